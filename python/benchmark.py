@@ -0,0 +1,163 @@
+#!/usr/bin/python3
+"""
+Benchmarks of ChainBridge
+=========================
+
+Usage
+-----
+    python3 benchmark.py [transaction_count]
+"""
+__author__ = ['Axel Ország-Krisz Dr.', 'Richárd Ádám Vécsey Dr.']
+__copyright__ = "Copyright 2021, ChainBridge Project"
+__credits__ = ['Axel Ország-Krisz Dr.', 'Richárd Ádám Vécsey Dr.']
+__license__ = 'Copyrighted'
+__version__ = '0.1'
+__status__ = 'Dev'
+
+
+import pickle
+import sys
+from time import perf_counter
+
+from chainbridge import (CBTransaction, CBUtxo, CertificationBatch,
+                         CertificationRegistry, CertificationVerifier,
+                         generic_permission_function, StatementOfAccount,
+                         UserWallet, WalletFile)
+
+
+
+def make_wallet(transaction_count):
+    """
+    Creates a synthetic user wallet
+    ===============================
+
+    Parameters
+    ----------
+    transaction_count : int
+        Number of transactions to generate.
+
+    Returns
+    -------
+    UserWallet
+        The generated user wallet.
+    """
+
+    wallet = UserWallet('bitcoincash:qbenchmark', displayed_name='Benchmark',
+                        is_valid=True)
+    for i in range(transaction_count):
+        txid = '{:064x}'.format(i)
+        raw = {'txid': txid, 'blockheight': 600000 + i, 'time': 1600000000 + i,
+               'vin': [{'cashAddress': 'bitcoincash:qforeign{}'.format(i % 50),
+                        'value': 0.5, 'n': 0}],
+               'vout': [{'value': '0.49990000', 'n': 0,
+                         'scriptPubKey': {'cashAddrs': ['bitcoincash:qbenchmark']}}],
+               'fees': 0.0001}
+        wallet.transactions.append_(CBTransaction(txid, 600000 + i,
+                                                  1600000000 + i, 1600000000 + i,
+                                                  1600000000 + i, 10, [0.0],
+                                                  [0.4999], [0.0001],
+                                                  'bitcoincash:qforeign{}'.format(i % 50),
+                                                  raw=raw))
+        if i % 10 == 0:
+            wallet.utxos.append_(CBUtxo(txid, 0.4999, 49990000, 600000 + i, 10))
+    return wallet
+
+
+
+def measure(function, repeat=5):
+    """
+    Measures the best runtime of a function
+    =======================================
+
+    Parameters
+    ----------
+    function : callable
+        Function to measure.
+    repeat : int, optional (5 if omitted)
+        Number of runs.
+
+    Returns
+    -------
+    float
+        The best runtime in seconds.
+    """
+
+    best = None
+    for i in range(repeat):
+        start = perf_counter()
+        function()
+        elapsed = perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+
+def benchmark_wallet_storage(transaction_count):
+    """
+    Compares cold loading of a user wallet from pickle and from WalletFile
+    ======================================================================
+
+    Parameters
+    ----------
+    transaction_count : int
+        Number of transactions of the synthetic wallet.
+    """
+
+    wallet = make_wallet(transaction_count)
+    pickled = pickle.dumps(wallet)
+    packed = WalletFile.dumps(wallet)
+    pickle_time = measure(lambda: pickle.loads(pickled))
+    packed_time = measure(lambda: UserWallet.from_dict_(WalletFile.loads(packed)))
+    print('Wallet storage ({} transactions)'.format(transaction_count))
+    print('  pickle     : {:10d} bytes {:8.2f} ms'.format(len(pickled),
+                                                          pickle_time * 1000))
+    print('  WalletFile : {:10d} bytes {:8.2f} ms'.format(len(packed),
+                                                          packed_time * 1000))
+    print('  speedup    : {:.1f}x'.format(pickle_time / packed_time))
+
+
+
+def benchmark_certification(document_count):
+    """
+    Measures offline verification of certified documents
+    ====================================================
+
+    Parameters
+    ----------
+    document_count : int
+        Number of documents certified in one batch.
+    """
+
+    registry = CertificationRegistry()
+    batch = CertificationBatch(anchor=lambda root: '{:064x}'.format(1),
+                               registry=registry)
+    documents = []
+    for i in range(document_count):
+        document = StatementOfAccount('bitcoincash:qbenchmark{}'.format(i % 100),
+                                      1600000000, 1600086400,
+                                      generic_permission_function, id=i)
+        content = 'STATEMENT OF ACCOUNT\nDocument {}\n'.format(i) * 20
+        batch.add(document, content)
+        documents.append((document, content))
+    start = perf_counter()
+    batch.certify()
+    certify_time = perf_counter() - start
+    verifier = CertificationVerifier(registry)
+    def verify_all():
+        for document, content in documents:
+            verifier.verify(document, content)
+    verify_time = measure(verify_all)
+    print('Certification ({} documents)'.format(document_count))
+    print('  certify    : {:8.2f} ms'.format(certify_time * 1000))
+    print('  verify     : {:10.0f} verifications/s'.format(document_count / verify_time))
+
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    else:
+        count = 50000
+    benchmark_wallet_storage(count)
+    benchmark_certification(count // 10)
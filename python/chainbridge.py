@@ -16,12 +16,34 @@ __version__ = '0.1'
 __status__ = 'Dev'
 
 
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict
 from collections.abc import Iterable
-from decimal import Decimal
+from concurrent.futures import (as_completed, FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+from contextlib import nullcontext
+import csv
+import hashlib
+import heapq
+import io
+from itertools import accumulate, islice
+import json
+import mmap
+from operator import attrgetter
+import os
 from os.path import isfile
 import pickle
+import re
 import requests
-from time import sleep, time
+import sqlite3
+import struct
+import sys
+import threading
+import unicodedata
+from time import gmtime, sleep, time
+from weakref import ref, WeakValueDictionary
+from zlib import compress, crc32, decompress
 
 
 
@@ -179,9 +201,18 @@ class APIHandler(object):
             back. By default request have result in case only, when return code
             from the server is 200. Adding elements to this parameter will cause
             that some error codes are sent back as result.
+
+        Attributes
+        ----------
+        api_root
+        rate_limiter
+        returncode_list
+        try_count
+        try_delay
         """
 
         self.__api_root = api_root.rstrip('/')
+        self.__rate_limiter = None
         if try_count is None:
             self.try_count = APIHandler.DEFAULT_TRY_COUNT
         else:
@@ -252,6 +283,71 @@ class APIHandler(object):
 
 
 
+    def post(self, paramlist, payload):
+        """
+        Makes a POST query from the API
+        ===============================
+
+        Parameters
+        ----------
+        paramlist : list of strings
+            The content of paramlist is transformed into SEO friendly API
+            query string like at .query().
+        payload : dict, list
+            Data to send as JSON body of the request.
+
+        Returns
+        -------
+        ResponseObject, None
+            The result like at .query().
+
+        Notes
+        -----
+            Bulk endpoints of APIs are usually served as POST requests.
+        """
+
+        query_string = ''
+        for param in paramlist:
+            query_string += '/{}'.format(param)
+        return self.query_(query_string, payload)
+
+
+
+    @property
+    def rate_limiter(self):
+        """
+        Gets the rate limiter of the queries
+        ====================================
+
+        Returns
+        -------
+        TokenBucket
+            The rate limiter every request has to pass.
+        None
+            If requests are not limited.
+        """
+
+        return self.__rate_limiter
+
+
+
+    @rate_limiter.setter
+    def rate_limiter(self, newlimiter):
+        """
+        Sets the rate limiter of the queries
+        ====================================
+
+        Parameters
+        ----------
+        newlimiter : TokenBucket, None
+            The rate limiter every request has to pass. Sharing the same
+            instance among APIHandler objects makes a global rate budget.
+        """
+
+        self.__rate_limiter = newlimiter
+
+
+
     @property
     def returncode_list(self):
         """
@@ -384,7 +480,7 @@ class APIHandler(object):
 
 
 
-    def query_(self, query_string):
+    def query_(self, query_string, payload=None):
         """
         Processes an actual query
         =========================
@@ -393,6 +489,9 @@ class APIHandler(object):
         ----------
         query_string : str
             String to be added to the API root to make a query.
+        payload : dict, list, optional (None if omitted)
+            Data to send as JSON body. If given the request is sent as POST,
+            otherwise as GET.
 
         Returns
         -------
@@ -423,8 +522,13 @@ class APIHandler(object):
         while do_loop:
             try_counter += 1
             request_success = True
+            if self.__rate_limiter is not None:
+                self.__rate_limiter.acquire()
             try:
-                response = requests.get(request_string)
+                if payload is None:
+                    response = requests.get(request_string)
+                else:
+                    response = requests.post(request_string, json=payload)
             except Exception:
                 request_success = False
             if request_success:
@@ -456,6 +560,10 @@ class BitcoinAPI(APIHandler):
         blockhain explorer API. It implements only those, which are needed to
         serve the purposes of ChainBridge.
 
+    Class Level Constants
+    ---------------------
+    BULK_LIMIT
+
     See Also
     --------
         Documentation of the bitcoin.com REST API can be consulet at:
@@ -464,6 +572,10 @@ class BitcoinAPI(APIHandler):
 
 
 
+    BULK_LIMIT = 20
+
+
+
     def __init__(self, try_count=None, try_delay=None):
         """
         Initializes the BitcoinAPI object
@@ -536,6 +648,54 @@ class BitcoinAPI(APIHandler):
 
 
 
+    def bulk_query_(self, endpoint, walletaddresses, key=None):
+        """
+        Processes a bulk query of addresses
+        ===================================
+
+        Parameters
+        ----------
+        endpoint : str
+            Name of the address endpoint, eg. 'details'.
+        walletaddresses : list of str
+            The bitcoincash addresses of the wallets.
+        key : str, optional (None if omitted)
+            Key of the records to return instead of the whole records.
+
+        Returns
+        -------
+        dict
+            The records by address.
+        None
+            If any query wasn't successful at all.
+
+        Throws
+        ------
+        ValueError
+            If any of the given addresses is not valid.
+
+        Notes
+        -----
+            Addresses are sent in chunks of BULK_LIMIT.
+        """
+
+        result = {}
+        for i in range(0, len(walletaddresses), BitcoinAPI.BULK_LIMIT):
+            chunk = list(walletaddresses[i:i + BitcoinAPI.BULK_LIMIT])
+            data = self.post(['address', endpoint], {'addresses': chunk})
+            if data is None:
+                return None
+            if data.code == 400:
+                raise ValueError('BitcoinAPI received invalid wallet address.')
+            for address, record in zip(chunk, data.content):
+                if key is None:
+                    result[address] = record
+                else:
+                    result[address] = record[key]
+        return result
+
+
+
     def get_address_details(self, walletaddress):
         """
         Gets the details record of the address
@@ -603,29 +763,66 @@ class BitcoinAPI(APIHandler):
             code prefers to use bitcoincash address where possible.
         """
 
-        data = self.query(['address', 'transactions', walletaddress])
+        page = self.get_address_transactions_page(walletaddress)
+        if page is not None:
+            result, pages_count = page
+            for i in range(1, pages_count):
+                page = self.get_address_transactions_page(walletaddress, i)
+                if page is not None:
+                    result += page[0]
+                else:
+                    raise RuntimeError('BitcoinAPI - error while getting address related transactions (page: {}/{}).'
+                                       .format(i, pages_count))
+            return result
+        return None
+
+
+
+    def get_address_transactions_page(self, walletaddress, page=0):
+        """
+        Gets a page of the transaction records of the address
+        =====================================================
+
+        Parameters
+        ----------
+        walletaddress : str
+            The bitcoincash address of the wallet.
+        page : int, optional (0 if omitted)
+            The index of the page to get.
+
+        Returns
+        -------
+        tuple (list, int)
+            List of the transactions of the page and the total number of pages.
+        None
+            If the query wasn't successful at all.
+
+        Throws
+        ------
+        ValueError
+            If the given address is not valid.
+        RuntimeError
+            If the address gets invalid during pagination of the transaction list.
+
+        Notes
+        -----
+            Pages are independent queries, so they can be fetched in parallel
+            once the total number of pages is known from the first page.
+        """
+
+        if page == 0:
+            data = self.query(['address', 'transactions', walletaddress])
+        else:
+            data = self.query(['address', 'transactions',
+                               '{}?page={}'.format(walletaddress, page)])
         if data is not None:
             if data.code == 200:
-                pages_count = data.content['pagesTotal']
-                result = []
-                for transaction in data.content['txs']:
-                    result.append(transaction)
-                for i in range(1, pages_count):
-                    data = self.query(['address', 'transactions',
-                                       '{}?page={}'.format(walletaddress, i)])
-                    if data is not None:
-                        if data.code == 200:
-                            for transaction in data.content['txs']:
-                                result.append(transaction)
-                        else:
-                            raise RuntimeError('BitcoinAPI - error 400 while getting address related transactions (page: {}/{}).'
-                                               .format(i, pages_count))
-                    else:
-                        raise RuntimeError('BitcoinAPI - error while getting address related transactions (page: {}/{}).'
-                                           .format(i, pages_count))
-                return result
+                return list(data.content['txs']), data.content['pagesTotal']
             elif data.code == 400:
-                raise ValueError('BitcoinAPI received invalid wallet address.')
+                if page == 0:
+                    raise ValueError('BitcoinAPI received invalid wallet address.')
+                raise RuntimeError('BitcoinAPI - error 400 while getting address related transactions (page: {}).'
+                                   .format(page))
         return None
 
 
@@ -659,7 +856,7 @@ class BitcoinAPI(APIHandler):
         data = self.query(['address', 'unconfirmed', walletaddress])
         if data is not None:
             if data.code == 200:
-                return data.content['utcos']
+                return data.content['utxos']
             elif data.code == 400:
                 raise ValueError('BitcoinAPI received invalid wallet address.')
         return None
@@ -702,6 +899,87 @@ class BitcoinAPI(APIHandler):
 
 
 
+    def get_addresses_details(self, walletaddresses):
+        """
+        Gets the details records of many addresses at once
+        ==================================================
+
+        Parameters
+        ----------
+        walletaddresses : list of str
+            The bitcoincash addresses of the wallets.
+
+        Returns
+        -------
+        dict
+            The details records by address.
+        None
+            If the query wasn't successful at all.
+
+        Throws
+        ------
+        ValueError
+            If any of the given addresses is not valid.
+        """
+
+        return self.bulk_query_('details', walletaddresses)
+
+
+
+    def get_addresses_unconfirmed(self, walletaddresses):
+        """
+        Gets the unconfirmed utxos of many addresses at once
+        ====================================================
+
+        Parameters
+        ----------
+        walletaddresses : list of str
+            The bitcoincash addresses of the wallets.
+
+        Returns
+        -------
+        dict
+            The lists of unconfirmed utxos by address.
+        None
+            If the query wasn't successful at all.
+
+        Throws
+        ------
+        ValueError
+            If any of the given addresses is not valid.
+        """
+
+        return self.bulk_query_('unconfirmed', walletaddresses, 'utxos')
+
+
+
+    def get_addresses_utxo(self, walletaddresses):
+        """
+        Gets the confirmed utxos of many addresses at once
+        ==================================================
+
+        Parameters
+        ----------
+        walletaddresses : list of str
+            The bitcoincash addresses of the wallets.
+
+        Returns
+        -------
+        dict
+            The lists of confirmed utxos by address.
+        None
+            If the query wasn't successful at all.
+
+        Throws
+        ------
+        ValueError
+            If any of the given addresses is not valid.
+        """
+
+        return self.bulk_query_('utxo', walletaddresses, 'utxos')
+
+
+
     def get_block_by_hash(self, hash):
         """
         Gets the block data with the given hash
@@ -764,6 +1042,32 @@ class BitcoinAPI(APIHandler):
 
 
 
+    def get_block_count(self):
+        """
+        Gets the height of the chain tip
+        ================================
+
+        Returns
+        -------
+        int
+            The height of the latest block of the chain.
+        None
+            If the query wasn't successful at all.
+
+        Notes
+        -----
+            This is the only query needed to refresh the confirmation state of
+            every transaction bound to a ChainTip instance.
+        """
+
+        data = self.query(['blockchain', 'getBlockCount'])
+        if data is not None:
+            if data.code == 200:
+                return int(data.content)
+        return None
+
+
+
     def get_transaction(self, txid):
         """
         Gets the transaction data with the given txid
@@ -839,100 +1143,286 @@ class BitcoinAPI(APIHandler):
 
 
 
-class Wallet(object):
-    """
-    This class provides basic functionality of a wallet
+class ChainTip(object):
     """
+    This class holds the height of the chain tip shared by many containers
+    ======================================================================
 
-
-
-    WALLET_INSTANTIATED = 0
-    WALLET_VALID = 1
-    WALLET_EDITABLE = 2
+    Notes
+    -----
+        The number of confirmations of a transaction is nothing else than the
+        height of the tip minus the height of the block of the transaction plus
+        one. Therefore it is enough to query the height of the tip once per new
+        block and let every subscribed container reclassify its transactions.
+    """
 
 
 
-    def __init__(self, address=None, displayed_name=None, details=None):
+    def __init__(self, height=None):
         """
-        Initializes the Wallet object
-        =============================
+        Initializes the ChainTip object
+        ===============================
 
         Parameters
         ----------
-        address : str, optional (None if omitted)
-            The address of the wallet instance.
-        displayed_name : str, optional (None if omitted)
-            The name to display for the wallet.
-        details : dict, optional (None if omitted)
-            Key, values pairs (str, str) of information about the wallet.
+        height : int, optional (None if omitted)
+            The known height of the chain tip.
 
         Attributes
         ----------
-        address
-        details
-        displayed_name
-        state
-
-        Class Level Constants
-        ---------------------
-        WALLET_INSTANTIATED
-        WALLET_VALID
-        WALLET_EDITABLE
+        height
         """
 
-        self.__address = None
-        self.__displayed_name = None
-        self.__details = {}
-        self.__state = Wallet.WALLET_INSTANTIATED
-        self.state_add(Wallet.WALLET_EDITABLE)
-        self.address = address
-        self.displayed_name = displayed_name
-        if details is not None:
-            for key, value in details:
-                self.set_detail(key, value)
-        self.state_delete(Wallet.WALLET_EDITABLE)
+        self.__height = height
+        self.__subscribers = {}
 
 
 
     @property
-    def address(self):
+    def height(self):
         """
-        Gets the address of the wallet
-        ==============================
+        Gets the height of the chain tip
+        ================================
 
-        Returns:
-        str
-            The address of the wallet.
+        Returns
+        -------
+        int
+            The height of the chain tip.
+        None
+            If the height is not known yet.
         """
 
-        return self.__address
+        return self.__height
 
 
 
-    @address.setter
-    def address(self, address):
+    def confirmations(self, block_height):
         """
-        Sets the address of the wallet
-        ==============================
+        Gets the number of confirmations of a block
+        ===========================================
 
         Parameters
         ----------
-        address : str
-            The address to be set as a wallet address.
+        block_height : int
+            The height of the block to count confirmations for.
 
-        Throws
-        ------
-        PermissionError
-            If you try to set the address more than once.
-        PermissionError
-            If the sate of the wallet doesn't cont WALLET_EDITABLE turned on.
+        Returns
+        -------
+        int
+            The number of confirmations. Blocks with height of None or less than
+            1 are considered as unconfirmed (mempool) entries.
+        None
+            If the height of the tip is not known yet.
         """
 
-        if has_state(self.__state, Wallet.WALLET_EDITABLE):
-            if self.__address is None:
-                self.__address = address
+        if self.__height is None:
+            return None
+        if block_height is None or block_height < 1:
+            return 0
+        return max(0, self.__height - block_height + 1)
+
+
+
+    def refresh(self, api):
+        """
+        Refreshes the height of the chain tip from the API
+        ==================================================
+
+        Parameters
+        ----------
+        api : BitcoinAPI
+            The API instance to query the tip with.
+
+        Returns
+        -------
+        bool
+            True if the height changed, False if not or if the query wasn't
+            successful.
+        """
+
+        height = api.get_block_count()
+        if height is None:
+            return False
+        return self.update(height)
+
+
+
+    def subscribe(self, container):
+        """
+        Subscribes a container to the changes of the chain tip
+        ======================================================
+
+        Parameters
+        ----------
+        container : TransactionContainer
+            The container to reclassify on each new block.
+
+        Notes
+        -----
+            Containers are held by weak references, subscribing a container
+            doesn't keep it alive.
+        """
+
+        key = id(container)
+        subscribers = self.__subscribers
+        self.__subscribers[key] = ref(container,
+                                      lambda _ref: subscribers.pop(key, None))
+
+
+
+    def unsubscribe(self, container):
+        """
+        Unsubscribes a container from the changes of the chain tip
+        ==========================================================
+
+        Parameters
+        ----------
+        container : TransactionContainer
+            The container to unsubscribe.
+        """
+
+        self.__subscribers.pop(id(container), None)
+
+
+
+    def update(self, height):
+        """
+        Updates the height of the chain tip
+        ===================================
+
+        Parameters
+        ----------
+        height : int
+            The new height of the chain tip.
+
+        Returns
+        -------
+        bool
+            True if the height changed, False if not.
+
+        Notes
+        -----
+            If the height changed every subscribed container reclassifies its
+            unconfirmed and under-confirmed transactions.
+        """
+
+        if height == self.__height:
+            return False
+        self.__height = height
+        for container_ref in list(self.__subscribers.values()):
+            container = container_ref()
+            if container is not None:
+                container.update_confirmations()
+        return True
+
+
+
+class Wallet(object):
+    """
+    This class provides basic functionality of a wallet
+    """
+
+
+
+    WALLET_INSTANTIATED = 0
+    WALLET_VALID = 1
+    WALLET_EDITABLE = 2
+
+
+
+    def __init__(self, address=None, displayed_name=None, details=None,
+                 is_valid=None):
+        """
+        Initializes the Wallet object
+        =============================
+
+        Parameters
+        ----------
+        address : str, optional (None if omitted)
+            The address of the wallet instance.
+        displayed_name : str, optional (None if omitted)
+            The name to display for the wallet.
+        details : dict, optional (None if omitted)
+            Key, values pairs (str, str) of information about the wallet.
+        is_valid : bool, optional (None if omitted)
+            Known validity of the address. If omitted the address is checked
+            with BitcoinAPI.is_valid_wallet(), which means a query. Restoring
+            a saved wallet should always give this parameter.
+
+        Attributes
+        ----------
+        address
+        details
+        displayed_name
+        state
+
+        Class Level Constants
+        ---------------------
+        WALLET_INSTANTIATED
+        WALLET_VALID
+        WALLET_EDITABLE
+        """
+
+        self.__address = None
+        self.__displayed_name = None
+        self.__details = {}
+        self.__containers = []
+        self.__state = Wallet.WALLET_INSTANTIATED
+        self.state_add(Wallet.WALLET_EDITABLE)
+        if is_valid is None:
+            self.address = address
+        else:
+            self.__address = address
+            if is_valid:
+                self.state_add(Wallet.WALLET_VALID)
+        self.displayed_name = displayed_name
+        if details is not None:
+            for key, value in details.items():
+                self.set_detail(key, value)
+        self.state_delete(Wallet.WALLET_EDITABLE)
+
+
+
+    @property
+    def address(self):
+        """
+        Gets the address of the wallet
+        ==============================
+
+        Returns:
+        str
+            The address of the wallet.
+        """
+
+        return self.__address
+
+
+
+    @address.setter
+    def address(self, address):
+        """
+        Sets the address of the wallet
+        ==============================
+
+        Parameters
+        ----------
+        address : str
+            The address to be set as a wallet address.
+
+        Throws
+        ------
+        PermissionError
+            If you try to set the address more than once.
+        PermissionError
+            If the sate of the wallet doesn't cont WALLET_EDITABLE turned on.
+        """
+
+        if has_state(self.__state, Wallet.WALLET_EDITABLE):
+            if self.__address is None:
+                self.__address = address
                 if BitcoinAPI.is_valid_wallet(address):
                     self.state_add(Wallet.WALLET_VALID)
+                self.changed_()
             else:
                 raise PermissionError('Tried to set read-only property "address".')
         else:
@@ -995,6 +1485,7 @@ class Wallet(object):
             else:
                 if has_state(self.__state, Wallet.WALLET_EDITABLE):
                     self.__displayed_name = name
+            self.changed_()
         else:
             raise PermissionError('Tried to change displayed name of a non-editable wallet.')
 
@@ -1024,6 +1515,30 @@ class Wallet(object):
 
 
 
+    @classmethod
+    def from_dict_(cls, datadict):
+        """
+        Creates a new Wallet instance from a dict
+        =========================================
+
+        Parameters
+        ----------
+        datadict : dict
+            Data as returned by .to_dict_().
+
+        Returns
+        -------
+        Wallet
+            The restored instance of the class the method is called on.
+        """
+
+        return cls(address=datadict['address'],
+                   displayed_name=datadict.get('displayed_name'),
+                   details=datadict.get('details'),
+                   is_valid=datadict.get('is_valid'))
+
+
+
     def set_detail(self, key, value):
         """
         Sets a detail of the wallet
@@ -1044,6 +1559,7 @@ class Wallet(object):
 
         if has_state(self.__state, Wallet.WALLET_EDITABLE):
             self.__details[key] = value
+            self.changed_()
         else:
             raise PermissionError('Tried to change a detail of a non-editable wallet.')
 
@@ -1098,6 +1614,8 @@ class Wallet(object):
         if stateid in [Wallet.WALLET_VALID, Wallet.WALLET_EDITABLE]:
             if not has_state(self.__state, stateid):
                 self.__state += stateid
+                if stateid == Wallet.WALLET_VALID:
+                    self.changed_()
         else:
             raise ValueError('Tried to add unknown state to a Wallet instance.')
 
@@ -1129,6 +1647,8 @@ class Wallet(object):
         if stateid in [Wallet.WALLET_VALID, Wallet.WALLET_EDITABLE]:
             if has_state(self.__state, stateid):
                 self.__state -= stateid
+                if stateid == Wallet.WALLET_VALID:
+                    self.changed_()
         else:
             raise ValueError('Tried to add unknown state to a Wallet instance.')
 
@@ -1162,11 +1682,95 @@ class Wallet(object):
                 self.__state -= stateid
             else:
                 self.__state += stateid
+            if stateid == Wallet.WALLET_VALID:
+                self.changed_()
         else:
             raise ValueError('Tried to add unknown state to a Wallet instance.')
 
 
 
+    def to_dict_(self):
+        """
+        Gets the data of the wallet as a dict
+        =====================================
+
+        Returns
+        -------
+        dict
+            JSON serializable data to restore the wallet with .from_dict_().
+        """
+
+        return {'address': self.__address,
+                'displayed_name': self.__displayed_name,
+                'details': dict(self.__details),
+                'is_valid': has_state(self.__state, Wallet.WALLET_VALID)}
+
+
+
+    def add_container_(self, container):
+        """
+        Registers a container to notify about the changes of the wallet
+        ===============================================================
+
+        Parameters
+        ----------
+        container : CBContainer
+            The container the wallet is added to.
+
+        Notes
+        -----
+            This function is for internal use by the containers.
+        """
+
+        if not any(item is container for item in self.__containers):
+            self.__containers.append(container)
+
+
+
+    def assign_(self, datadict):
+        """
+        Assigns the data of a dict to the wallet
+        ========================================
+
+        Parameters
+        ----------
+        datadict : dict
+            Data as returned by .to_dict_() with the same address.
+
+        Notes
+        -----
+            This function restores the state of a wallet in place, eg. when a
+            journal is replayed. The editable state of the wallet is ignored
+            and kept.
+        """
+
+        self.__displayed_name = datadict.get('displayed_name')
+        self.__details = dict(datadict.get('details') or {})
+        if datadict.get('is_valid', False):
+            self.__state |= Wallet.WALLET_VALID
+        else:
+            self.__state &= ~Wallet.WALLET_VALID
+        self.changed_()
+
+
+
+    def changed_(self):
+        """
+        Notifies the containers of the wallet about its change
+        ======================================================
+
+        Notes
+        -----
+            Every container the wallet is added to gets .item_changed_() with
+            the wallet, so its listeners get CONTAINER_UPDATE. This function
+            is called by the setters of the wallet.
+        """
+
+        for container in self.__containers:
+            container.item_changed_(self)
+
+
+
 class UserWallet(Wallet):
     """
     This class represents a user account and wallet
@@ -1174,9 +1778,17 @@ class UserWallet(Wallet):
 
 
 
+    UTXO_ADDED = 1
+    UTXO_CONFIRMED = 2
+    UTXO_REMOVED = 3
+    FETCH_WORKERS = 8
+
+
+
     def __init__(self, address, displayed_name=None, details=None,
                  addressbook=None, documents=None, searches=None,
-                 transactions=None, utxos=None, unconfirmed_utxos=None):
+                 transactions=None, utxos=None, unconfirmed_utxos=None,
+                 is_valid=None, loader=None):
         """
         Intializes the UserWallet object
         ================================
@@ -1192,7 +1804,7 @@ class UserWallet(Wallet):
             user wallet.
         addressbook : WalletContainer, optional (None if omitted)
             Container of foreign wallets that are registered by the user.
-        documents : list, optional (None if omitted)
+        documents : DocumentContainer, list, optional (None if omitted)
             Container of the document that are made by the user.
         searches : list, optional (None if omitted)
             Container of search activities of the user.
@@ -1202,17 +1814,31 @@ class UserWallet(Wallet):
             Container of all confirmed utxos of the user.
         unconfirmed_utxos : UtxoContainer, optional (None if omitted)
             Container of all unconfirmed utxos of the user.
+        is_valid : bool, optional (None if omitted)
+            Known validity of the address. If omitted the address is checked
+            with a query.
+        loader : object, optional (None if omitted)
+            Object with a load_container_(address, name) method. Containers
+            which are not given are loaded through it at first access, where
+            name is the name of the property.
 
         Attributes
         ----------
         addressbook
-        documents
+        balance
         documents
         searches
         transactions
         utxos
         unconfirmed_utxos
 
+        Class Level Constants
+        ---------------------
+        FETCH_WORKERS
+        UTXO_ADDED
+        UTXO_CONFIRMED
+        UTXO_REMOVED
+
         Classmethods
         ------------
         from_address
@@ -1236,1733 +1862,12914 @@ class UserWallet(Wallet):
 
         super(self.__class__, self).__init__(address=address,
                                              displayed_name=displayed_name,
-                                             details=details)
-        if addressbook is None:
+                                             details=details,
+                                             is_valid=is_valid)
+        self.__loader = loader
+        self.__load_listeners = []
+        self.__search_cache = None
+        self.__search_views = {}
+        self.__aggregation = None
+        self.__counterparties = None
+        if addressbook is None and loader is None:
             self.__addressbook = WalletContainer()
         else:
             self.__addressbook = addressbook
-        if documents is None:
-            self.__documents = []
-        else:
+        if documents is None and loader is None:
+            self.__documents = DocumentContainer()
+        elif documents is None or isinstance(documents, DocumentContainer):
             self.__documents = documents
-        if searches is None:
+        else:
+            self.__documents = DocumentContainer(documents)
+        if searches is None and loader is None:
             self.__searches = []
         else:
             self.__searches = searches
-        if transactions is None:
+        if transactions is None and loader is None:
             self.__transactions = TransactionContainer()
         else:
             self.__transactions = transactions
-        if utxos is None:
+        if utxos is None and loader is None:
             self.__utxos = UtxoContainer()
         else:
             self.__utxos = utxos
-        if unconfirmed_utxos is None:
+        if unconfirmed_utxos is None and loader is None:
             self.__unconfirmed_utxos = UtxoContainer()
         else:
             self.__unconfirmed_utxos = unconfirmed_utxos
 
 
 
-        @property
-        def addressbook(self):
-            """
-            Gets the addressbook of the user
-            ================================
+    def add_load_listener(self, listener):
+        """
+        Adds a listener of lazy container loads
+        =======================================
 
-            Returns
-            -------
-            WalletContainer
-                The addressbook of the user.
-
-            Notes
-            -----
-                However this property does not have setter, it doesn't mean that
-                the addressbook itself is not editable. It means only that it is
-                not replaceable.
-            """
-
-            return self.__addressbook
-
-
-
-        @property
-        def documents(self):
-            """
-            Gets the list of the documents created by the user
-            ==================================================
-
-            Returns
-            -------
-            list
-                The list of the documents of the user.
-
-            Notes
-            -----
-                However this property does not have setter, it doesn't mean that
-                the list of documents itself is not editable. It means only that
-                it is not replaceable.
-            """
-
-            return self.__documents
-
-
-
-        @classmethod
-        def from_address(cls, address):
-            """
-            Creates a new UserWallet instance from bitcoincash address
-            ==========================================================
-
-            Parameters
-            ----------
-            address : str
-                A bitcoincash address to create a new UserWallet from.
-
-            Returns
-            -------
-            UserWallet
-                The new instance for the user.
-
-            Throws
-            ------
-            ValueError
-                If the address is not valid.
-
-            Notes
-            -----
-            1
-                This is a classmethod and this method is a quite common and
-                convenient way to create a user wallet especially if you use
-                this code like part of online service and you register a new
-                user.
-            2
-                The service works with legacy and SLP addresses as well but this
-                code prefers to use bitcoincash address where possible.
-            """
-
-            data = {}
-            pass
-            return UserWallet.from_dict_(data)
-
-
-
-        @classmethod
-        def from_file(cls, filename):
-            """
-            Creates a new UserWallet instance from data from file
-            =====================================================
-
-            Parameters
-            ----------
-            filename : str
-                The name or path of a file to create a new UserWallet from.
-
-            Returns
-            -------
-            UserWallet
-                The new instance for the user.
-
-            Throws
-            ------
-            FileNotFoundError
-                If the file does not exist.
-
-            Notes
-            -----
-                This is a classmethod and this method is a quite common and
-                convenient way to create a user wallet especially if you use
-                this code like part of any service if you want to restore a user
-                from a saved state.
-            """
-
-            if isfile(filename):
-                with open(filename, 'rb') as instream:
-                    data = pickle.load(instream)
-                return UserWallet.from_dict_(data)
-            else:
-                raise FileNotFoundError('UserWallet.from_file() given fiel "{}" not found.'
-                                        .format(filename))
-
-
-
-        @property
-        def searches(self):
-            """
-            Gets the list of the search experements created by the user
-            ============================================================
+        Parameters
+        ----------
+        listener : callable
+            Function to call with (wallet, name, container) when a container
+            is loaded through the loader, where name is the name of the
+            property.
+        """
 
-            Returns
-            -------
-            list
-                The list of the search experiments of the user.
-
-            Notes
-            -----
-                However this property does not have setter, it doesn't mean that
-                the list of searches itself is not editable. It means only that
-                it is not replaceable.
-            """
-
-            return self.__searches
-
-
-
-        @property
-        def transactions(self):
-            """
-            Gets the transactions of the user
-            =================================
-
-            Returns
-            -------
-            TransactionContainer
-                The transactions of the user.
-
-            Notes
-            -----
-            1.
-                However this property does not have setter, it doesn't mean that
-                the transaction itself is not editable. It means only that it is
-                not replaceable.
-            2.
-                It is strongly unadvised to delete from containers based on
-                blockchain data. It is much better to re-query and re-generate
-                the concerning object if something bad or unexpected happened.
-            """
-
-            return self.__transactions
-
-
-
-        @property
-        def utxos(self):
-            """
-            Gets the utxos of the user
-            ================================
-
-            Returns
-            -------
-            UtxoContainer
-                The utxos of the user.
-
-            Notes
-            -----
-            1.
-                However this property does not have setter, it doesn't mean that
-                the utxos itself is not editable. It means only that it is not
-                replaceable.
-            2.
-                It is strongly unadvised to delete from containers based on
-                blockchain data. It is much better to re-query and re-generate
-                the concerning object if something bad or unexpected happened.
-            """
-
-            return self.__utxos
-
-
-        @property
-        def unconfirmed_utxos(self):
-            """
-            Gets the unconfirmed utxos of the user
-            ======================================
-
-            Returns
-            -------
-            UtxoContainer
-                The unconfirmed utxos of the user.
-
-            Notes
-            -----
-            1.
-                However this property does not have setter, it doesn't mean that
-                the unconfirmed utxos itself is not editable. It means only that
-                it is not replaceable.
-            2.
-                It is strongly unadvised to delete from containers based on
-                blockchain data. It is much better to re-query and re-generate
-                the concerning object if something bad or unexpected happened.
-            """
-
-            return self.__unconfirmed_utxos
-
-
-
-
-        @classmethod
-        def from_dict_(cls, datadict):
-            """
-            Creates a new UserWallet instance from a dict
-            =============================================
-
-            Parameters
-            ----------
-            datadict : dict
-                All the data which is needed to restore an existing UserWallet
-                instance.
-
-            Returns
-            -------
-            UserWallet
-                The new instance for the user.
-
-            Notes
-            -----
-                However this is a publicly accessible classmethod it is unadvised
-                to use it directly for getting new UserWallet instances. On the
-                other hand this method can be useful to restore UserWallet
-                instances from different sources as well.
-            """
-
-            pass
-            wallet = UserWallet()
-            return wallet
+        if listener not in self.__load_listeners:
+            self.__load_listeners.append(listener)
 
 
 
-class WalletContainer(list):
-    """
-    This class provides special container for Wallet instances
+    @property
+    def addressbook(self):
+        """
+        Gets the addressbook of the user
+        ================================
 
-    Notes
-    -----
-        The purpose of this class is not contain UserWallet instances but to
-        contain Wallet instances for an addressbook in a UserWallet instance.
-    """
+        Returns
+        -------
+        WalletContainer
+            The addressbook of the user.
 
+        Notes
+        -----
+            However this property does not have setter, it doesn't mean that
+            the addressbook itself is not editable. It means only that it is
+            not replaceable.
+        """
 
+        if self.__addressbook is None:
+            self.__addressbook = self.__loader.load_container_(self.address, 'addressbook')
+            self.loaded_('addressbook', self.__addressbook)
+        return self.__addressbook
 
-    def __init__(self, wallets=None):
-        """
-        Intializes the WalletContainer object
-        =====================================
 
-        Parameters
-        ----------
-        wallets : list
-            List of wallets to add to the container right at instantiation.
 
-        Notes
-        -----
-            WalletContainer is a subclass of list, please keep this in mind if
-            you are using an instance of this class.
+    @property
+    def aggregation(self):
         """
+        Gets the rollups of the transactions of the user
+        ================================================
 
-        add_wallets = True
-        if wallets is None:
+        Returns
+        -------
+        AggregationEngine
+            Engine attached to the transactions of the user, it is created at
+            first access.
+        """
+
+        if self.__aggregation is None:
+            self.__aggregation = AggregationEngine(self.transactions)
+        return self.__aggregation
+
+
+
+    @property
+    def balance(self):
+        """
+        Gets the balance summary of the user
+        ====================================
+
+        Returns
+        -------
+        dict
+            Summary with the following keys:
+                spendable : int, satoshis in confirmed utxos
+                pending : int, satoshis in unconfirmed utxos
+                total : int, satoshis in all utxos
+                utxo_count : int, number of all utxos
+                min_confirmations : int or None, confirmations of the youngest
+                    confirmed utxo
+
+        Notes
+        -----
+            The summary is built from running totals of the utxo containers,
+            so its cost doesn't depend on the number of utxos.
+        """
+
+        spendable = self.utxos.sat_total
+        pending = self.unconfirmed_utxos.sat_total
+        return {'spendable': spendable,
+                'pending': pending,
+                'total': spendable + pending,
+                'utxo_count': self.utxos.count + self.unconfirmed_utxos.count,
+                'min_confirmations': self.utxos.min_confirmations}
+
+
+
+    @property
+    def counterparties(self):
+        """
+        Gets the resolver of the counterparties of the user
+        ===================================================
+
+        Returns
+        -------
+        CounterpartyResolver
+            Resolver on the addressbook of the user, it is created at first
+            access.
+
+        Notes
+        -----
+            Call .counterparties.resolve(.transactions) to get the names of
+            the counterparties.
+        """
+
+        if self.__counterparties is None:
+            self.__counterparties = CounterpartyResolver(self.addressbook)
+        return self.__counterparties
+
+
+
+    @property
+    def documents(self):
+        """
+        Gets the list of the documents created by the user
+        ==================================================
+
+        Returns
+        -------
+        DocumentContainer
+            The list of the documents of the user.
+
+        Notes
+        -----
+            However this property does not have setter, it doesn't mean that
+            the list of documents itself is not editable. It means only that
+            it is not replaceable.
+        """
+
+        if self.__documents is None:
+            self.__documents = self.__loader.load_container_(self.address, 'documents')
+            self.loaded_('documents', self.__documents)
+        return self.__documents
+
+
+
+    @classmethod
+    def from_address(cls, address, api=None, chain_tip=None, progress=None,
+                     cancel=None, max_workers=None):
+        """
+        Creates a new UserWallet instance from bitcoincash address
+        ==========================================================
+
+        Parameters
+        ----------
+        address : str
+            A bitcoincash address to create a new UserWallet from.
+        api : BitcoinAPI, optional (None if omitted)
+            The API instance to query with. If omitted a new instance is used.
+        chain_tip : ChainTip, optional (None if omitted)
+            Shared chain tip to bind the transactions to.
+        progress : callable, optional (None if omitted)
+            Function to call with (done, total) after each finished query.
+            The total grows when the number of transaction pages gets known.
+        cancel : threading.Event, optional (None if omitted)
+            Event to set to abort the creation.
+        max_workers : int, optional (None if omitted)
+            Number of parallel queries. If omitted FETCH_WORKERS is used.
+
+        Returns
+        -------
+        UserWallet
+            The new instance for the user.
+
+        Throws
+        ------
+        ValueError
+            If the address is not valid.
+        RuntimeError
+            If any query wasn't successful at all or if the creation is
+            cancelled.
+
+        Notes
+        -----
+        1
+            This is a classmethod and this method is a quite common and
+            convenient way to create a user wallet especially if you use
+            this code like part of online service and you register a new
+            user.
+        2
+            The service works with legacy and SLP addresses as well but this
+            code prefers to use bitcoincash address where possible.
+        3
+            Details, transactions, confirmed and unconfirmed utxos are queried
+            at the same time and the remaining transaction pages are queried
+            in parallel as soon as their number is known. Pages are merged
+            into the transaction container in their original order as they
+            arrive, so the whole process takes about as long as the slowest
+            query chain instead of the sum of all queries.
+        """
+
+        if api is None:
+            api = BitcoinAPI()
+        if max_workers is None:
+            max_workers = UserWallet.FETCH_WORKERS
+        transactions = TransactionContainer(chain_tip=chain_tip)
+        data = {'address': address, 'is_valid': True,
+                'transactions': transactions}
+        pages = {}
+        next_page = 0
+        total = 4
+        done = 0
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = {executor.submit(api.get_address_details, address): 'details',
+                       executor.submit(api.get_address_utxo, address): 'utxos',
+                       executor.submit(api.get_address_unconfirmed, address): 'unconfirmed_utxos',
+                       executor.submit(api.get_address_transactions_page, address): 0}
+            while len(futures) > 0:
+                finished, waiting = wait(list(futures.keys()), timeout=0.1,
+                                         return_when=FIRST_COMPLETED)
+                if cancel is not None and cancel.is_set():
+                    raise RuntimeError('UserWallet.from_address() - cancelled.')
+                for future in finished:
+                    key = futures.pop(future)
+                    result = future.result()
+                    if result is None:
+                        raise RuntimeError('UserWallet.from_address() - query of {} failed.'
+                                           .format('transactions' if isinstance(key, int)
+                                                   else key))
+                    if key == 'details':
+                        data['details'] = result
+                    elif key == 'utxos' or key == 'unconfirmed_utxos':
+                        data[key] = UtxoContainer([CBUtxo.from_raw(record)
+                                                   for record in result],
+                                                  chain_tip=chain_tip)
+                    else:
+                        records, pages_count = result
+                        if key == 0 and pages_count > 1:
+                            for i in range(1, pages_count):
+                                futures[executor.submit(api.get_address_transactions_page,
+                                                        address, i)] = i
+                            total += pages_count - 1
+                        pages[key] = records
+                        while next_page in pages:
+                            transactions.merge([CBTransaction.from_raw(record, address)
+                                                for record in pages.pop(next_page)])
+                            next_page += 1
+                    done += 1
+                    if progress is not None:
+                        progress(done, total)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return UserWallet.from_dict_(data)
+
+
+
+    @classmethod
+    def from_file(cls, filename, allow_pickle=False):
+        """
+        Creates a new UserWallet instance from data from file
+        =====================================================
+
+        Parameters
+        ----------
+        filename : str
+            The name or path of a file to create a new UserWallet from.
+        allow_pickle : bool, optional (False if omitted)
+            Whether to read a legacy pickle file or not. A legacy file is
+            rewritten in the format of WalletFile right after reading, so
+            this is needed once per file only.
+
+        Returns
+        -------
+        UserWallet
+            The new instance for the user.
+
+        Throws
+        ------
+        FileNotFoundError
+            If the file does not exist.
+
+        ValueError
+            If the file is not a valid wallet file or its format version is
+            not supported, or if it is a legacy file and allow_pickle is False.
+
+        Notes
+        -----
+        1.
+            This is a classmethod and this method is a quite common and
+            convenient way to create a user wallet especially if you use
+            this code like part of any service if you want to restore a user
+            from a saved state.
+        2.
+            The file is read in the format of WalletFile. Unlike pickle this
+            format holds data only, therefore it is safe to read from untrusted
+            storage as well.
+        3.
+            Files written by earlier versions are pickles. Unpickling can run
+            arbitrary code, so allow_pickle=True should be used for files of
+            trusted origin only.
+        """
+
+        if isfile(filename):
+            with open(filename, 'rb') as instream:
+                data = instream.read()
+            if data[:len(WalletFile.MAGIC)] == WalletFile.MAGIC:
+                return UserWallet.from_dict_(WalletFile.loads(data))
+            if not allow_pickle:
+                raise ValueError('UserWallet.from_file() - "{}" is not a wallet file. If it '
+                                 'is a legacy pickle file of trusted origin, read it once '
+                                 'with allow_pickle=True to convert it.'.format(filename))
+            wallet = UserWallet.from_dict_(pickle.loads(data))
+            wallet.to_file(filename)
+            return wallet
+        else:
+            raise FileNotFoundError('UserWallet.from_file() given fiel "{}" not found.'
+                                    .format(filename))
+
+
+
+    def reconcile_utxos(self, confirmed=None, unconfirmed=None, listener=None):
+        """
+        Reconciles the utxo containers with fresh API results
+        =====================================================
+
+        Parameters
+        ----------
+        confirmed : list of dict, optional (None if omitted)
+            Fresh result of BitcoinAPI.get_address_utxo(). If omitted the
+            container of confirmed utxos is left untouched.
+        unconfirmed : list of dict, optional (None if omitted)
+            Fresh result of BitcoinAPI.get_address_unconfirmed(). If omitted
+            the container of unconfirmed utxos is left untouched.
+        listener : callable, optional (None if omitted)
+            Function to call with (event, utxo) for each change.
+
+        Returns
+        -------
+        list of tuple (int, CBUtxo)
+            List of changes, where event can be UTXO_ADDED, UTXO_CONFIRMED or
+            UTXO_REMOVED.
+
+        Notes
+        -----
+        1.
+            Records are matched by tx ID and output index. Entries present in
+            both the fresh and the stored state are not touched at all.
+        2.
+            An unconfirmed utxo which shows up among confirmed records is
+            promoted and reported as UTXO_CONFIRMED. Any other vanishing utxo
+            is reported as UTXO_REMOVED, since it is either spent or dropped
+            from the mempool.
+        """
+
+        changes = []
+        promoted = set()
+        if confirmed is not None:
+            fresh = {}
+            for record in confirmed:
+                utxo = CBUtxo.from_raw(record)
+                fresh[utxo.key] = utxo
+            stored = self.utxos.keys()
+            for utxo in self.utxos.remove_keys(stored - fresh.keys()):
+                changes.append((UserWallet.UTXO_REMOVED, utxo))
+            for key, utxo in fresh.items():
+                if key not in stored:
+                    self.utxos.append_(utxo)
+                    if self.unconfirmed_utxos.contains_key(key):
+                        promoted.add(key)
+                        changes.append((UserWallet.UTXO_CONFIRMED, utxo))
+                    else:
+                        changes.append((UserWallet.UTXO_ADDED, utxo))
+            self.unconfirmed_utxos.remove_keys(promoted)
+        if unconfirmed is not None:
+            fresh = {}
+            for record in unconfirmed:
+                utxo = CBUtxo.from_raw(record)
+                if utxo.key not in promoted and not self.utxos.contains_key(utxo.key):
+                    fresh[utxo.key] = utxo
+            stored = self.unconfirmed_utxos.keys()
+            for utxo in self.unconfirmed_utxos.remove_keys(stored - fresh.keys()):
+                changes.append((UserWallet.UTXO_REMOVED, utxo))
+            for key, utxo in fresh.items():
+                if key not in stored:
+                    self.unconfirmed_utxos.append_(utxo)
+                    changes.append((UserWallet.UTXO_ADDED, utxo))
+        if listener is not None:
+            for event, utxo in changes:
+                listener(event, utxo)
+        return changes
+
+
+
+    def refresh_utxos(self, api, listener=None):
+        """
+        Refreshes the utxo containers from the API
+        ==========================================
+
+        Parameters
+        ----------
+        api : BitcoinAPI
+            The API instance to query with.
+        listener : callable, optional (None if omitted)
+            Function to call with (event, utxo) for each change.
+
+        Returns
+        -------
+        list of tuple (int, CBUtxo)
+            List of changes, see .reconcile_utxos() for details.
+        """
+
+        confirmed = api.get_address_utxo(self.address)
+        unconfirmed = api.get_address_unconfirmed(self.address)
+        return self.reconcile_utxos(confirmed, unconfirmed, listener)
+
+
+
+    def remove_load_listener(self, listener):
+        """
+        Removes a listener of lazy container loads
+        ==========================================
+
+        Parameters
+        ----------
+        listener : callable
+            The listener to remove. Unknown listeners are ignored.
+        """
+
+        if listener in self.__load_listeners:
+            self.__load_listeners.remove(listener)
+
+
+
+    def search(self, search):
+        """
+        Applies a search to the transactions of the user
+        ================================================
+
+        Parameters
+        ----------
+        search : SearchObject
+            The search to apply, eg. an item of .searches.
+
+        Returns
+        -------
+        list of CBTransaction
+            The matching transactions.
+
+        Notes
+        -----
+            Results are memoized in a SearchCache of the wallet, so repeated
+            views of an unchanged search over unchanged transactions are not
+            recomputed.
+        """
+
+        if self.__search_cache is None:
+            self.__search_cache = SearchCache()
+        return self.__search_cache.apply(search, self.transactions, self.addressbook)
+
+
+
+    def search_view(self, search):
+        """
+        Gets the live view of a search on the transactions of the user
+        ==============================================================
+
+        Parameters
+        ----------
+        search : SearchObject
+            The search, eg. an item of .searches.
+
+        Returns
+        -------
+        SearchView
+            The view of the search. The same view is returned for the same
+            search as long as it is not closed.
+
+        Notes
+        -----
+            Views are kept up to date incrementally, which suits searches
+            shown continuously, like the ones of live AccountActivity
+            documents.
+        """
+
+        view = self.__search_views.get(id(search))
+        if view is None or view.closed or view.search is not search:
+            view = SearchView(search, self.transactions, self.addressbook)
+            self.__search_views[id(search)] = view
+        return view
+
+
+
+    def sync_transactions(self, api):
+        """
+        Adds the new transactions of the user from the API
+        ==================================================
+
+        Parameters
+        ----------
+        api : BitcoinAPI
+            The API instance to query with.
+
+        Returns
+        -------
+        list of CBTransaction
+            The new transactions.
+
+        Throws
+        ------
+        RuntimeError
+            If a query wasn't successful at all.
+
+        Notes
+        -----
+            Pages come newest first, so pages are fetched only until a page
+            holds an already known transaction.
+        """
+
+        result = []
+        page = 0
+        pages_count = 1
+        while page < pages_count:
+            data = api.get_address_transactions_page(self.address, page)
+            if data is None:
+                raise RuntimeError('UserWallet.sync_transactions() - query of page {} failed.'
+                                   .format(page))
+            records, pages_count = data
+            new_records = [record for record in records
+                           if not self.transactions.contains_tx(record['txid'])]
+            result += self.transactions.merge([CBTransaction.from_raw(record, self.address)
+                                               for record in new_records])
+            if len(new_records) < len(records):
+                break
+            page += 1
+        return result
+
+
+
+    def is_loaded(self, name):
+        """
+        Checks whether a container is loaded or not
+        ===========================================
+
+        Parameters
+        ----------
+        name : str
+            Name of the container property, eg. 'transactions'.
+
+        Returns
+        -------
+        bool
+            True if the container is in memory, False if it would be loaded
+            through the loader at next access.
+        """
+
+        return getattr(self, '_UserWallet__' + name) is not None
+
+
+
+    @property
+    def searches(self):
+        """
+        Gets the list of the search experements created by the user
+        ============================================================
+
+        Returns
+        -------
+        list
+            The list of the search experiments of the user.
+
+        Notes
+        -----
+            However this property does not have setter, it doesn't mean that
+            the list of searches itself is not editable. It means only that
+            it is not replaceable.
+        """
+
+        if self.__searches is None:
+            self.__searches = self.__loader.load_container_(self.address, 'searches')
+            self.loaded_('searches', self.__searches)
+        return self.__searches
+
+
+
+    @property
+    def transactions(self):
+        """
+        Gets the transactions of the user
+        =================================
+
+        Returns
+        -------
+        TransactionContainer
+            The transactions of the user.
+
+        Notes
+        -----
+        1.
+            However this property does not have setter, it doesn't mean that
+            the transaction itself is not editable. It means only that it is
+            not replaceable.
+        2.
+            It is strongly unadvised to delete from containers based on
+            blockchain data. It is much better to re-query and re-generate
+            the concerning object if something bad or unexpected happened.
+        """
+
+        if self.__transactions is None:
+            self.__transactions = self.__loader.load_container_(self.address, 'transactions')
+            self.loaded_('transactions', self.__transactions)
+        return self.__transactions
+
+
+
+    @property
+    def utxos(self):
+        """
+        Gets the utxos of the user
+        ================================
+
+        Returns
+        -------
+        UtxoContainer
+            The utxos of the user.
+
+        Notes
+        -----
+        1.
+            However this property does not have setter, it doesn't mean that
+            the utxos itself is not editable. It means only that it is not
+            replaceable.
+        2.
+            It is strongly unadvised to delete from containers based on
+            blockchain data. It is much better to re-query and re-generate
+            the concerning object if something bad or unexpected happened.
+        """
+
+        if self.__utxos is None:
+            self.__utxos = self.__loader.load_container_(self.address, 'utxos')
+            self.loaded_('utxos', self.__utxos)
+        return self.__utxos
+
+
+    @property
+    def unconfirmed_utxos(self):
+        """
+        Gets the unconfirmed utxos of the user
+        ======================================
+
+        Returns
+        -------
+        UtxoContainer
+            The unconfirmed utxos of the user.
+
+        Notes
+        -----
+        1.
+            However this property does not have setter, it doesn't mean that
+            the unconfirmed utxos itself is not editable. It means only that
+            it is not replaceable.
+        2.
+            It is strongly unadvised to delete from containers based on
+            blockchain data. It is much better to re-query and re-generate
+            the concerning object if something bad or unexpected happened.
+        """
+
+        if self.__unconfirmed_utxos is None:
+            self.__unconfirmed_utxos = self.__loader.load_container_(self.address, 'unconfirmed_utxos')
+            self.loaded_('unconfirmed_utxos', self.__unconfirmed_utxos)
+        return self.__unconfirmed_utxos
+
+
+
+
+    @classmethod
+    def from_dict_(cls, datadict):
+        """
+        Creates a new UserWallet instance from a dict
+        =============================================
+
+        Parameters
+        ----------
+        datadict : dict
+            All the data which is needed to restore an existing UserWallet
+            instance.
+
+        Returns
+        -------
+        UserWallet
+            The new instance for the user.
+
+        Notes
+        -----
+        1.
+            However this is a publicly accessible classmethod it is unadvised
+            to use it directly for getting new UserWallet instances. On the
+            other hand this method can be useful to restore UserWallet
+            instances from different sources as well.
+        2.
+            The keys of datadict are the same as the keys of the result of
+            .to_dict_(). Values of addressbook, transactions, utxos and
+            unconfirmed_utxos can be given as ready made containers or as lists
+            of records. Values of documents and searches can be given as lists
+            of instances or as lists of records. Only address is mandatory.
+        """
+
+        addressbook = datadict.get('addressbook')
+        if addressbook is not None and not isinstance(addressbook, WalletContainer):
+            container = WalletContainer()
+            for record in addressbook:
+                container.append(Wallet.from_dict_(record))
+            addressbook = container
+        transactions = datadict.get('transactions')
+        if transactions is not None and not isinstance(transactions, TransactionContainer):
+            container = TransactionContainer()
+            for record in transactions:
+                container.append_(CBTransaction(**record))
+            transactions = container
+        utxos = datadict.get('utxos')
+        if utxos is not None and not isinstance(utxos, UtxoContainer):
+            utxos = UtxoContainer([CBUtxo(**record) for record in utxos])
+        unconfirmed_utxos = datadict.get('unconfirmed_utxos')
+        if unconfirmed_utxos is not None and not isinstance(unconfirmed_utxos, UtxoContainer):
+            unconfirmed_utxos = UtxoContainer([CBUtxo(**record)
+                                               for record in unconfirmed_utxos])
+        documents = datadict.get('documents')
+        if documents is not None:
+            documents = [item if isinstance(item, CBDocument)
+                         else CBDocument.from_dict_(item) for item in documents]
+        searches = datadict.get('searches')
+        if searches is not None:
+            searches = [item if isinstance(item, SearchObject)
+                        else SearchObject(item) for item in searches]
+        wallet = UserWallet(datadict['address'],
+                            displayed_name=datadict.get('displayed_name'),
+                            details=datadict.get('details'),
+                            addressbook=addressbook, documents=documents,
+                            searches=searches, transactions=transactions,
+                            utxos=utxos, unconfirmed_utxos=unconfirmed_utxos,
+                            is_valid=datadict.get('is_valid'))
+        return wallet
+
+
+
+    def loaded_(self, name, container):
+
+        for listener in list(self.__load_listeners):
+            listener(self, name, container)
+
+
+
+    def to_dict_(self):
+        """
+        Gets the data of the user wallet as a dict
+        ==========================================
+
+        Returns
+        -------
+        dict
+            Data to restore the user wallet with .from_dict_(). Containers are
+            turned into lists of records.
+        """
+
+        result = super(self.__class__, self).to_dict_()
+        result['addressbook'] = [wallet.to_dict_() for wallet in self.addressbook]
+        result['documents'] = [document.to_dict_() for document in self.documents]
+        result['searches'] = [search.filter_list for search in self.searches]
+        result['transactions'] = [transaction.to_dict_()
+                                  for transaction in self.transactions]
+        result['utxos'] = [utxo.to_dict_() for utxo in self.utxos]
+        result['unconfirmed_utxos'] = [utxo.to_dict_()
+                                       for utxo in self.unconfirmed_utxos]
+        return result
+
+
+
+    def to_file(self, filename):
+        """
+        Saves the user wallet to file
+        =============================
+
+        Parameters
+        ----------
+        filename : str
+            The name or path of the file to save to.
+
+        Notes
+        -----
+            The file is written in the format of WalletFile and can be read
+            with .from_file().
+        """
+
+        with open(filename, 'wb') as outstream:
+            WalletFile.dump(self, outstream)
+
+
+
+class CBContainer(list):
+    """
+    This class is the common parent of the containers of ChainBridge
+
+    Notes
+    -----
+        Containers notify their listeners about appended, removed and updated
+        items and count their modifications in a version number. Updates are
+        changes of an item in place, eg. of its confirmation level, or of a
+        wallet or document which notifies its containers on change.
+        Modifications through the plain list interface (eg. list.remove() or
+        slicing) bypass this mechanism.
+    """
+
+
+
+    CONTAINER_APPEND = 1
+    CONTAINER_REMOVE = 2
+    CONTAINER_UPDATE = 3
+
+
+
+    def __init__(self, items=None):
+        """
+        Intializes the CBContainer object
+        =================================
+
+        Parameters
+        ----------
+        items : list, optional (None if omitted)
+            List of items to add to the container right at instantiation.
+
+        Attributes
+        ----------
+        version
+
+        Class Level Constants
+        ---------------------
+        CONTAINER_APPEND
+        CONTAINER_REMOVE
+        CONTAINER_UPDATE
+        """
+
+        if items is None:
+            super(CBContainer, self).__init__()
+        else:
+            super(CBContainer, self).__init__(items)
+        self.__listeners = []
+        self.__version = 0
+
+
+
+    def add_listener(self, listener):
+        """
+        Adds a listener to the container
+        ================================
+
+        Parameters
+        ----------
+        listener : callable
+            Function to call with (container, event, item) on each change,
+            where event is CONTAINER_APPEND, CONTAINER_REMOVE or
+            CONTAINER_UPDATE.
+        """
+
+        if listener not in self.__listeners:
+            self.__listeners.append(listener)
+
+
+
+    def notify_(self, event, item):
+        """
+        Notifies the listeners about a change
+        =====================================
+
+        Parameters
+        ----------
+        event : int
+            CONTAINER_APPEND, CONTAINER_REMOVE or CONTAINER_UPDATE.
+        item : any
+            The affected item.
+
+        Notes
+        -----
+            This function is for internal use by the containers.
+        """
+
+        self.__version += 1
+        for listener in self.__listeners:
+            listener(self, event, item)
+
+
+
+    def item_changed_(self, item):
+        """
+        Handles the change of an item in place
+        ======================================
+
+        Parameters
+        ----------
+        item : any
+            The changed item.
+
+        Notes
+        -----
+            This function is called by items which notify their containers
+            about their changes, eg. Wallet and CBDocument. The listeners get
+            CONTAINER_UPDATE.
+        """
+
+        self.notify_(CBContainer.CONTAINER_UPDATE, item)
+
+
+
+    def remove_listener(self, listener):
+        """
+        Removes a listener from the container
+        =====================================
+
+        Parameters
+        ----------
+        listener : callable
+            The listener to remove. Unknown listeners are ignored.
+        """
+
+        if listener in self.__listeners:
+            self.__listeners.remove(listener)
+
+
+
+    @property
+    def version(self):
+        """
+        Gets the version of the container
+        =================================
+
+        Returns
+        -------
+        int
+            Number of modifications since the instantiation of the container.
+        """
+
+        return self.__version
+
+
+
+class WalletContainer(CBContainer):
+    """
+    This class provides special container for Wallet instances
+
+    Notes
+    -----
+        The purpose of this class is not contain UserWallet instances but to
+        contain Wallet instances for an addressbook in a UserWallet instance.
+    """
+
+
+
+    def __init__(self, wallets=None):
+        """
+        Intializes the WalletContainer object
+        =====================================
+
+        Parameters
+        ----------
+        wallets : list
+            List of wallets to add to the container right at instantiation.
+
+        Notes
+        -----
+            WalletContainer is a subclass of list, please keep this in mind if
+            you are using an instance of this class.
+        """
+
+        add_wallets = True
+        if wallets is None:
             add_wallets = False
         elif isinstance(wallets, Iterable):
-            for Wallet in wallets:
+            for wallet in wallets:
                 if not isinstance(wallet, Wallet):
                     add_wallets = False
                     break
-        if add_wallets:
-            super(self.__class__, self).__init__(wallets)
+        if add_wallets:
+            super(self.__class__, self).__init__(wallets)
+        else:
+            super(self.__class__, self).__init__()
+        self.__addresses = {}
+        for wallet in self:
+            self.index_(wallet)
+            wallet.add_container_(self)
+
+
+
+    def append(self, item):
+        """
+        Appends a new item to the WalletContainer
+        =========================================
+
+        Parameters
+        ----------
+        item : Wallet
+            Item to add to the container.
+
+        Throws
+        ------
+        TypeError
+            If the type of the item is not Wallet.
+        """
+
+        if isinstance(item, Wallet):
+            if not self.contains_address(item.address):
+                super(self.__class__, self).append(item)
+                self.index_(item)
+                item.add_container_(self)
+                self.notify_(CBContainer.CONTAINER_APPEND, item)
+        else:
+            raise TypeError('Tried to add a non-Wallet instance to a WalletContainer.')
+
+
+
+    def contains_address(self, address):
+        """
+        Checks whether an address is added yet or not
+        =============================================
+
+        Parameters
+        ----------
+        address : str
+            The address to search for.
+
+        Returns
+        -------
+        bool
+            True if the address is found, False if not.
+
+        Notes
+        -----
+            Addresses are compared in normalized form, see
+            .normalize_address().
+        """
+
+        return self.get_by_address(address) is not None
+
+
+
+    def get_by_address(self, address):
+        """
+        Gets a wallet by address
+        ========================
+
+        Parameters
+        ----------
+        address : str
+            The address to search for.
+
+        Returns
+        -------
+        Wallet
+            The wallet with the address.
+        None
+            If there is no wallet with the address.
+
+        Notes
+        -----
+            Wallets are indexed by normalized address, so the lookup doesn't
+            depend on the size of the container.
+        """
+
+        if address is None:
+            return None
+        return self.__addresses.get(WalletContainer.normalize_address(address))
+
+
+
+    def get_by_detail(self, key, value):
+        """
+        Gets wallets by a detail
+        =========================
+
+        Parameters
+        ----------
+        key : str
+            The name of the detail to search for.
+        value : str
+            The value of the detail to search for.
+
+        Returns
+        -------
+        list
+            List of Wallet objects that matches the search.
+        """
+
+        result = []
+        for wallet in self:
+            if key in wallet.keys():
+                if value == wallet[key]:
+                    result.append(wallet)
+        return result
+
+
+
+    def get_by_displayed_name(self, name):
+        """
+        Gets wallets by displayed name
+        ==============================
+
+        Parameters
+        ----------
+        name : str
+            The name to search for.
+
+        Returns
+        -------
+        list
+            List of Wallet object that matches the search.
+
+        Notes
+        -----
+            This method implements classic string search.
+        """
+
+        result = []
+        for wallet in self:
+            if name in wallet.displayed_name:
+                result.append(wallet)
+        return result
+
+
+
+    def get_id_by_detail(self, key, value):
+        """
+        Gets IDs of wallets by a detail
+        ===============================
+
+        Parameters
+        ----------
+        key : str
+            The name of the detail to search for.
+        value : str
+            The value of the detail to search for.
+
+        Returns
+        -------
+        list
+            List of IDs of the Wallet objects that matches the search.
+        """
+
+        result = []
+        for idx, wallet in enumerate(self):
+            if key in wallet.keys():
+                if value == wallet[key]:
+                    result.append(idx)
+        return result
+
+
+
+    def get_id_by_displayed_name(self, name):
+        """
+        Gets IDs of wallets by displayed name
+        =====================================
+
+        Parameters
+        ----------
+        name : str
+            The name to search for.
+
+        Returns
+        -------
+        list
+            List of IDs of the Wallet objects that matches the search.
+
+        Notes
+        -----
+            This method implements classic string search.
+        """
+
+        result = []
+        for idx, wallet in enumerate(self):
+            if name in wallet.displayed_name:
+                result.append(idx)
+        return result
+
+
+
+    @classmethod
+    def normalize_address(cls, address):
+        """
+        Normalizes an address for comparison
+        ====================================
+
+        Parameters
+        ----------
+        address : str
+            The address to normalize.
+
+        Returns
+        -------
+        str
+            The address without surrounding whitespace and without the
+            bitcoincash: prefix, in lower case if it is a single-case (cash)
+            address. Mixed-case (legacy) addresses keep their case.
+        """
+
+        address = address.strip()
+        prefix, separator, payload = address.rpartition(':')
+        if separator != '' and prefix.lower() == 'bitcoincash':
+            address = payload
+        if address.lower() == address or address.upper() == address:
+            return address.lower()
+        return address
+
+
+
+    def item_changed_(self, item):
+        """
+        Handles the change of a wallet in place
+        =======================================
+
+        Parameters
+        ----------
+        item : Wallet
+            The changed wallet.
+
+        Notes
+        -----
+            If the address of the wallet is not indexed to the wallet (eg. it
+            has just got its address), the address index is rebuilt before
+            the listeners get CONTAINER_UPDATE.
+        """
+
+        if (item.address is not None and self.__addresses.get(
+                WalletContainer.normalize_address(item.address)) is not item):
+            self.__addresses = {}
+            for wallet in self:
+                self.index_(wallet)
+        super(WalletContainer, self).item_changed_(item)
+
+
+
+    def index_(self, wallet):
+        """
+        Adds a wallet to the address index
+        ==================================
+
+        Parameters
+        ----------
+        wallet : Wallet
+            The wallet to index.
+
+        Notes
+        -----
+            Wallets without address are not indexed, they are indexed when
+            they get their address. If more wallets have the same normalized
+            address, the first one is kept.
+        """
+
+        if wallet.address is not None:
+            self.__addresses.setdefault(WalletContainer.normalize_address(wallet.address),
+                                        wallet)
+
+
+
+class CounterpartyResolver(object):
+    """
+    This class resolves the counterparties of transactions to wallets
+    =================================================================
+
+    Notes
+    -----
+    1.
+        The distinct foreign addresses of a container are collected in one
+        pass, a TransactionStore gives them by its dictionary encoded column,
+        then every distinct address is looked up once in the normalized
+        address index of the addressbook.
+    2.
+        Results are cached by container and are reused as long as neither
+        the container nor the addressbook changes. The cache holds the
+        results of the last CACHE_SIZE containers. Containers are referenced
+        weakly, results of collected containers are dropped at the next
+        resolution and never returned for a new container.
+    3.
+        Addresses not in the addressbook are collected, they can be resolved
+        in one batch by the lookup function. Names found by the lookup are
+        kept for later resolutions.
+    """
+
+
+
+    CACHE_SIZE = 64
+
+
+
+    def __init__(self, addressbook, lookup=None):
+        """
+        Initializes the CounterpartyResolver object
+        ===========================================
+
+        Parameters
+        ----------
+        addressbook : WalletContainer
+            The addressbook to resolve with.
+        lookup : callable, optional (None if omitted)
+            Function to call with a list of unmatched addresses, it returns a
+            dict of names by address, eg. from an external directory.
+
+        Attributes
+        ----------
+        stats
+        """
+
+        self.__addressbook = addressbook
+        self.__lookup = lookup
+        self.__lock = threading.Lock()
+        self.__cache = OrderedDict()
+        self.__external = {}
+        self.__resolutions = 0
+        self.__hits = 0
+
+
+
+    def lookup_unmatched(self, transactions):
+        """
+        Resolves the unmatched addresses with the lookup function
+        =========================================================
+
+        Parameters
+        ----------
+        transactions : TransactionContainer, TransactionSnapshot
+            The transactions.
+
+        Returns
+        -------
+        dict
+            The resolution after the lookup, see .resolve().
+
+        Throws
+        ------
+        RuntimeError
+            If there is no lookup function.
+        """
+
+        if self.__lookup is None:
+            raise RuntimeError('CounterpartyResolver.lookup_unmatched() - no lookup function.')
+        unmatched = self.resolve(transactions)['unmatched']
+        if len(unmatched) > 0:
+            found = self.__lookup(list(unmatched)) or {}
+            with self.__lock:
+                for address in unmatched:
+                    name = found.get(address)
+                    if name is not None:
+                        self.__external[WalletContainer.normalize_address(address)] = name
+                self.__cache.clear()
+        return self.resolve(transactions)
+
+
+
+    def resolve(self, transactions):
+        """
+        Resolves the counterparties of transactions
+        ===========================================
+
+        Parameters
+        ----------
+        transactions : TransactionContainer, TransactionSnapshot
+            The transactions.
+
+        Returns
+        -------
+        dict
+            Resolution with the following keys:
+                names : dict, displayed names by foreign address
+                wallets : dict, addressbook wallets by foreign address
+                unmatched : list of str, foreign addresses neither in the
+                    addressbook nor found by the lookup
+            Addresses are given as they are in the transactions.
+        """
+
+        if isinstance(transactions, TransactionSnapshot):
+            transactions = transactions.container
+        key = id(transactions)
+        versions = (getattr(transactions, 'version', None), self.__addressbook.version,
+                    len(transactions))
+        with self.__lock:
+            cached = self.__cache.get(key)
+            if cached is not None and cached[0]() is transactions and cached[1] == versions:
+                self.__cache.move_to_end(key)
+                self.__hits += 1
+                return cached[2]
+        result = self.join_(self.addresses_(transactions))
+        try:
+            reference = ref(transactions)
+        except TypeError:
+            reference = None
+        with self.__lock:
+            self.__resolutions += 1
+            cache = self.__cache
+            for dead in [item for item, entry in cache.items() if entry[0]() is None]:
+                del cache[dead]
+            if reference is not None:
+                cache[key] = (reference, versions, result)
+                cache.move_to_end(key)
+                while len(cache) > CounterpartyResolver.CACHE_SIZE:
+                    cache.popitem(last=False)
+        return result
+
+
+
+    @property
+    def stats(self):
+        """
+        Gets the statistics of the resolver
+        ===================================
+
+        Returns
+        -------
+        dict
+            Statistics with the following keys: resolutions, hits, external,
+            cached.
+        """
+
+        return {'resolutions': self.__resolutions, 'hits': self.__hits,
+                'external': len(self.__external), 'cached': len(self.__cache)}
+
+
+
+    def addresses_(self, transactions):
+        """
+        Collects the distinct foreign addresses of transactions
+        =======================================================
+
+        Parameters
+        ----------
+        transactions : TransactionContainer
+            The transactions to collect the addresses of.
+
+        Returns
+        -------
+        set of str
+            The foreign addresses, without None.
+
+        Notes
+        -----
+            The addresses of a StoredTransactionContainer are taken from the
+            address table of its store, only the transactions appended after
+            the store are visited.
+        """
+
+        if isinstance(transactions, StoredTransactionContainer):
+            result = set(transactions.store.columns()['addresses'])
+            result.update(transactions[position].foreign_address for position
+                          in range(transactions.stored_count_(), len(transactions)))
+        else:
+            result = set(item.foreign_address for item in transactions)
+        result.discard(None)
+        return result
+
+
+
+    def join_(self, addresses):
+        """
+        Joins addresses with the addressbook and the external names
+        ===========================================================
+
+        Parameters
+        ----------
+        addresses : iterable of str
+            The distinct addresses to resolve.
+
+        Returns
+        -------
+        dict
+            Result with the following keys:
+                names : dict, display names by address
+                wallets : dict, addressbook entries by address
+                unmatched : list of str, sorted addresses without name
+
+        Notes
+        -----
+            Each address is looked up once in the address index of the
+            addressbook and then in the names found by the external lookup.
+        """
+
+        get_by_address = self.__addressbook.get_by_address
+        normalize = WalletContainer.normalize_address
+        names = {}
+        wallets = {}
+        unmatched = []
+        for address in addresses:
+            wallet = get_by_address(address)
+            if wallet is not None:
+                wallets[address] = wallet
+                if wallet.displayed_name is not None:
+                    names[address] = wallet.displayed_name
+            else:
+                name = self.__external.get(normalize(address))
+                if name is None:
+                    unmatched.append(address)
+                else:
+                    names[address] = name
+        unmatched.sort()
+        return {'names': names, 'wallets': wallets, 'unmatched': unmatched}
+
+
+
+class CBTransaction(object):
+    """
+    This class represents a transaction
+    """
+
+
+
+    CONFIRMATION_NONE = 0
+    CONFIRMATION_CONFIRMED = 1
+    CONFIRMATION_WELL = 2
+
+
+
+    def __init__(self, tx, block_height, transaction_time, block_time,
+                 first_seen_time, confirmations, inputs, outputs, fees,
+                 foreign_address, confirmation_limit=6, raw=None,
+                 chain_tip=None):
+        """
+        Intializes the CBTransaction object
+        ===================================
+
+        Parameters
+        ----------
+        tx : str
+            Transaction's tx ID.
+        block_height : int
+            The hieght of the transaction's block.
+        transaction_time : int
+            Transaction's time.
+        block_time : int
+            Time of the block of the transaction.
+        first_seen_time : int
+            First seen time of the transaction.
+        confirmations : int
+            Number of confirmations.
+        inputs : list, int
+            List of inputs. If set as a solo number, it gets converted into list.
+        outputs : list, int
+            List of outputs. If set as a solo number, it gets converted into list.
+        fees : list, int
+            List of fees. If set as a solo number, it gets converted into list.
+        foreign_address : str
+            Foreign address affected in the transaction.
+        confirmation_limit : int, optional (6 if omitted)
+            Confirmation limit to decide whether the transaction is well
+            confirmed or not.
+        raw : dict, bytes, optional (None if omitted)
+            Data of the rae transaction record given by the blockchain explorer.
+            If given as JSON encoded bytes it gets decoded at first access.
+        chain_tip : ChainTip, optional (None if omitted)
+            Shared chain tip to derive the number of confirmations from. If
+            omitted the value of confirmations parameter is used as is.
+
+        Attributes
+        ----------
+        balance
+        block_height
+        block_time
+        chain_tip
+        confirmations
+        confirmation_level
+        confirmation_limit
+        fee
+        fees
+        first_seen_time
+        foreign_address
+        inputs
+        is_confirmed
+        is_incoming
+        is_outgoing
+        is_well_confirmed
+        is_unconfirmed
+        Outputs
+        paid
+        raw
+        received
+        total_input
+        total_output
+        transaction_time
+        tx
+        """
+
+        self.__tx = tx
+        self.__block_height = block_height
+        self.__transaction_time = transaction_time
+        self.__block_time = block_time
+        self.__first_seen_time = first_seen_time
+        self.__confirmations = confirmations
+        if isinstance(inputs, list) or isinstance(inputs, Iterable):
+            self.__inputs = inputs
+        else:
+            self.__inputs = [inputs]
+        if isinstance(outputs, list) or isinstance(outputs, Iterable):
+            self.__outputs = outputs
+        else:
+            self.__outputs = [outputs]
+        if isinstance(fees, list) or isinstance(fees, Iterable):
+            self.__fees = fees
+        else:
+            self.__fees = [fees]
+        self.__foreign_address = foreign_address
+        self.__confirmation_limit = confirmation_limit
+        self.__raw = raw
+        self.__chain_tip = chain_tip
+
+        self.__total_input = round(sum(self.__inputs), 8)
+        self.__total_output = round(sum(self.__outputs), 8)
+        self.__total_fee = round(sum(self.__fees), 8)
+        if self.__total_input > self.__total_output:
+            self.__paid = round(self.__total_input - self.__total_output, 8)
+            self.__received = 0
+            self.__fee = self.__total_fee
+            self.__is_outgoing = True
+            self.__is_incoming = False
+            self.__balance = round(- self.__paid, 8)
+        elif self.__total_input < self.__total_output:
+            self.__paid = 0
+            self.__received = round(self.__total_output - self.__total_input, 8)
+            self.__fee = 0
+            self.__is_outgoing = False
+            self.__is_incoming = True
+            self.__balance = self.__received
+        else:
+            self.__paid = 0
+            self.__received = 0
+            self.__fee = 0
+            self.__is_outgoing = False
+            self.__is_incoming = False
+            self.__balance = 0.0
+
+
+
+    @property
+    def balance(self):
+        """
+        Gets the balance of the transaction
+        ===================================
+
+        Returns
+        -------
+        float
+            The calculated baalnce.
+        """
+
+        return self.__balance
+
+
+
+    @property
+    def block_height(self):
+        """
+        Gets the block height of the transaction
+        ========================================
+
+        Returns
+        -------
+        int
+            The block height.
+        """
+
+        return self.__block_height
+
+
+
+    @property
+    def block_time(self):
+        """
+        Gets the block time of the transaction
+        ======================================
+
+        Returns
+        -------
+        int
+            The block time.
+        """
+
+        return self.__block_time
+
+
+
+    @property
+    def chain_tip(self):
+        """
+        Gets the chain tip the transaction is bound to
+        ==============================================
+
+        Returns
+        -------
+        ChainTip
+            The shared chain tip.
+        None
+            If the transaction is not bound to any chain tip.
+        """
+
+        return self.__chain_tip
+
+
+
+    @chain_tip.setter
+    def chain_tip(self, newtip):
+        """
+        Binds the transaction to a chain tip
+        ====================================
+
+        Parameters
+        ----------
+        newtip : ChainTip, None
+            The shared chain tip to derive confirmations from. Setting it to
+            None makes the transaction use its stored confirmations again.
+        """
+
+        self.__chain_tip = newtip
+
+
+
+    @property
+    def confirmations(self):
+        """
+        Gets the number of confirmations of the transaction
+        ===================================================
+
+        Returns
+        -------
+        int
+            The number of confirmations.
+
+        Notes
+        -----
+            If the transaction is bound to a chain tip with known height, the
+            number of confirmations is derived from the height of the tip,
+            otherwise the value given at instantiation is returned.
+        """
+
+        if self.__chain_tip is not None:
+            confirmations = self.__chain_tip.confirmations(self.__block_height)
+            if confirmations is not None:
+                return confirmations
+        return self.__confirmations
+
+
+
+    @property
+    def confirmation_level(self):
+        """
+        Gets the confirmation class of the transaction
+        ==============================================
+
+        Returns
+        -------
+        int
+            CONFIRMATION_NONE, CONFIRMATION_CONFIRMED or CONFIRMATION_WELL.
+
+        Notes
+        -----
+            The number of confirmations is calculated only once to get the
+            level, which makes this property cheaper than asking .is_confirmed
+            and .is_well_confirmed one after the other.
+        """
+
+        return CBTransaction.level_(self.confirmations, self.__confirmation_limit)
+
+
+
+    @property
+    def confirmation_limit(self):
+        """
+        Gets the value of the confirmation limit
+        ========================================
+
+        Returns
+        -------
+        int
+            The limit to be considered as well confirmed transaction.
+        """
+
+        return self.__confirmation_limit
+
+
+
+    @confirmation_limit.setter
+    def confirmation_limit(self, newlimit):
+        """
+        Sets the value of the confirmation limit
+        ========================================
+
+        Parameters
+        ----------
+        newlimit : int
+            The limit to be considered as well confirmed transaction.
+        """
+
+        self.__confirmation_limit = newlimit
+
+
+
+    @property
+    def fee(self):
+        """
+        Gets the fee of the transaction
+        ===============================
+
+        Returns
+        -------
+        float
+            The calculated fee.
+        """
+
+        return self.__fee
+
+
+
+    @property
+    def fees(self):
+        """
+        Gets the fee components of the transaction
+        ==========================================
+
+        Returns
+        -------
+        list
+            List of the fee components.
+        """
+
+        return self.__fees
+
+
+
+    @property
+    def first_seen_time(self):
+        """
+        Gets the first seen time of the transaction
+        ===========================================
+
+        Returns
+        -------
+        int
+            The first seen time.
+        """
+
+        return self.__first_seen_time
+
+
+
+    @property
+    def foreign_address(self):
+        """
+        Gets the foreign address of the transaction
+        ===========================================
+
+        Returns
+        -------
+        str
+            The foreign address affected in the transaction.
+        """
+
+        return self.__foreign_address
+
+
+
+    @classmethod
+    def from_raw(cls, record, address, confirmation_limit=6, chain_tip=None):
+        """
+        Creates a new CBTransaction instance from an API record
+        =======================================================
+
+        Parameters
+        ----------
+        record : dict
+            A transaction record as returned by
+            BitcoinAPI.get_address_transactions() or by
+            BitcoinAPI.get_transaction().
+        address : str
+            The bitcoincash address of the user the transaction belongs to.
+        confirmation_limit : int, optional (6 if omitted)
+            Confirmation limit to decide whether the transaction is well
+            confirmed or not.
+        chain_tip : ChainTip, optional (None if omitted)
+            Shared chain tip to derive the number of confirmations from.
+
+        Returns
+        -------
+        CBTransaction
+            The new instance.
+
+        Notes
+        -----
+            Inputs and outputs are the values spent from and paid to the given
+            address. The foreign address is the first other address on the
+            opposite side of the transaction.
+        """
+
+        inputs = []
+        outputs = []
+        input_addresses = []
+        output_addresses = []
+        for item in record.get('vin', []):
+            item_address = item.get('cashAddress')
+            if item_address == address:
+                inputs.append(float(item.get('value', 0)))
+            elif item_address is not None:
+                input_addresses.append(item_address)
+        for item in record.get('vout', []):
+            item_addresses = item.get('scriptPubKey', {}).get('cashAddrs', [])
+            if address in item_addresses:
+                outputs.append(float(item.get('value', 0)))
+            else:
+                output_addresses += item_addresses
+        if sum(inputs) > sum(outputs):
+            foreign_addresses = output_addresses
+        else:
+            foreign_addresses = input_addresses
+        if len(foreign_addresses) > 0:
+            foreign_address = foreign_addresses[0]
+        else:
+            foreign_address = None
+        block_height = record.get('blockheight')
+        if block_height is not None and block_height < 1:
+            block_height = None
+        transaction_time = record.get('time')
+        return CBTransaction(record['txid'], block_height, transaction_time,
+                             record.get('blocktime', transaction_time),
+                             record.get('firstSeenTime', transaction_time),
+                             record.get('confirmations', 0), inputs, outputs,
+                             [float(record.get('fees', 0))], foreign_address,
+                             confirmation_limit, record, chain_tip)
+
+
+
+    @property
+    def inputs(self):
+        """
+        Gets the input components of the transaction
+        ============================================
+
+        Returns
+        -------
+        list
+            List of the input components.
+        """
+
+        return self.__inputs
+
+
+
+    @property
+    def is_confirmed(self):
+        """
+        Gets whether the transaction is confirmed or not
+        ==============//================================
+
+        Returns
+        -------
+        bool
+            True if the transaction is confirmed, False if not.
+        """
+
+        return self.confirmations > 0
+
+
+
+    @property
+    def is_incoming(self):
+        """
+        Gets whether the transaction is incoming or not
+        ===============================================
+
+        Returns
+        -------
+        bool
+            True if the transaction is incoming, False if not.
+        """
+
+        return self.__is_incoming
+
+
+
+    @property
+    def is_outgoing(self):
+        """
+        Gets whether the transaction is outgoing or not
+        ===============================================
+
+        Returns
+        -------
+        bool
+            True if the transaction is outgoing, False if not.
+        """
+
+        return self.__is_outgoing
+
+
+
+    @property
+    def is_well_confirmed(self):
+        """
+        Gets whether the transaction is well confirmed or not
+        =====================================================
+
+        Returns
+        -------
+        bool
+            True if the transaction is well confirmed, False if not.
+        """
+
+        return self.confirmations >= self.confirmation_limit
+
+
+
+    @property
+    def is_unconfirmed(self):
+        """
+        Gets whether the transaction is unconfirmed or not
+        ==================================================
+
+        Returns
+        -------
+        bool
+            True if the transaction is unconfirmed, False if not.
+        """
+
+        return self.confirmations == 0
+
+
+
+    @property
+    def outputs(self):
+        """
+        Gets the output components of the transaction
+        ==============//=============================
+
+        Returns
+        -------
+        list
+            List of the output components.
+        """
+
+        return self.__outputs
+
+
+
+    @property
+    def paid(self):
+        """
+        Gets the paid amount of the transaction
+        =======================================
+
+        Returns
+        -------
+        float
+            The calculated paid amount.
+        """
+
+        return self.__paid
+
+
+
+    @property
+    def raw(self):
+        """
+        Gets the raw data of the transaction
+        ====================================
+
+        Returns
+        -------
+        dict
+            The raw transaction data.
+        """
+
+        if isinstance(self.__raw, (bytes, bytearray, memoryview)):
+            self.__raw = json.loads(bytes(self.__raw).decode('utf-8'))
+        return self.__raw
+
+
+
+    def raw_json_(self):
+        """
+        Gets the raw data of the transaction JSON encoded
+        =================================================
+
+        Returns
+        -------
+        bytes
+            The raw transaction data as JSON, empty if there is no raw data.
+
+        Notes
+        -----
+            Raw data which is not decoded yet is returned as is, without
+            decoding and re-encoding it.
+        """
+
+        if self.__raw is None:
+            return b''
+        if isinstance(self.__raw, (bytes, bytearray, memoryview)):
+            return bytes(self.__raw)
+        return json.dumps(self.__raw, separators=(',', ':')).encode('utf-8')
+
+
+
+    @property
+    def received(self):
+        """
+        Gets the received amount of the transaction
+        ===========================================
+
+        Returns
+        -------
+        float
+            The calculated received amount.
+        """
+
+        return self.__received
+
+
+
+    @property
+    def total_input(self):
+        """
+        Gets the total input of the transaction
+        =======================================
+
+        Returns
+        -------
+        float
+            The calculated total input.
+        """
+
+        return self.__total_input
+
+
+
+    @property
+    def total_output(self):
+        """
+        Gets the total output of the transaction
+        ========================================
+
+        Returns
+        -------
+        float
+            The calculated total output.
+        """
+
+        return self.__total_output
+
+
+
+    @classmethod
+    def level_(cls, confirmations, confirmation_limit):
+        """
+        Gets the confirmation class of a number of confirmations
+        ========================================================
+
+        Parameters
+        ----------
+        confirmations : int
+            The number of confirmations.
+        confirmation_limit : int
+            Confirmation limit of the transaction.
+
+        Returns
+        -------
+        int
+            CONFIRMATION_NONE, CONFIRMATION_CONFIRMED or CONFIRMATION_WELL.
+        """
+
+        if confirmations >= confirmation_limit:
+            return CBTransaction.CONFIRMATION_WELL
+        elif confirmations > 0:
+            return CBTransaction.CONFIRMATION_CONFIRMED
+        return CBTransaction.CONFIRMATION_NONE
+
+
+
+    @property
+    def stored_confirmations_(self):
+        """
+        Gets the number of confirmations given at instantiation
+        =======================================================
+
+        Returns
+        -------
+        int
+            The stored number of confirmations, regardless of the chain tip.
+
+        Notes
+        -----
+            This property is for serialization purposes.
+        """
+
+        return self.__confirmations
+
+
+
+    @stored_confirmations_.setter
+    def stored_confirmations_(self, newconfirmations):
+        """
+        Sets the stored number of confirmations
+        =======================================
+
+        Parameters
+        ----------
+        newconfirmations : int
+            The number of confirmations.
+
+        Notes
+        -----
+            This property is for serialization purposes, the containers keep
+            it in line with the chain tip.
+        """
+
+        self.__confirmations = newconfirmations
+
+
+
+    def to_dict_(self):
+        """
+        Gets the data of the transaction as a dict
+        ==========================================
+
+        Returns
+        -------
+        dict
+            Data with the same keys as the parameters of the init method, so
+            the transaction can be restored with CBTransaction(**data).
+        """
+
+        return {'tx': self.__tx,
+                'block_height': self.__block_height,
+                'transaction_time': self.__transaction_time,
+                'block_time': self.__block_time,
+                'first_seen_time': self.__first_seen_time,
+                'confirmations': self.__confirmations,
+                'inputs': list(self.__inputs),
+                'outputs': list(self.__outputs),
+                'fees': list(self.__fees),
+                'foreign_address': self.__foreign_address,
+                'confirmation_limit': self.__confirmation_limit,
+                'raw': self.raw}
+
+
+
+    @property
+    def transaction_time(self):
+        """
+        Gets the time of the transaction
+        ================================
+
+        Returns
+        -------
+        int
+            The transaction's time.
+        """
+
+        return self.__transaction_time
+
+
+
+    @property
+    def tx(self):
+        """
+        Gets the tx ID of the transaction
+        =================================
+
+        Returns
+        -------
+        int
+            The tx ID.
+        """
+
+        return self.__tx
+
+
+
+class TransactionContainer(CBContainer):
+    """
+    Provides a container for the transactions of the user
+    """
+
+
+
+    INDEX_TIME = 'time'
+    INDEX_COUNTERPARTY = 'counterparty'
+    INDEX_AMOUNT = 'amount'
+
+
+
+    def __init__(self, transactions=None, chain_tip=None):
+        """
+        Intializes the TransactionContainer object
+        ==========================================
+
+        Parameters
+        ----------
+        transactions : list
+            List of transactions to add to the container right at instantiation.
+        chain_tip : ChainTip, optional (None if omitted)
+            Shared chain tip to bind the transactions of the container to.
+
+        Attributes
+        ----------
+        chain_tip
+        indexes
+
+        Class Level Constants
+        ---------------------
+        INDEX_AMOUNT
+        INDEX_COUNTERPARTY
+        INDEX_TIME
+
+        Notes
+        -----
+            TransactionContainer is a subclass of list, please keep this in
+            mind if you are using an instance of this class.
+        """
+
+        add_transactions = True
+        if transactions is None:
+            add_transactions = False
+        elif isinstance(transactions, Iterable):
+            for transaction in transactions:
+                if not isinstance(transaction, CBTransaction):
+                    add_transactions = False
+                    break
+        if add_transactions:
+            super(TransactionContainer, self).__init__(transactions)
+        else:
+            super(TransactionContainer, self).__init__()
+        self.__chain_tip = None
+        self.__pending = {}
+        self.__txids = set()
+        self.__indexes = {}
+        for transaction in self:
+            self.__txids.add(transaction.tx)
+            self.track_confirmation_(transaction)
+        if chain_tip is not None:
+            self.chain_tip = chain_tip
+
+
+
+    def append(self, item):
+        """
+        Appends a new item to the TransactionContainer
+        ==============================================
+
+        Parameters
+        ----------
+        item : CBTransaction
+            Item to add to the container.
+
+        Throws
+        ------
+        TypeError
+            If the type of the item is not CBTransaction.
+        """
+
+        if isinstance(item, CBTransaction):
+            if not self.contains_tx(item.tx):
+                self.append_(item)
+        else:
+            raise TypeError('Tried to add a non-CBTransaction instance to a TransactionContainer.')
+
+
+
+    @property
+    def chain_tip(self):
+        """
+        Gets the chain tip the container is bound to
+        ============================================
+
+        Returns
+        -------
+        ChainTip
+            The shared chain tip.
+        None
+            If the container is not bound to any chain tip.
+        """
+
+        return self.__chain_tip
+
+
+
+    @chain_tip.setter
+    def chain_tip(self, newtip):
+        """
+        Binds the container and its transactions to a chain tip
+        =======================================================
+
+        Parameters
+        ----------
+        newtip : ChainTip, None
+            The shared chain tip. Setting it to None unbinds the container.
+
+        Notes
+        -----
+            The container subscribes to the chain tip, so it gets reclassified
+            automatically whenever the height of the tip changes.
+        """
+
+        if self.__chain_tip is not None:
+            self.__chain_tip.unsubscribe(self)
+        self.__chain_tip = newtip
+        self.bind_chain_tip_(newtip)
+        if newtip is not None:
+            newtip.subscribe(self)
+        self.update_confirmations()
+
+
+
+    @property
+    def pending(self):
+        """
+        Gets the transactions that are not well confirmed yet
+        =====================================================
+
+        Returns
+        -------
+        list
+            List of unconfirmed and under-confirmed transactions.
+        """
+
+        return list(self.__pending.keys())
+
+
+
+    def update_confirmations(self):
+        """
+        Reclassifies unconfirmed and under-confirmed transactions
+        =========================================================
+
+        Returns
+        -------
+        list of tuple (CBTransaction, int, int)
+            List of transactions with changed confirmation level. Each element
+            holds the transaction, its previous and its actual level.
+
+        Notes
+        -----
+        1.
+            Only pending transactions are visited, well confirmed ones leave
+            the pending set once and for all. This makes the cost of a new
+            block proportional to the number of young transactions instead of
+            the length of the whole history.
+        2.
+            Listeners get a CONTAINER_UPDATE event for each changed
+            transaction. The stored confirmations of the changed transactions
+            are set to their actual number, so serialized containers keep the
+            change even without a chain tip.
+        """
+
+        result = []
+        for transaction, old_level in list(self.__pending.items()):
+            new_level = transaction.confirmation_level
+            if new_level != old_level:
+                transaction.stored_confirmations_ = transaction.confirmations
+                result.append((transaction, old_level, new_level))
+                if new_level == CBTransaction.CONFIRMATION_WELL:
+                    del self.__pending[transaction]
+                else:
+                    self.__pending[transaction] = new_level
+        for transaction, old_level, new_level in result:
+            self.notify_(CBContainer.CONTAINER_UPDATE, transaction)
+        return result
+
+
+
+    def bind_chain_tip_(self, newtip):
+        """
+        Binds the transactions of the container to a chain tip
+        ======================================================
+
+        Parameters
+        ----------
+        newtip : ChainTip, None
+            The shared chain tip.
+
+        Notes
+        -----
+            This function is for internal use by the container.
+        """
+
+        for transaction in self:
+            transaction.chain_tip = newtip
+
+
+
+    @classmethod
+    def index_key_(cls, kind, item):
+        """
+        Gets the key of a transaction in an index
+        =========================================
+
+        Parameters
+        ----------
+        kind : str
+            The kind of the index.
+        item : CBTransaction
+            The transaction to get the key of.
+
+        Returns
+        -------
+        int
+            The transaction time, 0 if unknown, for time indexes and the
+            absolute balance in satoshis for amount indexes.
+        str
+            The address of the counterparty for counterparty indexes.
+        """
+
+        if kind == TransactionContainer.INDEX_TIME:
+            return item.transaction_time or 0
+        elif kind == TransactionContainer.INDEX_AMOUNT:
+            return bch_2_sat(abs(item.balance))
+        return item.foreign_address
+
+
+
+    def index_item_(self, kind, index, item, position):
+        """
+        Adds a transaction to an index
+        ==============================
+
+        Parameters
+        ----------
+        kind : str
+            The kind of the index.
+        index : dict, tuple (list, list)
+            The index to add to. Counterparty indexes map addresses to lists
+            of positions, the others are pairs of sorted keys and positions.
+        item : CBTransaction
+            The transaction to add.
+        position : int
+            The position of the transaction in the container.
+
+        Notes
+        -----
+            Transactions mostly arrive in key order, so a key is appended if
+            it is not less than the last one and inserted after the equal keys
+            otherwise. Positions of equal keys stay in the order of arrival.
+        """
+
+        key = TransactionContainer.index_key_(kind, item)
+        if kind == TransactionContainer.INDEX_COUNTERPARTY:
+            index.setdefault(key, []).append(position)
+        else:
+            keys, positions = index
+            if len(keys) == 0 or keys[-1] <= key:
+                keys.append(key)
+                positions.append(position)
+            else:
+                at = bisect_right(keys, key)
+                keys.insert(at, key)
+                positions.insert(at, position)
+
+
+
+    def index_lookup_(self, kind, value, estimate=False, closed=False):
+        """
+        Looks up positions in an index
+        ==============================
+
+        Parameters
+        ----------
+        kind : str
+            The kind of the index.
+        value : any
+            A collection of addresses for counterparty indexes, a tuple of
+            (start, end) keys for the others, where start is inclusive and end
+            is exclusive, any of them can be None.
+        estimate : bool, optional (False if omitted)
+            Whether to get the number of positions only or not.
+        closed : bool, optional (False if omitted)
+            Whether the end key is inclusive or not.
+
+        Returns
+        -------
+        list of int
+            Positions of the matching transactions in no particular order.
+        int
+            The number of matching positions if estimate is True.
+
+        Notes
+        -----
+            This function is for internal use by SearchObject. The number of
+            matching positions is got without building the list.
+        """
+
+        index = self.__indexes[kind]
+        if kind == TransactionContainer.INDEX_COUNTERPARTY:
+            lists = [index.get(address, []) for address in value]
+            if estimate:
+                return sum(len(item) for item in lists)
+            result = []
+            for item in lists:
+                result += item
+            return result
+        keys, positions = index
+        start, end = value
+        first = 0 if start is None else bisect_left(keys, start)
+        if end is None:
+            last = len(keys)
+        elif closed:
+            last = bisect_right(keys, end)
+        else:
+            last = bisect_left(keys, end)
+        last = max(first, last)
+        if estimate:
+            return last - first
+        return positions[first:last]
+
+
+
+    def index_range_(self, kind, start, end):
+        """
+        Generates positions of a key range of an ordered index
+        ======================================================
+
+        Parameters
+        ----------
+        kind : str
+            The kind of the index, INDEX_TIME or INDEX_AMOUNT.
+        start : any
+            The first key, inclusive. If None the range starts at the first
+            key.
+        end : any
+            The last key, exclusive. If None the range ends at the last key.
+
+        Returns
+        -------
+        generator of int
+            Positions of the matching transactions in the order of the keys.
+
+        Notes
+        -----
+            Positions are read from the index one by one instead of copying
+            the range. If a transaction is inserted into the index meanwhile,
+            the generator finds the last generated position again and goes on
+            from there, so no position is skipped or repeated.
+        """
+
+        keys, positions = self.__indexes[kind]
+        at = 0 if start is None else bisect_left(keys, start)
+        size = len(keys)
+        key = None
+        position = None
+        while at < len(keys):
+            if len(keys) != size:
+                size = len(keys)
+                if position is None:
+                    at = 0 if start is None else bisect_left(keys, start)
+                else:
+                    at = bisect_left(keys, key)
+                    while positions[at] != position:
+                        at += 1
+                    at += 1
+                continue
+            key = keys[at]
+            if end is not None and key >= end:
+                break
+            position = positions[at]
+            yield position
+            at += 1
+
+
+
+    def track_confirmation_(self, item):
+        """
+        Registers an item for confirmation tracking
+        ===========================================
+
+        Parameters
+        ----------
+        item : CBTransaction
+            Item to track.
+
+        Notes
+        -----
+            This function is for internal use by the container.
+        """
+
+        if self.__chain_tip is not None:
+            item.chain_tip = self.__chain_tip
+        level = item.confirmation_level
+        if level != CBTransaction.CONFIRMATION_WELL:
+            self.__pending[item] = level
+
+
+
+    def contains_tx(self, tx):
+        """
+        Checks whether a tx is added yet or not
+        =======================================
+
+        Parameters
+        ----------
+        tx : str
+            The tx to search for.
+
+        Returns
+        -------
+        bool
+            True if the tx is found, False if not.
+        """
+
+        return tx in self.__txids
+
+
+
+    def create_index(self, kind):
+        """
+        Creates an index on the transactions
+        ====================================
+
+        Parameters
+        ----------
+        kind : str
+            INDEX_TIME, INDEX_COUNTERPARTY or INDEX_AMOUNT.
+
+        Throws
+        ------
+        ValueError
+            If the kind of the index is unknown.
+
+        Notes
+        -----
+        1.
+            Indexes hold positions of transactions in the container and are
+            maintained as transactions are appended. Time and amount indexes
+            are sorted lists of keys with parallel positions, the counterparty
+            index maps foreign addresses to lists of positions.
+        2.
+            SearchObject uses the indexes of the container to find candidate
+            transactions instead of scanning the whole container.
+        """
+
+        if kind == TransactionContainer.INDEX_COUNTERPARTY:
+            index = {}
+        elif kind in [TransactionContainer.INDEX_TIME, TransactionContainer.INDEX_AMOUNT]:
+            index = ([], [])
+        else:
+            raise ValueError('TransactionContainer.create_index() - unknown index "{}".'
+                             .format(kind))
+        self.__indexes[kind] = index
+        for position, item in enumerate(self):
+            self.index_item_(kind, index, item, position)
+
+
+
+    def drop_index(self, kind):
+        """
+        Drops an index of the transactions
+        ==================================
+
+        Parameters
+        ----------
+        kind : str
+            INDEX_TIME, INDEX_COUNTERPARTY or INDEX_AMOUNT.
+        """
+
+        self.__indexes.pop(kind, None)
+
+
+
+    @property
+    def indexes(self):
+        """
+        Gets the kinds of existing indexes
+        ==================================
+
+        Returns
+        -------
+        list of str
+            The kinds of indexes on the container.
+        """
+
+        return list(self.__indexes.keys())
+
+
+
+    def merge(self, transactions):
+        """
+        Merges transactions into the container
+        ======================================
+
+        Parameters
+        ----------
+        transactions : iterable of CBTransaction
+            Transactions to merge, eg. a page of transactions from the API.
+
+        Returns
+        -------
+        list of CBTransaction
+            The transactions which were not in the container yet.
+
+        Throws
+        ------
+        TypeError
+            If the type of any item is not CBTransaction.
+        """
+
+        result = []
+        for item in transactions:
+            if not isinstance(item, CBTransaction):
+                raise TypeError('Tried to add a non-CBTransaction instance to a TransactionContainer.')
+            if not self.contains_tx(item.tx):
+                self.append_(item)
+                result.append(item)
+        return result
+
+
+
+    def snapshot(self):
+        """
+        Takes a snapshot of the container
+        =================================
+
+        Returns
+        -------
+        TransactionSnapshot
+            Immutable view of the current transactions.
+        """
+
+        return TransactionSnapshot(self)
+
+
+
+    def append_(self, item):
+        """
+        Appends item to the container without check
+        ===========================================
+
+        Parameters
+        ----------
+        item : CBTransaction
+            Item to add to the container.
+
+        Notes
+        -----
+            This function is a backdoor only. Its usage is unadvised and can
+            lead to unexpected errors.
+        """
+
+        super(TransactionContainer, self).append(item)
+        self.__txids.add(item.tx)
+        if len(self.__indexes) > 0:
+            position = len(self) - 1
+            for kind, index in self.__indexes.items():
+                self.index_item_(kind, index, item, position)
+        self.track_confirmation_(item)
+        self.notify_(CBContainer.CONTAINER_APPEND, item)
+
+
+
+class TransactionSnapshot(object):
+    """
+    This class represents an immutable view of a transaction container
+    ==================================================================
+
+    Notes
+    -----
+    1.
+        Transaction containers only grow, so the first transactions of a
+        container never change their positions. A snapshot is the length of
+        the container at a moment, it reads the container itself and needs
+        neither a copy nor a lock while transactions are appended.
+    2.
+        The height of the chain tip is frozen too, confirmations of the
+        transactions are counted to the frozen height by .confirmations_of().
+    3.
+        A snapshot can be recreated from its length and tip height, so a
+        document rendered from a snapshot renders the same way later.
+    """
+
+
+
+    def __init__(self, transactions, length=None, tip_height=None):
+        """
+        Initializes the TransactionSnapshot object
+        ==========================================
+
+        Parameters
+        ----------
+        transactions : TransactionContainer, TransactionSnapshot
+            The container to take a snapshot of.
+        length : int, optional (None if omitted)
+            Number of transactions in the snapshot. If omitted the current
+            length of the container is used.
+        tip_height : int, optional (None if omitted)
+            Height of the chain tip. If omitted the current height of the
+            chain tip of the container is used.
+
+        Attributes
+        ----------
+        chain_tip
+        container
+        tip_height
+        version
+
+        Throws
+        ------
+        ValueError
+            If the container is shorter than length.
+        """
+
+        if isinstance(transactions, TransactionSnapshot):
+            if length is None:
+                length = len(transactions)
+            if tip_height is None:
+                tip_height = transactions.tip_height
+            transactions = transactions.container
+        current = len(transactions)
+        if length is None:
+            length = current
+        elif length > current:
+            raise ValueError('TransactionSnapshot.__init__() - container has {} transactions only, {} needed.'
+                             .format(current, length))
+        if tip_height is None:
+            chain_tip = getattr(transactions, 'chain_tip', None)
+            if chain_tip is not None:
+                tip_height = chain_tip.height
+        self.__container = transactions
+        self.__length = length
+        self.__version = getattr(transactions, 'version', None)
+        self.__tip_height = tip_height
+        if tip_height is None:
+            self.__chain_tip = None
+        else:
+            self.__chain_tip = ChainTip(tip_height)
+
+
+
+    def __getitem__(self, index):
+
+        if isinstance(index, slice):
+            return [self.__container[position] for position
+                    in range(*index.indices(self.__length))]
+        if index < 0:
+            index += self.__length
+        if not 0 <= index < self.__length:
+            raise IndexError('TransactionSnapshot index out of range.')
+        return self.__container[index]
+
+
+
+    def __iter__(self):
+
+        return islice(iter(self.__container), self.__length)
+
+
+
+    def __len__(self):
+
+        return self.__length
+
+
+
+    @property
+    def chain_tip(self):
+        """
+        Gets the frozen chain tip
+        =========================
+
+        Returns
+        -------
+        ChainTip
+            Chain tip with the height of the snapshot.
+        None
+            If the height is not known.
+        """
+
+        return self.__chain_tip
+
+
+
+    def confirmations_of(self, transaction):
+        """
+        Gets the number of confirmations of a transaction in the snapshot
+        =================================================================
+
+        Parameters
+        ----------
+        transaction : CBTransaction
+            The transaction.
+
+        Returns
+        -------
+        int
+            The number of confirmations at the height of the snapshot.
+        """
+
+        if self.__chain_tip is not None:
+            confirmations = self.__chain_tip.confirmations(transaction.block_height)
+            if confirmations is not None:
+                return confirmations
+        return transaction.confirmations
+
+
+
+    @property
+    def container(self):
+        """
+        Gets the container of the snapshot
+        ==================================
+
+        Returns
+        -------
+        TransactionContainer
+            The container.
+        """
+
+        return self.__container
+
+
+
+    @property
+    def is_current(self):
+        """
+        Gets whether the container is unchanged since the snapshot or not
+        =================================================================
+
+        Returns
+        -------
+        bool
+            True if the container has not changed, False if it has.
+        """
+
+        return getattr(self.__container, 'version', None) == self.__version
+
+
+
+    @property
+    def tip_height(self):
+        """
+        Gets the frozen height of the chain tip
+        =======================================
+
+        Returns
+        -------
+        int
+            The height.
+        None
+            If the height is not known.
+        """
+
+        return self.__tip_height
+
+
+
+    def to_dict_(self):
+        """
+        Gets the data of the snapshot as a dict
+        =======================================
+
+        Returns
+        -------
+        dict
+            JSON serializable data with the keys length, version and
+            tip_height.
+        """
+
+        return {'length': self.__length, 'version': self.__version,
+                'tip_height': self.__tip_height}
+
+
+
+    @property
+    def version(self):
+        """
+        Gets the version of the container at the snapshot
+        =================================================
+
+        Returns
+        -------
+        int
+            The version, see CBContainer.version.
+        """
+
+        return self.__version
+
+
+
+    def filter_(self, transactions):
+
+        container = self.__container
+        current = len(container)
+        if current == self.__length:
+            return list(transactions)
+        appended = set(id(container[position]) for position
+                       in range(self.__length, current))
+        return [item for item in transactions if id(item) not in appended]
+
+
+
+    def positions_(self, positions):
+
+        length = self.__length
+        return (position for position in positions if position < length)
+
+
+
+class AggregationEngine(object):
+    """
+    This class keeps rollups of transactions by day, month and counterparty
+    =======================================================================
+
+    Notes
+    -----
+    1.
+        Every rollup holds inflow, outflow, fee, count, the largest absolute
+        amount and the running mean and sum of squared deviations of the
+        amounts (Welford), amounts in satoshis. They are updated in constant
+        time per transaction and can be merged, so totals of a period are
+        summed from day rollups without reading the transactions again.
+    2.
+        An attached container is aggregated once in a single pass, a
+        TransactionStore through its columns, and appended transactions are
+        added as the container notifies about them.
+    3.
+        Days and months are UTC calendar days and months, keys are
+        'YYYY-MM-DD' and 'YYYY-MM'. Transactions without time fall on
+        1970-01-01. Transactions without foreign address are left out of the
+        counterparty rollups.
+    """
+
+
+
+    GROUP_DAY = 'day'
+    GROUP_MONTH = 'month'
+    GROUP_COUNTERPARTY = 'counterparty'
+    GROUPS = [GROUP_DAY, GROUP_MONTH, GROUP_COUNTERPARTY]
+    SECONDS_PER_DAY = 86400
+
+
+
+    def __init__(self, transactions=None):
+        """
+        Initializes the AggregationEngine object
+        ========================================
+
+        Parameters
+        ----------
+        transactions : TransactionContainer, optional (None if omitted)
+            Container to attach to.
+
+        Attributes
+        ----------
+        count
+        version
+
+        Class Level Constants
+        ---------------------
+        GROUP_COUNTERPARTY
+        GROUP_DAY
+        GROUP_MONTH
+        """
+
+        self.__lock = threading.Lock()
+        self.__rollups = {group: {} for group in AggregationEngine.GROUPS}
+        self.__total = AggregationEngine.new_rollup_()
+        self.__days = {}
+        self.__container = None
+        self.__version = None
+        if transactions is not None:
+            self.attach(transactions)
+
+
+
+    def add(self, transaction):
+        """
+        Adds a transaction to the rollups
+        =================================
+
+        Parameters
+        ----------
+        transaction : CBTransaction
+            The transaction to add.
+
+        Notes
+        -----
+            Transactions of the attached container are added automatically,
+            adding them again counts them twice.
+        """
+
+        with self.__lock:
+            self.add_(transaction.transaction_time or 0, bch_2_sat(transaction.balance),
+                      bch_2_sat(transaction.fee), transaction.foreign_address)
+
+
+
+    def aggregate(self, group, key):
+        """
+        Gets a rollup
+        =============
+
+        Parameters
+        ----------
+        group : str
+            GROUP_DAY, GROUP_MONTH or GROUP_COUNTERPARTY.
+        key : str
+            The day, the month or the address of the counterparty.
+
+        Returns
+        -------
+        dict
+            The rollup, see .aggregates().
+        None
+            If there are no transactions of the key.
+        """
+
+        rollups = self.rollups_(group)
+        with self.__lock:
+            rollup = rollups.get(key)
+            if rollup is None:
+                return None
+            return AggregationEngine.rollup_dict_(key, rollup)
+
+
+
+    def aggregates(self, group, start=None, end=None):
+        """
+        Gets the rollups of a group
+        ===========================
+
+        Parameters
+        ----------
+        group : str
+            GROUP_DAY, GROUP_MONTH or GROUP_COUNTERPARTY.
+        start : str, optional (None if omitted)
+            The first key to return.
+        end : str, optional (None if omitted)
+            The first key not to return.
+
+        Returns
+        -------
+        list of dict
+            Rollups in the order of their keys with the following keys: key,
+            inflow, outflow, net, fee, count, max, mean, volatility. Amounts
+            are in satoshis, volatility is the standard deviation of the
+            amounts.
+
+        Throws
+        ------
+        ValueError
+            If the group is unknown.
+        """
+
+        rollups = self.rollups_(group)
+        with self.__lock:
+            keys = sorted(key for key in rollups
+                          if (start is None or key >= start) and (end is None or key < end))
+            return [AggregationEngine.rollup_dict_(key, rollups[key]) for key in keys]
+
+
+
+    def attach(self, transactions):
+        """
+        Aggregates a container and follows its changes
+        ==============================================
+
+        Parameters
+        ----------
+        transactions : TransactionContainer
+            The container to attach to.
+
+        Throws
+        ------
+        RuntimeError
+            If the engine is already attached.
+        """
+
+        if self.__container is not None:
+            raise RuntimeError('AggregationEngine.attach() - engine is already attached.')
+        with self.__lock:
+            if isinstance(transactions, StoredTransactionContainer):
+                columns = transactions.store.columns()
+                addresses = columns['addresses']
+                none_int = TransactionStore.NONE_INT
+                for time_, amount, fee, address in zip(columns['transaction_time'],
+                                                       columns['balance'], columns['fee'],
+                                                       columns['foreign_address']):
+                    self.add_(0 if time_ == none_int else time_, amount,
+                              fee if amount < 0 else 0,
+                              addresses[address] if address >= 0 else None)
+                items = (transactions[position] for position
+                         in range(transactions.stored_count_(), len(transactions)))
+            else:
+                items = iter(transactions)
+            for item in items:
+                self.add_(item.transaction_time or 0, bch_2_sat(item.balance),
+                          bch_2_sat(item.fee), item.foreign_address)
+            self.__container = transactions
+            self.__version = transactions.version
+            transactions.add_listener(self.container_changed_)
+
+
+
+    @property
+    def count(self):
+        """
+        Gets the number of aggregated transactions
+        ==========================================
+
+        Returns
+        -------
+        int
+            The number of transactions.
+        """
+
+        return self.__total[3]
+
+
+
+    def detach(self):
+        """
+        Stops following the changes of the container
+        =============================================
+        """
+
+        if self.__container is not None:
+            self.__container.remove_listener(self.container_changed_)
+            self.__container = None
+
+
+
+    def scorecard(self, start=None, end=None, top=5):
+        """
+        Gets the scorecard of a period
+        ==============================
+
+        Parameters
+        ----------
+        start : int, optional (None if omitted)
+            Timestamp of the beginning of the period.
+        end : int, optional (None if omitted)
+            Timestamp of the end of the period, exclusive.
+        top : int, optional (5 if omitted)
+            Number of counterparties to list.
+
+        Returns
+        -------
+        dict
+            Scorecard with the following keys:
+                total : dict, the rollup of the period, see .aggregates()
+                active_days : int, number of days with transactions
+                active_months : int, number of months with transactions
+                daily_net_volatility : float, standard deviation of the net
+                    flow of the active days
+                monthly_inflow : float, average inflow of the active months
+                counterparties : list of dict, the rollups of the
+                    counterparties with the largest volume over the whole
+                    history
+
+        Notes
+        -----
+            The period is rounded to whole days, since it is summed from the
+            day rollups.
+        """
+
+        start_key = None if start is None else self.day_keys_(start)[0]
+        end_key = None if end is None else self.day_keys_(end + AggregationEngine.SECONDS_PER_DAY - 1)[0]
+        with self.__lock:
+            days = sorted((key, list(rollup)) for key, rollup
+                          in self.__rollups[AggregationEngine.GROUP_DAY].items()
+                          if (start_key is None or key >= start_key)
+                          and (end_key is None or key < end_key))
+            counterparties = sorted(self.__rollups[AggregationEngine.GROUP_COUNTERPARTY].items(),
+                                    key=lambda item: item[1][0] + item[1][1], reverse=True)[:top]
+            counterparties = [AggregationEngine.rollup_dict_(key, rollup)
+                              for key, rollup in counterparties]
+        total = AggregationEngine.new_rollup_()
+        months = {}
+        nets = AggregationEngine.new_rollup_()
+        for key, rollup in days:
+            AggregationEngine.merge_rollup_(total, rollup)
+            months[key[:7]] = months.get(key[:7], 0) + rollup[0]
+            AggregationEngine.update_rollup_(nets, rollup[0] - rollup[1], 0)
+        return {'total': AggregationEngine.rollup_dict_(None, total),
+                'active_days': len(days), 'active_months': len(months),
+                'daily_net_volatility': AggregationEngine.rollup_dict_(None, nets)['volatility'],
+                'monthly_inflow': sum(months.values()) / len(months) if len(months) > 0 else 0.0,
+                'counterparties': counterparties}
+
+
+
+    def total(self, start=None, end=None):
+        """
+        Gets the rollup of all transactions or of a period
+        ==================================================
+
+        Parameters
+        ----------
+        start : int, optional (None if omitted)
+            Timestamp of the beginning of the period.
+        end : int, optional (None if omitted)
+            Timestamp of the end of the period, exclusive.
+
+        Returns
+        -------
+        dict
+            The rollup, see .aggregates(). The period is rounded to whole
+            days.
+        """
+
+        if start is None and end is None:
+            with self.__lock:
+                return AggregationEngine.rollup_dict_(None, self.__total)
+        return self.scorecard(start, end, 0)['total']
+
+
+
+    @property
+    def version(self):
+        """
+        Gets the version of the container the rollups are up to date with
+        =================================================================
+
+        Returns
+        -------
+        int
+            The version, see CBContainer.version.
+        None
+            If the engine is not attached.
+        """
+
+        return self.__version
+
+
+
+    def add_(self, time_, amount, fee, counterparty):
+
+        day = time_ // AggregationEngine.SECONDS_PER_DAY
+        keys = self.__days.get(day)
+        if keys is None:
+            keys = self.day_keys_(time_)
+            self.__days[day] = keys
+        update = AggregationEngine.update_rollup_
+        rollups = self.__rollups
+        for group, key in [(AggregationEngine.GROUP_DAY, keys[0]),
+                           (AggregationEngine.GROUP_MONTH, keys[1]),
+                           (AggregationEngine.GROUP_COUNTERPARTY, counterparty)]:
+            if key is None:
+                continue
+            rollup = rollups[group].get(key)
+            if rollup is None:
+                rollup = AggregationEngine.new_rollup_()
+                rollups[group][key] = rollup
+            update(rollup, amount, fee)
+        update(self.__total, amount, fee)
+
+
+
+    def container_changed_(self, container, event, item):
+
+        with self.__lock:
+            if event == CBContainer.CONTAINER_APPEND:
+                self.add_(item.transaction_time or 0, bch_2_sat(item.balance),
+                          bch_2_sat(item.fee), item.foreign_address)
+            self.__version = container.version
+
+
+
+    @classmethod
+    def day_keys_(cls, time_):
+
+        moment = gmtime(time_)
+        return ('{:04d}-{:02d}-{:02d}'.format(moment.tm_year, moment.tm_mon, moment.tm_mday),
+                '{:04d}-{:02d}'.format(moment.tm_year, moment.tm_mon))
+
+
+
+    @classmethod
+    def merge_rollup_(cls, rollup, other):
+
+        if other[3] == 0:
+            return
+        count = rollup[3] + other[3]
+        delta = other[5] - rollup[5]
+        rollup[6] += other[6] + delta * delta * rollup[3] * other[3] / count
+        rollup[5] += delta * other[3] / count
+        rollup[0] += other[0]
+        rollup[1] += other[1]
+        rollup[2] += other[2]
+        rollup[3] = count
+        rollup[4] = max(rollup[4], other[4])
+
+
+
+    @classmethod
+    def new_rollup_(cls):
+
+        return [0, 0, 0, 0, 0, 0.0, 0.0]
+
+
+
+    def rollups_(self, group):
+
+        rollups = self.__rollups.get(group)
+        if rollups is None:
+            raise ValueError('AggregationEngine - unknown group "{}".'.format(group))
+        return rollups
+
+
+
+    @classmethod
+    def rollup_dict_(cls, key, rollup):
+
+        inflow, outflow, fee, count, maximum, mean, squares = rollup
+        return {'key': key, 'inflow': inflow, 'outflow': outflow,
+                'net': inflow - outflow, 'fee': fee, 'count': count,
+                'max': maximum, 'mean': mean,
+                'volatility': (squares / count) ** 0.5 if count > 0 else 0.0}
+
+
+
+    @classmethod
+    def update_rollup_(cls, rollup, amount, fee):
+
+        if amount > 0:
+            rollup[0] += amount
+        else:
+            rollup[1] -= amount
+        rollup[2] += fee
+        count = rollup[3] + 1
+        rollup[3] = count
+        if abs(amount) > rollup[4]:
+            rollup[4] = abs(amount)
+        delta = amount - rollup[5]
+        rollup[5] += delta / count
+        rollup[6] += delta * (amount - rollup[5])
+
+
+
+class CBUtxo(object):
+    """
+    This class represents an utxo
+    """
+
+    def __init__(self, tx, amount, sat_amount, block_height, confirmations,
+                 vout=0):
+        """
+        Initializes the CBUtxo object
+        =============================
+
+        Parameters
+        ----------
+        tx : int
+            Tx ID of the utxo.
+        amount : float
+            The amount of the utxo in bitcoincash.
+        sat_amount : int
+            The amount of the utxo in satoshis.
+        block_height : int
+            The block height of the utxo.
+        confirmations : int
+            The number of confirmations of the utxo.
+        vout : int, optional (0 if omitted)
+            The index of the output in the transaction.
+
+        Attributes
+        ----------
+        amount
+        block_height
+        confirmations
+        key
+        sat_amount
+        tx
+        vout
+
+        Classmethods
+        ------------
+        from_raw
+        """
+
+        self.__tx = tx
+        self.__amount = amount
+        self.__sat_amount = sat_amount
+        self.__block_height = block_height
+        self.__confirmations = confirmations
+        self.__vout = vout
+
+
+
+    @property
+    def amount(self):
+        """
+        Gets the amount stored in the utxo
+        ==================================
+
+        Returns
+        -------
+        float
+            The amount stored.
+        """
+
+        return self.__amount
+
+
+
+    @property
+    def block_height(self):
+        """
+        Gets the block height of the utxo
+        =================================
+
+        Returns
+        -------
+        int
+            The block height.
+        """
+
+        return self.__block_height
+
+
+
+    @property
+    def confirmations(self):
+        """
+        Gets the number of confirmations of the utxo
+        ============================================
+
+        Returns
+        -------
+        int
+            The number of confirmations.
+        """
+
+        return self.__confirmations
+
+
+
+    @classmethod
+    def from_raw(cls, record):
+        """
+        Creates a new CBUtxo instance from an API record
+        ================================================
+
+        Parameters
+        ----------
+        record : dict
+            An utxo record as returned by BitcoinAPI.get_address_utxo() or by
+            BitcoinAPI.get_address_unconfirmed().
+
+        Returns
+        -------
+        CBUtxo
+            The new instance.
+        """
+
+        sat_amount = record.get('satoshis')
+        amount = record.get('amount')
+        if sat_amount is None:
+            sat_amount = bch_2_sat(amount)
+        if amount is None:
+            amount = sat_2_bch(sat_amount)
+        return CBUtxo(record['txid'], amount, sat_amount,
+                      record.get('height', 0), record.get('confirmations', 0),
+                      record.get('vout', 0))
+
+
+
+    @property
+    def key(self):
+        """
+        Gets the identifier of the utxo
+        ===============================
+
+        Returns
+        -------
+        tuple (str, int)
+            The tx ID and the output index of the utxo.
+        """
+
+        return (self.__tx, self.__vout)
+
+
+
+    @property
+    def sat_amount(self):
+        """
+        Gets the satoshis stored in the utxo
+        ====================================
+
+        Returns
+        -------
+        int
+            The amount stored.
+        """
+
+        return self.__sat_amount
+
+
+
+    def to_dict_(self):
+        """
+        Gets the data of the utxo as a dict
+        ===================================
+
+        Returns
+        -------
+        dict
+            Data with the same keys as the parameters of the init method, so
+            the utxo can be restored with CBUtxo(**data).
+        """
+
+        return {'tx': self.__tx,
+                'amount': self.__amount,
+                'sat_amount': self.__sat_amount,
+                'block_height': self.__block_height,
+                'confirmations': self.__confirmations,
+                'vout': self.__vout}
+
+
+
+    @property
+    def tx(self):
+        """
+        Gets the tx ID of the utxo
+        ==========================
+
+        Returns
+        -------
+        int
+            The tx ID.
+        """
+
+        return self.__tx
+
+
+
+    @property
+    def vout(self):
+        """
+        Gets the output index of the utxo
+        =================================
+
+        Returns
+        -------
+        int
+            The index of the output in the transaction.
+        """
+
+        return self.__vout
+
+
+
+class UtxoContainer(CBContainer):
+    """
+    Provides a container for the utxos of the user
+
+    Notes
+    -----
+        Both utxos and uncofrimed utxos are stored in the same container types.
+        Though the container types are the same, this means two separate
+        instances.
+    """
+
+
+
+    def __init__(self, utxos=None, chain_tip=None):
+        """
+        Intializes the UtxoContainer object
+        ===================================
+
+        Parameters
+        ----------
+        utxos : list
+            List of utxos to add to the container right at instantiation.
+        chain_tip : ChainTip, optional (None if omitted)
+            Shared chain tip to derive the confirmations from.
+
+        Attributes
+        ----------
+        chain_tip
+        count
+        min_confirmations
+        sat_total
+
+        Notes
+        -----
+            UtxoContainer is a subclass of list, please keep this in mind if
+            you are using an instance of this class.
+        """
+
+        add_utxos = True
+        if utxos is None:
+            add_utxos = False
+        elif isinstance(utxos, Iterable):
+            for utxo in utxos:
+                if not isinstance(utxo, CBUtxo):
+                    add_utxos = False
+                    break
+        super(self.__class__, self).__init__()
+        self.__index = {}
+        self.__positions = {}
+        self.__sat_total = 0
+        self.__confirmation_counts = Counter()
+        self.__min_confirmations = None
+        self.__height_counts = Counter()
+        self.__youngest_height = None
+        self.__chain_tip = chain_tip
+        if add_utxos:
+            for utxo in utxos:
+                self.append(utxo)
+
+
+
+    def append(self, item):
+        """
+        Appends a new item to the UtxoContainer
+        =======================================
+
+        Parameters
+        ----------
+        item : CBUtxo
+            Item to add to the container.
+
+        Throws
+        ------
+        TypeError
+            If the type of the item is not CBUtxo.
+        """
+
+        if isinstance(item, CBUtxo):
+            if item.key not in self.__index:
+                self.append_(item)
+        else:
+            raise TypeError('Tried to add a non-CBUtxo instance to a UtxoContainer.')
+
+
+
+    @property
+    def chain_tip(self):
+        """
+        Gets the chain tip the container is bound to
+        ============================================
+
+        Returns
+        -------
+        ChainTip
+            The shared chain tip.
+        None
+            If the container is not bound to any chain tip.
+        """
+
+        return self.__chain_tip
+
+
+
+    @chain_tip.setter
+    def chain_tip(self, newtip):
+        """
+        Binds the container to a chain tip
+        ==================================
+
+        Parameters
+        ----------
+        newtip : ChainTip, None
+            The shared chain tip. Setting it to None makes the container use
+            the stored confirmations of the utxos again.
+        """
+
+        self.__chain_tip = newtip
+
+
+
+    def contains_key(self, key):
+        """
+        Checks whether an utxo is added yet or not
+        ==========================================
+
+        Parameters
+        ----------
+        key : tuple (str, int)
+            The tx ID and output index of the utxo to search for.
+
+        Returns
+        -------
+        bool
+            True if the utxo is found, False if not.
+        """
+
+        return key in self.__index
+
+
+
+    def contains_tx(self, tx):
+        """
+        Checks whether a tx is added yet or not
+        =======================================
+
+        Parameters
+        ----------
+        tx : str
+            The tx to search for.
+
+        Returns
+        -------
+        bool
+            True if the tx is found, False if not.
+        """
+
+        for utxo in self:
+            if utxo.tx == tx:
+                return True
+        return False
+
+
+
+    @property
+    def count(self):
+        """
+        Gets the number of utxos in the container
+        =========================================
+
+        Returns
+        -------
+        int
+            The number of utxos.
+        """
+
+        return len(self.__index)
+
+
+
+    def get_by_key(self, key):
+        """
+        Gets an utxo by its identifier
+        ==============================
+
+        Parameters
+        ----------
+        key : tuple (str, int)
+            The tx ID and output index of the utxo.
+
+        Returns
+        -------
+        CBUtxo
+            The utxo with the given identifier.
+        None
+            If the utxo is not in the container.
+        """
+
+        return self.__index.get(key)
+
+
+
+    def keys(self):
+        """
+        Gets the identifiers of the utxos in the container
+        ==================================================
+
+        Returns
+        -------
+        set of tuple (str, int)
+            The tx ID and output index pairs of all utxos.
+        """
+
+        return set(self.__index.keys())
+
+
+
+    @property
+    def min_confirmations(self):
+        """
+        Gets the lowest number of confirmations in the container
+        ========================================================
+
+        Returns
+        -------
+        int
+            The number of confirmations of the youngest utxo.
+        None
+            If the container is empty.
+
+        Notes
+        -----
+            If the height of the chain tip is known, the confirmations are
+            derived from the highest block of the utxos, so the value follows
+            the tip without touching the utxos. Otherwise the lowest stored
+            confirmations are returned, which are as old as the API records.
+        """
+
+        if self.__youngest_height is None:
+            return None
+        if self.__chain_tip is not None and self.__chain_tip.height is not None:
+            return self.__chain_tip.confirmations(self.__youngest_height)
+        return self.__min_confirmations
+
+
+
+    def remove_keys(self, keys):
+        """
+        Removes utxos by their identifiers
+        ==================================
+
+        Parameters
+        ----------
+        keys : iterable of tuple (str, int)
+            Identifiers of the utxos to remove. Unknown identifiers are
+            ignored.
+
+        Returns
+        -------
+        list of CBUtxo
+            The removed utxos.
+
+        Notes
+        -----
+            Each utxo is removed in constant time: the last utxo of the
+            container is moved into its position, so the order of the
+            remaining utxos is not kept.
+        """
+
+        removed = []
+        for key in keys:
+            utxo = self.__index.pop(key, None)
+            if utxo is not None:
+                removed.append(utxo)
+                self.subtract_(utxo)
+                position = self.__positions.pop(key)
+                last = super(self.__class__, self).pop()
+                if last is not utxo:
+                    self[position] = last
+                    self.__positions[last.key] = position
+        for utxo in removed:
+            self.notify_(CBContainer.CONTAINER_REMOVE, utxo)
+        return removed
+
+
+
+    @property
+    def sat_total(self):
+        """
+        Gets the sum of the utxos in the container
+        ==========================================
+
+        Returns
+        -------
+        int
+            The total amount in satoshis.
+        """
+
+        return self.__sat_total
+
+
+
+    def append_(self, item):
+        """
+        Appends item to the container without check
+        ===========================================
+
+        Parameters
+        ----------
+        item : CBUtxo
+            Item to add to the container.
+
+        Notes
+        -----
+            This function is a backdoor only. Its usage is unadvised and can
+            lead to unexpected errors. An utxo with the key of a stored one
+            replaces the stored one in its position.
+        """
+
+        replaced = self.__index.get(item.key)
+        if replaced is not None:
+            self.subtract_(replaced)
+            self[self.__positions[item.key]] = item
+        else:
+            self.__positions[item.key] = len(self)
+            super(self.__class__, self).append(item)
+        self.__index[item.key] = item
+        self.__sat_total += item.sat_amount
+        confirmations = item.confirmations
+        self.__confirmation_counts[confirmations] += 1
+        if self.__min_confirmations is None or confirmations < self.__min_confirmations:
+            self.__min_confirmations = confirmations
+        height = UtxoContainer.height_rank_(item.block_height)
+        self.__height_counts[height] += 1
+        if self.__youngest_height is None or height > self.__youngest_height:
+            self.__youngest_height = height
+        self.notify_(CBContainer.CONTAINER_APPEND, item)
+
+
+
+    @classmethod
+    def height_rank_(cls, block_height):
+        """
+        Gets the rank of a block height by youth
+        ========================================
+
+        Parameters
+        ----------
+        block_height : int, None
+            The height of the block of an utxo.
+
+        Returns
+        -------
+        float
+            The height itself, or infinity for mempool utxos, so the youngest
+            utxo has always the highest rank.
+        """
+
+        if block_height is None or block_height < 1:
+            return float('inf')
+        return block_height
+
+
+
+    def subtract_(self, utxo):
+        """
+        Removes an utxo from the running totals
+        =======================================
+
+        Parameters
+        ----------
+        utxo : CBUtxo
+            The utxo which leaves the container.
+        """
+
+        self.__sat_total -= utxo.sat_amount
+        confirmations = utxo.confirmations
+        self.__confirmation_counts[confirmations] -= 1
+        if self.__confirmation_counts[confirmations] == 0:
+            del self.__confirmation_counts[confirmations]
+            if confirmations == self.__min_confirmations:
+                if len(self.__confirmation_counts) > 0:
+                    self.__min_confirmations = min(self.__confirmation_counts)
+                else:
+                    self.__min_confirmations = None
+        height = UtxoContainer.height_rank_(utxo.block_height)
+        self.__height_counts[height] -= 1
+        if self.__height_counts[height] == 0:
+            del self.__height_counts[height]
+            if height == self.__youngest_height:
+                if len(self.__height_counts) > 0:
+                    self.__youngest_height = max(self.__height_counts)
+                else:
+                    self.__youngest_height = None
+
+
+
+class CBDocument(object):
+    """
+    This class represents the top level parent class of documents
+    """
+
+
+
+    DOCUMENT_INSTANTIATED = 0
+    DOCUMENT_CREATED = 1
+    DOCUMENT_HAS_ID = 2
+    DOCUMENT_CLOSED = 4
+    DOCUMENT_EXPIRES = 8
+    DOCUMENT_IS_ANONYMOUS = 16
+    DOCUMENT_IS_CERTIFIED = 32
+    DOCUMENT_EXPIRED = 64
+
+
+
+    def __init__(self, owner=None, id=None, created_at=None, closed_at=None,
+                 expires_at=None, is_certified=False, is_anonymous=False,
+                 certificate=None, binding=None):
+        """
+        Initializes the CBDocument
+        ==========================
+
+        Parameters
+        ----------
+        owner=None, id=None, created_at=None, closed_at=None,
+                     expires_at=None, is_certified=False, is_anonymous=False,
+                     certificate=None, binding=None
+        """
+
+        self.__containers = []
+        self.__owner = None
+        self.__id = None
+        self.__created = None
+        self.__closed = None
+        self.__expires = None
+        self.__certified = False
+        self.__certificate = None
+        self.__anonymous = False
+        self.__state = CBDocument.DOCUMENT_INSTANTIATED
+        self.__binding = binding
+        self.__snapshot = None
+        self.created = created_at
+        self.owner = owner
+        self.id = id
+        self.expires = expires_at
+        self.certified = is_certified
+        self.certificate = certificate
+        self.anonymous = is_anonymous
+        if closed_at is not None:
+            self.closed = closed_at
+
+
+
+    @property
+    def anonymous(self):
+
+        return self.__anonymous
+
+
+
+    @anonymous.setter
+    def anonymous(self, newstate):
+
+            self.__anonymous = newstate
+            self.set_state_(CBDocument.DOCUMENT_IS_ANONYMOUS, newstate)
+            self.changed_()
+
+
+
+    def bind(self, transactions):
+        """
+        Binds the document to a snapshot of transactions
+        ================================================
+
+        Parameters
+        ----------
+        transactions : TransactionContainer, TransactionSnapshot
+            The transactions of the owner.
+
+        Returns
+        -------
+        TransactionSnapshot
+            The snapshot the document is bound to.
+
+        Throws
+        ------
+        ValueError
+            If the document is already bound to more transactions than the
+            container has.
+
+        Notes
+        -----
+            The first binding is kept for the life of the document, later
+            bindings recreate the snapshot of the first one, so the document
+            always renders the same transactions.
+        """
+
+        if self.__binding is None:
+            snapshot = TransactionSnapshot(transactions)
+            self.__binding = snapshot.to_dict_()
+            self.changed_()
+        else:
+            snapshot = TransactionSnapshot(transactions, self.__binding['length'],
+                                           self.__binding['tip_height'])
+        self.__snapshot = snapshot
+        return snapshot
+
+
+
+    @property
+    def binding(self):
+        """
+        Gets the binding of the document
+        ================================
+
+        Returns
+        -------
+        dict
+            The snapshot data, see TransactionSnapshot.to_dict_().
+        None
+            If the document is not bound.
+        """
+
+        return self.__binding
+
+
+
+    @property
+    def certificate(self):
+
+        return self.__certificate
+
+
+
+    @certificate.setter
+    def certificate(self, newcertificate):
+
+        self.__certificate = newcertificate
+        self.changed_()
+
+
+
+    @property
+    def certified(self):
+
+        return self.__certified
+
+
+
+    @certified.setter
+    def certified(self, newstate):
+
+        self.__certified = newstate
+        self.set_state_(CBDocument.DOCUMENT_IS_CERTIFIED, newstate)
+        self.changed_()
+
+
+
+    @property
+    def closed(self):
+
+        return self.__closed
+
+
+
+    @closed.setter
+    def closed(self, timestamp=0):
+
+        if self.__closed is None:
+            if timestamp == 0:
+                self.__closed = now()
+            else:
+                if timestamp <= now():
+                    self.__closed = timestamp
+                else:
+                    raise ValueError('ChainBridgeDocument can be just closed now or can be restored.')
+            self.set_state_(CBDocument.DOCUMENT_CLOSED, True)
+            self.changed_()
+        else:
+            raise PermissionError('Tried to close a closed ChainBridgeDocument instance.')
+
+
+
+    @property
+    def created(self):
+
+        return self.__created
+
+
+
+    @created.setter
+    def created(self, timestamp=0):
+
+        if self.__created is None:
+            if timestamp is None or timestamp == 0:
+                self.__created = now()
+            else:
+                if timestamp <= now():
+                    self.__created = timestamp
+                else:
+                    raise ValueError('ChainBridgeDocument can be just created now or can be restored.')
+            self.set_state_(CBDocument.DOCUMENT_CREATED, True)
+        else:
+            raise PermissionError('Tried to create a created ChainBridgeDocument instance.')
+
+
+
+    @property
+    def expires(self):
+
+        return self.__expires
+
+
+
+    @expires.setter
+    def expires(self, timestamp):
+
+        if self.is_editable_('set expieration'):
+            self.__expires = timestamp
+            self.set_state_(CBDocument.DOCUMENT_EXPIRES, timestamp is not None)
+            self.set_state_(CBDocument.DOCUMENT_EXPIRED,
+                            timestamp is not None and timestamp < now())
+            self.changed_()
+
+
+
+    @property
+    def id(self):
+
+        return self.__id
+
+
+
+    @id.setter
+    def id(self, newid):
+
+        if self.is_editable_('add id'):
+            if self.__id is None:
+                self.__id = newid
+                self.set_state_(CBDocument.DOCUMENT_HAS_ID, newid is not None)
+                self.changed_()
+            else:
+                raise PermissionError('Tried to add id for a ChainBridgeDocument instance with id.')
+
+
+
+    @property
+    def owner(self):
+
+        return self.__owner
+
+
+
+    @owner.setter
+    def owner(self, newowner):
+
+        if self.is_editable_('add owner'):
+            if self.__owner is None:
+                self.__owner = newowner
+                self.changed_()
+            else:
+                raise PermissionError('Tried to add owner for a ChainBridgeDocument instance with owner.')
+
+
+
+    @classmethod
+    def refresh_expiry(cls, documents, now_=None):
+        """
+        Sets DOCUMENT_EXPIRED of documents which are due
+        ================================================
+
+        Parameters
+        ----------
+        documents : iterable of CBDocument
+            The documents.
+        now_ : int, optional (None if omitted)
+            The timestamp to evaluate expiry against. If omitted now() is
+            called once for all documents.
+
+        Returns
+        -------
+        list of CBDocument
+            The documents got expired.
+
+        Notes
+        -----
+            Registered documents are expired by the tick of their
+            DocumentRegistry, this method is for documents outside of a
+            registry.
+        """
+
+        if now_ is None:
+            now_ = now()
+        result = []
+        for document in documents:
+            if document.expire_(now_):
+                result.append(document)
+        return result
+
+
+
+    @property
+    def state(self):
+        """
+        Gets the state of the document
+        ==============================
+
+        Returns
+        -------
+        int
+            Sum of the DOCUMENT_* flags of the document.
+
+        Notes
+        -----
+            The state is stored and updated by the setters, reading it costs
+            no computation. Only a document with a pending expiry compares it
+            to now() and gets DOCUMENT_EXPIRED set when it is due, so it
+            expires outside of a DocumentRegistry too.
+        """
+
+        if (self.__state & CBDocument.DOCUMENT_EXPIRES
+                and not self.__state & CBDocument.DOCUMENT_EXPIRED):
+            self.expire_(now())
+        return self.__state
+
+
+
+    @classmethod
+    def states(cls, documents):
+        """
+        Gets the states of many documents
+        =================================
+
+        Parameters
+        ----------
+        documents : iterable of CBDocument
+            The documents.
+
+        Returns
+        -------
+        array of int
+            The states in the order of the documents, see .state.
+
+        Notes
+        -----
+            The stored states are collected by a single map over the
+            documents, no property of the documents is evaluated. The
+            documents with a pending expiry are compared to a single now()
+            tick taken for the whole call.
+        """
+
+        if not isinstance(documents, (list, tuple)):
+            documents = list(documents)
+        result = array('B', map(attrgetter('_CBDocument__state'), documents))
+        pending_mask = CBDocument.DOCUMENT_EXPIRES + CBDocument.DOCUMENT_EXPIRED
+        now_ = None
+        for position, state in enumerate(result):
+            if state & pending_mask == CBDocument.DOCUMENT_EXPIRES:
+                if now_ is None:
+                    now_ = now()
+                if documents[position].expire_(now_):
+                    result[position] = documents[position].__state
+        return result
+
+
+
+    def snapshot_(self, transactions):
+
+        if transactions is None:
+            if self.__snapshot is None:
+                raise ValueError('CBDocument - document is not bound to transactions.')
+            return self.__snapshot
+        if self.__binding is not None and not isinstance(transactions, TransactionSnapshot):
+            if (self.__snapshot is not None
+                    and self.__snapshot.container is transactions):
+                return self.__snapshot
+            return self.bind(transactions)
+        return transactions
+
+
+
+    def add_container_(self, container):
+        """
+        Registers a container to notify about the changes of the document
+        =================================================================
+
+        Parameters
+        ----------
+        container : CBContainer
+            The container the document is added to.
+
+        Notes
+        -----
+            This function is for internal use by the containers.
+        """
+
+        if not any(item is container for item in self.__containers):
+            self.__containers.append(container)
+
+
+
+    def changed_(self):
+
+        for container in self.__containers:
+            container.item_changed_(self)
+
+
+
+    def expire_(self, now_):
+
+        if (self.__state & CBDocument.DOCUMENT_EXPIRES
+                and not self.__state & CBDocument.DOCUMENT_EXPIRED
+                and self.__expires < now_):
+            self.__state |= CBDocument.DOCUMENT_EXPIRED
+            self.changed_()
+            return True
+        return False
+
+
+
+    def remove_container_(self, container):
+        """
+        Unregisters a container from the changes of the document
+        ========================================================
+
+        Parameters
+        ----------
+        container : CBContainer, DocumentRegistry
+            The container to unregister.
+
+        Notes
+        -----
+            This function is for internal use by the containers.
+        """
+
+        self.__containers = [item for item in self.__containers if item is not container]
+
+
+
+    def set_state_(self, flag, enabled):
+
+        if enabled:
+            self.__state |= flag
+        else:
+            self.__state &= ~flag
+
+
+
+    def is_editable_(self, activity_name='manipulate', drop_error=True):
+
+        if self.created is None or self.closed is not None:
+            if drop_error:
+                raise PermissionError('Tried to {} of a ChainBridgeDocument instance in non-editable state.'
+                                      .format(activity_name))
+            else:
+                return False
+        else:
+            return True;
+
+
+
+    @classmethod
+    def from_dict_(cls, datadict):
+        """
+        Creates a new document instance from a dict
+        ===========================================
+
+        Parameters
+        ----------
+        datadict : dict
+            Data as returned by .to_dict_().
+
+        Returns
+        -------
+        CBDocument
+            The restored instance. The class of the instance is given by the
+            type key of datadict.
+
+        Throws
+        ------
+        ValueError
+            If the type of the document is unknown.
+
+        Notes
+        -----
+            Protected documents get generic_permission_function_for_restore()
+            as permission function, so restored documents can't be modified.
+        """
+
+        doctype = datadict.get('type', 'CBDocument')
+        kwargs = {'id': datadict.get('id'),
+                  'created_at': datadict.get('created'),
+                  'closed_at': datadict.get('closed'),
+                  'expires_at': datadict.get('expires'),
+                  'is_certified': datadict.get('certified', False),
+                  'is_anonymous': datadict.get('anonymous', False),
+                  'certificate': datadict.get('certificate'),
+                  'binding': datadict.get('binding')}
+        if doctype == 'CBDocument':
+            return CBDocument(owner=datadict.get('owner'), **kwargs)
+        elif doctype == 'StatementOfAccount':
+            return StatementOfAccount(datadict['owner'], datadict['from_date'],
+                                      datadict['to_date'],
+                                      generic_permission_function_for_restore,
+                                      **kwargs)
+        elif doctype == 'AccountActivity':
+            search = datadict.get('search')
+            if search is not None:
+                search = SearchObject(search)
+            return AccountActivity(datadict['owner'], search,
+                                   generic_permission_function_for_restore,
+                                   **kwargs)
+        raise ValueError('CBDocument.from_dict_() unknown document type "{}".'
+                         .format(doctype))
+
+
+
+    def to_dict_(self):
+        """
+        Gets the data of the document as a dict
+        =======================================
+
+        Returns
+        -------
+        dict
+            JSON serializable data to restore the document with .from_dict_().
+        """
+
+        return {'type': self.__class__.__name__,
+                'owner': self.__owner,
+                'id': self.__id,
+                'created': self.__created,
+                'closed': self.__closed,
+                'expires': self.__expires,
+                'certified': self.__certified,
+                'certificate': self.__certificate,
+                'binding': self.__binding,
+                'anonymous': self.__anonymous}
+
+
+
+class ProtectedCBDocument(CBDocument):
+    """
+    This is an abstract mid-level class to relize a protected document
+    ==================================================================
+    """
+
+
+
+    def __init__(self, owner, permission_function, id=None,
+                 created_at=None, closed_at=None, expires_at=None,
+                 is_certified=False, is_anonymous=False, certificate=None,
+                 binding=None):
+
+        self.__check_permission = None
+        super(ProtectedCBDocument, self).__init__(owner=owner, id=id,
+                                                  created_at=created_at,
+                                                  closed_at=closed_at,
+                                                  expires_at=expires_at,
+                                                  is_certified=is_certified,
+                                                  is_anonymous=is_anonymous,
+                                                  certificate=certificate,
+                                                  binding=binding)
+        self.__check_permission = permission_function
+
+
+
+    @CBDocument.anonymous.setter
+    def anonymous(self, newstate):
+
+        if self.check_permission('anonymous'):
+            CBDocument.anonymous.fset(self, newstate)
+
+
+
+    def check_permission(self, query_string):
+
+        if self.__check_permission is None:
+            return True
+        return self.__check_permission(query_string)
+
+
+
+    @CBDocument.certificate.setter
+    def certificate(self, newcertificate):
+
+        if self.check_permission('certify'):
+            CBDocument.certificate.fset(self, newcertificate)
+
+
+
+    @CBDocument.certified.setter
+    def certified(self, newstate):
+
+        if self.check_permission('certify'):
+            CBDocument.certified.fset(self, newstate)
+
+
+
+class StatementOfAccount(ProtectedCBDocument):
+    """
+    This class represents a Statement of Account document
+    """
+
+
+
+    def __init__(self, owner, from_date, to_date, permission_function, id=None,
+                 created_at=None, closed_at=None, expires_at=None,
+                 is_certified=False, is_anonymous=False, certificate=None,
+                 binding=None):
+
+        if created_at is None:
+            created_at = now()
+        super(self.__class__, self).__init__(owner=owner,
+                                             permission_function=permission_function,
+                                             id=id, created_at=created_at,
+                                             closed_at=closed_at,
+                                             expires_at=expires_at,
+                                             is_certified=is_certified,
+                                             is_anonymous=is_anonymous,
+                                             certificate=certificate,
+                                             binding=binding)
+        if from_date > now():
+            raise ValueError('StatementOfAccount.init() - beginning cannot be in the future.')
+        if to_date < from_date:
+            raise ValueError('StatementOfAccount.init() - ending date cannot be earlier than beginning date.')
+        self.__from_date = from_date
+        self.__to_date = to_date
+
+
+
+    @property
+    def from_date(self):
+
+        return self.__from_date
+
+
+
+    def to_dict_(self):
+        """
+        Gets the data of the document as a dict
+        =======================================
+
+        Returns
+        -------
+        dict
+            JSON serializable data to restore the document with
+            CBDocument.from_dict_().
+        """
+
+        result = super(self.__class__, self).to_dict_()
+        result['from_date'] = self.__from_date
+        result['to_date'] = self.__to_date
+        return result
+
+
+
+    def render(self, transactions, outstream, format=None, page_size=None,
+               templates=None, locale=None, resolver=None):
+        """
+        Renders the statement to a stream
+        =================================
+
+        Parameters
+        ----------
+        transactions : TransactionContainer, TransactionSnapshot, None
+            The transactions of the owner. A bound document renders its
+            snapshot of the container, None renders the last bound snapshot.
+        outstream : file-like
+            Text stream to write to.
+        format : str, optional (None if omitted)
+            StatementRenderer.FORMAT_CSV, FORMAT_JSONL or FORMAT_TEXT. If
+            omitted FORMAT_CSV is used.
+        page_size : int, optional (None if omitted)
+            Number of rows on a page of FORMAT_TEXT.
+        templates : TemplateRegistry, optional (None if omitted)
+            Templates of FORMAT_TEXT. If omitted TemplateRegistry.default() is
+            used.
+        locale : str, optional (None if omitted)
+            The locale of the templates.
+        resolver : CounterpartyResolver, optional (None if omitted)
+            Resolver of the names of the counterparties.
+
+        Returns
+        -------
+        dict
+            The summary of the statement, see StatementRenderer.summary.
+
+        Notes
+        -----
+            Rows are written as they are generated, see StatementRenderer for
+            details.
+        """
+
+        return StatementRenderer(self, self.snapshot_(transactions), templates,
+                                 locale, resolver).render(outstream, format, page_size)
+
+
+
+    @property
+    def to_date(self):
+
+        return self.__to_date
+
+
+
+class AccountActivity(ProtectedCBDocument):
+    """
+    This class represents an Account Activity document
+    """
+
+
+
+    def __init__(self, owner, search, permission_function, id=None,
+                 created_at=None, closed_at=None, expires_at=None,
+                 is_certified=False, is_anonymous=False, certificate=None,
+                 binding=None):
+
+        if created_at is None:
+            created_at = now()
+        super(self.__class__, self).__init__(owner=owner,
+                                             permission_function=permission_function,
+                                             id=id, created_at=created_at,
+                                             closed_at=closed_at,
+                                             expires_at=expires_at,
+                                             is_certified=is_certified,
+                                             is_anonymous=is_anonymous,
+                                             certificate=certificate,
+                                             binding=binding)
+        self.__search = search
+
+
+
+    @property
+    def search(self):
+
+        return self.__search
+
+
+
+    def to_dict_(self):
+        """
+        Gets the data of the document as a dict
+        =======================================
+
+        Returns
+        -------
+        dict
+            JSON serializable data to restore the document with
+            CBDocument.from_dict_().
+        """
+
+        result = super(self.__class__, self).to_dict_()
+        if self.__search is None:
+            result['search'] = None
+        else:
+            result['search'] = self.__search.filter_list
+        return result
+
+
+
+    def render(self, transactions, outstream, format=None, page_size=None,
+               addressbook=None, templates=None, locale=None, resolver=None):
+        """
+        Renders the activity to a stream
+        ================================
+
+        Parameters
+        ----------
+        transactions : TransactionContainer, TransactionSnapshot, None
+            The transactions of the owner. A bound document renders its
+            snapshot of the container, None renders the last bound snapshot.
+        outstream : file-like
+            Text stream to write to.
+        format : str, optional (None if omitted)
+            StatementRenderer.FORMAT_CSV, FORMAT_JSONL or FORMAT_TEXT. If
+            omitted FORMAT_CSV is used.
+        page_size : int, optional (None if omitted)
+            Number of rows on a page of FORMAT_TEXT.
+        addressbook : WalletContainer, optional (None if omitted)
+            The addressbook of the owner, needed by addressbook filters only.
+        templates : TemplateRegistry, optional (None if omitted)
+            Templates of FORMAT_TEXT. If omitted TemplateRegistry.default() is
+            used.
+        locale : str, optional (None if omitted)
+            The locale of the templates.
+        resolver : CounterpartyResolver, optional (None if omitted)
+            Resolver of the names of the counterparties.
+
+        Returns
+        -------
+        dict
+            The summary of the activity, see StatementRenderer.summary.
+        """
+
+        return ActivityRenderer(self, self.snapshot_(transactions), addressbook, templates,
+                                locale, resolver).render(outstream, format, page_size)
+
+
+
+class DocumentTemplate(object):
+    """
+    This class represents a compiled layout of documents
+    ====================================================
+
+    Notes
+    -----
+    1.
+        Slots of the layout are written as {{name}} or {{name:spec}} where
+        spec is a format specification of the format() builtin, eg.
+        {{amount:>18}} or {{tx:<16.16}}. Everything else is literal text.
+    2.
+        The layout is parsed once, to a list of callables bound to the
+        literals and to the slots with their specifications, so rendering
+        costs only the formatting of the data.
+    """
+
+
+
+    SLOT_PATTERN = re.compile(r'\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*(?::([^}]*))?\}\}')
+
+
+
+    def __init__(self, source, name=None):
+        """
+        Initializes the DocumentTemplate object
+        =======================================
+
+        Parameters
+        ----------
+        source : str
+            The layout.
+        name : str, optional (None if omitted)
+            Name of the template for error messages.
+
+        Attributes
+        ----------
+        digest
+        name
+        slots
+        source
+
+        Throws
+        ------
+        TypeError
+            If source is not a string.
+        """
+
+        if not isinstance(source, str):
+            raise TypeError('DocumentTemplate.__init__() - source must be a string.')
+        self.__source = source
+        self.__name = name
+        self.__digest = hashlib.sha256(source.encode('utf-8')).hexdigest()
+        self.__slots, self.__render = DocumentTemplate.compile_(source)
+
+
+
+    def __call__(self, slots):
+
+        return self.__render(slots)
+
+
+
+    @property
+    def digest(self):
+        """
+        Gets the digest of the template
+        ===============================
+
+        Returns
+        -------
+        str
+            Hexadecimal SHA-256 hash of the source.
+        """
+
+        return self.__digest
+
+
+
+    @property
+    def name(self):
+        """
+        Gets the name of the template
+        =============================
+
+        Returns
+        -------
+        str
+            The name of the template.
+        None
+            If the template has no name.
+        """
+
+        return self.__name
+
+
+
+    def render(self, slots=None, **kwargs):
+        """
+        Renders the template
+        ====================
+
+        Parameters
+        ----------
+        slots : dict, optional (None if omitted)
+            Values of the slots.
+        **kwargs
+            Values of the slots, they override the values of slots.
+
+        Returns
+        -------
+        str
+            The rendered text.
+
+        Throws
+        ------
+        ValueError
+            If the value of a slot is missing.
+        """
+
+        if slots is None:
+            slots = kwargs
+        elif len(kwargs) > 0:
+            slots = dict(slots, **kwargs)
+        try:
+            return self.__render(slots)
+        except KeyError as exception:
+            raise ValueError('DocumentTemplate.render() - missing slot {} of template {}.'
+                             .format(exception, self.__name))
+
+
+
+    @property
+    def slots(self):
+        """
+        Gets the names of the slots
+        ===========================
+
+        Returns
+        -------
+        list of str
+            Names of the slots in the order of first appearance.
+        """
+
+        return list(self.__slots)
+
+
+
+    @property
+    def source(self):
+        """
+        Gets the source of the template
+        ===============================
+
+        Returns
+        -------
+        str
+            The layout.
+        """
+
+        return self.__source
+
+
+
+    @classmethod
+    def compile_(cls, source):
+        """
+        Compiles a layout
+        =================
+
+        Parameters
+        ----------
+        source : str
+            The layout.
+
+        Returns
+        -------
+        tuple (list of str, callable)
+            Names of the slots in the order of first appearance and the
+            function to call with the values of the slots to render.
+        """
+
+        slots = []
+        parts = []
+        position = 0
+        for match in DocumentTemplate.SLOT_PATTERN.finditer(source):
+            if match.start() > position:
+                parts.append(DocumentTemplate.literal_(source[position:match.start()]))
+            slot, spec = match.group(1), match.group(2)
+            if slot not in slots:
+                slots.append(slot)
+            parts.append(DocumentTemplate.field_(slot, spec))
+            position = match.end()
+        if position < len(source):
+            parts.append(DocumentTemplate.literal_(source[position:]))
+
+        def render_(s):
+            return ''.join([part(s) for part in parts])
+
+        return slots, render_
+
+
+
+    @classmethod
+    def field_(cls, slot, spec):
+
+        if spec is None:
+            return lambda s: format(s[slot])
+        return lambda s: format(s[slot], spec)
+
+
+
+    @classmethod
+    def literal_(cls, text):
+
+        return lambda s: text
+
+
+
+class TemplateRegistry(object):
+    """
+    This class compiles and caches the templates of documents
+    =========================================================
+
+    Notes
+    -----
+    1.
+        Templates are identified by document type, part, locale and version.
+        A document type without its own template uses the template of its
+        parent class, so layouts registered for CBDocument are shared by
+        every document. A locale like hu_HU falls back to hu and then to the
+        default locale. Without version the latest one is used.
+    2.
+        Templates are compiled on their first use and cached with the key
+        they are asked with, so later lookups are a single dict access.
+    3.
+        Templates can be loaded from a directory, where the file of a
+        template is <locale>/<document type>.<part>.tpl or
+        <locale>/<document type>.<part>.<version>.tpl. With hot reload the
+        modification time of the files is checked at most once in every
+        RELOAD_INTERVAL seconds and changed files are compiled again.
+    """
+
+
+
+    DEFAULT_LOCALE = 'en'
+    RELOAD_INTERVAL = 1.0
+    TEMPLATE_EXTENSION = '.tpl'
+    TEXT_RULE = '-' * 106
+    TEXT_TOTAL = '{:>10}  {:<16}  {:<36}  {:>18}  '
+    BUILTIN_TEMPLATES = {
+        ('CBDocument', 'header'): ('{{title}}\n'
+                                   'Owner: {{owner}}\n'
+                                   'Period: {{from_date}} - {{to_date}}    Page {{page}}\n'
+                                   + TEXT_RULE + '\n'
+                                   + TEXT_TOTAL.format('Time', 'Transaction', 'Counterparty',
+                                                       'Amount') + '{:>18}'.format('Balance')
+                                   + '\n' + TEXT_RULE + '\n'
+                                   + TEXT_TOTAL.format('', '', 'Brought forward', '')
+                                   + '{{balance:>18}}\n'),
+        ('CBDocument', 'row'): ('{{time:>10}}  {{tx:<16.16}}  {{counterparty:<36.36}}  '
+                                '{{amount:>18}}  {{balance:>18}}\n'),
+        ('CBDocument', 'page_break'): (TEXT_TOTAL.format('', '', 'Carried forward', '')
+                                       + '{{balance:>18}}\n\f'),
+        ('CBDocument', 'footer'): (TEXT_RULE + '\n'
+                                   'Opening balance     {{opening_balance:>18}}\n'
+                                   'Incoming            {{incoming:>18}}\n'
+                                   'Outgoing            {{outgoing:>18}}\n'
+                                   'Fees                {{fees:>18}}\n'
+                                   'Closing balance     {{closing_balance:>18}}\n'
+                                   'Transactions: {{count}}\n')}
+    __default = None
+
+
+
+    def __init__(self, directory=None, hot_reload=False, default_locale=None):
+        """
+        Initializes the TemplateRegistry object
+        =======================================
+
+        Parameters
+        ----------
+        directory : str, optional (None if omitted)
+            Directory to load templates from.
+        hot_reload : bool, optional (False if omitted)
+            Whether to check template files for changes or not.
+        default_locale : str, optional (None if omitted)
+            The last fallback locale. If omitted DEFAULT_LOCALE is used.
+
+        Attributes
+        ----------
+        stats
+        """
+
+        self.__directory = directory
+        self.__hot_reload = hot_reload
+        if default_locale is None:
+            self.__default_locale = TemplateRegistry.DEFAULT_LOCALE
+        else:
+            self.__default_locale = default_locale
+        self.__lock = threading.RLock()
+        self.__sources = {}
+        self.__files = {}
+        self.__cache = {}
+        self.__checked = 0.0
+        self.__compiles = 0
+        self.__hits = 0
+        self.__reloads = 0
+        for (doctype, part), source in TemplateRegistry.BUILTIN_TEMPLATES.items():
+            self.__sources.setdefault((doctype, part, self.__default_locale), {})[0] = source
+        if directory is not None:
+            self.scan_()
+
+
+
+    @classmethod
+    def default(cls):
+        """
+        Gets the shared registry
+        ========================
+
+        Returns
+        -------
+        TemplateRegistry
+            Registry with the builtin templates, created on first call.
+        """
+
+        if TemplateRegistry.__default is None:
+            TemplateRegistry.__default = TemplateRegistry()
+        return TemplateRegistry.__default
+
+
+
+    def get(self, doctype, part, locale=None, version=None):
+        """
+        Gets a compiled template
+        ========================
+
+        Parameters
+        ----------
+        doctype : str, type, CBDocument
+            The document type, the class of the document or the document.
+        part : str
+            The part of the layout, eg. 'header', 'row', 'page_break',
+            'footer'.
+        locale : str, optional (None if omitted)
+            The locale. If omitted the default locale is used.
+        version : int, optional (None if omitted)
+            The version. If omitted the latest version is used.
+
+        Returns
+        -------
+        DocumentTemplate
+            The compiled template.
+
+        Throws
+        ------
+        ValueError
+            If there is no template for the document type and part.
+        """
+
+        if not isinstance(doctype, (str, type)):
+            doctype = doctype.__class__
+        key = (doctype, part, locale, version)
+        if self.__hot_reload:
+            self.check_()
+        entry = self.__cache.get(key)
+        if entry is not None:
+            self.__hits += 1
+            return entry
+        with self.__lock:
+            entry = self.__cache.get(key)
+            if entry is None:
+                source_key, source_version = self.resolve_(doctype, part, locale, version)
+                source = self.__sources[source_key][source_version]
+                name = '{}.{}.{}.{}'.format(source_key[0], part, source_key[2],
+                                            source_version)
+                entry = None
+                for cached in self.__cache.values():
+                    if cached.name == name:
+                        entry = cached
+                        break
+                if entry is None:
+                    entry = DocumentTemplate(source, name)
+                    self.__compiles += 1
+                self.__cache[key] = entry
+            else:
+                self.__hits += 1
+        return entry
+
+
+
+    def register(self, doctype, part, source, locale=None, version=None):
+        """
+        Registers a template
+        ====================
+
+        Parameters
+        ----------
+        doctype : str, type
+            The document type or the class of the document.
+        part : str
+            The part of the layout.
+        source : str
+            The layout, see DocumentTemplate.
+        locale : str, optional (None if omitted)
+            The locale. If omitted the default locale is used.
+        version : int, optional (None if omitted)
+            The version. If omitted 0 is used.
+
+        Throws
+        ------
+        TypeError
+            If source is not a string.
+
+        Notes
+        -----
+            Compiled templates are dropped from the cache, so the next lookup
+            sees the new template.
+        """
+
+        if not isinstance(source, str):
+            raise TypeError('TemplateRegistry.register() - source must be a string.')
+        if isinstance(doctype, type):
+            doctype = doctype.__name__
+        if locale is None:
+            locale = self.__default_locale
+        if version is None:
+            version = 0
+        with self.__lock:
+            self.__sources.setdefault((doctype, part, locale), {})[version] = source
+            self.__cache = {}
+
+
+
+    def reload(self):
+        """
+        Loads the templates of the directory again
+        ==========================================
+        """
+
+        with self.__lock:
+            for key, version in list(self.__files.keys()):
+                versions = self.__sources.get(key, {})
+                versions.pop(version, None)
+                if len(versions) == 0:
+                    self.__sources.pop(key, None)
+            self.__files = {}
+            if self.__directory is not None:
+                self.scan_()
+            self.__cache = {}
+            self.__reloads += 1
+
+
+
+    @property
+    def stats(self):
+        """
+        Gets the statistics of the registry
+        ===================================
+
+        Returns
+        -------
+        dict
+            Statistics with the following keys: templates, compiled,
+            compiles, hits, reloads.
+        """
+
+        return {'templates': sum(len(versions) for versions in self.__sources.values()),
+                'compiled': len(set(id(entry) for entry in self.__cache.values())),
+                'compiles': self.__compiles, 'hits': self.__hits,
+                'reloads': self.__reloads}
+
+
+
+    def check_(self):
+
+        checked = time()
+        if checked - self.__checked < TemplateRegistry.RELOAD_INTERVAL:
+            return
+        self.__checked = checked
+        changed = False
+        for path, mtime in self.__files.values():
+            try:
+                if os.stat(path).st_mtime_ns != mtime:
+                    changed = True
+                    break
+            except OSError:
+                changed = True
+                break
+        if not changed and self.__directory is not None:
+            changed = len(self.listdir_()) != len(self.__files)
+        if changed:
+            self.reload()
+
+
+
+    def listdir_(self):
+
+        result = []
+        if not os.path.isdir(self.__directory):
+            return result
+        for locale in sorted(os.listdir(self.__directory)):
+            folder = os.path.join(self.__directory, locale)
+            if not os.path.isdir(folder):
+                continue
+            for filename in sorted(os.listdir(folder)):
+                if filename.endswith(TemplateRegistry.TEMPLATE_EXTENSION):
+                    result.append((locale, filename, os.path.join(folder, filename)))
+        return result
+
+
+
+    def resolve_(self, doctype, part, locale, version):
+
+        if isinstance(doctype, type):
+            doctypes = [item.__name__ for item in doctype.__mro__ if item is not object]
+        else:
+            doctypes = [doctype]
+            if doctype != 'CBDocument':
+                doctypes.append('CBDocument')
+        locales = []
+        if locale is not None:
+            locales.append(locale)
+            if '_' in locale:
+                locales.append(locale.split('_')[0])
+        if self.__default_locale not in locales:
+            locales.append(self.__default_locale)
+        for locale_ in locales:
+            for doctype_ in doctypes:
+                versions = self.__sources.get((doctype_, part, locale_))
+                if versions is None:
+                    continue
+                if version is None:
+                    return (doctype_, part, locale_), max(versions)
+                if version in versions:
+                    return (doctype_, part, locale_), version
+        raise ValueError('TemplateRegistry.get() - no template for {} {} (locale {}, version {}).'
+                         .format(doctypes[0], part, locale, version))
+
+
+
+    def scan_(self):
+
+        for locale, filename, path in self.listdir_():
+            parts = filename[:-len(TemplateRegistry.TEMPLATE_EXTENSION)].split('.')
+            if len(parts) == 2:
+                version = 0
+            elif len(parts) == 3 and parts[2].isdigit():
+                version = int(parts[2])
+            else:
+                continue
+            with open(path, 'r', encoding='utf-8') as instream:
+                source = instream.read()
+            key = (parts[0], parts[1], locale)
+            self.__sources.setdefault(key, {})[version] = source
+            self.__files[(key, version)] = (path, os.stat(path).st_mtime_ns)
+
+
+
+class StatementRenderer(object):
+    """
+    This class renders a StatementOfAccount from a stream of transactions
+    =====================================================================
+
+    Notes
+    -----
+    1.
+        Rows are generated one by one in the order of time and written right
+        away, the opening balance, the running balance and the period totals
+        are updated on the fly. Amounts are summed in satoshis, so there is no
+        rounding drift over long periods.
+    2.
+        A TransactionStore is read for the period only, with the opening
+        balance summed on its balance column. On a TransactionContainer with
+        a time index the period is read in the order of the index. Without
+        index the ascending runs of the period are merged, which needs memory
+        for one integer per run only, see .merge_runs_().
+    """
+
+
+
+    FORMAT_CSV = 'csv'
+    FORMAT_JSONL = 'jsonl'
+    FORMAT_TEXT = 'text'
+    DEFAULT_PAGE_SIZE = 50
+    COLUMNS = ['time', 'tx', 'counterparty', 'direction', 'amount', 'fee',
+               'balance', 'confirmations']
+    TITLE = 'STATEMENT OF ACCOUNT'
+    EXTENSIONS = {FORMAT_CSV: 'csv', FORMAT_JSONL: 'jsonl', FORMAT_TEXT: 'txt'}
+
+
+
+    def __init__(self, statement, transactions, templates=None, locale=None,
+                 resolver=None):
+        """
+        Initializes the StatementRenderer object
+        ========================================
+
+        Parameters
+        ----------
+        statement : StatementOfAccount
+            The statement to render.
+        transactions : TransactionContainer, TransactionSnapshot
+            The transactions of the owner of the statement. A snapshot of a
+            container is taken at once.
+        templates : TemplateRegistry, optional (None if omitted)
+            Templates of FORMAT_TEXT. If omitted TemplateRegistry.default() is
+            used.
+        locale : str, optional (None if omitted)
+            The locale of the templates.
+        resolver : CounterpartyResolver, optional (None if omitted)
+            Resolver of the names of the counterparties. If given, rows get a
+            counterparty_name column.
+
+        Attributes
+        ----------
+        document
+        summary
+        transactions
+        """
+
+        if not isinstance(transactions, TransactionSnapshot):
+            transactions = TransactionSnapshot(transactions)
+        self.__statement = statement
+        self.__transactions = transactions
+        if templates is None:
+            self.__templates = TemplateRegistry.default()
+        else:
+            self.__templates = templates
+        self.__locale = locale
+        self.__resolver = resolver
+        self.__summary = None
+
+
+
+    @property
+    def document(self):
+        """
+        Gets the rendered document
+        ==========================
+
+        Returns
+        -------
+        CBDocument
+            The document.
+        """
+
+        return self.__statement
+
+
+
+    @classmethod
+    def format_sat(cls, sat_amount):
+        """
+        Formats a satoshi amount as BCH
+        ===============================
+
+        Parameters
+        ----------
+        sat_amount : int
+            The amount in satoshis.
+
+        Returns
+        -------
+        str
+            The amount in BCH with 8 decimals.
+        """
+
+        sign = '-' if sat_amount < 0 else ''
+        whole, fraction = divmod(abs(sat_amount), 100000000)
+        return '{}{}.{:08d}'.format(sign, whole, fraction)
+
+
+
+    def opening_balance(self):
+        """
+        Gets the balance at the beginning of the statement
+        ==================================================
+
+        Returns
+        -------
+        int
+            The sum of the balances of earlier transactions in satoshis.
+        """
+
+        start = self.__statement.from_date
+        snapshot = self.__transactions
+        transactions = snapshot.container
+        if isinstance(transactions, StoredTransactionContainer):
+            first = transactions.store.time_slice(None, start)[1]
+            result = sum(islice(transactions.store.columns()['balance'], first))
+            items = (transactions[position] for position
+                     in range(transactions.stored_count_(), len(snapshot)))
+        elif TransactionContainer.INDEX_TIME in getattr(transactions, 'indexes', []):
+            result = 0
+            items = (transactions[position] for position
+                     in snapshot.positions_(transactions.index_range_(
+                         TransactionContainer.INDEX_TIME, None, start)))
+        else:
+            result = 0
+            items = iter(snapshot)
+        for item in items:
+            if (item.transaction_time or 0) < start:
+                result += bch_2_sat(item.balance)
+        return result
+
+
+
+    def period(self):
+        """
+        Gets the period of the document
+        ===============================
+
+        Returns
+        -------
+        tuple (int, int)
+            The first and the last timestamp of the period.
+        """
+
+        return self.__statement.from_date, self.__statement.to_date
+
+
+
+    def render(self, outstream, format=None, page_size=None):
+        """
+        Renders the statement to a stream
+        =================================
+
+        Parameters
+        ----------
+        outstream : file-like
+            Text stream to write to.
+        format : str, optional (None if omitted)
+            FORMAT_CSV, FORMAT_JSONL or FORMAT_TEXT. If omitted FORMAT_CSV is
+            used.
+        page_size : int, optional (None if omitted)
+            Number of rows on a page of FORMAT_TEXT. If omitted
+            DEFAULT_PAGE_SIZE is used.
+
+        Returns
+        -------
+        dict
+            The summary of the statement, see .summary.
+
+        Throws
+        ------
+        ValueError
+            If the format is unknown.
+        """
+
+        if format is None or format == StatementRenderer.FORMAT_CSV:
+            self.render_csv_(outstream)
+        elif format == StatementRenderer.FORMAT_JSONL:
+            self.render_jsonl_(outstream)
+        elif format == StatementRenderer.FORMAT_TEXT:
+            if page_size is None:
+                page_size = StatementRenderer.DEFAULT_PAGE_SIZE
+            self.render_text_(outstream, page_size)
+        else:
+            raise ValueError('StatementRenderer.render() - unknown format "{}".'
+                             .format(format))
+        return self.__summary
+
+
+
+    def rows(self):
+        """
+        Generates the rows of the statement
+        ===================================
+
+        Returns
+        -------
+        generator of dict
+            Rows in the order of time with the keys of COLUMNS, and with
+            counterparty_name if there is a resolver. Amounts are given in
+            satoshis, direction is 'incoming', 'outgoing' or ''.
+
+        Notes
+        -----
+            The summary of the statement is available at .summary after the
+            last row is generated.
+        """
+
+        opening = self.opening_balance()
+        balance = opening
+        incoming = 0
+        outgoing = 0
+        fees = 0
+        count = 0
+        self.__summary = None
+        confirmations_of = self.__transactions.confirmations_of
+        if self.__resolver is None:
+            names = None
+        else:
+            names = self.__resolver.resolve(self.__transactions)['names']
+        for item in self.period_():
+            amount = bch_2_sat(item.balance)
+            fee = bch_2_sat(item.fee)
+            balance += amount
+            if amount > 0:
+                incoming += amount
+                direction = SearchObject.DIRECTION_INCOMING
+            elif amount < 0:
+                outgoing -= amount
+                direction = SearchObject.DIRECTION_OUTGOING
+            else:
+                direction = ''
+            fees += fee
+            count += 1
+            row = {'time': item.transaction_time, 'tx': item.tx,
+                   'counterparty': item.foreign_address, 'direction': direction,
+                   'amount': amount, 'fee': fee, 'balance': balance,
+                   'confirmations': confirmations_of(item)}
+            if names is not None:
+                row['counterparty_name'] = names.get(item.foreign_address, '')
+            yield row
+        from_date, to_date = self.period()
+        self.__summary = {'owner': self.__statement.owner,
+                          'from_date': from_date, 'to_date': to_date,
+                          'opening_balance': opening, 'closing_balance': balance,
+                          'incoming': incoming, 'outgoing': outgoing,
+                          'fees': fees, 'count': count}
+
+
+
+    @property
+    def summary(self):
+        """
+        Gets the summary of the statement
+        =================================
+
+        Returns
+        -------
+        dict
+            Summary with the following keys: owner, from_date, to_date,
+            opening_balance, closing_balance, incoming, outgoing, fees, count,
+            amounts in satoshis.
+        None
+            If the rows are not generated yet.
+        """
+
+        return self.__summary
+
+
+
+    @property
+    def transactions(self):
+        """
+        Gets the rendered transactions
+        ==============================
+
+        Returns
+        -------
+        TransactionSnapshot
+            The snapshot of the transactions of the owner.
+        """
+
+        return self.__transactions
+
+
+
+    @classmethod
+    def merge_runs_(cls, items, begin, end, accept):
+        """
+        Generates items of a sequence in the order of time
+        ==================================================
+
+        Parameters
+        ----------
+        items : sequence of CBTransaction
+            The transactions to order.
+        begin : int
+            The first position to read, inclusive.
+        end : int
+            The last position to read, exclusive.
+        accept : callable
+            Function to call with a transaction, items it returns False for
+            are skipped.
+
+        Returns
+        -------
+        generator of CBTransaction
+            The accepted transactions in the order of time. Transactions of
+            the same time keep the order of their positions.
+
+        Notes
+        -----
+            Transactions mostly arrive in the order of time or in its reverse
+            (eg. pages of an API come newest first), so the sequence falls
+            into a few ascending or descending runs. Only the boundaries and
+            directions of the runs are collected in a first pass, then the
+            runs are read lazily, descending ones backwards with transactions
+            of the same time kept in the order of their positions, and merged
+            with heapq.merge(), which is stable.
+        """
+
+        runs = []
+        first = None
+        last = None
+        descending = None
+        for position in range(begin, end):
+            item = items[position]
+            if accept(item):
+                time_ = item.transaction_time or 0
+                if first is None:
+                    first = position
+                elif descending is None:
+                    if time_ != last:
+                        descending = time_ < last
+                elif (time_ > last) if descending else (time_ < last):
+                    runs.append((first, position, descending))
+                    first = position
+                    descending = None
+                last = time_
+        if first is not None:
+            runs.append((first, end, descending))
+        return heapq.merge(*[cls.read_run_(items, first, stop, descending, accept)
+                             for first, stop, descending in runs],
+                           key=lambda item: item.transaction_time or 0)
+
+
+
+    def owner_(self):
+
+        if self.__statement.anonymous:
+            return 'anonymous'
+        return self.__statement.owner
+
+
+
+    def period_(self):
+        """
+        Generates the transactions of the period in the order of time
+        =============================================================
+
+        Returns
+        -------
+        generator of CBTransaction
+            The transactions.
+        """
+
+        start = self.__statement.from_date
+        end = self.__statement.to_date + 1
+        snapshot = self.__transactions
+        transactions = snapshot.container
+        key = TransactionContainer.INDEX_TIME
+        in_period = lambda item: start <= (item.transaction_time or 0) < end
+        if isinstance(transactions, StoredTransactionContainer):
+            appended = StatementRenderer.merge_runs_(transactions,
+                                                     transactions.stored_count_(),
+                                                     len(snapshot), in_period)
+            return heapq.merge(transactions.range_by_time(start, end), appended,
+                               key=lambda item: item.transaction_time or 0)
+        if key in getattr(transactions, 'indexes', []):
+            return (transactions[position] for position
+                    in snapshot.positions_(transactions.index_range_(key, start, end)))
+        return StatementRenderer.merge_runs_(transactions, 0, len(snapshot), in_period)
+
+
+
+    @classmethod
+    def read_run_(cls, items, first, stop, descending, accept):
+
+        if not descending:
+            yield from filter(accept, (items[position] for position in range(first, stop)))
+            return
+        group = []
+        for position in range(stop - 1, first - 1, -1):
+            item = items[position]
+            if accept(item):
+                if (len(group) > 0 and (item.transaction_time or 0)
+                        != (group[0].transaction_time or 0)):
+                    yield from reversed(group)
+                    group = []
+                group.append(item)
+        yield from reversed(group)
+
+
+
+    def render_csv_(self, outstream):
+
+        writer = csv.writer(outstream)
+        if self.__resolver is None:
+            writer.writerow(StatementRenderer.COLUMNS)
+        else:
+            writer.writerow(StatementRenderer.COLUMNS + ['counterparty_name'])
+        rows = self.rows()
+        for row in rows:
+            values = [row['time'], row['tx'], row['counterparty'] or '',
+                      row['direction'], StatementRenderer.format_sat(row['amount']),
+                      StatementRenderer.format_sat(row['fee']),
+                      StatementRenderer.format_sat(row['balance']),
+                      row['confirmations']]
+            if 'counterparty_name' in row:
+                values.append(row['counterparty_name'])
+            writer.writerow(values)
+        summary = self.__summary
+        writer.writerow([])
+        for name in ['opening_balance', 'incoming', 'outgoing', 'fees',
+                     'closing_balance']:
+            writer.writerow([name, StatementRenderer.format_sat(summary[name])])
+
+
+
+    def render_jsonl_(self, outstream):
+
+        statement = self.__statement
+        from_date, to_date = self.period()
+        outstream.write(json.dumps({'type': self.TITLE.lower().replace(' ', '_'),
+                                    'owner': self.owner_(), 'id': statement.id,
+                                    'from_date': from_date,
+                                    'to_date': to_date}) + '\n')
+        for row in self.rows():
+            row['type'] = 'row'
+            outstream.write(json.dumps(row) + '\n')
+        summary = dict(self.__summary)
+        summary['type'] = 'summary'
+        summary['owner'] = self.owner_()
+        outstream.write(json.dumps(summary) + '\n')
+
+
+
+    def render_text_(self, outstream, page_size):
+
+        header, line, page_break, footer = [self.__templates.get(self.__statement, part,
+                                                                 self.__locale)
+                                            for part in ['header', 'row', 'page_break',
+                                                         'footer']]
+        format_sat = StatementRenderer.format_sat
+        from_date, to_date = self.period()
+        slots = {'title': self.TITLE, 'owner': self.owner_(),
+                 'from_date': from_date or '', 'to_date': to_date or ''}
+        page = 1
+        on_page = 0
+        balance = None
+        for row in self.rows():
+            if balance is None:
+                balance = row['balance'] - row['amount']
+                slots['page'] = page
+                slots['balance'] = format_sat(balance)
+                outstream.write(header(slots))
+            elif on_page == page_size:
+                outstream.write(page_break({'balance': format_sat(balance)}))
+                page += 1
+                on_page = 0
+                slots['page'] = page
+                slots['balance'] = format_sat(balance)
+                outstream.write(header(slots))
+            balance = row['balance']
+            row['time'] = row['time'] or ''
+            row['counterparty'] = row.get('counterparty_name') or row['counterparty'] or ''
+            row['amount'] = format_sat(row['amount'])
+            row['fee'] = format_sat(row['fee'])
+            row['balance'] = format_sat(balance)
+            outstream.write(line(row))
+            on_page += 1
+        summary = self.__summary
+        if balance is None:
+            slots['page'] = page
+            slots['balance'] = format_sat(summary['opening_balance'])
+            outstream.write(header(slots))
+        totals = {name: format_sat(summary[name]) for name
+                  in ['opening_balance', 'incoming', 'outgoing', 'fees', 'closing_balance']}
+        totals['count'] = summary['count']
+        outstream.write(footer(totals))
+
+
+
+class ActivityRenderer(StatementRenderer):
+    """
+    This class renders an AccountActivity from a stream of transactions
+    ===================================================================
+
+    Notes
+    -----
+        The rows are the transactions matching the search of the document in
+        the order of time. The balance column is the running sum of the
+        matching transactions, the opening balance is 0.
+    """
+
+
+
+    TITLE = 'ACCOUNT ACTIVITY'
+
+
+
+    def __init__(self, activity, transactions, addressbook=None, templates=None,
+                 locale=None, resolver=None):
+        """
+        Initializes the ActivityRenderer object
+        =======================================
+
+        Parameters
+        ----------
+        activity : AccountActivity
+            The document to render.
+        transactions : TransactionContainer, TransactionSnapshot
+            The transactions of the owner of the document. A snapshot of a
+            container is taken at once.
+        addressbook : WalletContainer, optional (None if omitted)
+            The addressbook of the owner, needed by addressbook filters only.
+        templates : TemplateRegistry, optional (None if omitted)
+            Templates of FORMAT_TEXT. If omitted TemplateRegistry.default() is
+            used.
+        locale : str, optional (None if omitted)
+            The locale of the templates.
+        resolver : CounterpartyResolver, optional (None if omitted)
+            Resolver of the names of the counterparties.
+        """
+
+        super(ActivityRenderer, self).__init__(activity, transactions, templates, locale,
+                                               resolver)
+        self.__addressbook = addressbook
+
+
+
+    def opening_balance(self):
+        """
+        Gets the balance at the beginning of the activity
+        =================================================
+
+        Returns
+        -------
+        int
+            Always 0.
+        """
+
+        return 0
+
+
+
+    def period(self):
+        """
+        Gets the period of the document
+        ===============================
+
+        Returns
+        -------
+        tuple (int, int)
+            The date range of the search, any of them can be None.
+        """
+
+        if self.document.search is None:
+            return None, None
+        return self.document.search.date_range_()
+
+
+
+    def period_(self):
+
+        search = self.document.search
+        if search is None:
+            snapshot = self.transactions
+            return StatementRenderer.merge_runs_(snapshot.container, 0, len(snapshot),
+                                                 lambda item: True)
+        items = search.apply_filter(self.transactions, self.__addressbook)
+        return StatementRenderer.merge_runs_(items, 0, len(items), lambda item: True)
+
+
+
+class DocumentBatch(object):
+    """
+    This class generates documents of many owners on a pool of processes
+    ====================================================================
+
+    Notes
+    -----
+    1.
+        Documents are grouped by owner, the wallet of every owner is loaded
+        once and is shipped to a worker process as a WalletFile snapshot
+        without raw transaction records together with the records of the
+        documents of the owner. Workers restore the wallet and render the
+        documents.
+    2.
+        Only a limited number of snapshots are in flight at once, so the
+        memory of the parent process doesn't grow with the size of the batch.
+    3.
+        Failures are reported per document, a failing document or owner
+        doesn't stop the batch.
+    """
+
+
+
+    DEFAULT_WORKERS = 4
+
+
+
+    def __init__(self, loader, max_workers=None, format=None, page_size=None,
+                 output_dir=None):
+        """
+        Initializes the DocumentBatch object
+        ====================================
+
+        Parameters
+        ----------
+        loader : callable
+            Function to call with an owner address to get its UserWallet,
+            eg. the .load() method of a WalletRepository or WalletCache.get().
+        max_workers : int, optional (None if omitted)
+            Number of worker processes. If omitted DEFAULT_WORKERS is used.
+        format : str, optional (None if omitted)
+            One of the formats of StatementRenderer. If omitted
+            StatementRenderer.FORMAT_CSV is used.
+        page_size : int, optional (None if omitted)
+            Number of rows on a page of StatementRenderer.FORMAT_TEXT.
+        output_dir : str, optional (None if omitted)
+            Directory to write the documents to. If omitted the rendered
+            documents are returned as strings.
+
+        Attributes
+        ----------
+        stats
+        """
+
+        self.__loader = loader
+        if max_workers is None:
+            self.__max_workers = DocumentBatch.DEFAULT_WORKERS
+        else:
+            self.__max_workers = max_workers
+        if format is None:
+            self.__format = StatementRenderer.FORMAT_CSV
+        else:
+            self.__format = format
+        self.__page_size = page_size
+        self.__output_dir = output_dir
+        self.__jobs = []
+        self.__stats = None
+
+
+
+    def __len__(self):
+
+        return len(self.__jobs)
+
+
+
+    def add(self, document):
+        """
+        Adds a document to the batch
+        ============================
+
+        Parameters
+        ----------
+        document : StatementOfAccount, AccountActivity
+            The document to generate.
+
+        Throws
+        ------
+        TypeError
+            If the document can't be rendered.
+        """
+
+        if isinstance(document, (StatementOfAccount, AccountActivity)):
+            self.__jobs.append(document)
+        else:
+            raise TypeError('Tried to add a non-renderable document to a DocumentBatch.')
+
+
+
+    def run(self):
+        """
+        Generates the documents of the batch
+        ====================================
+
+        Returns
+        -------
+        list of dict
+            Results in the order of the documents with the following keys:
+                index : int, position of the document in the batch
+                id : the id of the document
+                owner : str, the owner of the document
+                ok : bool, whether the document is generated or not
+                error : str or None, the error message
+                output : str or None, the rendered document or the path of
+                    its file if there is an output directory
+                summary : dict or None, the summary of the renderer
+        """
+
+        start = time()
+        groups = OrderedDict()
+        for index, document in enumerate(self.__jobs):
+            groups.setdefault(document.owner, []).append(index)
+        results = [None] * len(self.__jobs)
+        window = self.__max_workers * 2
+        with ProcessPoolExecutor(max_workers=self.__max_workers) as executor:
+            futures = {}
+            for owner, indices in groups.items():
+                if len(futures) >= window:
+                    finished, waiting = wait(list(futures.keys()),
+                                             return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        self.collect_(future, futures.pop(future), results)
+                try:
+                    wallet = self.__loader(owner)
+                    if wallet is None:
+                        raise ValueError('unknown owner')
+                    snapshot = WalletFile.dumps(wallet, include_raw=False)
+                except Exception as exception:
+                    for index in indices:
+                        results[index] = self.failure_(index, 'loading failed: {}'
+                                                       .format(exception))
+                    continue
+                payload = (snapshot,
+                           [(index, self.__jobs[index].to_dict_()) for index in indices],
+                           self.__format, self.__page_size, self.__output_dir)
+                futures[executor.submit(DocumentBatch.render_group_, payload)] = indices
+            for future in as_completed(list(futures.keys())):
+                self.collect_(future, futures[future], results)
+        seconds = time() - start
+        failures = sum(1 for result in results if not result['ok'])
+        self.__stats = {'documents': len(results), 'owners': len(groups),
+                        'failures': failures, 'seconds': seconds,
+                        'documents_per_second': len(results) / seconds if seconds > 0 else 0.0}
+        return results
+
+
+
+    @property
+    def stats(self):
+        """
+        Gets the statistics of the last run
+        ===================================
+
+        Returns
+        -------
+        dict
+            Statistics with the following keys: documents, owners, failures,
+            seconds, documents_per_second.
+        None
+            If the batch hasn't run yet.
+        """
+
+        return self.__stats
+
+
+
+    def collect_(self, future, indices, results):
+
+        try:
+            for result in future.result():
+                results[result['index']] = result
+        except Exception as exception:
+            for index in indices:
+                results[index] = self.failure_(index, 'worker failed: {}'
+                                               .format(exception))
+
+
+
+    def failure_(self, index, message):
+
+        document = self.__jobs[index]
+        return {'index': index, 'id': document.id, 'owner': document.owner,
+                'ok': False, 'error': message, 'output': None, 'summary': None}
+
+
+
+    @classmethod
+    def render_group_(cls, payload):
+        """
+        Renders the documents of an owner
+        =================================
+
+        Parameters
+        ----------
+        payload : tuple
+            Snapshot of the wallet, list of (index, document record) pairs,
+            format, page size and output directory.
+
+        Returns
+        -------
+        list of dict
+            Results of the documents, see .run().
+
+        Notes
+        -----
+            This function runs in the worker processes.
+        """
+
+        snapshot, records, format, page_size, output_dir = payload
+        wallet = UserWallet.from_dict_(WalletFile.loads(snapshot))
+        results = []
+        for index, record in records:
+            result = {'index': index, 'id': record.get('id'),
+                      'owner': record.get('owner'), 'ok': False, 'error': None,
+                      'output': None, 'summary': None}
+            try:
+                document = CBDocument.from_dict_(record)
+                if isinstance(document, AccountActivity):
+                    render = lambda outstream: document.render(wallet.transactions,
+                                                               outstream, format,
+                                                               page_size,
+                                                               wallet.addressbook)
+                else:
+                    render = lambda outstream: document.render(wallet.transactions,
+                                                               outstream, format,
+                                                               page_size)
+                if output_dir is None:
+                    outstream = io.StringIO()
+                    result['summary'] = render(outstream)
+                    result['output'] = outstream.getvalue()
+                else:
+                    path = os.path.join(output_dir, '{:06d}_{}.{}'.format(
+                        index, record['type'],
+                        StatementRenderer.EXTENSIONS.get(format, 'txt')))
+                    with open(path, 'w', newline='') as outstream:
+                        result['summary'] = render(outstream)
+                    result['output'] = path
+                result['ok'] = True
+            except Exception as exception:
+                result['error'] = str(exception)
+            results.append(result)
+        return results
+
+
+
+class MerkleTree(object):
+    """
+    This class represents a Merkle tree of SHA-256 hashes
+    =====================================================
+
+    Notes
+    -----
+    1.
+        Leaves and inner nodes are hashed with different prefixes (0x00 and
+        0x01), so a leaf can't be presented as an inner node.
+    2.
+        The unpaired last node of a level is carried up to the next level
+        unchanged, so an inclusion proof contains the siblings only, at most
+        one hash per level. The directions are given by the index of the leaf
+        and the size of the tree.
+    """
+
+
+
+    LEAF_PREFIX = b'\x00'
+    NODE_PREFIX = b'\x01'
+
+
+
+    def __init__(self, leaves):
+        """
+        Initializes the MerkleTree object
+        =================================
+
+        Parameters
+        ----------
+        leaves : list of bytes
+            Leaf hashes, see .leaf_hash().
+
+        Attributes
+        ----------
+        root
+        size
+
+        Throws
+        ------
+        ValueError
+            If there are no leaves.
+        """
+
+        if len(leaves) == 0:
+            raise ValueError('MerkleTree.__init__() - tree must have at least one leaf.')
+        levels = [list(leaves)]
+        sha256 = hashlib.sha256
+        prefix = MerkleTree.NODE_PREFIX
+        while len(levels[-1]) > 1:
+            level = levels[-1]
+            upper = [sha256(prefix + level[i] + level[i + 1]).digest()
+                     for i in range(0, len(level) - 1, 2)]
+            if len(level) % 2 == 1:
+                upper.append(level[-1])
+            levels.append(upper)
+        self.__levels = levels
+
+
+
+    def __len__(self):
+
+        return len(self.__levels[0])
+
+
+
+    @classmethod
+    def leaf_hash(cls, data):
+        """
+        Gets the hash of a leaf
+        =======================
+
+        Parameters
+        ----------
+        data : bytes
+            Data of the leaf.
+
+        Returns
+        -------
+        bytes
+            The hash of the leaf.
+        """
+
+        return hashlib.sha256(MerkleTree.LEAF_PREFIX + data).digest()
+
+
+
+    @classmethod
+    def node_hash(cls, left, right):
+        """
+        Gets the hash of an inner node
+        ==============================
+
+        Parameters
+        ----------
+        left : bytes
+            Hash of the left child.
+        right : bytes
+            Hash of the right child.
+
+        Returns
+        -------
+        bytes
+            The hash of the node.
+        """
+
+        return hashlib.sha256(MerkleTree.NODE_PREFIX + left + right).digest()
+
+
+
+    def proof(self, index):
+        """
+        Gets the inclusion proof of a leaf
+        ==================================
+
+        Parameters
+        ----------
+        index : int
+            Position of the leaf.
+
+        Returns
+        -------
+        list of bytes
+            Hashes of the siblings from the bottom to the top.
+
+        Throws
+        ------
+        IndexError
+            If the index is out of range.
+        """
+
+        if not 0 <= index < len(self.__levels[0]):
+            raise IndexError('MerkleTree.proof() - leaf index out of range.')
+        result = []
+        for level in self.__levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(level):
+                result.append(level[sibling])
+            index //= 2
+        return result
+
+
+
+    @property
+    def root(self):
+        """
+        Gets the root of the tree
+        =========================
+
+        Returns
+        -------
+        bytes
+            The root hash.
+        """
+
+        return self.__levels[-1][0]
+
+
+
+    @property
+    def size(self):
+        """
+        Gets the number of leaves
+        =========================
+
+        Returns
+        -------
+        int
+            The number of leaves.
+        """
+
+        return len(self.__levels[0])
+
+
+
+    @classmethod
+    def root_from_proof(cls, leaf, index, size, path):
+        """
+        Computes the root from an inclusion proof
+        =========================================
+
+        Parameters
+        ----------
+        leaf : bytes
+            Hash of the leaf.
+        index : int
+            Position of the leaf.
+        size : int
+            Number of leaves of the tree.
+        path : list of bytes
+            The proof, see .proof().
+
+        Returns
+        -------
+        bytes
+            The root hash.
+        None
+            If the proof doesn't fit the index and the size.
+        """
+
+        if not 0 <= index < size:
+            return None
+        result = leaf
+        position = 0
+        while size > 1:
+            if index % 2 == 1:
+                if position == len(path):
+                    return None
+                result = MerkleTree.node_hash(path[position], result)
+                position += 1
+            elif index + 1 < size:
+                if position == len(path):
+                    return None
+                result = MerkleTree.node_hash(result, path[position])
+                position += 1
+            index //= 2
+            size = (size + 1) // 2
+        if position != len(path):
+            return None
+        return result
+
+
+
+class CertificationBatch(object):
+    """
+    This class certifies many documents under one Merkle root
+    =========================================================
+
+    Notes
+    -----
+    1.
+        The content of a rendered document is hashed in a canonical form:
+        text is normalized to NFC with '\\n' line endings and encoded as UTF-8,
+        bytes are hashed as they are. The leaf of a document is the hash of
+        the canonical JSON of its type, id, owner, creation time and content
+        hash, so a proof can't be moved to another document.
+    2.
+        The anchor function is called once per batch with the root, so the
+        cost of the certification is shared by all documents of the batch.
+    3.
+        Every document gets a certificate with its own inclusion proof, it
+        can be verified with the content and the root only.
+    """
+
+
+
+    ALGORITHM = 'sha256'
+    CERTIFICATE_VERSION = 1
+
+
+
+    def __init__(self, anchor=None, registry=None):
+        """
+        Initializes the CertificationBatch object
+        =========================================
+
+        Parameters
+        ----------
+        anchor : callable, optional (None if omitted)
+            Function to call with the hexadecimal root, it publishes the root,
+            eg. in a blockchain transaction, and returns a reference to it.
+        registry : CertificationRegistry, optional (None if omitted)
+            Registry to add the root of the batch to.
+
+        Attributes
+        ----------
+        anchor_reference
+        root
+        """
+
+        self.__anchor = anchor
+        self.__registry = registry
+        self.__documents = []
+        self.__contents = []
+        self.__root = None
+        self.__anchor_reference = None
+
+
+
+    def __len__(self):
+
+        return len(self.__documents)
+
+
+
+    def add(self, document, content):
+        """
+        Adds a document to the batch
+        ============================
+
+        Parameters
+        ----------
+        document : CBDocument
+            The document to certify.
+        content : str, bytes
+            The rendered document.
+
+        Returns
+        -------
+        int
+            Position of the document in the batch.
+
+        Throws
+        ------
+        RuntimeError
+            If the batch is already certified.
+        ValueError
+            If the document is already certified.
+        """
+
+        if self.__root is not None:
+            raise RuntimeError('CertificationBatch.add() - batch is already certified.')
+        if document.certified:
+            raise ValueError('CertificationBatch.add() - document is already certified.')
+        self.__documents.append(document)
+        self.__contents.append(CertificationBatch.content_hash(content))
+        return len(self.__documents) - 1
+
+
+
+    @property
+    def anchor_reference(self):
+        """
+        Gets the reference returned by the anchor function
+        ==================================================
+
+        Returns
+        -------
+        any
+            The reference.
+        None
+            If the batch is not certified or there is no anchor function.
+        """
+
+        return self.__anchor_reference
+
+
+
+    def certify(self):
+        """
+        Certifies the documents of the batch
+        ====================================
+
+        Returns
+        -------
+        list of dict
+            Certificates in the order of the documents, None for documents
+            that didn't allow certification. A certificate has the following
+            keys: version, algorithm, content, root, index, size, path,
+            anchor, certified_at, hashes are hexadecimal strings.
+
+        Throws
+        ------
+        RuntimeError
+            If the batch is empty or already certified.
+        """
+
+        if self.__root is not None:
+            raise RuntimeError('CertificationBatch.certify() - batch is already certified.')
+        if len(self.__documents) == 0:
+            raise RuntimeError('CertificationBatch.certify() - batch is empty.')
+        leaves = [MerkleTree.leaf_hash(CertificationBatch.leaf_data_(document, content))
+                  for document, content in zip(self.__documents, self.__contents)]
+        tree = MerkleTree(leaves)
+        root = tree.root.hex()
+        if self.__anchor is not None:
+            self.__anchor_reference = self.__anchor(root)
+        if self.__registry is not None:
+            self.__registry.add(root, self.__anchor_reference)
+        self.__root = root
+        certified_at = now()
+        result = []
+        for index, document in enumerate(self.__documents):
+            certificate = {'version': CertificationBatch.CERTIFICATE_VERSION,
+                           'algorithm': CertificationBatch.ALGORITHM,
+                           'content': self.__contents[index], 'root': root,
+                           'index': index, 'size': tree.size,
+                           'path': [item.hex() for item in tree.proof(index)],
+                           'anchor': self.__anchor_reference,
+                           'certified_at': certified_at}
+            document.certificate = certificate
+            document.certified = True
+            if document.certified and document.certificate is certificate:
+                result.append(certificate)
+            else:
+                result.append(None)
+        return result
+
+
+
+    @classmethod
+    def content_hash(cls, content):
+        """
+        Gets the canonical hash of a rendered document
+        ==============================================
+
+        Parameters
+        ----------
+        content : str, bytes
+            The rendered document.
+
+        Returns
+        -------
+        str
+            Hexadecimal SHA-256 hash of the canonical content.
+
+        Throws
+        ------
+        TypeError
+            If content is neither string nor bytes.
+        """
+
+        if isinstance(content, str):
+            content = unicodedata.normalize('NFC', content.replace('\r\n', '\n')
+                                            .replace('\r', '\n')).encode('utf-8')
+        elif not isinstance(content, (bytes, bytearray)):
+            raise TypeError('CertificationBatch.content_hash() - content must be str or bytes.')
+        return hashlib.sha256(content).hexdigest()
+
+
+
+    @property
+    def root(self):
+        """
+        Gets the root of the batch
+        ==========================
+
+        Returns
+        -------
+        str
+            Hexadecimal root hash.
+        None
+            If the batch is not certified yet.
+        """
+
+        return self.__root
+
+
+
+    @classmethod
+    def verify(cls, document, content=None):
+        """
+        Verifies the certificate of a document
+        ======================================
+
+        Parameters
+        ----------
+        document : CBDocument
+            The certified document.
+        content : str, bytes, optional (None if omitted)
+            The rendered document. If omitted the content hash of the
+            certificate is trusted.
+
+        Returns
+        -------
+        bool
+            True if the content and the certificate of the document lead to
+            the root of the certificate, False if not.
+
+        Notes
+        -----
+            This method checks the inclusion proof only, whether the root is
+            trusted has to be checked separately.
+        """
+
+        certificate = document.certificate
+        if not isinstance(certificate, dict) or not document.certified:
+            return False
+        if certificate.get('algorithm') != CertificationBatch.ALGORITHM:
+            return False
+        if content is None:
+            content_hash = certificate.get('content')
+        else:
+            content_hash = CertificationBatch.content_hash(content)
+            if content_hash != certificate.get('content'):
+                return False
+        try:
+            leaf = MerkleTree.leaf_hash(CertificationBatch.leaf_data_(document,
+                                                                      content_hash))
+            root = MerkleTree.root_from_proof(leaf, certificate['index'],
+                                              certificate['size'],
+                                              [bytes.fromhex(item) for item
+                                               in certificate['path']])
+        except (KeyError, TypeError, ValueError):
+            return False
+        return root is not None and root.hex() == certificate['root']
+
+
+
+    @classmethod
+    def leaf_data_(cls, document, content_hash):
+
+        data = {'type': document.__class__.__name__, 'id': document.id,
+                'owner': document.owner, 'created': document.created,
+                'content': content_hash}
+        if document.binding is not None:
+            data['binding'] = document.binding
+        return json.dumps(data, sort_keys=True, separators=(',', ':'),
+                          ensure_ascii=False).encode('utf-8')
+
+
+
+class CertificationRegistry(object):
+    """
+    This class stores the trusted certification roots in an SQLite database
+    =======================================================================
+
+    Notes
+    -----
+        Roots are kept in memory too, keyed by root, so a lookup doesn't touch
+        the database. The database is indexed by anchor as well.
+    """
+
+
+
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS roots (
+               root TEXT PRIMARY KEY, anchor TEXT, block_height INTEGER,
+               time INTEGER, registered INTEGER)""",
+        """CREATE INDEX IF NOT EXISTS roots_anchor ON roots (anchor)"""]
+    UPSERT_ROOT = """INSERT OR REPLACE INTO roots VALUES (?, ?, ?, ?, ?)"""
+
+
+
+    def __init__(self, path=':memory:'):
+        """
+        Opens a CertificationRegistry
+        =============================
+
+        Parameters
+        ----------
+        path : str, optional (':memory:' if omitted)
+            Path of the database file. The database is created if it doesn't
+            exist.
+        """
+
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        self.__lock = threading.Lock()
+        with self.__connection:
+            for statement in CertificationRegistry.SCHEMA:
+                self.__connection.execute(statement)
+        self.__roots = {}
+        for row in self.__connection.execute('SELECT * FROM roots'):
+            self.__roots[row[0]] = self.record_(row)
+
+
+
+    def __contains__(self, root):
+
+        return root in self.__roots
+
+
+
+    def __len__(self):
+
+        return len(self.__roots)
+
+
+
+    def add(self, root, anchor=None, block_height=None, timestamp=None):
+        """
+        Adds a trusted root
+        ===================
+
+        Parameters
+        ----------
+        root : str
+            Hexadecimal root hash.
+        anchor : str, optional (None if omitted)
+            Reference of the publication of the root, eg. a txid.
+        block_height : int, optional (None if omitted)
+            Height of the block of the anchoring transaction.
+        timestamp : int, optional (None if omitted)
+            Time of the anchoring transaction.
+        """
+
+        row = (root, anchor, block_height, timestamp, now())
+        with self.__lock:
+            with self.__connection:
+                self.__connection.execute(CertificationRegistry.UPSERT_ROOT, row)
+            self.__roots[root] = self.record_(row)
+
+
+
+    def close(self):
+        """
+        Closes the registry
+        ===================
+        """
+
+        self.__connection.close()
+
+
+
+    def find_anchor(self, anchor):
+        """
+        Gets the roots of an anchor
+        ===========================
+
+        Parameters
+        ----------
+        anchor : str
+            Reference of the publication, eg. a txid.
+
+        Returns
+        -------
+        list of dict
+            Records of the roots, see .get().
+        """
+
+        with self.__lock:
+            rows = self.__connection.execute('SELECT * FROM roots WHERE anchor = ?',
+                                             (anchor,)).fetchall()
+        return [self.record_(row) for row in rows]
+
+
+
+    def get(self, root):
+        """
+        Gets the record of a root
+        =========================
+
+        Parameters
+        ----------
+        root : str
+            Hexadecimal root hash.
+
+        Returns
+        -------
+        dict
+            Record with the following keys: root, anchor, block_height, time,
+            registered.
+        None
+            If the root is not trusted.
+        """
+
+        return self.__roots.get(root)
+
+
+
+    @classmethod
+    def record_(cls, row):
+
+        return {'root': row[0], 'anchor': row[1], 'block_height': row[2],
+                'time': row[3], 'registered': row[4]}
+
+
+
+class CertificationVerifier(object):
+    """
+    This class verifies certified documents locally
+    ===============================================
+
+    Notes
+    -----
+    1.
+        The content hash and the inclusion proof of the certificate are
+        checked locally, then the root is looked up in a CertificationRegistry.
+    2.
+        If the root is not in the registry, the anchoring transaction is
+        fetched with BitcoinAPI.get_transaction() and the root is searched in
+        its outputs. A found root is added to the registry, so the chain is
+        queried once per root. Anchors without the root are remembered by
+        anchor and root for NEGATIVE_TTL seconds, failed queries are not
+        remembered.
+    3.
+        The chain is queried outside of the lock of the verifier, concurrent
+        verifications of the same anchor and root wait for a single query.
+    """
+
+
+
+    NEGATIVE_TTL = 600
+
+
+
+    def __init__(self, registry=None, api=None, loader=None):
+        """
+        Initializes the CertificationVerifier object
+        ============================================
+
+        Parameters
+        ----------
+        registry : CertificationRegistry, optional (None if omitted)
+            Registry of trusted roots. If omitted an in-memory registry is
+            used.
+        api : BitcoinAPI, optional (None if omitted)
+            API to fetch anchoring transactions. If omitted unknown roots are
+            not trusted.
+        loader : callable, optional (None if omitted)
+            Function to call with a document id to get the document, needed
+            to verify documents by id only.
+
+        Attributes
+        ----------
+        registry
+        stats
+        """
+
+        if registry is None:
+            self.__registry = CertificationRegistry()
+        else:
+            self.__registry = registry
+        self.__api = api
+        self.__loader = loader
+        self.__rejected = {}
+        self.__fetching = {}
+        self.__lock = threading.Lock()
+        self.__stats = Counter()
+
+
+
+    @property
+    def registry(self):
+        """
+        Gets the registry of trusted roots
+        ==================================
+
+        Returns
+        -------
+        CertificationRegistry
+            The registry.
+        """
+
+        return self.__registry
+
+
+
+    @property
+    def stats(self):
+        """
+        Gets the statistics of the verifier
+        ===================================
+
+        Returns
+        -------
+        dict
+            Statistics with the following keys: verifications, valid,
+            registry_hits, chain_queries, chain_hits.
+        """
+
+        return {name: self.__stats[name] for name in ['verifications', 'valid',
+                                                      'registry_hits',
+                                                      'chain_queries', 'chain_hits']}
+
+
+
+    def verify(self, document, content=None):
+        """
+        Verifies a certified document
+        =============================
+
+        Parameters
+        ----------
+        document : CBDocument, any
+            The document or its id.
+        content : str, bytes, optional (None if omitted)
+            The rendered document. If omitted the content hash of the
+            certificate is trusted.
+
+        Returns
+        -------
+        dict
+            Result with the following keys:
+                valid : bool, whether the document is verified or not
+                reason : str or None, why the document is not verified
+                root : str or None, the root of the certificate
+                anchor : any, the anchor of the root
+                source : str or None, 'registry' or 'chain'
+
+        Throws
+        ------
+        ValueError
+            If an id is given without loader.
+        """
+
+        self.__stats['verifications'] += 1
+        if not isinstance(document, CBDocument):
+            if self.__loader is None:
+                raise ValueError('CertificationVerifier.verify() - no loader to load documents by id.')
+            document = self.__loader(document)
+            if document is None:
+                return self.result_(False, 'unknown document')
+        certificate = document.certificate
+        if not document.certified or not isinstance(certificate, dict):
+            return self.result_(False, 'not certified')
+        root = certificate.get('root')
+        if content is not None:
+            if CertificationBatch.content_hash(content) != certificate.get('content'):
+                return self.result_(False, 'content mismatch', root)
+        if not CertificationBatch.verify(document):
+            return self.result_(False, 'invalid proof', root)
+        anchor = certificate.get('anchor')
+        record = self.__registry.get(root)
+        if record is not None:
+            self.__stats['registry_hits'] += 1
+            if anchor is not None and record['anchor'] is not None and anchor != record['anchor']:
+                return self.result_(False, 'anchor mismatch', root, anchor)
+            self.__stats['valid'] += 1
+            return self.result_(True, None, root, record['anchor'], 'registry')
+        if self.__api is None or anchor is None:
+            return self.result_(False, 'unknown root', root, anchor)
+        return self.fetch_anchor_(root, anchor)
+
+
+
+    def cached_result_(self, root, anchor):
+
+        record = self.__registry.get(root)
+        if record is not None:
+            self.__stats['registry_hits'] += 1
+            self.__stats['valid'] += 1
+            return self.result_(True, None, root, record['anchor'], 'registry')
+        rejected = self.__rejected.get((anchor, root))
+        if rejected is not None and time() - rejected < CertificationVerifier.NEGATIVE_TTL:
+            return self.result_(False, 'unknown root', root, anchor)
+        return None
+
+
+
+    def fetch_anchor_(self, root, anchor):
+
+        key = (anchor, root)
+        with self.__lock:
+            result = self.cached_result_(root, anchor)
+            if result is not None:
+                return result
+            event = self.__fetching.get(key)
+            is_fetcher = event is None
+            if is_fetcher:
+                event = threading.Event()
+                self.__fetching[key] = event
+                self.__stats['chain_queries'] += 1
+        if not is_fetcher:
+            event.wait()
+            with self.__lock:
+                result = self.cached_result_(root, anchor)
+            if result is not None:
+                return result
+            return self.result_(False, 'anchor unavailable', root, anchor)
+        try:
+            try:
+                transaction = self.__api.get_transaction(anchor)
+            except Exception:
+                transaction = None
+            if transaction is None:
+                return self.result_(False, 'anchor unavailable', root, anchor)
+            if not CertificationVerifier.contains_root_(transaction, root):
+                with self.__lock:
+                    self.__rejected[key] = time()
+                return self.result_(False, 'unknown root', root, anchor)
+            self.__registry.add(root, anchor, transaction.get('blockheight'),
+                                transaction.get('time'))
+        finally:
+            with self.__lock:
+                del self.__fetching[key]
+            event.set()
+        self.__stats['chain_hits'] += 1
+        self.__stats['valid'] += 1
+        return self.result_(True, None, root, anchor, 'chain')
+
+
+
+    @classmethod
+    def contains_root_(cls, transaction, root):
+
+        for output in transaction.get('vout', []):
+            script = output.get('scriptPubKey') or {}
+            if root in (script.get('hex') or '') or root in (script.get('asm') or ''):
+                return True
+        return False
+
+
+
+    @classmethod
+    def result_(cls, valid, reason, root=None, anchor=None, source=None):
+
+        return {'valid': valid, 'reason': reason, 'root': root, 'anchor': anchor,
+                'source': source}
+
+
+
+class DocumentContainer(CBContainer):
+    """
+    Provides a container for the documents of the user
+    """
+
+
+
+    def __init__(self, documents=None):
+        """
+        Intializes the DocumentContainer object
+        =======================================
+
+        Parameters
+        ----------
+        documents : list
+            List of documents to add to the container right at instantiation.
+
+        Notes
+        -----
+            DocumentContainer is a subclass of list, please keep this in mind
+            if you are using an instance of this class.
+        """
+
+        super(self.__class__, self).__init__()
+        if documents is not None:
+            for document in documents:
+                self.append(document)
+
+
+
+    def append(self, item):
+        """
+        Appends a new item to the DocumentContainer
+        ===========================================
+
+        Parameters
+        ----------
+        item : CBDocument
+            Item to add to the container.
+
+        Throws
+        ------
+        TypeError
+            If the type of the item is not CBDocument.
+        """
+
+        if isinstance(item, CBDocument):
+            super(self.__class__, self).append(item)
+            item.add_container_(self)
+            self.notify_(CBContainer.CONTAINER_APPEND, item)
+        else:
+            raise TypeError('Tried to add a non-CBDocument instance to a DocumentContainer.')
+
+
+
+    def replace_(self, position, item):
+        """
+        Replaces a document of the container
+        ====================================
+
+        Parameters
+        ----------
+        position : int
+            Position of the document to replace.
+        item : CBDocument
+            The new document.
+
+        Throws
+        ------
+        TypeError
+            If the type of the item is not CBDocument.
+
+        Notes
+        -----
+            This function restores the state of a document, eg. when a journal
+            is replayed. Listeners get CONTAINER_UPDATE with the new document.
+        """
+
+        if not isinstance(item, CBDocument):
+            raise TypeError('Tried to add a non-CBDocument instance to a DocumentContainer.')
+        if self[position] is not item:
+            self[position].remove_container_(self)
+        self[position] = item
+        item.add_container_(self)
+        self.notify_(CBContainer.CONTAINER_UPDATE, item)
+
+
+
+class DocumentRegistry(object):
+    """
+    This class indexes documents by id, owner and state
+    ===================================================
+
+    Notes
+    -----
+    1.
+        Documents are indexed by id, by owner and by the state flags in
+        INDEXED_STATES, so finding the documents of an owner with or without
+        some flags is a set intersection starting from the smallest set.
+    2.
+        Documents which expire are kept in a heap ordered by their expiry.
+        DOCUMENT_EXPIRED is set in the index when the document becomes
+        expired, ie. when the expiry is earlier than now(). The flag is set
+        in the stored state of the document too, so the registry is the
+        shared clock tick of CBDocument.state. Only the due documents are
+        touched, the cost of checking the expiry doesn't depend on the number
+        of documents.
+    3.
+        Registered documents notify the registry about their changes through
+        their setters. Documents appended to an attached DocumentContainer
+        are added automatically.
+    """
+
+
+
+    INDEXED_STATES = [CBDocument.DOCUMENT_CLOSED, CBDocument.DOCUMENT_EXPIRES,
+                      CBDocument.DOCUMENT_IS_ANONYMOUS,
+                      CBDocument.DOCUMENT_IS_CERTIFIED, CBDocument.DOCUMENT_EXPIRED]
+    INDEXED_MASK = sum(INDEXED_STATES)
+    MAX_DELAY = 1.0
+
+
+
+    def __init__(self, listener=None):
+        """
+        Initializes the DocumentRegistry object
+        =======================================
+
+        Parameters
+        ----------
+        listener : callable, optional (None if omitted)
+            Function to call with a document when it gets expired. It is
+            called once for every registered document getting expired,
+            either by the tick of the registry or by the document itself.
+        """
+
+        self.__listener = listener
+        self.__lock = threading.RLock()
+        self.__wake = threading.Event()
+        self.__documents = {}
+        self.__states = {}
+        self.__owners = {}
+        self.__indexes = {state: set() for state in DocumentRegistry.INDEXED_STATES}
+        self.__heap = []
+        self.__scheduled = {}
+        self.__sequence = 0
+        self.__containers = []
+
+
+
+    def __contains__(self, id):
+
+        return id in self.__documents
+
+
+
+    def __len__(self):
+
+        return len(self.__documents)
+
+
+
+    def add(self, document):
+        """
+        Adds a document to the registry
+        ===============================
+
+        Parameters
+        ----------
+        document : CBDocument
+            The document to add.
+
+        Throws
+        ------
+        TypeError
+            If the document is not a CBDocument.
+        ValueError
+            If the document has no id or another document has the same id.
+        """
+
+        if not isinstance(document, CBDocument):
+            raise TypeError('Tried to add a non-CBDocument instance to a DocumentRegistry.')
+        if document.id is None:
+            raise ValueError('DocumentRegistry.add() - document must have an id.')
+        with self.__lock:
+            registered = self.__documents.get(document.id)
+            if registered is not None and registered is not document:
+                raise ValueError('DocumentRegistry.add() - id {} is already registered.'
+                                 .format(document.id))
+            self.index_(document)
+
+
+
+    def attach(self, container):
+        """
+        Adds the documents of a container and the documents appended later
+        ==================================================================
+
+        Parameters
+        ----------
+        container : DocumentContainer
+            The container to attach.
+
+        Notes
+        -----
+            A document replaced in the container, eg. by a journal replay,
+            replaces the registered document of the same id.
+        """
+
+        def on_documents(container_, event, item):
+            if item.id is None:
+                return
+            if event == CBContainer.CONTAINER_APPEND:
+                self.add(item)
+            elif event == CBContainer.CONTAINER_UPDATE:
+                self.replace_(item)
+        with self.__lock:
+            for document in container:
+                if document.id is not None:
+                    self.add(document)
+            container.add_listener(on_documents)
+            self.__containers.append((container, on_documents))
+
+
+
+    def detach(self, container):
+        """
+        Stops adding the documents appended to a container
+        ==================================================
+
+        Parameters
+        ----------
+        container : DocumentContainer
+            The container to detach.
+        """
+
+        with self.__lock:
+            for position, (container_, listener) in enumerate(self.__containers):
+                if container_ is container:
+                    container.remove_listener(listener)
+                    del self.__containers[position]
+                    break
+
+
+
+    def expire_due(self, now_=None):
+        """
+        Sets DOCUMENT_EXPIRED of the due documents
+        ==========================================
+
+        Parameters
+        ----------
+        now_ : int, optional (None if omitted)
+            The current timestamp. If omitted now() is used.
+
+        Returns
+        -------
+        list of CBDocument
+            The documents got expired.
+        """
+
+        if now_ is None:
+            now_ = now()
+        due = []
+        with self.__lock:
+            heap = self.__heap
+            while len(heap) > 0 and heap[0][0] < now_:
+                expires, sequence, id = heapq.heappop(heap)
+                document = self.__documents.get(id)
+                if (document is None or document.expires != expires
+                        or self.__scheduled.get(id) != expires):
+                    continue
+                del self.__scheduled[id]
+                due.append(document)
+        return [document for document in due if document.expire_(now_)]
+
+
+
+    def find(self, owner=None, state=0, exclude=0):
+        """
+        Finds documents
+        ===============
+
+        Parameters
+        ----------
+        owner : str, optional (None if omitted)
+            The owner of the documents. If omitted documents of all owners are
+            found.
+        state : int, optional (0 if omitted)
+            Sum of states the documents must have, eg.
+            CBDocument.DOCUMENT_IS_CERTIFIED.
+        exclude : int, optional (0 if omitted)
+            Sum of states the documents must not have, eg.
+            CBDocument.DOCUMENT_EXPIRED.
+
+        Returns
+        -------
+        list of CBDocument
+            The documents in the order of their creation.
+
+        Notes
+        -----
+            Due documents are expired before the lookup.
+        """
+
+        self.expire_due()
+        with self.__lock:
+            candidates = []
+            if owner is not None:
+                candidates.append(self.__owners.get(owner, set()))
+            for flag, ids in self.__indexes.items():
+                if state & flag:
+                    candidates.append(ids)
+            if len(candidates) == 0:
+                ids = self.__documents.keys()
+            else:
+                ids = min(candidates, key=len)
+            states = self.__states
+            result = [self.__documents[id] for id in ids
+                      if states[id] & state == state and states[id] & exclude == 0
+                      and (owner is None or self.__documents[id].owner == owner)]
+        result.sort(key=lambda document: document.created or 0)
+        return result
+
+
+
+    def get(self, id):
+        """
+        Gets a document by id
+        =====================
+
+        Parameters
+        ----------
+        id : any
+            The id of the document.
+
+        Returns
+        -------
+        CBDocument
+            The document.
+        None
+            If there is no document with the id.
+        """
+
+        return self.__documents.get(id)
+
+
+
+    def next_expiry(self):
+        """
+        Gets the expiry of the next document to expire
+        ==============================================
+
+        Returns
+        -------
+        int
+            The expiry timestamp, the document gets expired one second later.
+        None
+            If no document is about to expire.
+        """
+
+        with self.__lock:
+            heap = self.__heap
+            while len(heap) > 0:
+                expires, sequence, id = heap[0]
+                if self.__scheduled.get(id) == expires:
+                    return expires
+                heapq.heappop(heap)
+            return None
+
+
+
+    def remove(self, document):
+        """
+        Removes a document from the registry
+        ====================================
+
+        Parameters
+        ----------
+        document : CBDocument, any
+            The document or its id.
+        """
+
+        id = document.id if isinstance(document, CBDocument) else document
+        with self.__lock:
+            document = self.__documents.pop(id, None)
+            if document is not None:
+                self.unindex_(id, document)
+                self.__scheduled.pop(id, None)
+                document.remove_container_(self)
+
+
+
+    def run(self, cancel):
+        """
+        Expires documents when they are due until cancelled
+        ===================================================
+
+        Parameters
+        ----------
+        cancel : threading.Event
+            Event to set to stop running.
+        """
+
+        while not cancel.is_set():
+            self.__wake.clear()
+            self.expire_due()
+            next_expiry = self.next_expiry()
+            if next_expiry is None:
+                delay = DocumentRegistry.MAX_DELAY
+            else:
+                delay = max(0.0, next_expiry + 1 - time())
+            self.__wake.wait(min(delay, DocumentRegistry.MAX_DELAY))
+
+
+
+    @property
+    def stats(self):
+        """
+        Gets the statistics of the registry
+        ===================================
+
+        Returns
+        -------
+        dict
+            Statistics with the following keys: documents, owners, scheduled,
+            states. States is a dict of the number of documents by indexed
+            state.
+        """
+
+        with self.__lock:
+            return {'documents': len(self.__documents), 'owners': len(self.__owners),
+                    'scheduled': len(self.__scheduled),
+                    'states': {flag: len(ids) for flag, ids in self.__indexes.items()}}
+
+
+
+    def update(self, document):
+        """
+        Updates the index of a document after its change
+        ================================================
+
+        Parameters
+        ----------
+        document : CBDocument, any
+            The document or its id.
+
+        Throws
+        ------
+        KeyError
+            If the document is not registered.
+
+        Notes
+        -----
+            Changes through the setters of the document are indexed
+            automatically, this method is needed after changes bypassing
+            them only.
+        """
+
+        id = document.id if isinstance(document, CBDocument) else document
+        with self.__lock:
+            self.index_(self.__documents[id])
+
+
+
+    def index_(self, document):
+
+        id = document.id
+        previous = self.__documents.get(id)
+        previous_state = self.__states.get(id, CBDocument.DOCUMENT_EXPIRED)
+        if previous is not None:
+            self.unindex_(id, previous)
+        state = document._CBDocument__state & DocumentRegistry.INDEXED_MASK
+        expires = document.expires
+        if expires is not None:
+            if state & CBDocument.DOCUMENT_EXPIRED:
+                self.__scheduled.pop(id, None)
+            elif self.__scheduled.get(id) != expires:
+                self.__scheduled[id] = expires
+                self.__sequence += 1
+                heapq.heappush(self.__heap, (expires, self.__sequence, id))
+                if self.__heap[0][2] == id:
+                    self.__wake.set()
+        else:
+            self.__scheduled.pop(id, None)
+        self.__documents[id] = document
+        self.__states[id] = state
+        self.__owners.setdefault(document.owner, set()).add(id)
+        document.add_container_(self)
+        for flag, ids in self.__indexes.items():
+            if state & flag:
+                ids.add(id)
+        return state & ~previous_state & CBDocument.DOCUMENT_EXPIRED != 0
+
+
+
+    def item_changed_(self, document):
+
+        with self.__lock:
+            expired = (self.__documents.get(document.id) is document
+                       and self.index_(document))
+        if expired and self.__listener is not None:
+            self.__listener(document)
+
+
+
+    def replace_(self, document):
+
+        with self.__lock:
+            previous = self.__documents.get(document.id)
+            if previous is document:
+                return
+            if previous is not None:
+                previous.remove_container_(self)
+            self.index_(document)
+
+
+
+    def unindex_(self, id, document):
+
+        state = self.__states.pop(id, 0)
+        for flag, ids in self.__indexes.items():
+            if state & flag:
+                ids.discard(id)
+        owned = self.__owners.get(document.owner)
+        if owned is not None:
+            owned.discard(id)
+            if len(owned) == 0:
+                del self.__owners[document.owner]
+
+
+
+class SearchObject(object):
+    """
+    This class contains a search of a user
+    ======================================
+
+    Notes
+    -----
+    1.
+        Filters are (type, value) pairs, the following types are known:
+            date : (start, end) timestamps of the transaction time, end is
+                exclusive, any of them can be None
+            amount : (minimum, maximum) of the absolute balance in BCH, both
+                inclusive, any of them can be None
+            direction : 'incoming' or 'outgoing'
+            counterparty : a foreign address or a list of them
+            confirmation : a confirmation level of CBTransaction or a list of
+                them
+            addressbook : True to match counterparties in the addressbook,
+                False to match the others
+    2.
+        Filters are compiled into a single predicate, where the most selective
+        filters come first. The compiled factory is kept until the filters
+        change.
+    3.
+        Indexes of the container are used to get candidate transactions, see
+        .explain() for the chosen plan. The compiled predicate is applied to
+        the candidates only.
+    """
+
+
+
+    FILTER_DATE = 'date'
+    FILTER_AMOUNT = 'amount'
+    FILTER_DIRECTION = 'direction'
+    FILTER_COUNTERPARTY = 'counterparty'
+    FILTER_CONFIRMATION = 'confirmation'
+    FILTER_ADDRESSBOOK = 'addressbook'
+    DIRECTION_INCOMING = 'incoming'
+    DIRECTION_OUTGOING = 'outgoing'
+    FILTER_ORDER = [FILTER_COUNTERPARTY, FILTER_ADDRESSBOOK, FILTER_DATE,
+                    FILTER_AMOUNT, FILTER_CONFIRMATION, FILTER_DIRECTION]
+    INTERSECT_FACTOR = 4
+
+
+
+    def __init__(self, filters):
+
+        self.__filter_list = []
+        self.__compiled = None
+        self.__key = None
+        for _filter in filters:
+            self.add_filter(_filter[0], _filter[1])
+
+
+
+    def add_filter(self, filter_type, filter_value):
+
+        if SearchObject.is_valid_(filter_type, filter_value):
+            self.__filter_list.append((filter_type, filter_value))
+            self.changed_()
+        else:
+            raise ValueError('Tried to add non-valid filter.')
+
+
+
+    def apply_filter(self, transactions, addressbook=None, chain_tip=None):
+        """
+        Applies the filters to transactions
+        ===================================
+
+        Parameters
+        ----------
+        transactions : iterable of CBTransaction
+            The transactions to filter, eg. a TransactionContainer.
+        addressbook : WalletContainer, optional (None if omitted)
+            The addressbook of the user, needed by addressbook filters only.
+        chain_tip : ChainTip, optional (None if omitted)
+            Shared chain tip to derive confirmation levels of stored
+            transactions from. If omitted the chain tip of the container is
+            used.
+
+        Returns
+        -------
+        list of CBTransaction
+            The matching transactions in their original order.
+
+        Notes
+        -----
+            Transactions of a StoredTransactionContainer are filtered on the
+            columns of the store first, so only matching transactions are
+            read. Date filters narrow the scan with binary search.
+        """
+
+        if isinstance(transactions, TransactionSnapshot):
+            if chain_tip is None:
+                chain_tip = transactions.chain_tip
+            return transactions.filter_(self.apply_filter(transactions.container,
+                                                          addressbook, chain_tip))
+        if chain_tip is None:
+            chain_tip = getattr(transactions, 'chain_tip', None)
+        if isinstance(transactions, StoredTransactionContainer):
+            predicate, index_predicate = self.compile_(addressbook, chain_tip,
+                                                       transactions.store.columns())
+            start, end = self.date_range_()
+            return transactions.select_(predicate, index_predicate, start, end)
+        predicate = self.compile_(addressbook, chain_tip)[0]
+        plan = self.plan_(transactions, addressbook)
+        if plan['access'] == 'scan':
+            return list(filter(predicate, transactions))
+        candidates = None
+        for step in plan['steps']:
+            positions = transactions.index_lookup_(step['index'], step['value'],
+                                                   closed=step['closed'])
+            if candidates is None:
+                candidates = set(positions)
+            else:
+                candidates.intersection_update(positions)
+        return list(filter(predicate, (transactions[position]
+                                       for position in sorted(candidates))))
+
+
+
+    def canonical_key(self):
+        """
+        Gets the canonical key of the filters
+        =====================================
+
+        Returns
+        -------
+        str
+            Hexadecimal SHA-256 digest of the normalized filter list.
+
+        Notes
+        -----
+            The key doesn't depend on the order of the filters, on the order
+            of addresses and levels in a filter or on whether a single value
+            or a list is given, therefore equivalent searches get the same
+            key. The key is kept until the filters change.
+        """
+
+        if self.__key is None:
+            normalized = []
+            for filter_type, filter_value in self.__filter_list:
+                if filter_type in [SearchObject.FILTER_COUNTERPARTY,
+                                   SearchObject.FILTER_CONFIRMATION]:
+                    if isinstance(filter_value, (str, int)):
+                        filter_value = [filter_value]
+                    filter_value = sorted(set(filter_value))
+                elif isinstance(filter_value, tuple):
+                    filter_value = list(filter_value)
+                normalized.append(json.dumps([filter_type, filter_value]))
+            data = json.dumps(sorted(normalized)).encode('utf-8')
+            self.__key = hashlib.sha256(data).hexdigest()
+        return self.__key
+
+
+
+    def change_filter(self, filter_type, filter_value):
+
+        if not SearchObject.is_valid_(filter_type, filter_value):
+            raise ValueError('Tried to change to non-valid filter.')
+        result = []
+        match = False
+        for _filter in self.__filter_list:
+            if _filter[0] == filter_type:
+                if not match:
+                    result.append((filter_type, filter_value))
+                match = True
+            else:
+                result.append(_filter)
+        if match:
+            self.__filter_list = result
+            self.changed_()
+        else:
+            raise ValueError('Cannot change non-existing filter-type.')
+
+
+
+    def explain(self, transactions, addressbook=None):
+        """
+        Gets the plan of applying the filters to transactions
+        =====================================================
+
+        Parameters
+        ----------
+        transactions : iterable of CBTransaction
+            The transactions to filter.
+        addressbook : WalletContainer, optional (None if omitted)
+            The addressbook of the user.
+
+        Returns
+        -------
+        dict
+            The plan with the following keys:
+                access : str, 'index', 'scan' or 'columns'
+                steps : list of dict, index lookups in the order of execution
+                    with keys index, filter, value, closed and estimate,
+                    where closed tells whether the end key of value is
+                    inclusive and estimate is the number of positions the
+                    lookup gives
+                candidates : int, estimated number of transactions to check
+                    with the predicate
+                cost : float, estimated cost of the plan
+                scan_cost : float, estimated cost of a full scan
+
+        Notes
+        -----
+            Costs are given in predicate evaluations, where an index lookup
+            costs a binary search plus one unit per position.
+        """
+
+        return self.plan_(transactions, addressbook)
+
+
+
+    @property
+    def filter_list(self):
+
+        result = []
+        for _filter in self.__filter_list:
+            result.append(_filter)
+        return result
+
+
+
+    def get_filter(self, id):
+
+        return self.__filter_list[id]
+
+
+
+    def remove_filter_by_id(self, id):
+
+        if id < len(self.__filter_list) and id >= 0:
+            result = []
+            for i in range(len(self.__filter_list)):
+                if i != id:
+                    result.append(self.__filter_list[i])
+            self.__filter_list = result
+            self.changed_()
+        else:
+            raise ValueError('Cannot remove non-existing id.')
+
+
+
+    def remove_filter_by_type(self, filter_type):
+
+        result = []
+        match = False
+        for _filter in self.__filter_list:
+            if _filter[0] == filter_type:
+                match = True
+            else:
+                result.append(_filter)
+        if match:
+            self.__filter_list = result
+            self.changed_()
+        else:
+            raise ValueError('Cannot remove non-existing filter-type.')
+
+
+
+    def changed_(self):
+
+        self.__compiled = None
+        self.__key = None
+
+
+
+    def compile_(self, addressbook=None, chain_tip=None, columns=None):
+        """
+        Gets the compiled predicates of the filters
+        ===========================================
+
+        Parameters
+        ----------
+        addressbook : WalletContainer, optional (None if omitted)
+            The addressbook of the user.
+        chain_tip : ChainTip, optional (None if omitted)
+            Shared chain tip to derive confirmation levels of stored records
+            from.
+        columns : dict, optional (None if omitted)
+            Columns of a TransactionStore as returned by its .columns() method.
+
+        Returns
+        -------
+        tuple (callable, callable)
+            Predicate over CBTransaction instances and predicate over record
+            indices of the columns, the latter is None if columns are not
+            given. The predicate over indices doesn't check date filters,
+            since those are applied by narrowing the scan.
+
+        Notes
+        -----
+            Both predicates are composed of one closure per term, values of the
+            filters are normalized once and bound to the closures.
+        """
+
+        if self.__compiled is None:
+            self.__compiled = SearchObject.generate_(self.__filter_list)
+        if addressbook is None:
+            book = frozenset()
+        else:
+            book = frozenset(wallet.address for wallet in addressbook)
+        return self.__compiled(book, chain_tip, columns)
+
+
+
+    def amount_range_(self):
+
+        start = None
+        end = None
+        for filter_type, filter_value in self.__filter_list:
+            if filter_type == SearchObject.FILTER_AMOUNT:
+                if filter_value[0] is not None and (start is None or filter_value[0] > start):
+                    start = filter_value[0]
+                if filter_value[1] is not None and (end is None or filter_value[1] < end):
+                    end = filter_value[1]
+        return start, end
+
+
+
+    def date_range_(self):
+
+        start = None
+        end = None
+        for filter_type, filter_value in self.__filter_list:
+            if filter_type == SearchObject.FILTER_DATE:
+                if filter_value[0] is not None and (start is None or filter_value[0] > start):
+                    start = filter_value[0]
+                if filter_value[1] is not None and (end is None or filter_value[1] < end):
+                    end = filter_value[1]
+        return start, end
+
+
+
+    @classmethod
+    def generate_(cls, filter_list):
+        """
+        Generates the predicate factory of a filter list
+        ================================================
+
+        Parameters
+        ----------
+        filter_list : list of tuple (str, any)
+            The filters.
+
+        Returns
+        -------
+        callable
+            Function to call with (addressbook, chain_tip, columns) to get the
+            predicates, where addressbook is a set of addresses.
+        """
+
+        ordered = []
+        for filter_type, filter_value in sorted(filter_list,
+                                                key=lambda item: SearchObject.FILTER_ORDER.index(item[0])):
+            if filter_type == SearchObject.FILTER_COUNTERPARTY and isinstance(filter_value, str):
+                filter_value = [filter_value]
+            elif filter_type == SearchObject.FILTER_CONFIRMATION and isinstance(filter_value, int):
+                filter_value = [filter_value]
+            if filter_type in [SearchObject.FILTER_COUNTERPARTY,
+                               SearchObject.FILTER_CONFIRMATION]:
+                filter_value = frozenset(filter_value)
+            ordered.append((filter_type, filter_value))
+
+        def factory(book, chain_tip, columns):
+            terms = []
+            for filter_type, filter_value in ordered:
+                terms += SearchObject.item_terms_(filter_type, filter_value, book,
+                                                  chain_tip)
+            predicate = SearchObject.fuse_(terms)
+            if columns is None:
+                return predicate, None
+            levels = None
+            if any(item[0] == SearchObject.FILTER_CONFIRMATION for item in ordered):
+                levels = SearchObject.levels_(columns, chain_tip)
+            index_terms = []
+            for filter_type, filter_value in ordered:
+                index_terms += SearchObject.index_terms_(filter_type, filter_value,
+                                                         book, columns, levels)
+            return predicate, SearchObject.fuse_(index_terms)
+
+        return factory
+
+
+
+    @classmethod
+    def fuse_(cls, terms):
+        """
+        Fuses terms into a single predicate
+        ===================================
+
+        Parameters
+        ----------
+        terms : list of callable
+            The terms in the order of evaluation.
+
+        Returns
+        -------
+        callable
+            Predicate that is True if every term is True, evaluation stops at
+            the first False term.
+        """
+
+        if len(terms) == 0:
+            return lambda item: True
+        if len(terms) == 1:
+            return terms[0]
+        terms = tuple(terms)
+
+        def predicate(item):
+            for term in terms:
+                if not term(item):
+                    return False
+            return True
+
+        return predicate
+
+
+
+    @classmethod
+    def index_terms_(cls, filter_type, filter_value, book, columns, levels):
+        """
+        Gets the terms of a filter over record indices of columns
+        =========================================================
+
+        Parameters
+        ----------
+        filter_type : str
+            The type of the filter.
+        filter_value : any
+            The normalized value of the filter.
+        book : frozenset of str
+            Addresses of the addressbook.
+        columns : dict
+            Columns of a TransactionStore as returned by its .columns() method.
+        levels : list of int, None
+            Confirmation levels of the records, needed by confirmation filters
+            only.
+
+        Returns
+        -------
+        list of callable
+            The terms, date filters give no term since those are applied by
+            narrowing the scan.
+        """
+
+        ids = columns['address_ids']
+        foreign = columns['foreign_address']
+        balance = columns['balance']
+        if filter_type == SearchObject.FILTER_COUNTERPARTY:
+            values = frozenset(ids[address] for address in filter_value if address in ids)
+            return [lambda i: foreign[i] in values]
+        elif filter_type == SearchObject.FILTER_ADDRESSBOOK:
+            values = frozenset(ids[address] for address in book if address in ids)
+            if filter_value:
+                return [lambda i: foreign[i] in values]
+            return [lambda i: foreign[i] not in values]
+        elif filter_type == SearchObject.FILTER_AMOUNT:
+            terms = []
+            if filter_value[0] is not None:
+                minimum = bch_2_sat(filter_value[0])
+                terms.append(lambda i: abs(balance[i]) >= minimum)
+            if filter_value[1] is not None:
+                maximum = bch_2_sat(filter_value[1])
+                terms.append(lambda i: abs(balance[i]) <= maximum)
+            return terms
+        elif filter_type == SearchObject.FILTER_CONFIRMATION:
+            return [lambda i: levels[i] in filter_value]
+        elif filter_type == SearchObject.FILTER_DIRECTION:
+            if filter_value == SearchObject.DIRECTION_INCOMING:
+                return [lambda i: balance[i] > 0]
+            return [lambda i: balance[i] < 0]
+        return []
+
+
+
+    @classmethod
+    def item_terms_(cls, filter_type, filter_value, book, chain_tip):
+        """
+        Gets the terms of a filter over transactions
+        ============================================
+
+        Parameters
+        ----------
+        filter_type : str
+            The type of the filter.
+        filter_value : any
+            The normalized value of the filter.
+        book : frozenset of str
+            Addresses of the addressbook.
+        chain_tip : ChainTip, None
+            Chain tip to derive confirmation levels from. If None or its
+            height is not known the levels of the transactions are used.
+
+        Returns
+        -------
+        list of callable
+            The terms.
+
+        Notes
+        -----
+            Confirmation levels are counted to the given chain tip, not to
+            the chain tips of the transactions, so a snapshot with a frozen
+            tip keeps matching the same transactions while the live tip
+            moves.
+        """
+
+        if filter_type == SearchObject.FILTER_COUNTERPARTY:
+            return [lambda t: t.foreign_address in filter_value]
+        elif filter_type == SearchObject.FILTER_ADDRESSBOOK:
+            if filter_value:
+                return [lambda t: t.foreign_address in book]
+            return [lambda t: t.foreign_address not in book]
+        elif filter_type == SearchObject.FILTER_DATE:
+            terms = []
+            if filter_value[0] is not None:
+                start = filter_value[0]
+                terms.append(lambda t: (t.transaction_time or 0) >= start)
+            if filter_value[1] is not None:
+                end = filter_value[1]
+                terms.append(lambda t: (t.transaction_time or 0) < end)
+            return terms
+        elif filter_type == SearchObject.FILTER_AMOUNT:
+            terms = []
+            if filter_value[0] is not None:
+                minimum = filter_value[0]
+                terms.append(lambda t: abs(t.balance) >= minimum)
+            if filter_value[1] is not None:
+                maximum = filter_value[1]
+                terms.append(lambda t: abs(t.balance) <= maximum)
+            return terms
+        elif filter_type == SearchObject.FILTER_CONFIRMATION:
+            if chain_tip is None or chain_tip.height is None:
+                return [lambda t: t.confirmation_level in filter_value]
+            confirmations = chain_tip.confirmations
+            level = CBTransaction.level_
+            return [lambda t: level(confirmations(t.block_height),
+                                    t.confirmation_limit) in filter_value]
+        elif filter_type == SearchObject.FILTER_DIRECTION:
+            if filter_value == SearchObject.DIRECTION_INCOMING:
+                return [attrgetter('is_incoming')]
+            return [attrgetter('is_outgoing')]
+        return []
+
+
+
+    def has_filter_(self, filter_type):
+
+        return any(item[0] == filter_type for item in self.__filter_list)
+
+
+
+    @classmethod
+    def is_valid_(cls, filter_type, filter_value):
+
+        def is_number(value):
+            return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+        if filter_type in [SearchObject.FILTER_DATE, SearchObject.FILTER_AMOUNT]:
+            return (isinstance(filter_value, (list, tuple)) and len(filter_value) == 2
+                    and all(value is None or is_number(value) for value in filter_value))
+        elif filter_type == SearchObject.FILTER_DIRECTION:
+            return filter_value in [SearchObject.DIRECTION_INCOMING,
+                                    SearchObject.DIRECTION_OUTGOING]
+        elif filter_type == SearchObject.FILTER_COUNTERPARTY:
+            if isinstance(filter_value, str):
+                return True
+            return (isinstance(filter_value, (list, tuple, set, frozenset))
+                    and all(isinstance(value, str) for value in filter_value))
+        elif filter_type == SearchObject.FILTER_CONFIRMATION:
+            levels = [CBTransaction.CONFIRMATION_NONE,
+                      CBTransaction.CONFIRMATION_CONFIRMED,
+                      CBTransaction.CONFIRMATION_WELL]
+            if isinstance(filter_value, int) and not isinstance(filter_value, bool):
+                return filter_value in levels
+            return (isinstance(filter_value, (list, tuple, set, frozenset))
+                    and all(value in levels for value in filter_value))
+        elif filter_type == SearchObject.FILTER_ADDRESSBOOK:
+            return isinstance(filter_value, bool)
+        return False
+
+
+
+    def plan_(self, transactions, addressbook=None):
+        """
+        Plans the application of the filters
+        ====================================
+
+        Parameters
+        ----------
+        transactions : iterable of CBTransaction
+            The transactions to filter.
+        addressbook : WalletContainer, optional (None if omitted)
+            The addressbook of the user.
+
+        Returns
+        -------
+        dict
+            The plan, see .explain() for details.
+
+        Notes
+        -----
+            Every filter with a matching index gives an access path. Paths are
+            ordered by their estimated number of positions, the first path is
+            taken if it is smaller than the container and the others are
+            intersected as long as they are not much larger than the actual
+            candidate set, since checking a candidate with the predicate is
+            cheaper than collecting positions to intersect.
+        """
+
+        count = len(transactions)
+        terms = max(1, len(self.__filter_list))
+        scan_cost = float(count * terms)
+        start, end = self.date_range_()
+        if isinstance(transactions, StoredTransactionContainer):
+            first, last = transactions.store.time_slice(start, end)
+            steps = []
+            if start is not None or end is not None:
+                steps.append({'index': TransactionContainer.INDEX_TIME,
+                              'filter': SearchObject.FILTER_DATE,
+                              'value': (start, end), 'closed': False,
+                              'estimate': last - first})
+            candidates = count - transactions.stored_count_() + last - first
+            return {'access': 'columns', 'steps': steps,
+                    'candidates': candidates,
+                    'cost': float(candidates * terms), 'scan_cost': scan_cost}
+        if isinstance(transactions, TransactionContainer):
+            indexes = transactions.indexes
+        else:
+            indexes = []
+        paths = []
+        if TransactionContainer.INDEX_TIME in indexes and (start is not None or end is not None):
+            paths.append({'index': TransactionContainer.INDEX_TIME,
+                          'filter': SearchObject.FILTER_DATE, 'value': (start, end),
+                          'closed': False})
+        if TransactionContainer.INDEX_COUNTERPARTY in indexes:
+            for filter_type, filter_value in self.__filter_list:
+                if filter_type == SearchObject.FILTER_COUNTERPARTY:
+                    if isinstance(filter_value, str):
+                        filter_value = [filter_value]
+                    paths.append({'index': TransactionContainer.INDEX_COUNTERPARTY,
+                                  'filter': filter_type,
+                                  'value': sorted(set(filter_value)), 'closed': False})
+                elif filter_type == SearchObject.FILTER_ADDRESSBOOK and filter_value:
+                    book = [] if addressbook is None else addressbook
+                    paths.append({'index': TransactionContainer.INDEX_COUNTERPARTY,
+                                  'filter': filter_type,
+                                  'value': sorted(set(wallet.address for wallet in book)),
+                                  'closed': False})
+        minimum, maximum = self.amount_range_()
+        if TransactionContainer.INDEX_AMOUNT in indexes and (minimum is not None or maximum is not None):
+            paths.append({'index': TransactionContainer.INDEX_AMOUNT,
+                          'filter': SearchObject.FILTER_AMOUNT,
+                          'value': (None if minimum is None else bch_2_sat(minimum),
+                                    None if maximum is None else bch_2_sat(maximum)),
+                          'closed': True})
+        for path in paths:
+            path['estimate'] = transactions.index_lookup_(path['index'], path['value'], True,
+                                                          path['closed'])
+        paths.sort(key=lambda item: item['estimate'])
+        steps = []
+        candidates = count
+        for path in paths:
+            if len(steps) == 0:
+                if path['estimate'] < count:
+                    steps.append(path)
+                    candidates = path['estimate']
+            elif path['estimate'] <= candidates * SearchObject.INTERSECT_FACTOR:
+                steps.append(path)
+                candidates = min(candidates, path['estimate'])
+        if len(steps) == 0:
+            return {'access': 'scan', 'steps': [], 'candidates': count,
+                    'cost': scan_cost, 'scan_cost': scan_cost}
+        probe = max(1, count).bit_length()
+        cost = float(sum(step['estimate'] + probe for step in steps) + candidates * terms)
+        return {'access': 'index', 'steps': steps, 'candidates': candidates,
+                'cost': cost, 'scan_cost': scan_cost}
+
+
+
+    @classmethod
+    def levels_(cls, columns, chain_tip):
+        """
+        Gets the confirmation levels of stored records
+        ==============================================
+
+        Parameters
+        ----------
+        columns : dict
+            Columns of a TransactionStore.
+        chain_tip : ChainTip, None
+            Shared chain tip to derive confirmations from.
+
+        Returns
+        -------
+        list of int
+            The confirmation level of each record.
+        """
+
+        if chain_tip is not None and chain_tip.height is not None:
+            confirmations = [chain_tip.confirmations(None if height == TransactionStore.NONE_INT
+                                                     else height)
+                             for height in columns['block_height']]
+        else:
+            confirmations = [0 if value == TransactionStore.NONE_INT else value
+                             for value in columns['confirmations']]
+        level = CBTransaction.level_
+        return [level(value, limit) for value, limit
+                in zip(confirmations, columns['confirmation_limit'])]
+
+
+
+class SearchCache(object):
+    """
+    This class memoizes results of searches
+    =======================================
+
+    Notes
+    -----
+    1.
+        Results are kept under the canonical key of the search and the
+        identity of the container and the addressbook, and are valid as long
+        as the versions of the containers and, for searches with confirmation
+        filters, the height of the chain tip are unchanged. Edited filters
+        give a new key, new transactions give a new version, so stale results
+        are never returned.
+    2.
+        The cache keeps the least recently used entries up to its capacity.
+    """
+
+
+
+    DEFAULT_CAPACITY = 128
+
+
+
+    def __init__(self, capacity=None):
+        """
+        Initializes the SearchCache object
+        ==================================
+
+        Parameters
+        ----------
+        capacity : int, optional (None if omitted)
+            Maximal number of results to keep. If omitted DEFAULT_CAPACITY is
+            used.
+
+        Attributes
+        ----------
+        stats
+        """
+
+        if capacity is None:
+            self.__capacity = SearchCache.DEFAULT_CAPACITY
+        else:
+            self.__capacity = capacity
+        self.__lock = threading.Lock()
+        self.__entries = OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+
+
+
+    def __len__(self):
+
+        with self.__lock:
+            return len(self.__entries)
+
+
+
+    def apply(self, search, transactions, addressbook=None, chain_tip=None):
+        """
+        Gets the result of a search
+        ===========================
+
+        Parameters
+        ----------
+        search : SearchObject
+            The search to apply.
+        transactions : TransactionContainer
+            The transactions to filter.
+        addressbook : WalletContainer, optional (None if omitted)
+            The addressbook of the user.
+        chain_tip : ChainTip, optional (None if omitted)
+            Shared chain tip, see SearchObject.apply_filter().
+
+        Returns
+        -------
+        list of CBTransaction
+            The matching transactions. The list is a copy, the caller is free
+            to change it.
+
+        Notes
+        -----
+            Transactions which are not in a CBContainer have no version, so
+            their results are not cached.
+        """
+
+        if not isinstance(transactions, CBContainer):
+            return search.apply_filter(transactions, addressbook, chain_tip)
+        key = (search.canonical_key(), id(transactions), id(addressbook))
+        if chain_tip is None:
+            chain_tip = getattr(transactions, 'chain_tip', None)
+        height = None
+        if chain_tip is not None and search.has_filter_(SearchObject.FILTER_CONFIRMATION):
+            height = chain_tip.height
+        versions = (transactions.version,
+                    None if addressbook is None else addressbook.version, height)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if (entry is not None and entry[0] == versions
+                    and entry[1]() is transactions
+                    and (addressbook is None or entry[2]() is addressbook)):
+                self.__entries.move_to_end(key)
+                self.__hits += 1
+                return list(entry[3])
+            self.__misses += 1
+        result = search.apply_filter(transactions, addressbook, chain_tip)
+        with self.__lock:
+            self.__entries[key] = (versions, ref(transactions),
+                                   None if addressbook is None else ref(addressbook),
+                                   result)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__capacity:
+                self.__entries.popitem(last=False)
+        return list(result)
+
+
+
+    def clear(self):
+        """
+        Drops all results
+        =================
+        """
+
+        with self.__lock:
+            self.__entries.clear()
+
+
+
+    @property
+    def stats(self):
+        """
+        Gets the statistics of the cache
+        ================================
+
+        Returns
+        -------
+        dict
+            Statistics with the following keys: hits, misses, entries.
+        """
+
+        with self.__lock:
+            return {'hits': self.__hits, 'misses': self.__misses,
+                    'entries': len(self.__entries)}
+
+
+
+class SearchView(object):
+    """
+    This class keeps the result of a search up to date
+    ==================================================
+
+    Notes
+    -----
+    1.
+        The view is evaluated once over the whole container, then it listens
+        to the container. Appended transactions and transactions with changed
+        confirmation level are tested alone, so the cost of keeping the view
+        up to date is proportional to the changes instead of the history.
+    2.
+        Changes of the filters or of the addressbook lead to a full
+        re-evaluation at the next access.
+    3.
+        The container holds the view through its listener, call .close() if
+        the view is not needed anymore.
+    """
+
+
+
+    def __init__(self, search, transactions, addressbook=None, listener=None):
+        """
+        Initializes the SearchView object
+        =================================
+
+        Parameters
+        ----------
+        search : SearchObject
+            The search to keep up to date.
+        transactions : TransactionContainer
+            The transactions to filter.
+        addressbook : WalletContainer, optional (None if omitted)
+            The addressbook of the user.
+        listener : callable, optional (None if omitted)
+            Function to call with (event, transaction) when a transaction
+            enters or leaves the result, where event is
+            CBContainer.CONTAINER_APPEND or CBContainer.CONTAINER_REMOVE.
+
+        Attributes
+        ----------
+        closed
+        count
+        result
+        search
+        version
+        """
+
+        self.__search = search
+        self.__transactions = transactions
+        self.__addressbook = addressbook
+        self.__listener = listener
+        self.__closed = False
+        self.__version = 0
+        self.__key = None
+        self.__book_version = None
+        self.__predicate = None
+        self.__members = []
+        self.__member_set = set()
+        self.__pending = {}
+        self.__result = None
+        transactions.add_listener(self.container_changed_)
+        self.evaluate_()
+
+
+
+    def close(self):
+        """
+        Closes the view
+        ===============
+
+        Notes
+        -----
+            A closed view doesn't follow the changes of the container anymore.
+        """
+
+        if not self.__closed:
+            self.__transactions.remove_listener(self.container_changed_)
+            self.__closed = True
+
+
+
+    @property
+    def closed(self):
+        """
+        Gets whether the view is closed or not
+        ======================================
+
+        Returns
+        -------
+        bool
+            True if the view is closed, False if not.
+        """
+
+        return self.__closed
+
+
+
+    @property
+    def count(self):
+        """
+        Gets the number of matching transactions
+        ========================================
+
+        Returns
+        -------
+        int
+            The number of transactions in the result.
+        """
+
+        self.check_()
+        return len(self.__members)
+
+
+
+    @property
+    def result(self):
+        """
+        Gets the matching transactions
+        ==============================
+
+        Returns
+        -------
+        list of CBTransaction
+            The matching transactions in the order of the container.
+        """
+
+        self.check_()
+        if self.__result is None:
+            self.__result = [self.__transactions[position]
+                             for position in self.__members]
+        return list(self.__result)
+
+
+
+    @property
+    def search(self):
+        """
+        Gets the search of the view
+        ===========================
+
+        Returns
+        -------
+        SearchObject
+            The search.
+        """
+
+        return self.__search
+
+
+
+    @property
+    def version(self):
+        """
+        Gets the version of the result
+        ==============================
+
+        Returns
+        -------
+        int
+            Number of changes of the result since the instantiation.
+        """
+
+        self.check_()
+        return self.__version
+
+
+
+    def add_(self, position):
+
+        if position not in self.__member_set:
+            self.__member_set.add(position)
+            if len(self.__members) == 0 or self.__members[-1] < position:
+                self.__members.append(position)
+            else:
+                self.__members.insert(bisect_left(self.__members, position), position)
+            self.changed_(CBContainer.CONTAINER_APPEND, position)
+
+
+
+    def changed_(self, event, position):
+
+        self.__version += 1
+        self.__result = None
+        if self.__listener is not None:
+            self.__listener(event, self.__transactions[position])
+
+
+
+    def check_(self):
+
+        if self.__key != self.__search.canonical_key() or \
+           (self.__addressbook is not None and
+            self.__book_version != self.__addressbook.version):
+            self.evaluate_()
+
+
+
+    def container_changed_(self, container, event, item):
+        """
+        Follows a change of the container
+        =================================
+
+        Parameters
+        ----------
+        container : TransactionContainer
+            The container.
+        event : int
+            The event of the change.
+        item : CBTransaction
+            The affected transaction.
+
+        Notes
+        -----
+            This function is for internal use as listener of the container.
+        """
+
+        if event == CBContainer.CONTAINER_APPEND:
+            position = len(container) - 1
+            if item.confirmation_level != CBTransaction.CONFIRMATION_WELL:
+                self.__pending[item] = position
+            if self.__predicate(item):
+                self.add_(position)
+        elif event == CBContainer.CONTAINER_UPDATE:
+            position = self.__pending.get(item)
+            if position is None:
+                return
+            if item.confirmation_level == CBTransaction.CONFIRMATION_WELL:
+                del self.__pending[item]
+            if self.__predicate(item):
+                self.add_(position)
+            elif position in self.__member_set:
+                self.__member_set.discard(position)
+                self.__members.pop(bisect_left(self.__members, position))
+                self.changed_(CBContainer.CONTAINER_REMOVE, position)
+
+
+
+    def evaluate_(self):
+        """
+        Evaluates the search over the whole container
+        =============================================
+
+        Notes
+        -----
+            Stored transactions are filtered on the columns of the store and
+            are not tracked for confirmation changes, since they are settled.
+        """
+
+        transactions = self.__transactions
+        chain_tip = getattr(transactions, 'chain_tip', None)
+        self.__key = self.__search.canonical_key()
+        if self.__addressbook is not None:
+            self.__book_version = self.__addressbook.version
+        offset = 0
+        members = []
+        if isinstance(transactions, StoredTransactionContainer):
+            predicate, index_predicate = self.__search.compile_(self.__addressbook, chain_tip,
+                                                                transactions.store.columns())
+            start, end = self.__search.date_range_()
+            members = transactions.store.select(index_predicate, start, end)
+            offset = transactions.stored_count_()
+            items = (transactions[position] for position in range(offset, len(transactions)))
+        else:
+            predicate = self.__search.compile_(self.__addressbook, chain_tip)[0]
+            items = iter(transactions)
+        pending = set(transactions.pending)
+        self.__pending = {}
+        for position, item in enumerate(items, offset):
+            if item in pending:
+                self.__pending[item] = position
+            if predicate(item):
+                members.append(position)
+        self.__predicate = predicate
+        self.__members = members
+        self.__member_set = set(members)
+        self.__result = None
+        self.__version += 1
+
+
+
+class WalletFile(object):
+    """
+    This class implements the versioned storage format of UserWallet instances
+    ==========================================================================
+
+    Notes
+    -----
+    1.
+        The file starts with a header of magic bytes, format version and the
+        number of sections. Each section has a four byte name and a length, so
+        readers can skip unknown sections.
+    2.
+        Transactions and utxos are stored column by column in packed arrays of
+        little-endian integers. Amounts are stored in satoshis. Tx IDs are
+        stored as 32 raw bytes each and counterparties as indices into a table
+        of distinct addresses.
+    3.
+        Raw transaction records are stored in a separate zlib compressed
+        section. The section is decompressed at load, but the records are
+        decoded only if the raw data of a transaction is accessed.
+    4.
+        The format holds data only, it doesn't execute anything while loading.
+    5.
+        Files of format version 1, with tx IDs and counterparties as JSON
+        strings and uncompressed raw records, are still readable.
+    """
+
+
+
+    MAGIC = b'CBWF'
+    FORMAT_VERSION = 2
+    NONE_INT = -2 ** 63
+    SECTION_META = b'META'
+    SECTION_TRANSACTIONS = b'TXNS'
+    SECTION_RAW = b'RAWS'
+    SECTION_RAW_COMPRESSED = b'RAWZ'
+    SECTION_UTXOS = b'UTXC'
+    SECTION_UNCONFIRMED_UTXOS = b'UTXU'
+    TXIDS_JSON = 0
+    TXIDS_BINARY = 1
+
+
+
+    @classmethod
+    def dump(cls, wallet, outstream):
+        """
+        Writes a user wallet to a binary stream
+        =======================================
+
+        Parameters
+        ----------
+        wallet : UserWallet
+            The user wallet to write.
+        outstream : file-like
+            Binary stream to write to.
+        """
+
+        outstream.write(WalletFile.dumps(wallet))
+
+
+
+    @classmethod
+    def dumps(cls, wallet, include_raw=True):
+        """
+        Gets a user wallet in the storage format
+        ========================================
+
+        Parameters
+        ----------
+        wallet : UserWallet
+            The user wallet to serialize.
+        include_raw : bool, optional (True if omitted)
+            Whether to include raw transaction records or not. Leaving them
+            out gives compact snapshots for processing, where raw records are
+            not needed.
+
+        Returns
+        -------
+        bytes
+            The serialized user wallet.
+        """
+
+        sections = [(WalletFile.SECTION_META, WalletFile.pack_meta_(wallet)),
+                    (WalletFile.SECTION_TRANSACTIONS,
+                     WalletFile.pack_transactions_(wallet.transactions))]
+        if include_raw:
+            raw_offsets, raw_blob = WalletFile.pack_raw_(wallet.transactions)
+            sections.append((WalletFile.SECTION_RAW_COMPRESSED,
+                             compress(raw_offsets + raw_blob)))
+        sections += [(WalletFile.SECTION_UTXOS,
+                      WalletFile.pack_utxos_(wallet.utxos)),
+                     (WalletFile.SECTION_UNCONFIRMED_UTXOS,
+                      WalletFile.pack_utxos_(wallet.unconfirmed_utxos))]
+        parts = [struct.pack('<4sHH', WalletFile.MAGIC,
+                             WalletFile.FORMAT_VERSION, len(sections))]
+        for name, payload in sections:
+            parts.append(struct.pack('<4sQ', name, len(payload)))
+            parts.append(payload)
+        return b''.join(parts)
+
+
+
+    @classmethod
+    def load(cls, instream):
+        """
+        Reads user wallet data from a binary stream
+        ===========================================
+
+        Parameters
+        ----------
+        instream : file-like
+            Binary stream to read from.
+
+        Returns
+        -------
+        dict
+            Data to restore the user wallet with UserWallet.from_dict_().
+
+        Throws
+        ------
+        ValueError
+            If the data is not a valid wallet file or if its format version is
+            not supported.
+        """
+
+        return WalletFile.loads(instream.read())
+
+
+
+    @classmethod
+    def loads(cls, data):
+        """
+        Reads user wallet data from bytes
+        =================================
+
+        Parameters
+        ----------
+        data : bytes
+            Serialized user wallet as returned by .dumps().
+
+        Returns
+        -------
+        dict
+            Data to restore the user wallet with UserWallet.from_dict_().
+
+        Throws
+        ------
+        ValueError
+            If the data is not a valid wallet file or if its format version is
+            not supported.
+        """
+
+        view = memoryview(data)
+        if len(view) < 8:
+            raise ValueError('WalletFile.loads() - data is too short.')
+        magic, version, section_count = struct.unpack_from('<4sHH', view, 0)
+        if magic != WalletFile.MAGIC:
+            raise ValueError('WalletFile.loads() - not a wallet file.')
+        if version > WalletFile.FORMAT_VERSION:
+            raise ValueError('WalletFile.loads() - unsupported format version {}.'
+                             .format(version))
+        sections = {}
+        position = 8
+        for i in range(section_count):
+            if position + 12 > len(view):
+                raise ValueError('WalletFile.loads() - truncated section header.')
+            name, length = struct.unpack_from('<4sQ', view, position)
+            position += 12
+            if position + length > len(view):
+                raise ValueError('WalletFile.loads() - truncated section.')
+            sections[name] = view[position:position + length]
+            position += length
+        if WalletFile.SECTION_META not in sections:
+            raise ValueError('WalletFile.loads() - missing metadata section.')
+        result = json.loads(bytes(sections[WalletFile.SECTION_META]).decode('utf-8'))
+        raw_view = sections.get(WalletFile.SECTION_RAW)
+        if WalletFile.SECTION_RAW_COMPRESSED in sections:
+            raw_view = memoryview(decompress(sections[WalletFile.SECTION_RAW_COMPRESSED]))
+        result['transactions'] = WalletFile.unpack_transactions_(
+                                    sections.get(WalletFile.SECTION_TRANSACTIONS),
+                                    raw_view, version)
+        result['utxos'] = WalletFile.unpack_utxos_(
+                                    sections.get(WalletFile.SECTION_UTXOS), version)
+        result['unconfirmed_utxos'] = WalletFile.unpack_utxos_(
+                                    sections.get(WalletFile.SECTION_UNCONFIRMED_UTXOS),
+                                    version)
+        return result
+
+
+
+    @classmethod
+    def pack_ints_(cls, typecode, values):
+        """
+        Packs integers into little-endian bytes
+        =======================================
+
+        Parameters
+        ----------
+        typecode : str
+            Typecode of the array module.
+        values : iterable of int
+            Values to pack. None values of signed arrays are replaced with
+            NONE_INT.
+
+        Returns
+        -------
+        bytes
+            The packed values.
+        """
+
+        if typecode == 'q':
+            values = [WalletFile.NONE_INT if value is None else value
+                      for value in values]
+        packed = array(typecode, values)
+        if sys.byteorder == 'big':
+            packed.byteswap()
+        return packed.tobytes()
+
+
+
+    @classmethod
+    def pack_meta_(cls, wallet):
+        """
+        Packs the data of a user wallet except transactions and utxos
+        =============================================================
+
+        Parameters
+        ----------
+        wallet : UserWallet
+            The user wallet to pack.
+
+        Returns
+        -------
+        bytes
+            JSON encoded address, name, details, addressbook, documents and
+            searches of the user wallet.
+        """
+
+        meta = Wallet.to_dict_(wallet)
+        meta['addressbook'] = [item.to_dict_() for item in wallet.addressbook]
+        meta['documents'] = [item.to_dict_() for item in wallet.documents]
+        meta['searches'] = [item.filter_list for item in wallet.searches]
+        return json.dumps(meta, separators=(',', ':')).encode('utf-8')
+
+
+
+    @classmethod
+    def pack_raw_(cls, transactions):
+        """
+        Packs raw transaction records
+        =============================
+
+        Parameters
+        ----------
+        transactions : TransactionContainer
+            Transactions to pack raw records of.
+
+        Returns
+        -------
+        tuple (bytes, bytes)
+            Packed offsets of the records and the records themselves.
+        """
+
+        blobs = [transaction.raw_json_() for transaction in transactions]
+        offsets = [0]
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        return WalletFile.pack_ints_('Q', offsets), b''.join(blobs)
+
+
+
+    @classmethod
+    def pack_transactions_(cls, transactions):
+        """
+        Packs transactions into columns
+        ===============================
+
+        Parameters
+        ----------
+        transactions : TransactionContainer
+            Transactions to pack.
+
+        Returns
+        -------
+        bytes
+            The packed section.
+        """
+
+        table = {}
+        indices = [table.setdefault(item.foreign_address, len(table))
+                   for item in transactions]
+        strings = json.dumps(list(table.keys()), separators=(',', ':')).encode('utf-8')
+        parts = [struct.pack('<I', len(transactions)),
+                 WalletFile.pack_txids_([item.tx for item in transactions]),
+                 struct.pack('<Q', len(strings)), strings,
+                 WalletFile.pack_ints_('I', indices)]
+        for key in ['block_height', 'transaction_time', 'block_time',
+                    'first_seen_time', 'stored_confirmations_',
+                    'confirmation_limit']:
+            parts.append(WalletFile.pack_ints_('q', [getattr(item, key)
+                                                     for item in transactions]))
+        for key in ['inputs', 'outputs', 'fees']:
+            parts.append(WalletFile.pack_ints_('I', [len(getattr(item, key))
+                                                     for item in transactions]))
+        for key in ['inputs', 'outputs', 'fees']:
+            parts.append(WalletFile.pack_ints_('q', [bch_2_sat(value)
+                                                     for item in transactions
+                                                     for value in getattr(item, key)]))
+        return b''.join(parts)
+
+
+
+    @classmethod
+    def pack_txids_(cls, txs):
+        """
+        Packs tx IDs
+        ============
+
+        Parameters
+        ----------
+        txs : list of str
+            Tx IDs to pack.
+
+        Returns
+        -------
+        bytes
+            The packed tx IDs, prefixed with their encoding and length.
+
+        Notes
+        -----
+            Tx IDs are stored as 32 raw bytes each if all of them are lower
+            case hexadecimal strings of 64 characters, otherwise they are
+            stored as a JSON list.
+        """
+
+        try:
+            packed = bytes.fromhex(''.join(txs))
+            is_binary = (len(packed) == 32 * len(txs)
+                         and all(len(tx) == 64 and tx == tx.lower() for tx in txs))
+        except ValueError:
+            is_binary = False
+        if is_binary:
+            encoding = WalletFile.TXIDS_BINARY
+        else:
+            encoding = WalletFile.TXIDS_JSON
+            packed = json.dumps(txs, separators=(',', ':')).encode('utf-8')
+        return struct.pack('<BQ', encoding, len(packed)) + packed
+
+
+
+    @classmethod
+    def pack_utxos_(cls, utxos):
+        """
+        Packs utxos into columns
+        ========================
+
+        Parameters
+        ----------
+        utxos : UtxoContainer
+            Utxos to pack.
+
+        Returns
+        -------
+        bytes
+            The packed section.
+        """
+
+        return b''.join([struct.pack('<I', len(utxos)),
+                         WalletFile.pack_txids_([item.tx for item in utxos]),
+                         WalletFile.pack_ints_('I', [item.vout for item in utxos]),
+                         WalletFile.pack_ints_('q', [item.sat_amount for item in utxos]),
+                         WalletFile.pack_ints_('q', [item.block_height for item in utxos]),
+                         WalletFile.pack_ints_('q', [item.confirmations for item in utxos])])
+
+
+
+    @classmethod
+    def unpack_ints_(cls, typecode, view, position, count):
+        """
+        Unpacks little-endian integers
+        ==============================
+
+        Parameters
+        ----------
+        typecode : str
+            Typecode of the array module.
+        view : memoryview
+            Data to unpack from.
+        position : int
+            Position of the first byte to unpack.
+        count : int
+            Number of integers to unpack.
+
+        Returns
+        -------
+        tuple (list of int, int)
+            The unpacked values and the position after the last unpacked byte.
+            NONE_INT values of signed arrays are replaced with None.
+
+        Throws
+        ------
+        ValueError
+            If the data is too short.
+        """
+
+        unpacked = array(typecode)
+        end = position + count * unpacked.itemsize
+        if end > len(view):
+            raise ValueError('WalletFile - truncated column.')
+        unpacked.frombytes(view[position:end])
+        if sys.byteorder == 'big':
+            unpacked.byteswap()
+        values = unpacked.tolist()
+        if typecode == 'q' and WalletFile.NONE_INT in values:
+            values = [None if value == WalletFile.NONE_INT else value
+                      for value in values]
+        return values, end
+
+
+
+    @classmethod
+    def unpack_transactions_(cls, view, raw_view, version=FORMAT_VERSION):
+        """
+        Unpacks transactions from columns
+        =================================
+
+        Parameters
+        ----------
+        view : memoryview, None
+            The packed transaction section.
+        raw_view : memoryview, None
+            The packed raw section, decompressed if it was compressed.
+        version : int, optional (FORMAT_VERSION if omitted)
+            The format version of the file.
+
+        Returns
+        -------
+        TransactionContainer
+            The unpacked transactions.
+        """
+
+        result = TransactionContainer()
+        if view is None:
+            return result
+        if version < 2:
+            count, strings_length = struct.unpack_from('<IQ', view, 0)
+            position = 12
+            txs, foreign_addresses = json.loads(bytes(view[position:position
+                                                           + strings_length]))
+            position += strings_length
+        else:
+            count = struct.unpack_from('<I', view, 0)[0]
+            txs, position = WalletFile.unpack_txids_(view, 4, count)
+            strings_length = struct.unpack_from('<Q', view, position)[0]
+            position += 8
+            table = json.loads(bytes(view[position:position + strings_length]))
+            position += strings_length
+            indices, position = WalletFile.unpack_ints_('I', view, position, count)
+            foreign_addresses = [table[index] for index in indices]
+        columns = []
+        for i in range(6):
+            values, position = WalletFile.unpack_ints_('q', view, position, count)
+            columns.append(values)
+        counts = []
+        for i in range(3):
+            values, position = WalletFile.unpack_ints_('I', view, position, count)
+            counts.append(values)
+        lists = []
+        for i in range(3):
+            values, position = WalletFile.unpack_ints_('q', view, position,
+                                                       sum(counts[i]))
+            values = [value / 100000000 for value in values]
+            if counts[i].count(1) == count:
+                lists.append([[value] for value in values])
+            else:
+                ends = list(accumulate(counts[i]))
+                lists.append([values[end - length:end]
+                              for end, length in zip(ends, counts[i])])
+        raws = [None] * count
+        if raw_view is not None and len(raw_view) > 0:
+            raw_offsets, raw_start = WalletFile.unpack_ints_('Q', raw_view, 0,
+                                                             count + 1)
+            blob = bytes(raw_view[raw_start:])
+            raws = [blob[start:end] if end > start else None
+                    for start, end in zip(raw_offsets, raw_offsets[1:])]
+        for row in zip(txs, *columns[:5], *lists, foreign_addresses,
+                       columns[5], raws):
+            result.append_(CBTransaction(*row[:10], confirmation_limit=row[10],
+                                         raw=row[11]))
+        return result
+
+
+
+    @classmethod
+    def unpack_txids_(cls, view, position, count):
+        """
+        Unpacks tx IDs
+        ==============
+
+        Parameters
+        ----------
+        view : memoryview
+            Data to unpack from.
+        position : int
+            Position of the encoding of the tx IDs.
+        count : int
+            Number of tx IDs to unpack.
+
+        Returns
+        -------
+        tuple (list of str, int)
+            The unpacked tx IDs and the position after the last unpacked byte.
+
+        Throws
+        ------
+        ValueError
+            If the data is too short or if the encoding is unknown.
+        """
+
+        encoding, length = struct.unpack_from('<BQ', view, position)
+        start = position + 9
+        end = start + length
+        if end > len(view):
+            raise ValueError('WalletFile - truncated tx IDs.')
+        if encoding == WalletFile.TXIDS_BINARY:
+            packed = bytes(view[start:end]).hex()
+            txs = [packed[i:i + 64] for i in range(0, 64 * count, 64)]
+        elif encoding == WalletFile.TXIDS_JSON:
+            txs = json.loads(bytes(view[start:end]))
+        else:
+            raise ValueError('WalletFile - unknown tx ID encoding {}.'.format(encoding))
+        return txs, end
+
+
+
+    @classmethod
+    def unpack_utxos_(cls, view, version=FORMAT_VERSION):
+        """
+        Unpacks utxos from columns
+        ==========================
+
+        Parameters
+        ----------
+        view : memoryview, None
+            The packed utxo section.
+        version : int, optional (FORMAT_VERSION if omitted)
+            The format version of the file.
+
+        Returns
+        -------
+        UtxoContainer
+            The unpacked utxos.
+        """
+
+        result = UtxoContainer()
+        if view is None:
+            return result
+        if version < 2:
+            count, strings_length = struct.unpack_from('<IQ', view, 0)
+            position = 12
+            txs = json.loads(bytes(view[position:position + strings_length]))
+            position += strings_length
+        else:
+            count = struct.unpack_from('<I', view, 0)[0]
+            txs, position = WalletFile.unpack_txids_(view, 4, count)
+        vouts, position = WalletFile.unpack_ints_('I', view, position, count)
+        sat_amounts, position = WalletFile.unpack_ints_('q', view, position, count)
+        heights, position = WalletFile.unpack_ints_('q', view, position, count)
+        confirmations, position = WalletFile.unpack_ints_('q', view, position, count)
+        for i in range(count):
+            result.append_(CBUtxo(txs[i], sat_2_bch(sat_amounts[i]),
+                                  sat_amounts[i], heights[i], confirmations[i],
+                                  vouts[i]))
+        return result
+
+
+
+class WalletJournal(object):
+    """
+    This class implements an append-only journal of UserWallet changes
+    ==================================================================
+
+    Notes
+    -----
+    1.
+        The journal consists of a snapshot written in the format of WalletFile
+        and a journal file. Every change of the containers of the wallet is
+        appended to the journal file as soon as it happens, so the cost of
+        saving is proportional to the change and not to the size of the wallet.
+        Changes of addressbook entries and documents in place (eg. renaming a
+        wallet or certifying a document) are appended as full records of the
+        item, replaying them replaces the item with the same address or id.
+        Documents without id can't be addressed by a record, their changes
+        trigger a compaction. Confirmation changes of transactions are
+        appended as compact records of the tx and its confirmations.
+    2.
+        Each record is a JSON object prefixed with its length and checksum. A
+        torn record at the end of the journal (eg. after a crash) is dropped
+        at recovery.
+    3.
+        Compaction writes a new snapshot and truncates the journal. It happens
+        on demand or automatically when the journal grows over the given size.
+        Replaying records is idempotent, so a crash between writing the
+        snapshot and truncating the journal does no harm.
+    """
+
+
+
+    JOURNAL_EXTENSION = '.journal'
+    RECORD_HEADER = '<II'
+    RECORD_TRANSACTION = 'transaction'
+    RECORD_CONFIRMATION = 'confirmation'
+    RECORD_UTXO_ADD = 'utxo_add'
+    RECORD_UTXO_REMOVE = 'utxo_remove'
+    RECORD_UNCONFIRMED_ADD = 'unconfirmed_add'
+    RECORD_UNCONFIRMED_REMOVE = 'unconfirmed_remove'
+    RECORD_ADDRESSBOOK = 'addressbook'
+    RECORD_DOCUMENT = 'document'
+
+
+
+    def __init__(self, wallet, snapshot_path, journal_path=None,
+                 compact_size=None, sync=False):
+        """
+        Initializes the WalletJournal object
+        ====================================
+
+        Parameters
+        ----------
+        wallet : UserWallet
+            The user wallet to journal.
+        snapshot_path : str
+            Path of the snapshot file. If the file doesn't exist, the actual
+            state of the wallet is written as the first snapshot.
+        journal_path : str, optional (None if omitted)
+            Path of the journal file. If omitted, the path of the snapshot with
+            JOURNAL_EXTENSION is used.
+        compact_size : int, optional (None if omitted)
+            Size of the journal in bytes to trigger automatic compaction. If
+            omitted the journal is compacted on demand only.
+        sync : bool, optional (False if omitted)
+            Whether to fsync the journal after each record or not.
+
+        Attributes
+        ----------
+        journal_path
+        record_count
+        snapshot_path
+        wallet
+
+        Classmethods
+        ------------
+        open
+        recover
+
+        Notes
+        -----
+            The wallet must be in the state of the snapshot and the journal
+            together. Use .open() to get a journal with a recovered wallet.
+        """
+
+        self.__wallet = wallet
+        self.__snapshot_path = snapshot_path
+        if journal_path is None:
+            self.__journal_path = snapshot_path + WalletJournal.JOURNAL_EXTENSION
+        else:
+            self.__journal_path = journal_path
+        self.__compact_size = compact_size
+        self.__sync = sync
+        self.__record_count = 0
+        if not isfile(self.__snapshot_path):
+            WalletJournal.write_snapshot_(wallet, self.__snapshot_path)
+            if isfile(self.__journal_path):
+                os.remove(self.__journal_path)
+        self.__stream = open(self.__journal_path, 'ab')
+        self.__listeners = [(wallet.transactions, self.on_transactions_),
+                            (wallet.utxos, self.on_utxos_),
+                            (wallet.unconfirmed_utxos, self.on_unconfirmed_utxos_),
+                            (wallet.addressbook, self.on_addressbook_),
+                            (wallet.documents, self.on_documents_)]
+        for container, listener in self.__listeners:
+            container.add_listener(listener)
+
+
+
+    def close(self):
+        """
+        Closes the journal
+        ==================
+
+        Notes
+        -----
+            The journal stops listening to the wallet. The journal file is kept
+            as it is, the next .open() replays it.
+        """
+
+        for container, listener in self.__listeners:
+            container.remove_listener(listener)
+        self.__listeners = []
+        if self.__stream is not None:
+            self.__stream.close()
+            self.__stream = None
+
+
+
+    def compact(self):
+        """
+        Folds the journal into a new snapshot
+        =====================================
+
+        Notes
+        -----
+            The new snapshot is written next to the old one and gets renamed
+            over it, so a crash during compaction leaves either the old
+            snapshot with the full journal or the new snapshot behind.
+        """
+
+        WalletJournal.write_snapshot_(self.__wallet, self.__snapshot_path)
+        self.__stream.close()
+        self.__stream = open(self.__journal_path, 'wb')
+        self.__record_count = 0
+
+
+
+    @property
+    def journal_path(self):
+        """
+        Gets the path of the journal file
+        =================================
+
+        Returns
+        -------
+        str
+            The path of the journal file.
+        """
+
+        return self.__journal_path
+
+
+
+    @classmethod
+    def open(cls, snapshot_path, journal_path=None, compact_size=None,
+             sync=False):
+        """
+        Opens an existing journal
+        =========================
+
+        Parameters
+        ----------
+        snapshot_path : str
+            Path of the snapshot file.
+        journal_path : str, optional (None if omitted)
+            Path of the journal file.
+        compact_size : int, optional (None if omitted)
+            Size of the journal in bytes to trigger automatic compaction.
+        sync : bool, optional (False if omitted)
+            Whether to fsync the journal after each record or not.
+
+        Returns
+        -------
+        WalletJournal
+            The journal with the recovered wallet as .wallet.
+
+        Throws
+        ------
+        FileNotFoundError
+            If the snapshot does not exist.
+        """
+
+        if journal_path is None:
+            journal_path = snapshot_path + WalletJournal.JOURNAL_EXTENSION
+        wallet, valid_size = WalletJournal.recover_(snapshot_path, journal_path)
+        if isfile(journal_path) and os.path.getsize(journal_path) > valid_size:
+            with open(journal_path, 'r+b') as stream:
+                stream.truncate(valid_size)
+        return WalletJournal(wallet, snapshot_path, journal_path,
+                             compact_size, sync)
+
+
+
+    @property
+    def record_count(self):
+        """
+        Gets the number of records written since the last compaction
+        =============================================================
+
+        Returns
+        -------
+        int
+            The number of records.
+        """
+
+        return self.__record_count
+
+
+
+    @classmethod
+    def recover(cls, snapshot_path, journal_path=None):
+        """
+        Recovers a user wallet from snapshot and journal
+        ================================================
+
+        Parameters
+        ----------
+        snapshot_path : str
+            Path of the snapshot file.
+        journal_path : str, optional (None if omitted)
+            Path of the journal file.
+
+        Returns
+        -------
+        UserWallet
+            The recovered user wallet.
+
+        Throws
+        ------
+        FileNotFoundError
+            If the snapshot does not exist.
+        """
+
+        if journal_path is None:
+            journal_path = snapshot_path + WalletJournal.JOURNAL_EXTENSION
+        return WalletJournal.recover_(snapshot_path, journal_path)[0]
+
+
+
+    @property
+    def snapshot_path(self):
+        """
+        Gets the path of the snapshot file
+        ==================================
+
+        Returns
+        -------
+        str
+            The path of the snapshot file.
+        """
+
+        return self.__snapshot_path
+
+
+
+    @property
+    def wallet(self):
+        """
+        Gets the journaled user wallet
+        ==============================
+
+        Returns
+        -------
+        UserWallet
+            The user wallet.
+        """
+
+        return self.__wallet
+
+
+
+    def on_addressbook_(self, container, event, item):
+
+        if event in [CBContainer.CONTAINER_APPEND, CBContainer.CONTAINER_UPDATE]:
+            self.write_record_(WalletJournal.RECORD_ADDRESSBOOK, item.to_dict_())
+
+
+
+    def on_documents_(self, container, event, item):
+
+        if event == CBContainer.CONTAINER_APPEND:
+            self.write_record_(WalletJournal.RECORD_DOCUMENT, item.to_dict_())
+        elif event == CBContainer.CONTAINER_UPDATE:
+            if item.id is None:
+                self.compact()
+            else:
+                self.write_record_(WalletJournal.RECORD_DOCUMENT, item.to_dict_())
+
+
+
+    def on_transactions_(self, container, event, item):
+
+        if event == CBContainer.CONTAINER_APPEND:
+            self.write_record_(WalletJournal.RECORD_TRANSACTION, item.to_dict_())
+        elif event == CBContainer.CONTAINER_UPDATE:
+            self.write_record_(WalletJournal.RECORD_CONFIRMATION,
+                               [item.tx, item.confirmations])
+
+
+
+    def on_unconfirmed_utxos_(self, container, event, item):
+
+        if event == CBContainer.CONTAINER_APPEND:
+            self.write_record_(WalletJournal.RECORD_UNCONFIRMED_ADD, item.to_dict_())
+        elif event == CBContainer.CONTAINER_REMOVE:
+            self.write_record_(WalletJournal.RECORD_UNCONFIRMED_REMOVE, list(item.key))
+
+
+
+    def on_utxos_(self, container, event, item):
+
+        if event == CBContainer.CONTAINER_APPEND:
+            self.write_record_(WalletJournal.RECORD_UTXO_ADD, item.to_dict_())
+        elif event == CBContainer.CONTAINER_REMOVE:
+            self.write_record_(WalletJournal.RECORD_UTXO_REMOVE, list(item.key))
+
+
+
+    @classmethod
+    def document_key_(cls, record):
+
+        if record.get('id') is None:
+            return ('record', json.dumps(record, sort_keys=True))
+        return ('id', record['id'])
+
+
+
+    @classmethod
+    def recover_(cls, snapshot_path, journal_path):
+        """
+        Recovers a user wallet and measures the valid part of the journal
+        =================================================================
+
+        Parameters
+        ----------
+        snapshot_path : str
+            Path of the snapshot file.
+        journal_path : str
+            Path of the journal file.
+
+        Returns
+        -------
+        tuple (UserWallet, int)
+            The recovered user wallet and the size of the valid part of the
+            journal in bytes.
+        """
+
+        wallet = UserWallet.from_file(snapshot_path)
+        valid_size = 0
+        if not isfile(journal_path):
+            return wallet, valid_size
+        documents = {}
+        for position, document in enumerate(wallet.documents):
+            documents[WalletJournal.document_key_(document.to_dict_())] = position
+        with open(journal_path, 'rb') as stream:
+            data = stream.read()
+        header_size = struct.calcsize(WalletJournal.RECORD_HEADER)
+        position = 0
+        while position + header_size <= len(data):
+            length, checksum = struct.unpack_from(WalletJournal.RECORD_HEADER,
+                                                  data, position)
+            payload = data[position + header_size:position + header_size + length]
+            if len(payload) < length or crc32(payload) != checksum:
+                break
+            kind, record = json.loads(payload.decode('utf-8'))
+            WalletJournal.replay_(wallet, kind, record, documents)
+            position += header_size + length
+            valid_size = position
+        wallet.transactions.update_confirmations()
+        return wallet, valid_size
+
+
+
+    @classmethod
+    def replay_(cls, wallet, kind, record, documents):
+        """
+        Applies a journal record to a user wallet
+        =========================================
+
+        Parameters
+        ----------
+        wallet : UserWallet
+            The user wallet to apply the record to.
+        kind : str
+            The type of the record.
+        record : any
+            The data of the record.
+        documents : dict
+            Positions of the documents of the wallet by .document_key_(), it
+            is updated with appended documents.
+
+        Throws
+        ------
+        ValueError
+            If the type of the record is unknown.
+        """
+
+        if kind == WalletJournal.RECORD_TRANSACTION:
+            wallet.transactions.append(CBTransaction(**record))
+        elif kind == WalletJournal.RECORD_CONFIRMATION:
+            tx, confirmations = record
+            for transaction in reversed(wallet.transactions):
+                if transaction.tx == tx:
+                    transaction.stored_confirmations_ = confirmations
+                    break
+        elif kind == WalletJournal.RECORD_UTXO_ADD:
+            wallet.utxos.append(CBUtxo(**record))
+        elif kind == WalletJournal.RECORD_UTXO_REMOVE:
+            wallet.utxos.remove_keys([tuple(record)])
+        elif kind == WalletJournal.RECORD_UNCONFIRMED_ADD:
+            wallet.unconfirmed_utxos.append(CBUtxo(**record))
+        elif kind == WalletJournal.RECORD_UNCONFIRMED_REMOVE:
+            wallet.unconfirmed_utxos.remove_keys([tuple(record)])
+        elif kind == WalletJournal.RECORD_ADDRESSBOOK:
+            existing = wallet.addressbook.get_by_address(record['address'])
+            if existing is None:
+                wallet.addressbook.append(Wallet.from_dict_(record))
+            else:
+                existing.assign_(record)
+        elif kind == WalletJournal.RECORD_DOCUMENT:
+            key = WalletJournal.document_key_(record)
+            position = documents.get(key)
+            if position is None:
+                documents[key] = len(wallet.documents)
+                wallet.documents.append(CBDocument.from_dict_(record))
+            elif wallet.documents[position].to_dict_() != record:
+                wallet.documents.replace_(position, CBDocument.from_dict_(record))
         else:
-            super(self.__class__, self).__init__()
+            raise ValueError('WalletJournal - unknown record type "{}".'
+                             .format(kind))
+
+
+
+    def write_record_(self, kind, record):
+        """
+        Appends a record to the journal
+        ===============================
+
+        Parameters
+        ----------
+        kind : str
+            The type of the record.
+        record : any
+            JSON serializable data of the record.
+        """
+
+        payload = json.dumps([kind, record], separators=(',', ':')).encode('utf-8')
+        self.__stream.write(struct.pack(WalletJournal.RECORD_HEADER,
+                                        len(payload), crc32(payload)))
+        self.__stream.write(payload)
+        self.__stream.flush()
+        if self.__sync:
+            os.fsync(self.__stream.fileno())
+        self.__record_count += 1
+        if self.__compact_size is not None:
+            if self.__stream.tell() >= self.__compact_size:
+                self.compact()
+
+
+
+    @classmethod
+    def write_snapshot_(cls, wallet, snapshot_path):
+        """
+        Writes a snapshot atomically
+        ============================
+
+        Parameters
+        ----------
+        wallet : UserWallet
+            The user wallet to write.
+        snapshot_path : str
+            Path of the snapshot file.
+        """
+
+        temp_path = snapshot_path + '.tmp'
+        with open(temp_path, 'wb') as stream:
+            WalletFile.dump(wallet, stream)
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.replace(temp_path, snapshot_path)
+
+
+
+class TransactionStore(object):
+    """
+    This class implements a memory-mapped record store of a wallet's history
+    ========================================================================
+
+    Notes
+    -----
+    1.
+        A store consists of the following files next to each other:
+            .meta : JSON data of the wallet except transactions and utxos
+            .txr : fixed-width transaction records ordered by time
+            .txi : fixed-width (txid, record index) pairs ordered by txid
+            .raw : raw transaction records, read on demand only
+            .utx : fixed-width utxo records
+    2.
+        Record files are memory-mapped, so only the touched pages are read.
+        Looking up a transaction by txid is a binary search over the index,
+        scanning a time range is a binary search over the records followed by
+        a sequential read.
+    3.
+        Inputs, outputs and fees are stored as totals, therefore transactions
+        read from the store have single element lists of them.
+    """
+
+
+
+    MAGIC = b'CBTS'
+    FORMAT_VERSION = 1
+    HEADER = struct.Struct('<4sHHQ')
+    TRANSACTION_RECORD = struct.Struct('<64s6q3q64sQI')
+    INDEX_RECORD = struct.Struct('<64sI')
+    UTXO_RECORD = struct.Struct('<64sIqqqB')
+    TIME_FIELD = struct.Struct('<q')
+    TIME_OFFSET = 72
+    NONE_INT = -2 ** 63
+
+
+
+    def __init__(self, path):
+        """
+        Opens a TransactionStore
+        ========================
+
+        Parameters
+        ----------
+        path : str
+            Path of the store without extension.
+
+        Attributes
+        ----------
+        path
+        transaction_count
+
+        Classmethods
+        ------------
+        load_wallet
+        write
+
+        Throws
+        ------
+        FileNotFoundError
+            If the files of the store don't exist.
+        ValueError
+            If the files are not valid store files.
+        """
+
+        self.__path = path
+        self.__files = []
+        self.__columns = None
+        self.__records, self.__count = self.map_(path + '.txr')
+        self.__index, index_count = self.map_(path + '.txi')
+        self.__raw = self.map_(path + '.raw', False)[0]
+        self.__utxos, self.__utxo_count = self.map_(path + '.utx')
+        if index_count != self.__count:
+            raise ValueError('TransactionStore - index doesn\'t match records.')
+
+
+
+    def close(self):
+        """
+        Closes the store
+        ================
+
+        Notes
+        -----
+            Raw data of transactions that is not decoded yet keeps the raw
+            file mapped until those transactions are released.
+        """
+
+        self.__records = b''
+        self.__index = b''
+        self.__raw = b''
+        self.__utxos = b''
+        for mapping, stream in self.__files:
+            try:
+                mapping.close()
+            except BufferError:
+                pass
+            stream.close()
+        self.__files = []
+
+
+
+    def columns(self):
+        """
+        Gets the columns of the transaction records
+        ===========================================
+
+        Returns
+        -------
+        dict
+            Columns by name, each in the order of the records:
+                block_height : array of int
+                confirmations : array of int, stored confirmations
+                confirmation_limit : array of int
+                transaction_time : array of int
+                balance : array of int, balance in satoshis
+                fee : array of int, total fee in satoshis
+                foreign_address : array of int, ids of foreign addresses
+                addresses : list of str, foreign addresses by id
+                address_ids : dict, ids by foreign address
+
+        Notes
+        -----
+        1.
+            Columns are decoded in one pass at first call and are kept, since
+            the store is immutable. Foreign addresses are dictionary encoded,
+            missing ones get id -1.
+        2.
+            Missing integers are stored as NONE_INT.
+        """
+
+        if self.__columns is None:
+            size = TransactionStore.TRANSACTION_RECORD.size
+            base = TransactionStore.HEADER.size
+            view = memoryview(self.__records)[base:base + self.__count * size]
+            fields = list(zip(*TransactionStore.TRANSACTION_RECORD.iter_unpack(view)))
+            view.release()
+            if len(fields) == 0:
+                fields = [()] * 13
+            ids = {b'\x00' * 64: -1}
+            foreign_address = array('q', [ids.setdefault(value, len(ids) - 1)
+                                          for value in fields[10]])
+            del ids[b'\x00' * 64]
+            addresses = [value.rstrip(b'\x00').decode('utf-8') for value in ids]
+            self.__columns = {'block_height': array('q', fields[1]),
+                              'confirmations': array('q', fields[5]),
+                              'confirmation_limit': array('q', fields[6]),
+                              'transaction_time': array('q', fields[2]),
+                              'balance': array('q', [output - input_ for input_, output
+                                                     in zip(fields[7], fields[8])]),
+                              'fee': array('q', fields[9]),
+                              'foreign_address': foreign_address,
+                              'addresses': addresses,
+                              'address_ids': {address: idx for idx, address
+                                              in enumerate(addresses)}}
+        return self.__columns
+
+
+
+    def container(self, chain_tip=None):
+        """
+        Gets a transaction container sitting on the store
+        =================================================
+
+        Parameters
+        ----------
+        chain_tip : ChainTip, optional (None if omitted)
+            Shared chain tip to bind the container to.
+
+        Returns
+        -------
+        StoredTransactionContainer
+            The container.
+        """
+
+        return StoredTransactionContainer(self, chain_tip)
+
+
+
+    def find_time_(self, timestamp):
+        """
+        Finds the first record not earlier than a timestamp
+        ===================================================
+
+        Parameters
+        ----------
+        timestamp : int
+            The timestamp to search for.
+
+        Returns
+        -------
+        int
+            Index of the first record with time not earlier than timestamp.
+        """
+
+        low = 0
+        high = self.__count
+        while low < high:
+            middle = (low + high) // 2
+            if self.time_at(middle) < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+
+
+    def get_by_txid(self, tx):
+        """
+        Gets a transaction by its tx ID
+        ===============================
+
+        Parameters
+        ----------
+        tx : str
+            The tx ID to search for.
+
+        Returns
+        -------
+        CBTransaction
+            The transaction.
+        None
+            If the tx ID is not in the store.
+        """
+
+        idx = self.index_of(tx)
+        if idx is None:
+            return None
+        return self.transaction(idx)
 
 
 
-    def append(self, item):
+    def index_of(self, tx):
         """
-        Appends a new item to the WalletContainer
-        =========================================
+        Gets the record index of a tx ID
+        ================================
 
         Parameters
         ----------
-        item : Wallet
-            Item to add to the container.
+        tx : str
+            The tx ID to search for.
+
+        Returns
+        -------
+        int
+            The index of the record.
+        None
+            If the tx ID is not in the store.
+        """
+
+        key = tx.encode('utf-8')
+        if len(key) > 64:
+            return None
+        key = key.ljust(64, b'\x00')
+        low = 0
+        high = self.__count
+        record = TransactionStore.INDEX_RECORD
+        base = TransactionStore.HEADER.size
+        while low < high:
+            middle = (low + high) // 2
+            txid, idx = record.unpack_from(self.__index, base + middle * record.size)
+            if txid < key:
+                low = middle + 1
+            elif txid > key:
+                high = middle
+            else:
+                return idx
+        return None
+
+
+
+    @classmethod
+    def load_wallet(cls, path, chain_tip=None):
+        """
+        Creates a UserWallet instance sitting on a store
+        ================================================
+
+        Parameters
+        ----------
+        path : str
+            Path of the store without extension.
+        chain_tip : ChainTip, optional (None if omitted)
+            Shared chain tip to bind the transactions to.
+
+        Returns
+        -------
+        UserWallet
+            The user wallet with a StoredTransactionContainer.
+        """
+
+        with open(path + '.meta', 'rb') as stream:
+            datadict = json.loads(stream.read().decode('utf-8'))
+        store = TransactionStore(path)
+        datadict['transactions'] = store.container(chain_tip)
+        datadict['utxos'] = store.utxo_container(True)
+        datadict['unconfirmed_utxos'] = store.utxo_container(False)
+        return UserWallet.from_dict_(datadict)
+
+
+
+    def map_(self, filename, has_header=True):
+        """
+        Maps a file of the store into memory
+        ====================================
+
+        Parameters
+        ----------
+        filename : str
+            The file to map.
+        has_header : bool, optional (True if omitted)
+            Whether the file has a header or not.
+
+        Returns
+        -------
+        tuple (mmap, int)
+            The mapped file and the number of records given in its header.
 
         Throws
         ------
-        TypeError
-            If the type of the item is not Wallet.
+        ValueError
+            If the header is not valid.
+        """
+
+        stream = open(filename, 'rb')
+        if os.fstat(stream.fileno()).st_size == 0:
+            stream.close()
+            if has_header:
+                raise ValueError('TransactionStore - empty file "{}".'
+                                 .format(filename))
+            return b'', 0
+        mapping = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__files.append((mapping, stream))
+        count = 0
+        if has_header:
+            if len(mapping) < TransactionStore.HEADER.size:
+                raise ValueError('TransactionStore - truncated file "{}".'
+                                 .format(filename))
+            magic, version, reserved, count = TransactionStore.HEADER.unpack_from(mapping, 0)
+            if magic != TransactionStore.MAGIC:
+                raise ValueError('TransactionStore - not a store file "{}".'
+                                 .format(filename))
+            if version > TransactionStore.FORMAT_VERSION:
+                raise ValueError('TransactionStore - unsupported format version {}.'
+                                 .format(version))
+        return mapping, count
+
+
+
+    @property
+    def path(self):
         """
+        Gets the path of the store
+        ==========================
 
-        if isinstance(item, Wallet):
-            if not self.contains_address(item.address):
-                super(self.__class__, self).append(item)
-        else:
-            raise TypeError('Tried to add a non-Wallet instance to a WalletContainer.')
+        Returns
+        -------
+        str
+            Path of the store without extension.
+        """
 
+        return self.__path
 
 
-    def contains_address(self, address):
+
+    def range_by_time(self, start=None, end=None):
         """
-        Checks whether an address is added yet or not
-        =============================================
+        Gets the transactions of a time range
+        =====================================
 
         Parameters
         ----------
-        address : str
-            The address to search for.
+        start : int, optional (None if omitted)
+            The first timestamp of the range. If omitted the range starts with
+            the first transaction.
+        end : int, optional (None if omitted)
+            The first timestamp after the range. If omitted the range ends with
+            the last transaction.
 
         Returns
         -------
-        bool
-            True if the address is found, False if not.
+        generator of CBTransaction
+            The transactions of the range in the order of time.
         """
 
-        for wallet in self:
-            if wallet.address == address:
-                return True
-        return False
+        return (self.transaction(idx) for idx in range(*self.time_slice(start, end)))
 
 
 
-    def get_by_detail(self, key, value):
+    def select(self, predicate, start=None, end=None):
         """
-        Gets wallets by a detail
-        =========================
+        Selects records with a predicate
+        ================================
 
         Parameters
         ----------
-        key : str
-            The name of the detail to search for.
-        value : str
-            The value of the detail to search for.
+        predicate : callable
+            Function to call with the index of a record, the record matches if
+            it returns True. The predicate is expected to work on .columns().
+        start : int, optional (None if omitted)
+            The first timestamp of the range to scan.
+        end : int, optional (None if omitted)
+            The first timestamp after the range to scan.
 
         Returns
         -------
-        list
-            List of Wallet objects that matches the search.
+        list of int
+            Indices of the matching records.
         """
 
-        result = []
-        for wallet in self:
-            if key in wallet.keys():
-                if value == wallet[key]:
-                    result.append(wallet)
-        return result
+        return list(filter(predicate, range(*self.time_slice(start, end))))
 
 
 
-    def get_by_displayed_name(self, name):
+    def time_at(self, idx):
         """
-        Gets wallets by displayed name
-        ==============================
+        Gets the time of a record
+        =========================
 
         Parameters
         ----------
-        name : str
-            The name to search for.
+        idx : int
+            Index of the record.
 
         Returns
         -------
-        list
-            List of Wallet object that matches the search.
+        int
+            The time of the transaction, 0 if it is unknown.
+        """
 
-        Notes
-        -----
-            This method implements classic string search.
+        offset = (TransactionStore.HEADER.size + idx * TransactionStore.TRANSACTION_RECORD.size
+                  + TransactionStore.TIME_OFFSET)
+        value = TransactionStore.TIME_FIELD.unpack_from(self.__records, offset)[0]
+        if value == TransactionStore.NONE_INT:
+            return 0
+        return value
+
+
+
+    def time_slice(self, start=None, end=None):
         """
+        Gets the index range of a time range
+        ====================================
 
-        result = []
-        for wallet in self:
-            if name in wallet.displayed_name:
-                result.append(wallet)
-        return result
+        Parameters
+        ----------
+        start : int, optional (None if omitted)
+            The first timestamp of the range.
+        end : int, optional (None if omitted)
+            The first timestamp after the range.
+
+        Returns
+        -------
+        tuple (int, int)
+            Index of the first record of the range and index of the first
+            record after the range.
+        """
 
+        if start is None:
+            first = 0
+        else:
+            first = self.find_time_(start)
+        if end is None:
+            last = self.__count
+        else:
+            last = self.find_time_(end)
+        return first, max(first, last)
 
 
-    def get_id_by_detail(self, key, value):
+
+    def transaction(self, idx, chain_tip=None):
         """
-        Gets IDs of wallets by a detail
-        ===============================
+        Reads a transaction from the store
+        ==================================
 
         Parameters
         ----------
-        key : str
-            The name of the detail to search for.
-        value : str
-            The value of the detail to search for.
+        idx : int
+            Index of the record.
+        chain_tip : ChainTip, optional (None if omitted)
+            Shared chain tip to bind the transaction to.
 
         Returns
         -------
-        list
-            List of IDs of the Wallet objects that matches the search.
+        CBTransaction
+            The transaction. Its raw data is read from the raw file when it is
+            accessed for the first time.
+
+        Throws
+        ------
+        IndexError
+            If the index is out of range.
+        """
+
+        if idx < 0 or idx >= self.__count:
+            raise IndexError('TransactionStore - record index out of range.')
+        fields = TransactionStore.TRANSACTION_RECORD.unpack_from(self.__records,
+                    TransactionStore.HEADER.size + idx * TransactionStore.TRANSACTION_RECORD.size)
+        values = [None if value == TransactionStore.NONE_INT else value
+                  for value in fields[1:7]]
+        foreign_address = fields[10].rstrip(b'\x00').decode('utf-8')
+        if foreign_address == '':
+            foreign_address = None
+        raw = None
+        if fields[12] > 0:
+            raw = memoryview(self.__raw)[fields[11]:fields[11] + fields[12]]
+        return CBTransaction(fields[0].rstrip(b'\x00').decode('utf-8'),
+                             values[0], values[1], values[2], values[3],
+                             values[4], [fields[7] / 100000000],
+                             [fields[8] / 100000000], [fields[9] / 100000000],
+                             foreign_address, confirmation_limit=values[5],
+                             raw=raw, chain_tip=chain_tip)
+
+
+
+    @property
+    def transaction_count(self):
         """
+        Gets the number of transactions in the store
+        ============================================
 
-        result = []
-        for idx, wallet in enumerate(self):
-            if key in wallet.keys():
-                if value == wallet[key]:
-                    result.append(idx)
-        return result
+        Returns
+        -------
+        int
+            The number of transactions.
+        """
 
+        return self.__count
 
 
-    def get_id_by_displayed_name(self, name):
+
+    def utxo_container(self, confirmed=True):
         """
-        Gets IDs of wallets by displayed name
-        =====================================
+        Reads the utxos of the store
+        ============================
 
         Parameters
         ----------
-        name : str
-            The name to search for.
+        confirmed : bool, optional (True if omitted)
+            Whether to read confirmed or unconfirmed utxos.
 
         Returns
         -------
-        list
-            List of IDs of the Wallet objects that matches the search.
+        UtxoContainer
+            The utxos.
 
         Notes
         -----
-            This method implements classic string search.
-        """
-
-        result = []
-        for idx, wallet in enumerate(self):
-            if name in wallet.displayed_name:
-                result.append(idx)
+            The number of utxos is usually small compared to the number of
+            transactions, therefore they are read at once.
+        """
+
+        result = UtxoContainer()
+        record = TransactionStore.UTXO_RECORD
+        base = TransactionStore.HEADER.size
+        for i in range(self.__utxo_count):
+            tx, vout, sat_amount, height, confirmations, flag = \
+                record.unpack_from(self.__utxos, base + i * record.size)
+            if bool(flag) == confirmed:
+                if height == TransactionStore.NONE_INT:
+                    height = None
+                result.append_(CBUtxo(tx.rstrip(b'\x00').decode('utf-8'),
+                                      sat_2_bch(sat_amount), sat_amount, height,
+                                      confirmations, vout))
         return result
 
 
 
-class CBTransaction(object):
+    @classmethod
+    def write(cls, path, wallet):
+        """
+        Writes a user wallet into a store
+        =================================
+
+        Parameters
+        ----------
+        path : str
+            Path of the store without extension.
+        wallet : UserWallet
+            The user wallet to write.
+
+        Throws
+        ------
+        ValueError
+            If a tx ID or a foreign address is longer than 64 bytes.
+        """
+
+        none_int = TransactionStore.NONE_INT
+        def int_or_none(value):
+            return none_int if value is None else value
+        transactions = sorted(wallet.transactions,
+                              key=lambda item: item.transaction_time or 0)
+        header = TransactionStore.HEADER
+        records = [header.pack(TransactionStore.MAGIC,
+                               TransactionStore.FORMAT_VERSION, 0,
+                               len(transactions))]
+        index = []
+        raws = []
+        raw_offset = 0
+        for idx, item in enumerate(transactions):
+            txid = item.tx.encode('utf-8')
+            foreign_address = (item.foreign_address or '').encode('utf-8')
+            if len(txid) > 64 or len(foreign_address) > 64:
+                raise ValueError('TransactionStore.write() - field longer than 64 bytes.')
+            raw = item.raw_json_()
+            raws.append(raw)
+            records.append(TransactionStore.TRANSACTION_RECORD.pack(
+                txid, int_or_none(item.block_height),
+                int_or_none(item.transaction_time), int_or_none(item.block_time),
+                int_or_none(item.first_seen_time),
+                int_or_none(item.stored_confirmations_),
+                int_or_none(item.confirmation_limit),
+                bch_2_sat(item.total_input), bch_2_sat(item.total_output),
+                bch_2_sat(sum(item.fees)), foreign_address, raw_offset, len(raw)))
+            raw_offset += len(raw)
+            index.append((txid.ljust(64, b'\x00'), idx))
+        index.sort()
+        index_records = [header.pack(TransactionStore.MAGIC,
+                                     TransactionStore.FORMAT_VERSION, 0,
+                                     len(index))]
+        for txid, idx in index:
+            index_records.append(TransactionStore.INDEX_RECORD.pack(txid, idx))
+        utxos = [(item, 1) for item in wallet.utxos] + \
+                [(item, 0) for item in wallet.unconfirmed_utxos]
+        utxo_records = [header.pack(TransactionStore.MAGIC,
+                                    TransactionStore.FORMAT_VERSION, 0,
+                                    len(utxos))]
+        for item, flag in utxos:
+            utxo_records.append(TransactionStore.UTXO_RECORD.pack(
+                item.tx.encode('utf-8'), item.vout, item.sat_amount,
+                int_or_none(item.block_height), item.confirmations, flag))
+        for extension, parts in [('.txr', records), ('.txi', index_records),
+                                 ('.raw', raws), ('.utx', utxo_records),
+                                 ('.meta', [WalletFile.pack_meta_(wallet)])]:
+            temp_path = path + extension + '.tmp'
+            with open(temp_path, 'wb') as stream:
+                stream.write(b''.join(parts))
+            os.replace(temp_path, path + extension)
+
+
+
+class StoredTransactionContainer(TransactionContainer):
     """
-    This class represents a transaction
+    Provides a transaction container sitting on a TransactionStore
+
+    Notes
+    -----
+    1.
+        Stored transactions are read from the store when they are accessed.
+        Transactions appended to the container are kept in memory after the
+        stored ones.
+    2.
+        Materialized transactions are cached weakly, so the same instance is
+        returned as long as it is referenced anywhere.
+    3.
+        Stored transactions are considered settled, the confirmation tracking
+        of the container covers the appended transactions only.
     """
 
 
 
-    def __init__(self, tx, block_height, transaction_time, block_time,
-                 first_seen_time, confirmations, inputs, outputs, fees,
-                 foreign_address, confirmation_limit=6, raw=None):
+    def __init__(self, store, chain_tip=None):
         """
-        Intializes the CBTransaction object
-        ===================================
+        Intializes the StoredTransactionContainer object
+        ================================================
 
         Parameters
         ----------
-        tx : str
-            Transaction's tx ID.
-        block_height : int
-            The hieght of the transaction's block.
-        transaction_time : int
-            Transaction's time.
-        block_time : int
-            Time of the block of the transaction.
-        first_seen_time : int
-            First seen time of the transaction.
-        confirmations : int
-            Number of confirmations.
-        inputs : list, int
-            List of inputs. If set as a solo number, it gets converted into list.
-        outputs : list, int
-            List of outputs. If set as a solo number, it gets converted into list.
-        fees : list, int
-            List of fees. If set as a solo number, it gets converted into list.
-        foreign_address : str
-            Foreign address affected in the transaction.
-        confirmation_limit : int, optional (6 if omitted)
-            Confirmation limit to decide whether the transaction is well
-            confirmed or not.
-        raw : dict, optional (None if omitted)
-            Data of the rae transaction record given by the blockchain explorer.
+        store : TransactionStore
+            The store to sit on.
+        chain_tip : ChainTip, optional (None if omitted)
+            Shared chain tip to bind the container to.
 
         Attributes
         ----------
-        balance
-        block_height
-        block_time
-        confirmations
-        confirmation_limit
-        fee
-        fees
-        first_seen_time
-        inputs
-        is_confirmed
-        is_incoming
-        is_outgoing
-        is_well_confirmed
-        is_unconfirmed
-        Outputs
-        paid
-        raw
-        received
-        total_input
-        total_output
-        transaction_time
-        tx
+        store
         """
 
-        self.__tx = tx
-        self.__block_height = block_height
-        self.__transaction_time = transaction_timestamp
-        self.__block_time = block_timestamp
-        self.__first_seen_time = first_seen_time
-        self.__confirmations = confirmations
-        if isinstance(inputs, Iterable):
-            self.__inputs = inputs
-        else:
-            self.__inputs = [inputs]
-        if isinstance(outputs, Iterable):
-            self.__outputs = outputs
-        else:
-            self.__outputs = [outputs]
-        if isinstance(fees, Iterable):
-            self.__fees = fees
-        else:
-            self.__fees = [fees]
-        self.__foreign_address = foreign_address
-        self.__confirmation_limit = 6
-        self.__raw = raw
+        self.__store = None
+        self.__cache = WeakValueDictionary()
+        super(StoredTransactionContainer, self).__init__(chain_tip=chain_tip)
+        self.__store = store
+
+
+
+    def __getitem__(self, key):
+
+        if isinstance(key, slice):
+            return [self[idx] for idx in range(*key.indices(len(self)))]
+        count = self.stored_count_()
+        if key < 0:
+            key += len(self)
+        if 0 <= key < count:
+            item = self.__cache.get(key)
+            if item is None:
+                item = self.__store.transaction(key, self.chain_tip)
+                self.__cache[key] = item
+            return item
+        return super(StoredTransactionContainer, self).__getitem__(key - count)
+
+
+
+    def __iter__(self):
+
+        for idx in range(self.stored_count_()):
+            yield self[idx]
+        for item in super(StoredTransactionContainer, self).__iter__():
+            yield item
+
+
+
+    def __len__(self):
+
+        return self.stored_count_() + super(StoredTransactionContainer, self).__len__()
+
+
+
+    def bind_chain_tip_(self, newtip):
+        """
+        Binds the transactions of the container to a chain tip
+        ======================================================
+
+        Parameters
+        ----------
+        newtip : ChainTip, None
+            The shared chain tip.
 
-        self.__total_input = 0
-        for item in inputs:
-            self.__total_input += item
-        self.__total_input = round(self.__total_input, 8)
-        self.__total_output = 0
-        for item in outputs:
-            self.__total_output += item
-        self.__total_output = round(self.__total_output, 8)
-        self.__total_fee = 0
-        for item in fees:
-            self.__total_fee += item
-        self.__total_fee = round(self.__total_fee, 8)
-        if self.__total_input > self.__total_output:
-            self.__paid = round(self.__total_input - self.__total_output, 8)
-            self.__received = 0
-            self.__fee = self.__total_fee
-            self.__is_outgoing = True
-            self.__is_incoming = False
-            self.__balance = round(- self.__paid, 8)
-        elif self.__total_input < self.__total_output:
-            self.__paid = 0
-            self.__received = round(self.__total_output - self.__total_input, 8)
-            self.__fee = 0
-            self.__is_outgoing = False
-            self.__is_incoming = True
-            self.__balance = self.__received
-        else:
-            self.__paid = 0
-            self.__received = 0
-            self.__fee = 0
-            self.__is_outgoing = False
-            self.__is_incoming = False
-            self.__balance = 0.0
+        Notes
+        -----
+            Only materialized and appended transactions are bound right away,
+            the others are bound when they are read.
+        """
 
+        for item in list(self.__cache.values()):
+            item.chain_tip = newtip
+        for item in super(StoredTransactionContainer, self).__iter__():
+            item.chain_tip = newtip
 
 
-    @property
-    def balance(self):
+
+    def contains_tx(self, tx):
         """
-        Gets the balance of the transaction
-        ===================================
+        Checks whether a tx is added yet or not
+        =======================================
+
+        Parameters
+        ----------
+        tx : str
+            The tx to search for.
 
         Returns
         -------
-        float
-            The calculated baalnce.
+        bool
+            True if the tx is found, False if not.
         """
 
-        return self.__balance
+        if self.__store is not None and self.__store.index_of(tx) is not None:
+            return True
+        return super(StoredTransactionContainer, self).contains_tx(tx)
 
 
 
-    @property
-    def block_height(self):
+    def range_by_time(self, start=None, end=None):
         """
-        Gets the block height of the transaction
-        ========================================
+        Gets the stored transactions of a time range
+        ============================================
+
+        Parameters
+        ----------
+        start : int, optional (None if omitted)
+            The first timestamp of the range.
+        end : int, optional (None if omitted)
+            The first timestamp after the range.
 
         Returns
         -------
-        int
-            The block height.
+        generator of CBTransaction
+            The stored transactions of the range in the order of time.
         """
 
-        return self.__block_height
+        first, last = self.__store.time_slice(start, end)
+        return (self[idx] for idx in range(first, last))
 
 
 
     @property
-    def block_time(self):
+    def store(self):
         """
-        Gets the block time of the transaction
-        ======================================
+        Gets the store of the container
+        ===============================
 
         Returns
         -------
-        int
-            The block time.
+        TransactionStore
+            The store the container sits on.
         """
 
-        return self.__block_time
+        return self.__store
 
 
 
-    @property
-    def confirmations(self):
+    def select_(self, predicate, index_predicate, start=None, end=None):
         """
-        Gets the number of confirmations of the transaction
-        ===================================================
+        Selects transactions with compiled predicates
+        =============================================
+
+        Parameters
+        ----------
+        predicate : callable
+            Predicate over CBTransaction instances, applied to the appended
+            transactions.
+        index_predicate : callable
+            Predicate over record indices of the columns of the store, applied
+            to the stored transactions.
+        start : int, optional (None if omitted)
+            The first timestamp of the stored range to scan.
+        end : int, optional (None if omitted)
+            The first timestamp after the stored range to scan.
 
         Returns
         -------
-        int
-            The number of confirmations.
+        list of CBTransaction
+            The matching transactions, stored ones first.
+
+        Notes
+        -----
+            This function is for internal use by SearchObject.
         """
 
-        return self.__confirmations
+        result = [self[idx] for idx in self.__store.select(index_predicate, start, end)]
+        result += filter(predicate, super(StoredTransactionContainer, self).__iter__())
+        return result
 
 
 
-    @property
-    def confirmation_limit(self):
+    def stored_count_(self):
+
+        if self.__store is None:
+            return 0
+        return self.__store.transaction_count
+
+
+
+class WalletRepository(object):
+    """
+    This class implements a multi-user repository on an embedded SQLite database
+    ============================================================================
+
+    Notes
+    -----
+    1.
+        Every user wallet is stored in rows of the tables wallets, addressbook,
+        transactions, utxos, documents and searches. Rows are written with bulk
+        upserts and statements are kept constant so SQLite can reuse them as
+        prepared statements.
+    2.
+        Wallets are loaded lazily: containers are read from the database at
+        their first access.
+    3.
+        Attached wallets write their changes into the repository as they
+        happen, like WalletJournal does.
+    4.
+        The connection is shared between threads, every statement and
+        transaction of the repository is serialized by a lock.
+    """
+
+
+
+    SCHEMA_VERSION = 1
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS wallets (
+               address TEXT PRIMARY KEY, displayed_name TEXT, details TEXT,
+               is_valid INTEGER, updated INTEGER)""",
+        """CREATE TABLE IF NOT EXISTS addressbook (
+               owner TEXT, address TEXT, displayed_name TEXT, details TEXT,
+               is_valid INTEGER, PRIMARY KEY (owner, address))""",
+        """CREATE INDEX IF NOT EXISTS addressbook_address ON addressbook (address)""",
+        """CREATE TABLE IF NOT EXISTS transactions (
+               owner TEXT, tx TEXT, block_height INTEGER,
+               transaction_time INTEGER, block_time INTEGER,
+               first_seen_time INTEGER, confirmations INTEGER,
+               confirmation_limit INTEGER, inputs TEXT, outputs TEXT, fees TEXT,
+               foreign_address TEXT, raw BLOB, PRIMARY KEY (owner, tx))""",
+        """CREATE INDEX IF NOT EXISTS transactions_tx ON transactions (tx)""",
+        """CREATE INDEX IF NOT EXISTS transactions_time
+               ON transactions (owner, transaction_time)""",
+        """CREATE INDEX IF NOT EXISTS transactions_foreign
+               ON transactions (foreign_address)""",
+        """CREATE TABLE IF NOT EXISTS utxos (
+               owner TEXT, tx TEXT, vout INTEGER, sat_amount INTEGER,
+               block_height INTEGER, confirmations INTEGER, confirmed INTEGER,
+               PRIMARY KEY (owner, confirmed, tx, vout))""",
+        """CREATE INDEX IF NOT EXISTS utxos_tx ON utxos (tx, vout)""",
+        """CREATE TABLE IF NOT EXISTS documents (
+               owner TEXT, position INTEGER, document_id TEXT, type TEXT,
+               created INTEGER, closed INTEGER, expires INTEGER,
+               certified INTEGER, anonymous INTEGER, data TEXT,
+               PRIMARY KEY (owner, position))""",
+        """CREATE INDEX IF NOT EXISTS documents_id ON documents (document_id)""",
+        """CREATE INDEX IF NOT EXISTS documents_expires ON documents (expires)""",
+        """CREATE TABLE IF NOT EXISTS searches (
+               owner TEXT, position INTEGER, filters TEXT,
+               PRIMARY KEY (owner, position))"""]
+    UPSERT_WALLET = """INSERT OR REPLACE INTO wallets VALUES (?, ?, ?, ?, ?)"""
+    UPSERT_ADDRESSBOOK = """INSERT OR REPLACE INTO addressbook VALUES (?, ?, ?, ?, ?)"""
+    UPSERT_TRANSACTION = """INSERT OR REPLACE INTO transactions
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+    UPSERT_UTXO = """INSERT OR REPLACE INTO utxos VALUES (?, ?, ?, ?, ?, ?, ?)"""
+    DELETE_UTXO = """DELETE FROM utxos
+                     WHERE owner = ? AND confirmed = ? AND tx = ? AND vout = ?"""
+    UPSERT_DOCUMENT = """INSERT OR REPLACE INTO documents
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+    UPSERT_SEARCH = """INSERT OR REPLACE INTO searches VALUES (?, ?, ?)"""
+
+
+
+    def __init__(self, path):
+        """
+        Opens a WalletRepository
+        ========================
+
+        Parameters
+        ----------
+        path : str
+            Path of the database file. The database is created if it doesn't
+            exist. ':memory:' opens an in-memory database.
+
+        Attributes
+        ----------
+        connection
+
+        Throws
+        ------
+        ValueError
+            If the schema of the database is newer than SCHEMA_VERSION.
         """
-        Gets the value of the confirmation limit
-        ========================================
+
+        self.__connection = sqlite3.connect(path, cached_statements=256,
+                                            check_same_thread=False)
+        version = self.__connection.execute('PRAGMA user_version').fetchone()[0]
+        if version > WalletRepository.SCHEMA_VERSION:
+            raise ValueError('WalletRepository - unsupported schema version {}.'
+                             .format(version))
+        with self.__connection:
+            for statement in WalletRepository.SCHEMA:
+                self.__connection.execute(statement)
+            self.__connection.execute('PRAGMA user_version = {}'
+                                      .format(WalletRepository.SCHEMA_VERSION))
+        self.__lock = threading.RLock()
+        self.__attached = {}
+
+
+
+    def addresses(self):
+        """
+        Gets the addresses of all stored user wallets
+        =============================================
 
         Returns
         -------
-        int
-            The limit to be considered as well confirmed transaction.
+        list of str
+            The addresses.
         """
 
-        return self.__confirmation_limit
+        with self.__lock:
+            return [row[0] for row in
+                    self.__connection.execute('SELECT address FROM wallets ORDER BY address')]
 
 
 
-    @confirmation_limit.setter
-    def confirmation_limit(self, newlimit):
+    def attach(self, wallet):
         """
-        Sets the value of the confirmation limit
-        ========================================
+        Writes changes of a user wallet into the repository as they happen
+        ==================================================================
 
         Parameters
         ----------
-        newlimit : int
-            The limit to be considered as well confirmed transaction.
-        """
+        wallet : UserWallet
+            The user wallet to attach.
 
-        self.__confirmation_limit = newlimit
+        Notes
+        -----
+            Attaching a wallet loads its lazy containers, since listeners are
+            added to them.
+        """
+
+        if wallet.address in self.__attached:
+            return
+        address = wallet.address
+        def on_transactions(container, event, item):
+            if event == CBContainer.CONTAINER_APPEND:
+                with self.__lock, self.__connection:
+                    self.upsert_transactions_(address, [item])
+        def on_utxos(container, event, item, confirmed):
+            with self.__lock, self.__connection:
+                if event == CBContainer.CONTAINER_APPEND:
+                    self.upsert_utxos_(address, [item], confirmed)
+                elif event == CBContainer.CONTAINER_REMOVE:
+                    self.__connection.execute(WalletRepository.DELETE_UTXO,
+                                              (address, int(confirmed),
+                                               item.tx, item.vout))
+        def on_addressbook(container, event, item):
+            if event in [CBContainer.CONTAINER_APPEND, CBContainer.CONTAINER_UPDATE]:
+                with self.__lock, self.__connection:
+                    self.upsert_addressbook_(address, [item])
+        def on_documents(container, event, item):
+            if event == CBContainer.CONTAINER_APPEND:
+                with self.__lock, self.__connection:
+                    self.upsert_documents_(address, [(len(container) - 1, item)])
+            elif event == CBContainer.CONTAINER_UPDATE:
+                for position, document in enumerate(container):
+                    if document is item:
+                        with self.__lock, self.__connection:
+                            self.upsert_documents_(address, [(position, item)])
+                        break
+        listeners = [(wallet.transactions, on_transactions),
+                     (wallet.utxos, lambda c, e, i: on_utxos(c, e, i, True)),
+                     (wallet.unconfirmed_utxos, lambda c, e, i: on_utxos(c, e, i, False)),
+                     (wallet.addressbook, on_addressbook),
+                     (wallet.documents, on_documents)]
+        for container, listener in listeners:
+            container.add_listener(listener)
+        self.__attached[address] = listeners
+
+
+
+    def close(self):
+        """
+        Closes the repository
+        =====================
+        """
+
+        for address in list(self.__attached.keys()):
+            self.detach(address)
+        with self.__lock:
+            self.__connection.close()
 
 
 
     @property
-    def fee(self):
+    def connection(self):
         """
-        Gets the fee of the transaction
-        ===============================
+        Gets the database connection
+        ============================
 
         Returns
         -------
-        float
-            The calculated fee.
+        sqlite3.Connection
+            The connection of the repository.
         """
 
-        return self.__fee
+        return self.__connection
 
 
 
-    @property
-    def fees(self):
+    def detach(self, address):
         """
-        Gets the fee components of the transaction
-        ==========================================
+        Stops writing changes of a user wallet into the repository
+        ==========================================================
+
+        Parameters
+        ----------
+        address : str
+            The address of the attached user wallet.
+        """
+
+        listeners = self.__attached.pop(address, [])
+        for container, listener in listeners:
+            container.remove_listener(listener)
+
+
+
+    def documents_by_id(self, document_id):
+        """
+        Gets documents by their id across all users
+        ===========================================
+
+        Parameters
+        ----------
+        document_id : str
+            The id of the document.
 
         Returns
         -------
-        list
-            List of the fee components.
+        list of tuple (str, CBDocument)
+            The owner wallet address and the document.
         """
 
-        return self.__fees
+        with self.__lock:
+            rows = self.__connection.execute('SELECT owner, data FROM documents '
+                                             'WHERE document_id = ?',
+                                             (document_id,)).fetchall()
+        return [(owner, CBDocument.from_dict_(json.loads(data)))
+                for owner, data in rows]
 
 
 
-    @property
-    def first_seen_time(self):
+    def documents_expiring(self, start, end):
         """
-        Gets the first seen time of the transaction
-        ===========================================
+        Gets documents expiring in a time range across all users
+        ========================================================
+
+        Parameters
+        ----------
+        start : int
+            The first timestamp of the range.
+        end : int
+            The first timestamp after the range.
 
         Returns
         -------
-        int
-            The first seen time.
+        list of tuple (str, CBDocument)
+            The owner wallet address and the document.
         """
 
-        return self.__first_seen_time
+        with self.__lock:
+            rows = self.__connection.execute('SELECT owner, data FROM documents '
+                                             'WHERE expires >= ? AND expires < ? '
+                                             'ORDER BY expires', (start, end)).fetchall()
+        return [(owner, CBDocument.from_dict_(json.loads(data)))
+                for owner, data in rows]
 
 
 
-    @property
-    def inputs(self):
+    def load(self, address, lazy=True):
         """
-        Gets the input components of the transaction
-        ============================================
+        Loads a user wallet from the repository
+        =======================================
+
+        Parameters
+        ----------
+        address : str
+            The address of the user wallet.
+        lazy : bool, optional (True if omitted)
+            Whether to load containers at their first access or right away.
 
         Returns
         -------
-        list
-            List of the input components.
+        UserWallet
+            The loaded user wallet.
+        None
+            If the address is not in the repository.
         """
 
-        return self.__inputs
+        with self.__lock:
+            row = self.__connection.execute('SELECT displayed_name, details, is_valid '
+                                            'FROM wallets WHERE address = ?',
+                                            (address,)).fetchone()
+        if row is None:
+            return None
+        wallet = UserWallet(address, displayed_name=row[0],
+                            details=json.loads(row[1]), is_valid=bool(row[2]),
+                            loader=self)
+        if not lazy:
+            for name in ['addressbook', 'documents', 'searches', 'transactions',
+                         'utxos', 'unconfirmed_utxos']:
+                getattr(wallet, name)
+        return wallet
 
 
 
-    @property
-    def is_confirmed(self):
+    def load_container_(self, address, name):
         """
-        Gets whether the transaction is confirmed or not
-        ==============//================================
+        Loads a container of a user wallet
+        ==================================
+
+        Parameters
+        ----------
+        address : str
+            The address of the user wallet.
+        name : str
+            The name of the container property.
 
         Returns
         -------
-        bool
-            True if the transaction is confirmed, False if not.
+        CBContainer, list
+            The loaded container.
+
+        Throws
+        ------
+        ValueError
+            If the name is unknown.
+
+        Notes
+        -----
+            This method implements the loader interface of UserWallet.
         """
 
-        return self.confirmations > 0
+        with self.__lock:
+            return self.read_container_(address, name)
 
 
 
-    @property
-    def is_incoming(self):
+    def save(self, wallet):
         """
-        Gets whether the transaction is incoming or not
-        ===============================================
+        Saves a user wallet into the repository
+        =======================================
+
+        Parameters
+        ----------
+        wallet : UserWallet
+            The user wallet to save.
+
+        Notes
+        -----
+            Containers which are not loaded yet are not written, since they
+            can't differ from the stored ones. Loaded containers replace their
+            stored rows, so removed items get deleted too.
+        """
+
+        address = wallet.address
+        data = Wallet.to_dict_(wallet)
+        with self.__lock, self.__connection:
+            self.__connection.execute(WalletRepository.UPSERT_WALLET,
+                                      (address, data['displayed_name'],
+                                       json.dumps(data['details']),
+                                       int(data['is_valid']), now()))
+            if wallet.is_loaded('addressbook'):
+                self.__connection.execute('DELETE FROM addressbook WHERE owner = ?',
+                                          (address,))
+                self.upsert_addressbook_(address, wallet.addressbook)
+            if wallet.is_loaded('transactions'):
+                self.upsert_transactions_(address, wallet.transactions)
+            if wallet.is_loaded('utxos'):
+                self.__connection.execute('DELETE FROM utxos WHERE owner = ? '
+                                          'AND confirmed = 1', (address,))
+                self.upsert_utxos_(address, wallet.utxos, True)
+            if wallet.is_loaded('unconfirmed_utxos'):
+                self.__connection.execute('DELETE FROM utxos WHERE owner = ? '
+                                          'AND confirmed = 0', (address,))
+                self.upsert_utxos_(address, wallet.unconfirmed_utxos, False)
+            if wallet.is_loaded('documents'):
+                self.__connection.execute('DELETE FROM documents WHERE owner = ?',
+                                          (address,))
+                self.upsert_documents_(address, enumerate(wallet.documents))
+            if wallet.is_loaded('searches'):
+                self.__connection.execute('DELETE FROM searches WHERE owner = ?',
+                                          (address,))
+                self.__connection.executemany(WalletRepository.UPSERT_SEARCH,
+                                              [(address, position,
+                                                json.dumps(search.filter_list))
+                                               for position, search
+                                               in enumerate(wallet.searches)])
+
+
+
+    def transactions_by_counterparty(self, foreign_address):
+        """
+        Gets transactions with a counterparty across all users
+        ======================================================
+
+        Parameters
+        ----------
+        foreign_address : str
+            The address of the counterparty.
 
         Returns
         -------
-        bool
-            True if the transaction is incoming, False if not.
+        list of tuple (str, str, int)
+            The owner wallet address, the tx ID and the time of the
+            transactions.
+        """
+
+        with self.__lock:
+            return self.__connection.execute('SELECT owner, tx, transaction_time '
+                                             'FROM transactions WHERE foreign_address = ? '
+                                             'ORDER BY transaction_time',
+                                             (foreign_address,)).fetchall()
+
+
+
+    def read_container_(self, address, name):
+
+        execute = self.__connection.execute
+        if name == 'transactions':
+            result = TransactionContainer()
+            for row in execute('SELECT tx, block_height, transaction_time, '
+                               'block_time, first_seen_time, confirmations, '
+                               'inputs, outputs, fees, foreign_address, '
+                               'confirmation_limit, raw FROM transactions '
+                               'WHERE owner = ? ORDER BY transaction_time',
+                               (address,)):
+                result.append_(CBTransaction(row[0], row[1], row[2], row[3],
+                                             row[4], row[5], json.loads(row[6]),
+                                             json.loads(row[7]), json.loads(row[8]),
+                                             row[9], confirmation_limit=row[10],
+                                             raw=row[11] or None))
+            return result
+        elif name in ['utxos', 'unconfirmed_utxos']:
+            result = UtxoContainer()
+            for row in execute('SELECT tx, sat_amount, block_height, '
+                               'confirmations, vout FROM utxos '
+                               'WHERE owner = ? AND confirmed = ?',
+                               (address, int(name == 'utxos'))):
+                result.append_(CBUtxo(row[0], sat_2_bch(row[1]), row[1], row[2],
+                                      row[3], row[4]))
+            return result
+        elif name == 'addressbook':
+            result = WalletContainer()
+            for row in execute('SELECT address, displayed_name, details, is_valid '
+                               'FROM addressbook WHERE owner = ?', (address,)):
+                result.append(Wallet(row[0], row[1], json.loads(row[2]),
+                                     is_valid=bool(row[3])))
+            return result
+        elif name == 'documents':
+            return DocumentContainer([CBDocument.from_dict_(json.loads(row[0]))
+                                      for row in execute('SELECT data FROM documents '
+                                                         'WHERE owner = ? ORDER BY position',
+                                                         (address,))])
+        elif name == 'searches':
+            return [SearchObject(json.loads(row[0]))
+                    for row in execute('SELECT filters FROM searches '
+                                       'WHERE owner = ? ORDER BY position',
+                                       (address,))]
+        raise ValueError('WalletRepository - unknown container "{}".'.format(name))
+
+
+
+    def upsert_addressbook_(self, address, wallets):
+
+        self.__connection.executemany(WalletRepository.UPSERT_ADDRESSBOOK,
+                                      [(address, item.address,
+                                        item.displayed_name,
+                                        json.dumps(item.details),
+                                        int(has_state(item.state,
+                                                      Wallet.WALLET_VALID)))
+                                       for item in wallets])
+
+
+
+    def upsert_documents_(self, address, documents):
+
+        rows = []
+        for position, item in documents:
+            data = item.to_dict_()
+            rows.append((address, position, data['id'], data['type'],
+                         data['created'], data['closed'], data['expires'],
+                         int(bool(data['certified'])),
+                         int(bool(data['anonymous'])), json.dumps(data)))
+        self.__connection.executemany(WalletRepository.UPSERT_DOCUMENT, rows)
+
+
+
+    def upsert_transactions_(self, address, transactions):
+
+        self.__connection.executemany(WalletRepository.UPSERT_TRANSACTION,
+                                      [(address, item.tx, item.block_height,
+                                        item.transaction_time, item.block_time,
+                                        item.first_seen_time,
+                                        item.stored_confirmations_,
+                                        item.confirmation_limit,
+                                        json.dumps(list(item.inputs)),
+                                        json.dumps(list(item.outputs)),
+                                        json.dumps(list(item.fees)),
+                                        item.foreign_address,
+                                        item.raw_json_())
+                                       for item in transactions])
+
+
+
+    def upsert_utxos_(self, address, utxos, confirmed):
+
+        self.__connection.executemany(WalletRepository.UPSERT_UTXO,
+                                      [(address, item.tx, item.vout,
+                                        item.sat_amount, item.block_height,
+                                        item.confirmations, int(confirmed))
+                                       for item in utxos])
+
+
+
+class WalletCache(object):
+    """
+    This class implements a bounded cache of hydrated UserWallet instances
+    ======================================================================
+
+    Notes
+    -----
+    1.
+        Wallets are kept by address in least recently used order. When the
+        estimated resident size exceeds the capacity, the least recently used
+        wallets which are not in use get evicted.
+    2.
+        Concurrent requests for the same address share a single instance, the
+        wallet is loaded only once. Use .checkout() to get exclusive access to
+        a wallet for the time of an operation.
+    3.
+        Changes of cached wallets are detected through container listeners,
+        lazy containers are watched as soon as they get loaded. With
+        write-through the writer is called right after each change,
+        otherwise dirty wallets are written at eviction or at .flush().
+    """
+
+
+
+    DEFAULT_CAPACITY = 256 * 1024 * 1024
+    WALLET_SIZE = 4096
+    TRANSACTION_SIZE = 1024
+    UTXO_SIZE = 400
+    ITEM_SIZE = 600
+    WATCHED_CONTAINERS = ['transactions', 'utxos', 'unconfirmed_utxos', 'addressbook',
+                          'documents']
+
+
+
+    def __init__(self, loader, writer=None, capacity=None, write_through=False,
+                 size_function=None):
         """
+        Initializes the WalletCache object
+        ==================================
+
+        Parameters
+        ----------
+        loader : callable
+            Function to call with an address to get a UserWallet, eg. the
+            .load() method of a WalletRepository. It may return None if the
+            address is unknown.
+        writer : callable, optional (None if omitted)
+            Function to call with a UserWallet to persist it, eg. the .save()
+            method of a WalletRepository. If omitted, cached wallets are
+            considered read-only.
+        capacity : int, optional (None if omitted)
+            Capacity of the cache in bytes. If omitted DEFAULT_CAPACITY is
+            used.
+        write_through : bool, optional (False if omitted)
+            Whether to write changes right away or at eviction only.
+        size_function : callable, optional (None if omitted)
+            Function to estimate the resident size of a wallet in bytes. If
+            omitted .estimate_size() is used.
+
+        Attributes
+        ----------
+        capacity
+        hit_rate
+        resident_size
+        stats
+        """
+
+        self.__loader = loader
+        self.__writer = writer
+        if capacity is None:
+            self.__capacity = WalletCache.DEFAULT_CAPACITY
+        else:
+            self.__capacity = capacity
+        self.__write_through = write_through
+        if size_function is None:
+            self.__size_function = WalletCache.estimate_size
+        else:
+            self.__size_function = size_function
+        self.__lock = threading.Lock()
+        self.__entries = OrderedDict()
+        self.__loading = {}
+        self.__resident_size = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__writes = 0
+
 
-        return self.__is_incoming
+
+    def __contains__(self, address):
+
+        with self.__lock:
+            return address in self.__entries
+
+
+
+    def __len__(self):
+
+        with self.__lock:
+            return len(self.__entries)
 
 
 
     @property
-    def is_outgoing(self):
+    def capacity(self):
         """
-        Gets whether the transaction is outgoing or not
-        ===============================================
+        Gets the capacity of the cache
+        ==============================
 
         Returns
         -------
-        bool
-            True if the transaction is outgoing, False if not.
+        int
+            The capacity in bytes.
         """
 
-        return self.__is_outgoing
+        return self.__capacity
+
+
+
+    @capacity.setter
+    def capacity(self, newcapacity):
+        """
+        Sets the capacity of the cache
+        ==============================
+
+        Parameters
+        ----------
+        newcapacity : int
+            The capacity in bytes. Wallets get evicted if needed.
+        """
+
+        self.__capacity = newcapacity
+        self.evict_()
 
 
 
-    @property
-    def is_well_confirmed(self):
+    def checkout(self, address):
         """
-        Gets whether the transaction is well confirmed or not
-        =====================================================
+        Gets exclusive access to a cached wallet
+        ========================================
+
+        Parameters
+        ----------
+        address : str
+            The address of the wallet.
 
         Returns
         -------
-        bool
-            True if the transaction is well confirmed, False if not.
+        WalletCheckout
+            Context manager which holds the lock of the wallet and returns the
+            wallet (or None if the address is unknown) on enter.
+
+        Notes
+        -----
+            A checked out wallet is never evicted. Its size is re-estimated
+            when the context is left.
         """
 
-        return self.confirmations >= self.confirmation_limit
+        return WalletCheckout(self, address)
 
 
 
-    @property
-    def is_unconfirmed(self):
+    @classmethod
+    def estimate_size(cls, wallet):
         """
-        Gets whether the transaction is unconfirmed or not
-        ==================================================
+        Estimates the resident size of a wallet
+        =======================================
+
+        Parameters
+        ----------
+        wallet : UserWallet
+            The wallet to estimate the size of.
 
         Returns
         -------
-        bool
-            True if the transaction is unconfirmed, False if not.
+        int
+            The estimated size in bytes.
+
+        Notes
+        -----
+            The estimation counts loaded containers only and uses average item
+            sizes instead of walking the object graph. Transactions of a
+            TransactionStore count only while they are hydrated.
         """
 
-        return self.confirmations == 0
+        size = cls.WALLET_SIZE
+        if wallet.is_loaded('transactions'):
+            transactions = wallet.transactions
+            if isinstance(transactions, StoredTransactionContainer):
+                count = len(transactions) - transactions.stored_count_()
+            else:
+                count = len(transactions)
+            size += cls.TRANSACTION_SIZE * count
+        for name in ['utxos', 'unconfirmed_utxos']:
+            if wallet.is_loaded(name):
+                size += cls.UTXO_SIZE * len(getattr(wallet, name))
+        for name in ['addressbook', 'documents', 'searches']:
+            if wallet.is_loaded(name):
+                size += cls.ITEM_SIZE * len(getattr(wallet, name))
+        return size
 
 
 
-    @property
-    def outputs(self):
+    def evict(self, address):
         """
-        Gets the output components of the transaction
-        ==============//=============================
+        Evicts a wallet from the cache
+        ==============================
+
+        Parameters
+        ----------
+        address : str
+            The address of the wallet.
 
         Returns
         -------
-        list
-            List of the output components.
+        bool
+            True if the wallet was evicted, False if it wasn't in the cache.
+
+        Notes
+        -----
+            A dirty wallet is written before eviction.
         """
 
-        return self.__outputs
+        with self.__lock:
+            entry = self.__entries.pop(address, None)
+            if entry is None:
+                return False
+            self.__resident_size -= entry.size
+            self.__evictions += 1
+        with entry.lock:
+            self.release_entry_(entry)
+        return True
 
 
 
-    @property
-    def paid(self):
+    def flush(self):
         """
-        Gets the paid amount of the transaction
-        =======================================
+        Writes all dirty wallets
+        ========================
 
         Returns
         -------
-        float
-            The calculated paid amount.
+        int
+            The number of written wallets.
         """
 
-        return self.__paid
+        with self.__lock:
+            entries = list(self.__entries.values())
+        count = 0
+        for entry in entries:
+            with entry.lock:
+                if entry.dirty:
+                    self.write_entry_(entry)
+                    count += 1
+        return count
 
 
 
-    @property
-    def raw(self):
+    def get(self, address):
         """
-        Gets the raw data of the transaction
-        ====================================
+        Gets a wallet from the cache
+        ============================
+
+        Parameters
+        ----------
+        address : str
+            The address of the wallet.
 
         Returns
         -------
-        dict
-            The raw transaction data.
+        UserWallet
+            The cached or freshly loaded wallet.
+        None
+            If the loader doesn't know the address.
+
+        Notes
+        -----
+            If many threads ask for the same missing address at the same time,
+            only one of them loads it and the others wait for its result.
         """
 
-        return self.__raw
+        entry = self.get_entry_(address)
+        if entry is None:
+            return None
+        return entry.wallet
 
 
 
     @property
-    def received(self):
+    def hit_rate(self):
         """
-        Gets the received amount of the transaction
-        ===========================================
+        Gets the hit rate of the cache
+        ==============================
 
         Returns
         -------
         float
-            The calculated received amount.
+            Ratio of hits and all requests, 0.0 if there was no request yet.
         """
 
-        return self.__received
+        total = self.__hits + self.__misses
+        if total == 0:
+            return 0.0
+        return self.__hits / total
 
 
 
-    @property
-    def total_input(self):
+    def lock(self, address):
         """
-        Gets the total input of the transaction
-        =======================================
+        Gets the lock of a cached wallet
+        ================================
+
+        Parameters
+        ----------
+        address : str
+            The address of the wallet.
 
         Returns
         -------
-        float
-            The calculated total input.
+        threading.RLock
+            The lock of the wallet.
+        None
+            If the wallet is not in the cache.
         """
 
-        return self.__total_input
+        with self.__lock:
+            entry = self.__entries.get(address)
+        if entry is None:
+            return None
+        return entry.lock
 
 
 
-    @property
-    def total_output(self):
+    def refresh_size(self, address):
         """
-        Gets the total output of the transaction
-        ========================================
+        Re-estimates the resident size of a cached wallet
+        =================================================
 
-        Returns
-        -------
-        float
-            The calculated total output.
+        Parameters
+        ----------
+        address : str
+            The address of the wallet.
+
+        Notes
+        -----
+            Sizes are re-estimated automatically when a checkout ends, this
+            method is useful after changes outside of .checkout().
         """
 
-        return self.__total_output
+        with self.__lock:
+            entry = self.__entries.get(address)
+        if entry is not None:
+            self.resize_entry_(entry)
+            self.evict_()
 
 
 
     @property
-    def transaction_time(self):
+    def resident_size(self):
         """
-        Gets the time of the transaction
-        ================================
+        Gets the estimated resident size of the cache
+        =============================================
 
         Returns
         -------
         int
-            The transaction's time.
+            The estimated size of all cached wallets in bytes.
         """
 
-        return self.__transaction_time
+        return self.__resident_size
 
 
 
     @property
-    def tx(self):
+    def stats(self):
         """
-        Gets the tx ID of the transaction
-        =================================
+        Gets the statistics of the cache
+        ================================
 
         Returns
         -------
-        int
-            The tx ID.
+        dict
+            Statistics with the following keys: hits, misses, hit_rate,
+            evictions, writes, wallets, resident_size, capacity.
         """
 
-        return self.__tx
-
+        with self.__lock:
+            wallets = len(self.__entries)
+        return {'hits': self.__hits,
+                'misses': self.__misses,
+                'hit_rate': self.hit_rate,
+                'evictions': self.__evictions,
+                'writes': self.__writes,
+                'wallets': wallets,
+                'resident_size': self.__resident_size,
+                'capacity': self.__capacity}
 
 
-class TransactionContainer(list):
-    """
-    Provides a container for the transactions of the user
-    """
-
 
-
-    def __init__(self, transactions=None):
+    def evict_(self):
         """
-        Intializes the TransactionContainer object
-        ==========================================
-
-        Parameters
-        ----------
-        transactions : list
-            List of transactions to add to the container right at instantiation.
+        Evicts least recently used wallets over capacity
+        ================================================
 
         Notes
         -----
-            TransactionContainer is a subclass of list, please keep this in
-            mind if you are using an instance of this class.
+            Wallets in use are skipped and the most recently used wallet is
+            never evicted.
         """
 
-        add_transactions = True
-        if transactions is None:
-            add_transactions = False
-        elif isinstance(transactions, Iterable):
-            for transaction in transactions:
-                if not isinstance(transaction, CBTransaction):
-                    add_transactions = False
-                    break
-        if add_transactions:
-            super(self.__class__, self).__init__(transactions)
-        else:
-            super(self.__class__, self).__init__()
+        victims = []
+        with self.__lock:
+            if self.__resident_size > self.__capacity:
+                for address, entry in list(self.__entries.items())[:-1]:
+                    if self.__resident_size <= self.__capacity:
+                        break
+                    if entry.users > 0:
+                        continue
+                    del self.__entries[address]
+                    self.__resident_size -= entry.size
+                    self.__evictions += 1
+                    victims.append(entry)
+        for entry in victims:
+            with entry.lock:
+                self.release_entry_(entry)
 
 
 
-    def append(self, item):
+    def get_entry_(self, address, use=False):
         """
-        Appends a new item to the TransactionContainer
-        ==============================================
+        Gets or loads the cache entry of an address
+        ===========================================
 
         Parameters
         ----------
-        item : CBTransaction
-            Item to add to the container.
+        address : str
+            The address of the wallet.
+        use : bool, optional (False if omitted)
+            Whether to count the entry as in use or not.
 
-        Throws
-        ------
-        TypeError
-            If the type of the item is not CBTransaction.
-        """
+        Returns
+        -------
+        WalletCacheEntry
+            The entry.
+        None
+            If the loader doesn't know the address.
+        """
+
+        with self.__lock:
+            entry = self.__entries.get(address)
+            if entry is not None:
+                self.__entries.move_to_end(address)
+                self.__hits += 1
+                if use:
+                    entry.users += 1
+                return entry
+            event = self.__loading.get(address)
+            is_loader = event is None
+            if is_loader:
+                event = threading.Event()
+                self.__loading[address] = event
+                self.__misses += 1
+            else:
+                self.__hits += 1
+        if not is_loader:
+            event.wait()
+            with self.__lock:
+                entry = self.__entries.get(address)
+                if entry is not None and use:
+                    entry.users += 1
+            return entry
+        try:
+            wallet = self.__loader(address)
+            if wallet is not None:
+                entry = WalletCacheEntry(wallet)
+                entry.size = self.__size_function(wallet)
+                self.watch_(entry)
+                with self.__lock:
+                    self.__entries[address] = entry
+                    self.__resident_size += entry.size
+                    if use:
+                        entry.users += 1
+        finally:
+            with self.__lock:
+                del self.__loading[address]
+            event.set()
+        self.evict_()
+        return entry
 
-        if isinstance(item, CBTransaction):
-            if not self.contains_tx(item.tx):
-                super(self.__class__, self).append(item)
-        else:
-            raise TypeError('Tried to add a non-CBTransaction instance to a TransactionContainer.')
 
 
+    def release_entry_(self, entry):
 
-    def contains_tx(self, tx):
-        """
-        Checks whether a tx is added yet or not
-        =======================================
+        if entry.load_listener is not None:
+            entry.wallet.remove_load_listener(entry.load_listener)
+            entry.load_listener = None
+        for container, listener in entry.listeners:
+            container.remove_listener(listener)
+        entry.listeners = []
+        if entry.dirty:
+            self.write_entry_(entry)
 
-        Parameters
-        ----------
-        tx : str
-            The tx to search for.
 
-        Returns
-        -------
-        bool
-            True if the tx is found, False if not.
-        """
 
-        for transaction in self:
-            if transaction.tx == tx:
-                return True
-        return False
+    def resize_entry_(self, entry):
 
+        size = self.__size_function(entry.wallet)
+        with self.__lock:
+            if self.__entries.get(entry.wallet.address) is entry:
+                self.__resident_size += size - entry.size
+            entry.size = size
 
 
-    def append_(self, item):
-        """
-        Appends item to the container without check
-        ===========================================
 
-        Parameters
-        ----------
-        item : CBTransaction
-            Item to add to the container.
+    def return_entry_(self, entry):
 
-        Notes
-        -----
-            This function is a backdoor only. Its usage is unadvised and can
-            lead to unexpected errors.
-        """
+        with self.__lock:
+            entry.users -= 1
+        self.resize_entry_(entry)
+        self.evict_()
 
-        super(self.__class__, self).append(item)
 
 
+    def watch_(self, entry):
 
-class CBUtxo(object):
-    """
-    This class represents an utxo
-    """
+        def listener(container, event, item):
+            if event == CBContainer.CONTAINER_UPDATE and isinstance(container,
+                                                                    TransactionContainer):
+                return
+            entry.dirty = True
+            if self.__write_through:
+                with entry.lock:
+                    self.write_entry_(entry)
 
-    def __init__(self, tx, amount, sat_amount, block_height, confirmations):
-        """
-        Initializes the CBUtxo object
-        =============================
+        def on_load(wallet, name, container):
+            if name in WalletCache.WATCHED_CONTAINERS:
+                container.add_listener(listener)
+                entry.listeners.append((container, listener))
 
-        Parameters
-        ----------
-        tx : int
-            Tx ID of the utxo.
-        amount : float
-            The amount of the utxo in bitcoincash.
-        sat_amount : int
-            The amount of the utxo in satoshis.
-        block_height : int
-            The block height of the utxo.
-        confirmations : int
-            The number of confirmations of the utxo.
-        """
+        if self.__writer is not None:
+            for name in WalletCache.WATCHED_CONTAINERS:
+                if entry.wallet.is_loaded(name):
+                    on_load(entry.wallet, name, getattr(entry.wallet, name))
+            entry.wallet.add_load_listener(on_load)
+            entry.load_listener = on_load
 
-        self.__tx = tx
-        self.__amount = amount
-        self.__sat_amount = sat_amount
-        self.__block_height = block_height
-        self.__confirmations = confirmations
 
 
+    def write_entry_(self, entry):
 
-    @property
-    def amount(self):
-        """
-        Gets the amount stored in the utxo
-        ==================================
+        if self.__writer is not None:
+            self.__writer(entry.wallet)
+            self.__writes += 1
+        entry.dirty = False
 
-        Returns
-        -------
-        float
-            The amount stored.
-        """
 
-        return self.__amount
 
+class WalletCacheEntry(object):
+    """
+    This class holds a wallet and its bookkeeping in a WalletCache
+    ==============================================================
 
+    Notes
+    -----
+        The attributes are public for the WalletCache. The size and the
+        number of users are guarded by the lock of the cache, the wallet by
+        .lock of the entry.
+    """
 
-    @property
-    def block_height(self):
-        """
-        Gets the block height of the utxo
-        =================================
 
-        Returns
-        -------
-        int
-            The block height.
-        """
 
-        return self.__block_height
+    def __init__(self, wallet):
+
+        self.wallet = wallet
+        self.lock = threading.RLock()
+        self.size = 0
+        self.users = 0
+        self.dirty = False
+        self.listeners = []
+        self.load_listener = None
 
 
 
-    @property
-    def confirmations(self):
-        """
-        Gets the number of confirmations of the utxo
-        ============================================
+class WalletCheckout(object):
+    """
+    This class is the context manager of WalletCache.checkout()
+    ===========================================================
 
-        Returns
-        -------
-        int
-            The number of confirmations.
-        """
+    Notes
+    -----
+        The entry of the wallet is counted as in use from entering until
+        leaving the context, so the wallet is not evicted meanwhile.
+    """
 
-        return self.__confirmations
 
 
+    def __init__(self, cache, address):
 
-    @property
-    def sat_amount(self):
-        """
-        Gets the satoshis stored in the utxo
-        ====================================
+        self.__cache = cache
+        self.__address = address
+        self.__entry = None
 
-        Returns
-        -------
-        int
-            The amount stored.
-        """
 
-        return self.__sat_amount
 
+    def __enter__(self):
 
+        self.__entry = self.__cache.get_entry_(self.__address, True)
+        if self.__entry is None:
+            return None
+        self.__entry.lock.acquire()
+        return self.__entry.wallet
 
-    @property
-    def tx(self):
-        """
-        Gets the tx ID of the utxo
-        ==========================
 
-        Returns
-        -------
-        int
-            The tx ID.
-        """
 
-        return self.__tx
+    def __exit__(self, exc_type, exc_value, traceback):
 
+        if self.__entry is not None:
+            self.__entry.lock.release()
+            self.__cache.return_entry_(self.__entry)
+            self.__entry = None
+        return False
 
 
 
-class UtxoContainer(list):
+class TokenBucket(object):
     """
-    Provides a container for the utxos of the user
+    This class implements a thread-safe token bucket rate limiter
+    =============================================================
 
     Notes
     -----
-        Both utxos and uncofrimed utxos are stored in the same container types.
-        Though the container types are the same, this means two separate
-        instances.
+        Tokens are added continuously at the given rate up to the capacity.
+        The bucket is refilled lazily by the calls, so it needs no thread of
+        its own.
     """
 
 
 
-    def __init__(self, utxos=None):
+    def __init__(self, rate, capacity=None):
         """
-        Intializes the UtxoContainer object
-        ===================================
+        Initializes the TokenBucket object
+        ==================================
 
         Parameters
         ----------
-        utxos : list
-            List of utxos to add to the container right at instantiation.
+        rate : float
+            Number of tokens added per second.
+        capacity : float, optional (None if omitted)
+            Maximal number of tokens to store, the size of bursts. If omitted
+            it equals to rate.
 
-        Notes
-        -----
-            UtxoContainer is a subclass of list, please keep this in mind if
-            you are using an instance of this class.
+        Attributes
+        ----------
+        capacity
+        rate
         """
 
-        add_utxos = True
-        if utxos is None:
-            add_utxos = False
-        elif isinstance(utxos, Iterable):
-            for utxo in utxos:
-                if not isinstance(utxo, CBUtxo):
-                    add_utxos = False
-                    break
-        if add_utxos:
-            super(self.__class__, self).__init__(utxos)
+        self.__rate = rate
+        if capacity is None:
+            self.__capacity = rate
         else:
-            super(self.__class__, self).__init__()
+            self.__capacity = capacity
+        self.__tokens = self.__capacity
+        self.__updated = time()
+        self.__lock = threading.Lock()
 
 
 
-    def append(self, item):
+    def acquire(self, count=1):
         """
-        Appends a new item to the UtxoContainer
-        =======================================
+        Takes tokens from the bucket
+        ============================
 
         Parameters
         ----------
-        item : CBUtxo
-            Item to add to the container.
+        count : float, optional (1 if omitted)
+            Number of tokens to take.
 
         Throws
         ------
-        TypeError
-            If the type of the item is not CBUtxo.
+        ValueError
+            If count is more than the capacity, since the bucket can never
+            hold that many tokens.
+
+        Notes
+        -----
+            The call blocks until there are enough tokens in the bucket.
         """
 
-        if isinstance(item, CBUtxo):
-            if not self.contains_tx(item.tx):
-                super(self.__class__, self).append(item)
-        else:
-            raise TypeError('Tried to add a non-CBUtxo instance to a UtxoContainer.')
+        if count > self.__capacity:
+            raise ValueError('TokenBucket.acquire() - {} tokens requested, capacity is {}.'
+                             .format(count, self.__capacity))
+        while True:
+            with self.__lock:
+                self.refill_()
+                if self.__tokens >= count:
+                    self.__tokens -= count
+                    return
+                delay = (count - self.__tokens) / self.__rate
+            sleep(delay)
 
 
 
-    def contains_tx(self, tx):
+    @property
+    def capacity(self):
         """
-        Checks whether a tx is added yet or not
-        =======================================
-
-        Parameters
-        ----------
-        tx : str
-            The tx to search for.
+        Gets the capacity of the bucket
+        ===============================
 
         Returns
         -------
-        bool
-            True if the tx is found, False if not.
+        float
+            Maximal number of stored tokens.
         """
 
-        for utxo in self:
-            if utxo.tx == tx:
-                return True
-        return False
+        return self.__capacity
 
 
 
-    def append_(self, item):
+    @property
+    def rate(self):
         """
-        Appends item to the container without check
-        ===========================================
-
-        Parameters
-        ----------
-        item : CBUtxo
-            Item to add to the container.
+        Gets the rate of the bucket
+        ===========================
 
-        Notes
-        -----
-            This function is a backdoor only. Its usage is unadvised and can
-            lead to unexpected errors.
+        Returns
+        -------
+        float
+            Number of tokens added per second.
         """
 
-        super(self.__class__, self).append(item)
-
-
-
-class CBDocument(object):
-    """
-    This class represents the top level parent class of documents
-    """
-
-
-
-    DOCUMENT_INSTANTIATED = 0
-    DOCUMENT_CREATED = 1
-    DOCUMENT_HAS_ID = 2
-    DOCUMENT_CLOSED = 4
-    DOCUMENT_EXPIRES = 8
-    DOCUMENT_IS_ANONYMOUS = 16
-    DOCUMENT_IS_CERTIFIED = 32
-    DOCUMENT_EXPIRED = 64
+        return self.__rate
 
 
 
-    def __init__(self, owner=None, id=None, created_at=None, closed_at=None,
-                 expires_at=None, is_certified=False, is_anonymous=False):
+    def try_acquire(self, count=1):
         """
-        Initializes the CBDocument
-        ==========================
+        Takes tokens from the bucket if possible
+        ========================================
 
         Parameters
         ----------
-        owner=None, id=None, created_at=None, closed_at=None,
-                     expires_at=None, is_certified=False, is_anonymous=False
-        """
-
-        self.__owner = None
-        self.__id = None
-        self.__created = None
-        self.__closed = None
-        self.__expires = None
-        self.__certified = False
-        self.__anonymous = False
-        self.owner = owner
-        self.id = id
-        self.created = created_at
-        self.closed = closed_at
-        self.expires = expires_at
-        self.certified = is_certified
+        count : float, optional (1 if omitted)
+            Number of tokens to take.
 
+        Returns
+        -------
+        bool
+            True if the tokens are taken, False if there are not enough tokens.
+        """
 
-
-    @property
-    def anonymous(self):
-
-        return self.__anonymous
-
+        with self.__lock:
+            self.refill_()
+            if self.__tokens >= count:
+                self.__tokens -= count
+                return True
+            return False
 
 
-    @anonymous.setter
-    def anonymous(self, newstate):
 
-            self.__anonymous = newstate
+    def refill_(self):
+        """
+        Adds the tokens accrued since the last refill
+        =============================================
 
+        Notes
+        -----
+            Tokens are added at the rate of the bucket for the time elapsed
+            since the last refill, up to the capacity. This function must be
+            called with the lock held.
+        """
 
+        now_ = time()
+        self.__tokens = min(self.__capacity,
+                            self.__tokens + (now_ - self.__updated) * self.__rate)
+        self.__updated = now_
 
-    @property
-    def certified(self):
 
-        return self.__certified
 
+class SyncScheduler(object):
+    """
+    This class refreshes many user wallets with bulk queries
+    ========================================================
 
+    Notes
+    -----
+    1.
+        Wallets are synchronized in batches of BitcoinAPI.BULK_LIMIT addresses.
+        Details, confirmed and unconfirmed utxos of a batch are queried with
+        one bulk request each. Transactions are queried per wallet, only if
+        the number of transactions in the details has changed since the last
+        synchronization.
+    2.
+        Wallets are prioritized by staleness weighted by their recent
+        activity, wallets never synchronized come first.
+    3.
+        Batches run on a bounded pool of worker threads and every request
+        passes the rate limiter of the API, so the rate budget is global.
+    """
 
-    @certified.setter
-    def certified(self, newstate):
 
-        self.__certified = newstate
 
+    DEFAULT_WORKERS = 4
+    ACTIVITY_DECAY = 0.5
 
 
-    @property
-    def closed(self):
 
-        return self.__closed
+    def __init__(self, api=None, cache=None, workers=None, rate=None,
+                 batch_size=None):
+        """
+        Initializes the SyncScheduler object
+        ====================================
 
+        Parameters
+        ----------
+        api : BitcoinAPI, optional (None if omitted)
+            The API instance to query with. If omitted a new instance is used.
+        cache : WalletCache, optional (None if omitted)
+            Cache to check out wallets from, which are added by address.
+        workers : int, optional (None if omitted)
+            Number of worker threads. If omitted DEFAULT_WORKERS is used.
+        rate : float, optional (None if omitted)
+            Maximal number of requests per second. If given, a TokenBucket is
+            set as the rate limiter of the API.
+        batch_size : int, optional (None if omitted)
+            Number of addresses in a batch. If omitted BitcoinAPI.BULK_LIMIT
+            is used.
 
+        Attributes
+        ----------
+        addresses
+        stats
+        """
+
+        if api is None:
+            api = BitcoinAPI()
+        self.__api = api
+        if rate is not None:
+            self.__api.rate_limiter = TokenBucket(rate)
+        self.__cache = cache
+        if workers is None:
+            self.__workers = SyncScheduler.DEFAULT_WORKERS
+        else:
+            self.__workers = workers
+        if batch_size is None:
+            self.__batch_size = BitcoinAPI.BULK_LIMIT
+        else:
+            self.__batch_size = batch_size
+        self.__lock = threading.Lock()
+        self.__states = {}
+        self.__synced = 0
+        self.__errors = 0
+        self.__changes = 0
+        self.__busy_time = 0.0
 
-    @closed.setter
-    def closed(self, timestamp=0):
 
-        if self.__closed is None:
-            if timestamp == 0:
-                self.__closed = now()
-            else:
-                if timestamp <= now():
-                    self.__closed = timestamp
-                else:
-                    raise ValueError('ChainBridgeDocument can be just closed now or can be restored.')
-        else:
-            raise PermissionError('Tried to close a closed ChainBridgeDocument instance.')
 
+    def __len__(self):
 
+        return len(self.__states)
 
-    @property
-    def created(self):
 
-        return self.__created
 
+    def add(self, wallet):
+        """
+        Adds a wallet to the schedule
+        =============================
 
+        Parameters
+        ----------
+        wallet : UserWallet, str
+            The wallet or the address of the wallet to check out from the
+            cache.
 
-    @created.setter
-    def created(self, timestamp=0):
+        Throws
+        ------
+        ValueError
+            If an address is given without cache.
+        """
 
-        if self.__created is None:
-            if timestamp == 0:
-                self.__created = now()
-            else:
-                if timestamp <= now():
-                    self.__created = timestamp
-                else:
-                    raise ValueError('ChainBridgeDocument can be just created now or can be restored.')
+        if isinstance(wallet, UserWallet):
+            address = wallet.address
+        elif self.__cache is not None:
+            address = wallet
+            wallet = None
         else:
-            raise PermissionError('Tried to create a created ChainBridgeDocument instance.')
+            raise ValueError('SyncScheduler.add() - addresses can be added with cache only.')
+        with self.__lock:
+            if address not in self.__states:
+                self.__states[address] = {'wallet': wallet, 'synced': None,
+                                          'activity': 0.0, 'appearances': None,
+                                          'errors': 0}
 
 
 
     @property
-    def expires(self):
-
-        return self.__expires
-
+    def addresses(self):
+        """
+        Gets the scheduled addresses
+        ============================
 
+        Returns
+        -------
+        list of str
+            The addresses of the scheduled wallets.
+        """
 
-    @expires.setter
-    def expires(self, timestamp):
+        with self.__lock:
+            return list(self.__states.keys())
 
-        if self.is_editable_('set expieration'):
-            self.__expires = timestamp
 
 
+    def due(self, limit=None):
+        """
+        Gets the addresses to synchronize next
+        ======================================
 
-    @property
-    def id(self):
+        Parameters
+        ----------
+        limit : int, optional (None if omitted)
+            Maximal number of addresses to get. If omitted all addresses are
+            returned.
 
-        return self.__id
+        Returns
+        -------
+        list of str
+            Addresses in the order of priority.
+        """
 
+        now_ = time()
+        with self.__lock:
+            ranking = sorted(self.__states.items(),
+                             key=lambda item: self.priority_(item[1], now_),
+                             reverse=True)
+        if limit is not None:
+            ranking = ranking[:limit]
+        return [address for address, state in ranking]
 
 
-    @id.setter
-    def id(self, newid):
 
-        if self.is_editable_('add id'):
-            if self.__id is None:
-                self.__id = newid
-            else:
-                raise PermissionError('Tried to add id for a ChainBridgeDocument instance with id.')
+    def freshness(self):
+        """
+        Gets the freshness of the wallets
+        =================================
 
+        Returns
+        -------
+        dict
+            Number of seconds since the last synchronization by address. The
+            value is None for wallets never synchronized.
+        """
 
+        now_ = time()
+        with self.__lock:
+            return {address: None if state['synced'] is None
+                    else now_ - state['synced']
+                    for address, state in self.__states.items()}
 
-    @property
-    def owner(self):
 
-        return self.__owner
 
+    def remove(self, address):
+        """
+        Removes a wallet from the schedule
+        ==================================
 
+        Parameters
+        ----------
+        address : str
+            The address of the wallet.
+        """
 
-    @owner.setter
-    def owner(self, newowner):
+        with self.__lock:
+            self.__states.pop(address, None)
 
-        if self.is_editable_('add owner'):
-            if self.__owner is None:
-                self.__owner = newowner
-            else:
-                raise PermissionError('Tried to add owner for a ChainBridgeDocument instance with owner.')
 
 
+    def run(self, interval, cancel, limit=None):
+        """
+        Runs synchronization rounds until cancelled
+        ===========================================
 
-    @property
-    def state(self):
+        Parameters
+        ----------
+        interval : float
+            Number of seconds between the start of rounds.
+        cancel : threading.Event
+            Event to set to stop running.
+        limit : int, optional (None if omitted)
+            Maximal number of wallets in a round.
+        """
 
-        result = CBDocument.DOCUMENT_INSTANTIATED
-        if self.created is not None:
-            result += CBDocument.DOCUMENT_CREATED
-        if self.id is not None:
-            result += CBDocument.DOCUMENT_HAS_ID
-        if self.closed is not None:
-            result += CBDocument.DOCUMENT_CLOSED
-        if self.expires is not None:
-            result += CBDocument.DOCUMENT_EXPIRES
-        if self.anonymous:
-            result += CBDocument.DOCUMENT_IS_ANONYMOUS
-        if self.certified:
-            result += CBDocument.DOCUMENT_IS_CERTIFIED
-        if self.expires < now():
-            result += CBDocument.DOCUMENT_EXPIRED
-        return result
+        while not cancel.is_set():
+            start = time()
+            self.run_once(limit)
+            cancel.wait(max(0.0, interval - (time() - start)))
 
 
 
-    def is_editable_(self, activity_name='manipulate', drop_error=True):
+    def run_once(self, limit=None):
+        """
+        Runs a synchronization round
+        ============================
 
-        if self.created is None or self.closed is not None:
-            if drop_error:
-                raise PermissionError('Tried to {} of a ChainBridgeDocument instance in non-editable state.'
-                                      .format(activity_name))
-            else:
-                return False
+        Parameters
+        ----------
+        limit : int, optional (None if omitted)
+            Maximal number of wallets to synchronize. If omitted every wallet
+            is synchronized.
+
+        Returns
+        -------
+        dict
+            Report of the round with the following keys: wallets, changes,
+            errors, seconds, wallets_per_minute.
+        """
+
+        start = time()
+        addresses = self.due(limit)
+        batches = [addresses[i:i + self.__batch_size]
+                   for i in range(0, len(addresses), self.__batch_size)]
+        synced = 0
+        changes = 0
+        errors = 0
+        with ThreadPoolExecutor(max_workers=self.__workers) as executor:
+            for result in executor.map(self.sync_batch_, batches):
+                synced += result[0]
+                changes += result[1]
+                errors += result[2]
+        seconds = time() - start
+        with self.__lock:
+            self.__synced += synced
+            self.__changes += changes
+            self.__errors += errors
+            self.__busy_time += seconds
+        if seconds > 0:
+            rate = synced * 60 / seconds
         else:
-            return True;
+            rate = 0.0
+        return {'wallets': synced, 'changes': changes, 'errors': errors,
+                'seconds': seconds, 'wallets_per_minute': rate}
 
 
 
-class ProtectedCBDocument(CBDocument):
-    """
-    This is an abstract mid-level class to relize a protected document
-    ==================================================================
-    """
+    @property
+    def stats(self):
+        """
+        Gets the statistics of the scheduler
+        ====================================
 
+        Returns
+        -------
+        dict
+            Statistics with the following keys: wallets, synced, changes,
+            errors, wallets_per_minute, oldest.
 
+        Notes
+        -----
+            The throughput is measured on the time spent in rounds, oldest is
+            the largest number of seconds since the last synchronization of a
+            wallet, or None if there is any wallet never synchronized.
+        """
 
-    def __init__(self, owner, permission_function, id=None,
-                 created_at=None, closed_at=None, expires_at=None,
-                 is_certified=False, is_anonymous=False):
+        ages = list(self.freshness().values())
+        if len(ages) == 0:
+            oldest = 0.0
+        elif None in ages:
+            oldest = None
+        else:
+            oldest = max(ages)
+        with self.__lock:
+            if self.__busy_time > 0:
+                rate = self.__synced * 60 / self.__busy_time
+            else:
+                rate = 0.0
+            return {'wallets': len(self.__states), 'synced': self.__synced,
+                    'changes': self.__changes, 'errors': self.__errors,
+                    'wallets_per_minute': rate, 'oldest': oldest}
 
-        super(self.__class__, self).__init__(owner=owner, id=id,
-                                             created_at=created_at,
-                                             closed_at=closed_at,
-                                             expires_at=expires_at,
-                                             is_certified=is_certified,
-                                             is_anonymous=is_anonymous)
-        self.__check_permission = permission_function
 
 
+    def checkout_(self, address, state):
 
-    @CBDocument.anonymous.setter
-    def anonymous(self, newstate):
+        if state['wallet'] is not None:
+            return nullcontext(state['wallet'])
+        return self.__cache.checkout(address)
 
-        if self.check_permission('anonymous'):
-            super(self.__class__, self).anonymous(newstate)
 
 
+    @classmethod
+    def priority_(cls, state, now_):
 
-    @property
-    def check_permission(self, query_string):
+        if state['synced'] is None:
+            return float('inf')
+        return (now_ - state['synced']) * (1 + state['activity'])
 
-        return self.__check_permission(query_string)
 
 
+    def sync_batch_(self, addresses):
+        """
+        Synchronizes a batch of wallets
+        ===============================
 
-    @CBDocument.certified.setter
-    def certified(self, newstate):
+        Parameters
+        ----------
+        addresses : list of str
+            The addresses of the wallets.
 
-        if self.check_permission('certify'):
-            super(self.__class__, self).certified(newstate)
+        Returns
+        -------
+        tuple (int, int, int)
+            Number of synchronized wallets, changes and errors.
 
+        Notes
+        -----
+            Errors don't stop the scheduler, they are counted per wallet
+            instead.
+        """
+
+        try:
+            details = self.__api.get_addresses_details(addresses)
+            confirmed = self.__api.get_addresses_utxo(addresses)
+            unconfirmed = self.__api.get_addresses_unconfirmed(addresses)
+        except Exception:
+            details = None
+        if details is None or confirmed is None or unconfirmed is None:
+            with self.__lock:
+                for address in addresses:
+                    state = self.__states.get(address)
+                    if state is not None:
+                        state['errors'] += 1
+            return 0, 0, len(addresses)
+        synced = 0
+        changes = 0
+        errors = 0
+        for address in addresses:
+            with self.__lock:
+                state = self.__states.get(address)
+            if state is None:
+                continue
+            try:
+                with self.checkout_(address, state) as wallet:
+                    if wallet is None:
+                        raise ValueError('SyncScheduler - unknown wallet.')
+                    count = len(wallet.reconcile_utxos(confirmed.get(address),
+                                                       unconfirmed.get(address)))
+                    record = details.get(address, {})
+                    appearances = (record.get('txApperances', 0)
+                                   + record.get('unconfirmedTxApperances', 0))
+                    if appearances != state['appearances']:
+                        count += len(wallet.sync_transactions(self.__api))
+                        state['appearances'] = appearances
+            except Exception:
+                state['errors'] += 1
+                errors += 1
+                continue
+            state['activity'] = state['activity'] * SyncScheduler.ACTIVITY_DECAY + count
+            state['synced'] = time()
+            synced += 1
+            changes += count
+        return synced, changes, errors
 
 
-class StatementOfAccount(ProtectedCBDocument):
+
+class AdaptivePoller(object):
     """
-    This class represents an Account Activity document
+    This class polls the unconfirmed utxos of wallets adaptively
+    ============================================================
+
+    Notes
+    -----
+    1.
+        Every wallet has its own polling interval. A poll which finds pending
+        or changed unconfirmed utxos resets the interval to the minimum, a
+        poll which finds nothing multiplies the interval by the backoff
+        factor up to the maximum. Dormant wallets cost a request only rarely
+        while active ones are polled often.
+    2.
+        Due wallets are kept in a heap ordered by their next poll time, so
+        the cost of finding the due wallets doesn't depend on the number of
+        wallets.
+    3.
+        Changes are fed into the utxo containers of the wallet, which notify
+        their listeners and bump their versions, therefore caches listening
+        to the containers or keyed by their versions get invalidated.
     """
 
 
 
-    def __init__(self, owner, from_date, to_date, permission_function, id=None,
-                 created_at=None, closed_at=None, expires_at=None,
-                 is_certified=False, is_anonymous=False):
+    DEFAULT_MIN_INTERVAL = 10.0
+    DEFAULT_MAX_INTERVAL = 3600.0
+    DEFAULT_BACKOFF = 2.0
 
-        if created_at is None:
-            created_at = now()
-        super(self.__class__, self).__init__(owner=owner,
-                                             permission_function=permission_function,
-                                             id=id, created_at=created_at,
-                                             closed_at=closed_at,
-                                             expires_at=expires_at,
-                                             is_certified=is_certified,
-                                             is_anonymous=is_anonymous)
-        if from_date > now():
-            raise ValueError('StatementOfAccount.init() - beginning cannot be in the future.')
-        if to_date < from_date:
-            raise ValueError('StatementOfAccount.init() - ending date cannot be earlier than beginning date.')
-        self.__from_date = from_date
-        self.__to_date = to_date
 
 
+    def __init__(self, api=None, cache=None, min_interval=None,
+                 max_interval=None, backoff=None, listener=None):
+        """
+        Initializes the AdaptivePoller object
+        =====================================
 
-    @property
-    def from_date(self):
+        Parameters
+        ----------
+        api : BitcoinAPI, optional (None if omitted)
+            The API instance to query with. If omitted a new instance is used.
+        cache : WalletCache, optional (None if omitted)
+            Cache to check out wallets from, which are added by address.
+        min_interval : float, optional (None if omitted)
+            Polling interval of active wallets in seconds. If omitted
+            DEFAULT_MIN_INTERVAL is used.
+        max_interval : float, optional (None if omitted)
+            Longest polling interval of dormant wallets in seconds. If omitted
+            DEFAULT_MAX_INTERVAL is used.
+        backoff : float, optional (None if omitted)
+            Factor to multiply the interval of a wallet with after a poll
+            without activity. If omitted DEFAULT_BACKOFF is used.
+        listener : callable, optional (None if omitted)
+            Function to call with (address, changes) when a poll finds
+            changes, where changes is the result of
+            UserWallet.reconcile_utxos().
 
-        return self.__from_date
+        Attributes
+        ----------
+        stats
+        """
 
+        if api is None:
+            api = BitcoinAPI()
+        self.__api = api
+        self.__cache = cache
+        if min_interval is None:
+            self.__min_interval = AdaptivePoller.DEFAULT_MIN_INTERVAL
+        else:
+            self.__min_interval = min_interval
+        if max_interval is None:
+            self.__max_interval = AdaptivePoller.DEFAULT_MAX_INTERVAL
+        else:
+            self.__max_interval = max_interval
+        if backoff is None:
+            self.__backoff = AdaptivePoller.DEFAULT_BACKOFF
+        else:
+            self.__backoff = backoff
+        self.__listener = listener
+        self.__lock = threading.Lock()
+        self.__heap = []
+        self.__states = {}
+        self.__sequence = 0
+        self.__polls = 0
+        self.__changes = 0
+        self.__errors = 0
 
 
-    @property
-    def to_date(self):
 
-        return self.__to_date
+    def __len__(self):
 
+        return len(self.__states)
 
 
-class AccountActivity(ProtectedCBDocument):
-    """
-    This class represents an Account Activity document
-    """
 
+    def add(self, wallet, due=None):
+        """
+        Adds a wallet to poll
+        =====================
 
+        Parameters
+        ----------
+        wallet : UserWallet, str
+            The wallet or the address of the wallet to check out from the
+            cache.
+        due : float, optional (None if omitted)
+            Timestamp of the first poll. If omitted the wallet is due at once.
 
-    def __init__(self, owner, search, permission_function, id=None,
-                 created_at=None, closed_at=None, expires_at=None,
-                 is_certified=False, is_anonymous=False):
+        Throws
+        ------
+        ValueError
+            If an address is given without cache.
+        """
 
-        if created_at is None:
-            created_at = now()
-        super(self.__class__, self).__init__(owner=owner,
-                                             permission_function=permission_function,
-                                             id=id, created_at=created_at,
-                                             closed_at=closed_at,
-                                             expires_at=expires_at,
-                                             is_certified=is_certified,
-                                             is_anonymous=is_anonymous)
-        self.__search = search
+        if isinstance(wallet, UserWallet):
+            address = wallet.address
+        elif self.__cache is not None:
+            address = wallet
+            wallet = None
+        else:
+            raise ValueError('AdaptivePoller.add() - addresses can be added with cache only.')
+        if due is None:
+            due = time()
+        with self.__lock:
+            if address not in self.__states:
+                self.__states[address] = {'wallet': wallet,
+                                          'interval': self.__min_interval,
+                                          'due': None, 'polled': None}
+                self.schedule_(address, due)
 
 
 
-    @property
-    def search(self):
+    def next_due(self):
+        """
+        Gets the time of the next poll
+        ==============================
 
-        return self.__search
+        Returns
+        -------
+        float
+            Timestamp of the next poll.
+        None
+            If there is no wallet to poll.
+        """
 
+        with self.__lock:
+            self.drop_stale_()
+            if len(self.__heap) == 0:
+                return None
+            return self.__heap[0][0]
 
 
-class SearchObject(object):
-    """
-    This class contains a search of a user
-    ======================================
-    """
 
+    def poll_due(self, now_=None):
+        """
+        Polls the due wallets
+        =====================
 
+        Parameters
+        ----------
+        now_ : float, optional (None if omitted)
+            Timestamp to compare due times with. If omitted the actual time is
+            used.
 
-    def __init__(self, filters):
+        Returns
+        -------
+        int
+            Number of polled wallets.
+        """
 
-        self.__filter_list = []
-        for filter in filters:
-            pass
+        if now_ is None:
+            now_ = time()
+        due = []
+        with self.__lock:
+            self.drop_stale_()
+            while len(self.__heap) > 0 and self.__heap[0][0] <= now_:
+                entry = heapq.heappop(self.__heap)
+                self.__states[entry[2]]['due'] = None
+                due.append(entry[2])
+                self.drop_stale_()
+        for address in due:
+            self.poll_(address)
+        return len(due)
 
 
-    def add_filter(self, filter_type, filter_value):
 
-        pass
+    def remove(self, address):
+        """
+        Removes a wallet from polling
+        =============================
 
+        Parameters
+        ----------
+        address : str
+            The address of the wallet.
 
+        Notes
+        -----
+            The entry of the wallet stays in the heap until it gets to the top
+            and is dropped then.
+        """
 
-    def apply_filter(self, transactions):
+        with self.__lock:
+            self.__states.pop(address, None)
 
-        pass
 
 
+    def run(self, cancel):
+        """
+        Polls wallets until cancelled
+        =============================
 
-    def change_filter(self, filter_type, filter_value):
+        Parameters
+        ----------
+        cancel : threading.Event
+            Event to set to stop running.
+        """
 
-        result = []
-        match = False
-        for _filter in self.__filter_list:
-            if _filter[0] == filter_type:
-                match = True
+        while not cancel.is_set():
+            self.poll_due()
+            next_due = self.next_due()
+            if next_due is None:
+                delay = self.__min_interval
             else:
-                if SearchObject.is_valid_(filter_type, filter_value)
-                    result.append(_filter)
-                else:
-                    raise ValueError('Tried to change to non-valid filter.')
-        if match:
-            self.__filter_list = result
-        else:
-            raise ValueError('Cannot change non-existing filter-type.')
+                delay = max(0.0, next_due - time())
+            cancel.wait(min(delay, self.__min_interval))
 
 
 
     @property
-    def filter_list(self):
+    def stats(self):
+        """
+        Gets the statistics of the poller
+        =================================
 
-        result = []
-        for _filter in self.__filter_list:
-            result.append(_filter)
-        return result
+        Returns
+        -------
+        dict
+            Statistics with the following keys: wallets, polls, changes,
+            errors, active. Active is the number of wallets polled at the
+            minimal interval.
+        """
 
+        with self.__lock:
+            active = sum(1 for state in self.__states.values()
+                         if state['interval'] <= self.__min_interval)
+            return {'wallets': len(self.__states), 'polls': self.__polls,
+                    'changes': self.__changes, 'errors': self.__errors,
+                    'active': active}
 
 
-    def get_filter(self, id):
 
-        return self.__filter_list[id]
+    def wake(self, address):
+        """
+        Makes a wallet due at once
+        ==========================
 
+        Parameters
+        ----------
+        address : str
+            The address of the wallet.
 
+        Notes
+        -----
+            This is useful if activity is expected, eg. right after the user
+            sent a transaction. The interval of the wallet is reset as well.
+        """
 
-    def remove_filter_by_id(self, id):
+        with self.__lock:
+            state = self.__states.get(address)
+            if state is not None:
+                state['interval'] = self.__min_interval
+                self.schedule_(address, time())
 
-        if id < len(self.__filter_list) and id >= 0:
-            result = []
-            for i in range(len(self.__filter_list)):
-                if i != id:
-                    result.append(self.__filter_list[i])
-            self.__filter_list = result
-        else:
-            raise ValueError('Cannot remove non-existing id.')
 
 
+    def drop_stale_(self):
 
-    def remove_filter_by_type(self, filter_type):
+        while len(self.__heap) > 0:
+            due, sequence, address = self.__heap[0]
+            state = self.__states.get(address)
+            if state is not None and state['due'] == (due, sequence):
+                return
+            heapq.heappop(self.__heap)
 
-        result = []
-        match = False
-        for _filter in self.__filter_list:
-            if _filter[0] == filter_type:
-                match = True
+
+
+    def poll_(self, address):
+        """
+        Polls a wallet and reschedules it
+        =================================
+
+        Parameters
+        ----------
+        address : str
+            The address of the wallet.
+
+        Notes
+        -----
+            If a stored unconfirmed utxo is missing from the fresh records,
+            the confirmed utxos are queried as well, so a confirmation is told
+            apart from a drop out of the mempool.
+        """
+
+        with self.__lock:
+            state = self.__states.get(address)
+        if state is None:
+            return
+        changes = []
+        active = False
+        try:
+            unconfirmed = self.__api.get_address_unconfirmed(address)
+            if unconfirmed is None:
+                raise RuntimeError('AdaptivePoller - query failed.')
+            if state['wallet'] is not None:
+                context = nullcontext(state['wallet'])
             else:
-                result.append(_filter)
-        if match:
-            self.__filter_list = result
-        else:
-            raise ValueError('Cannot remove non-existing filter-type.')
+                context = self.__cache.checkout(address)
+            with context as wallet:
+                if wallet is None:
+                    raise ValueError('AdaptivePoller - unknown wallet.')
+                fresh = set((record['txid'], record.get('vout', 0))
+                            for record in unconfirmed)
+                confirmed = None
+                if len(wallet.unconfirmed_utxos.keys() - fresh) > 0:
+                    confirmed = self.__api.get_address_utxo(address)
+                changes = wallet.reconcile_utxos(confirmed, unconfirmed)
+            active = len(unconfirmed) > 0 or len(changes) > 0
+        except Exception:
+            with self.__lock:
+                self.__errors += 1
+        with self.__lock:
+            self.__polls += 1
+            self.__changes += len(changes)
+            if address in self.__states:
+                if active:
+                    state['interval'] = self.__min_interval
+                else:
+                    state['interval'] = min(state['interval'] * self.__backoff,
+                                            self.__max_interval)
+                state['polled'] = time()
+                if state['due'] is None:
+                    self.schedule_(address, state['polled'] + state['interval'])
+        if len(changes) > 0 and self.__listener is not None:
+            self.__listener(address, changes)
 
 
 
-    @classmethod
-    def is_valid_(cls, filter_type, filter_value):
+    def schedule_(self, address, due):
 
-        return True
+        self.__sequence += 1
+        self.__states[address]['due'] = (due, self.__sequence)
+        heapq.heappush(self.__heap, (due, self.__sequence, address))
 
 
 
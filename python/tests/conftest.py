@@ -0,0 +1,134 @@
+"""
+Shared fixtures of the ChainBridge tests
+=======================================
+"""
+
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chainbridge as cb
+
+
+
+OWNER = 'bitcoincash:qowner'
+
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    """
+    Keeps the tests away from the network
+    """
+
+    monkeypatch.setattr(cb.BitcoinAPI, 'is_valid_wallet',
+                        classmethod(lambda cls, address: True))
+
+
+
+def make_transaction(i, amount=0.5, block_height=None, foreign_address=None,
+                     time_=None, chain_tip=None, raw=False):
+    """
+    Creates a synthetic transaction
+    ===============================
+
+    Parameters
+    ----------
+    i : int
+        Serial number of the transaction, gives the txid and the defaults.
+    amount : float, optional (0.5 if omitted)
+        Balance of the transaction in BCH, negative for outgoing ones.
+    block_height : int, optional (600000 + i if omitted)
+        Height of the block, 0 for unconfirmed transactions.
+    foreign_address : str, optional (None if omitted)
+        The counterparty, bitcoincash:qforeign<i % 5> if omitted.
+    time_ : int, optional (None if omitted)
+        Time of the transaction, 1600000000 + i * 100 if omitted.
+    chain_tip : ChainTip, optional (None if omitted)
+        Shared chain tip of the transaction.
+    raw : bool, optional (False if omitted)
+        Whether to attach a raw record or not.
+
+    Returns
+    -------
+    CBTransaction
+        The transaction.
+    """
+
+    if block_height is None:
+        block_height = 600000 + i
+    if foreign_address is None:
+        foreign_address = 'bitcoincash:qforeign{}'.format(i % 5)
+    if time_ is None:
+        time_ = 1600000000 + i * 100
+    txid = '{:064x}'.format(i)
+    fee = 0.0001
+    if amount >= 0:
+        inputs, outputs, fees = [0.0], [amount], [0.0]
+    else:
+        inputs, outputs, fees = [-amount + fee], [fee], [fee]
+    record = None
+    if raw:
+        record = {'txid': txid, 'blockheight': block_height, 'time': time_,
+                  'fees': fee}
+    return cb.CBTransaction(txid, block_height, time_, time_, time_,
+                            10 if block_height > 0 else 0, inputs, outputs, fees,
+                            foreign_address, raw=record, chain_tip=chain_tip)
+
+
+
+def make_wallet(transaction_count=0, address=OWNER, **kwargs):
+    """
+    Creates a synthetic user wallet
+    ===============================
+
+    Parameters
+    ----------
+    transaction_count : int, optional (0 if omitted)
+        Number of transactions to generate with make_transaction().
+    address : str, optional (OWNER if omitted)
+        Address of the wallet.
+    **kwargs
+        Passed to make_transaction().
+
+    Returns
+    -------
+    UserWallet
+        The wallet.
+    """
+
+    wallet = cb.UserWallet(address, displayed_name='Owner', is_valid=True)
+    for i in range(transaction_count):
+        wallet.transactions.append(make_transaction(i, **kwargs))
+    return wallet
+
+
+
+def make_utxo(i, sat_amount=10000, block_height=600000, confirmations=10):
+    """
+    Creates a synthetic unspent output
+    ==================================
+
+    Parameters
+    ----------
+    i : int
+        Serial number of the output, gives the txid.
+    sat_amount : int, optional (10000 if omitted)
+        Amount in satoshi.
+    block_height : int, optional (600000 if omitted)
+        Height of the block, 0 for unconfirmed outputs.
+    confirmations : int, optional (10 if omitted)
+        Number of confirmations at creation.
+
+    Returns
+    -------
+    CBUtxo
+        The output.
+    """
+
+    return cb.CBUtxo('{:064x}'.format(i), cb.sat_2_bch(sat_amount), sat_amount,
+                     block_height, confirmations, 0)
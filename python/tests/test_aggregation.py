@@ -0,0 +1,136 @@
+"""
+Tests of AggregationEngine
+==========================
+"""
+
+
+from statistics import pstdev
+import threading
+
+import pytest
+
+import chainbridge as cb
+from conftest import make_transaction, make_wallet
+
+
+
+def build_transactions():
+
+    transactions = cb.TransactionContainer()
+    for i in range(60):
+        amount = round(0.01 * (i % 9 + 1) * (-1 if i % 4 == 0 else 1), 8)
+        transactions.append(make_transaction(i, amount=amount,
+                                             time_=1600000000 + i * 7200))
+    return transactions
+
+
+
+def sat_amounts(transactions):
+
+    return [cb.bch_2_sat(item.balance) for item in transactions]
+
+
+
+def test_total_matches_the_transactions():
+
+    transactions = build_transactions()
+    engine = cb.AggregationEngine(transactions)
+    total = engine.total()
+    amounts = sat_amounts(transactions)
+    assert total['count'] == engine.count == 60
+    assert total['inflow'] == sum(amount for amount in amounts if amount > 0)
+    assert total['outflow'] == -sum(amount for amount in amounts if amount < 0)
+    assert total['fee'] == 15 * 10000
+    assert total['max'] == max(abs(amount) for amount in amounts)
+    assert total['mean'] == pytest.approx(sum(amounts) / 60)
+    assert total['volatility'] == pytest.approx(pstdev(amounts))
+
+
+
+def test_merged_day_rollups_match_the_period():
+
+    transactions = build_transactions()
+    engine = cb.AggregationEngine(transactions)
+    start, end = 1600041600, 1600041600 + 2 * 86400
+    period = [item for item in transactions if start <= item.transaction_time < end]
+    amounts = sat_amounts(period)
+    total = engine.total(start, end)
+    assert total['count'] == len(period)
+    assert total['net'] == sum(amounts)
+    assert total['volatility'] == pytest.approx(pstdev(amounts))
+    assert [day['key'] for day in engine.aggregates(cb.AggregationEngine.GROUP_DAY,
+                                                    '2020-09-14', '2020-09-16')] == \
+           ['2020-09-14', '2020-09-15']
+
+
+
+def test_appends_are_aggregated_incrementally():
+
+    transactions = build_transactions()
+    engine = cb.AggregationEngine(transactions)
+    transactions.append(make_transaction(60, amount=1.0, foreign_address='bitcoincash:qnew'))
+    assert engine.count == 61
+    assert engine.version == transactions.version
+    assert engine.aggregate(cb.AggregationEngine.GROUP_COUNTERPARTY,
+                            'bitcoincash:qnew')['inflow'] == 100000000
+    assert engine.scorecard(top=1)['counterparties'][0]['key'] == 'bitcoincash:qnew'
+    engine.detach()
+    transactions.append(make_transaction(61))
+    assert engine.count == 61
+
+
+
+def test_transactions_without_counterparty_are_not_grouped():
+
+    transactions = build_transactions()
+    item = make_transaction(60, amount=0.5)
+    transactions.append(cb.CBTransaction(item.tx, item.block_height, item.transaction_time,
+                                         item.block_time, item.first_seen_time, 10,
+                                         item.inputs, item.outputs, item.fees, None))
+    engine = cb.AggregationEngine(transactions)
+    keys = [rollup['key'] for rollup in engine.aggregates(cb.AggregationEngine.GROUP_COUNTERPARTY)]
+    assert None not in keys
+    assert sum(rollup['count'] for rollup
+               in engine.aggregates(cb.AggregationEngine.GROUP_COUNTERPARTY)) == 60
+    assert engine.count == 61
+    assert None not in [rollup['key'] for rollup in engine.scorecard(top=10)['counterparties']]
+
+
+
+def test_scorecard_is_consistent_while_appending():
+
+    transactions = build_transactions()
+    engine = cb.AggregationEngine(transactions)
+
+    def append():
+        for i in range(60, 1060):
+            transactions.append(make_transaction(i, time_=1600000000 + i * 600))
+
+    thread = threading.Thread(target=append)
+    thread.start()
+    try:
+        while thread.is_alive():
+            scorecard = engine.scorecard(1600000000, 1601000000)
+            assert scorecard['total']['count'] <= engine.count
+    finally:
+        thread.join()
+    assert engine.scorecard()['total']['count'] == 1060
+
+
+
+def test_store_columns_give_the_same_rollups(tmp_path):
+
+    wallet = make_wallet()
+    for item in build_transactions():
+        wallet.transactions.append(item)
+    path = str(tmp_path / 'store')
+    cb.TransactionStore.write(path, wallet)
+    stored = cb.TransactionStore.load_wallet(path)
+    try:
+        expected = cb.AggregationEngine(wallet.transactions)
+        engine = cb.AggregationEngine(stored.transactions)
+        for group in [cb.AggregationEngine.GROUP_DAY, cb.AggregationEngine.GROUP_MONTH,
+                      cb.AggregationEngine.GROUP_COUNTERPARTY]:
+            assert engine.aggregates(group) == pytest.approx(expected.aggregates(group))
+    finally:
+        stored.transactions.store.close()
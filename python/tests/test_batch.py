@@ -0,0 +1,59 @@
+"""
+Tests of DocumentBatch
+======================
+"""
+
+
+import io
+
+import pytest
+
+import chainbridge as cb
+from conftest import make_wallet, OWNER
+
+
+
+def allow(query_string):
+
+    return True
+
+
+
+def test_batch_renders_like_the_document_and_reports_failures():
+
+    wallet = make_wallet(10)
+    statement = cb.StatementOfAccount(OWNER, 1600000000, 1600000500, allow, id=1)
+    expected = io.StringIO()
+    expected_summary = statement.render(wallet.transactions, expected)
+    batch = cb.DocumentBatch({OWNER: wallet}.get, max_workers=2)
+    batch.add(statement)
+    batch.add(cb.StatementOfAccount('bitcoincash:qnobody', 1600000000, 1600000500,
+                                    allow, id=2))
+    results = batch.run()
+    assert [result['ok'] for result in results] == [True, False]
+    assert results[0]['output'] == expected.getvalue()
+    assert results[0]['summary'] == expected_summary
+    assert results[1]['error'].startswith('loading failed')
+    assert batch.stats['failures'] == 1
+    assert batch.stats['owners'] == 2
+
+
+
+def test_batch_writes_files_into_the_output_directory(tmp_path):
+
+    wallet = make_wallet(3)
+    batch = cb.DocumentBatch({OWNER: wallet}.get, max_workers=1,
+                             format=cb.StatementRenderer.FORMAT_JSONL,
+                             output_dir=str(tmp_path))
+    batch.add(cb.StatementOfAccount(OWNER, 1600000000, 1600000500, allow, id=5))
+    result = batch.run()[0]
+    assert result['ok']
+    with open(result['output']) as stream:
+        assert len(stream.readlines()) == 3 + 2
+
+
+
+def test_batch_rejects_other_documents():
+
+    with pytest.raises(TypeError):
+        cb.DocumentBatch(lambda owner: None).add(cb.CBDocument(OWNER))
@@ -0,0 +1,142 @@
+"""
+Tests of WalletCache
+====================
+"""
+
+
+import threading
+import time
+
+import chainbridge as cb
+from conftest import make_transaction, make_wallet, OWNER
+
+
+
+def allow(query_string):
+
+    return True
+
+
+
+class Storage(object):
+
+    def __init__(self, delay=0.0):
+
+        self.loads = []
+        self.writes = []
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def load(self, address):
+
+        with self.lock:
+            self.loads.append(address)
+        time.sleep(self.delay)
+        if address.endswith('unknown'):
+            return None
+        return make_wallet(2, address=address)
+
+    def write(self, wallet):
+
+        self.writes.append(wallet.address)
+
+
+
+def test_concurrent_requests_share_one_instance():
+
+    storage = Storage(delay=0.05)
+    cache = cb.WalletCache(storage.load)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('bitcoincash:qa')))
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert storage.loads == ['bitcoincash:qa']
+    assert all(wallet is results[0] for wallet in results)
+    assert cache.hit_rate == 7 / 8
+
+
+
+def test_unknown_address_is_not_cached():
+
+    storage = Storage()
+    cache = cb.WalletCache(storage.load)
+    assert cache.get('bitcoincash:qunknown') is None
+    assert 'bitcoincash:qunknown' not in cache
+
+
+
+def test_least_recently_used_wallet_is_evicted_and_written_back():
+
+    storage = Storage()
+    cache = cb.WalletCache(storage.load, storage.write, capacity=250,
+                           size_function=lambda wallet: 100)
+    first = cache.get('bitcoincash:qa')
+    cache.get('bitcoincash:qb')
+    first.transactions.append(make_transaction(10))
+    cache.get('bitcoincash:qa')
+    cache.get('bitcoincash:qc')
+    assert 'bitcoincash:qb' not in cache
+    assert 'bitcoincash:qa' in cache
+    assert storage.writes == []
+    cache.evict('bitcoincash:qa')
+    assert storage.writes == ['bitcoincash:qa']
+    assert cache.resident_size == 100
+
+
+
+def test_checked_out_wallet_is_not_evicted():
+
+    storage = Storage()
+    cache = cb.WalletCache(storage.load, capacity=150, size_function=lambda wallet: 100)
+    with cache.checkout('bitcoincash:qa') as wallet:
+        assert wallet.address == 'bitcoincash:qa'
+        cache.get('bitcoincash:qb')
+        assert 'bitcoincash:qa' in cache
+        assert len(cache) == 2
+    assert 'bitcoincash:qa' not in cache
+    assert len(cache) == 1
+
+
+
+def test_write_through_follows_item_edits():
+
+    storage = Storage()
+    cache = cb.WalletCache(storage.load, storage.write, write_through=True)
+    wallet = cache.get('bitcoincash:qa')
+    document = cb.StatementOfAccount(wallet.address, 1, 2, allow, id=1)
+    wallet.documents.append(document)
+    assert len(storage.writes) == 1
+    document.closed = 0
+    assert len(storage.writes) == 2
+    wallet.transactions.chain_tip = cb.ChainTip(700000)
+    assert len(storage.writes) == 2
+
+
+
+def test_flush_writes_dirty_wallets_only():
+
+    storage = Storage()
+    cache = cb.WalletCache(storage.load, storage.write)
+    cache.get('bitcoincash:qa').transactions.append(make_transaction(10))
+    cache.get('bitcoincash:qb')
+    assert cache.flush() == 1
+    assert storage.writes == ['bitcoincash:qa']
+    assert cache.flush() == 0
+
+
+
+def test_lazy_repository_wallet_is_watched(tmp_path):
+
+    repository = cb.WalletRepository(str(tmp_path / 'wallets.db'))
+    repository.save(make_wallet(2))
+    cache = cb.WalletCache(repository.load, repository.save)
+    with cache.checkout(OWNER) as wallet:
+        wallet.documents.append(cb.StatementOfAccount(OWNER, 1, 2, allow, id=1))
+    assert cache.flush() == 1
+    with cache.checkout(OWNER) as wallet:
+        wallet.documents.append(cb.StatementOfAccount(OWNER, 1, 2, allow, id=2))
+    assert cache.evict(OWNER)
+    assert len(repository.load(OWNER).documents) == 2
@@ -0,0 +1,199 @@
+"""
+Tests of Merkle-batched certification
+=====================================
+"""
+
+
+import threading
+from time import sleep
+
+import pytest
+
+import chainbridge as cb
+from conftest import OWNER
+
+
+
+def allow(query_string):
+
+    return True
+
+
+
+def statements(count):
+
+    return [cb.StatementOfAccount(OWNER, 1600000000, 1600001000 + i, allow, id=i)
+            for i in range(count)]
+
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 8, 9])
+def test_every_proof_leads_to_the_root(size):
+
+    leaves = [cb.MerkleTree.leaf_hash('leaf {}'.format(i).encode('utf-8'))
+              for i in range(size)]
+    tree = cb.MerkleTree(leaves)
+    for index, leaf in enumerate(leaves):
+        assert cb.MerkleTree.root_from_proof(leaf, index, size,
+                                             tree.proof(index)) == tree.root
+
+
+
+def test_batch_certifies_every_document():
+
+    documents = statements(5)
+    batch = cb.CertificationBatch()
+    for document in documents:
+        batch.add(document, 'content of {}'.format(document.id))
+    certificates = batch.certify()
+    assert all(certificate['root'] == batch.root for certificate in certificates)
+    for document in documents:
+        assert document.certified
+        assert cb.CertificationBatch.verify(document, 'content of {}'.format(document.id))
+        assert not cb.CertificationBatch.verify(document, 'forged content')
+    with pytest.raises(RuntimeError):
+        batch.certify()
+
+
+
+def test_content_hash_is_canonical():
+
+    assert cb.CertificationBatch.content_hash('a\r\nb\rc\n') == \
+           cb.CertificationBatch.content_hash('a\nb\nc\n')
+    assert cb.CertificationBatch.content_hash('cafe\u0301') == \
+           cb.CertificationBatch.content_hash('caf\u00e9')
+    with pytest.raises(TypeError):
+        cb.CertificationBatch.content_hash(42)
+
+
+
+def test_certificate_is_bound_to_the_document():
+
+    first, second = statements(2)
+    batch = cb.CertificationBatch()
+    batch.add(first, 'same content')
+    batch.add(second, 'same content')
+    batch.certify()
+    second.certificate = first.certificate
+    assert not cb.CertificationBatch.verify(second, 'same content')
+
+
+
+class FakeAPI(object):
+
+    def __init__(self, transactions, delay=0.0):
+
+        self.transactions = transactions
+        self.delay = delay
+        self.calls = 0
+
+    def get_transaction(self, txid):
+
+        self.calls += 1
+        sleep(self.delay)
+        return self.transactions.get(txid)
+
+
+
+def certified_document(registry=None, anchor=None, content='rendered'):
+
+    document = statements(1)[0]
+    batch = cb.CertificationBatch(anchor=anchor, registry=registry)
+    batch.add(document, content)
+    batch.certify()
+    return document, batch.root
+
+
+
+def test_verifier_answers_from_the_registry_offline():
+
+    registry = cb.CertificationRegistry()
+    document, root = certified_document(registry)
+    verifier = cb.CertificationVerifier(registry)
+    assert verifier.verify(document, 'rendered')['source'] == 'registry'
+    assert verifier.verify(document, 'forged')['reason'] == 'content mismatch'
+    assert verifier.verify(statements(1)[0])['reason'] == 'not certified'
+    assert verifier.stats['registry_hits'] == 1
+
+
+
+def test_unknown_root_is_checked_on_chain_once():
+
+    anchor = '{:064x}'.format(5)
+    document, root = certified_document(anchor=lambda root: anchor)
+    api = FakeAPI({anchor: {'blockheight': 700000, 'time': 1700000000,
+                            'vout': [{'scriptPubKey': {'asm': 'OP_RETURN ' + root}}]}})
+    verifier = cb.CertificationVerifier(api=api)
+    assert verifier.verify(document)['source'] == 'chain'
+    assert verifier.verify(document)['source'] == 'registry'
+    assert api.calls == 1
+    assert verifier.registry.get(root)['anchor'] == anchor
+
+
+
+def test_rejected_anchor_is_not_queried_again():
+
+    anchor = '{:064x}'.format(6)
+    document, root = certified_document(anchor=lambda root: anchor)
+    api = FakeAPI({anchor: {'vout': []}})
+    verifier = cb.CertificationVerifier(api=api)
+    assert verifier.verify(document)['reason'] == 'unknown root'
+    assert verifier.verify(document)['reason'] == 'unknown root'
+    assert api.calls == 1
+
+
+
+def test_rejection_is_cached_by_anchor_and_root():
+
+    anchor = '{:064x}'.format(7)
+    first, first_root = certified_document(anchor=lambda root: anchor)
+    second, second_root = certified_document(anchor=lambda root: anchor, content='other')
+    api = FakeAPI({anchor: {'vout': [{'scriptPubKey': {'asm': 'OP_RETURN ' + second_root}}]}})
+    verifier = cb.CertificationVerifier(api=api)
+    assert verifier.verify(first)['reason'] == 'unknown root'
+    assert verifier.verify(second)['source'] == 'chain'
+    assert api.calls == 2
+
+
+
+def test_unavailable_anchor_is_queried_again():
+
+    anchor = '{:064x}'.format(8)
+    document, root = certified_document(anchor=lambda root: anchor)
+    api = FakeAPI({})
+    verifier = cb.CertificationVerifier(api=api)
+    assert verifier.verify(document)['reason'] == 'anchor unavailable'
+    api.transactions[anchor] = {'vout': [{'scriptPubKey': {'asm': 'OP_RETURN ' + root}}]}
+    assert verifier.verify(document)['source'] == 'chain'
+    assert api.calls == 2
+
+
+
+def test_concurrent_verifications_share_one_query():
+
+    anchor = '{:064x}'.format(9)
+    document, root = certified_document(anchor=lambda root: anchor)
+    api = FakeAPI({anchor: {'vout': [{'scriptPubKey': {'asm': 'OP_RETURN ' + root}}]}},
+                  delay=0.1)
+    verifier = cb.CertificationVerifier(api=api)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(verifier.verify(document)))
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(result['valid'] for result in results)
+    assert api.calls == 1
+
+
+
+def test_documents_are_loaded_by_id():
+
+    registry = cb.CertificationRegistry()
+    document, root = certified_document(registry)
+    verifier = cb.CertificationVerifier(registry, loader={document.id: document}.get)
+    assert verifier.verify(document.id)['valid']
+    assert verifier.verify(99)['reason'] == 'unknown document'
+    with pytest.raises(ValueError):
+        cb.CertificationVerifier(registry).verify(document.id)
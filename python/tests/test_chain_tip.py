@@ -0,0 +1,65 @@
+"""
+Tests of ChainTip driven confirmation updates
+=============================================
+"""
+
+
+import gc
+
+import chainbridge as cb
+from conftest import make_transaction
+
+
+
+class FakeAPI(object):
+
+    def __init__(self, height):
+
+        self.height = height
+
+    def get_block_count(self):
+
+        return self.height
+
+
+
+def test_new_block_reclassifies_pending_transactions_only():
+
+    tip = cb.ChainTip(600000)
+    transactions = cb.TransactionContainer(chain_tip=tip)
+    transactions.append(make_transaction(0, block_height=599990))
+    transactions.append(make_transaction(1, block_height=600000))
+    transactions.append(make_transaction(2, block_height=0))
+    events = []
+    transactions.add_listener(lambda container, event, item: events.append((event, item.tx)))
+    assert [item.confirmations for item in transactions] == [11, 1, 0]
+    assert len(transactions.pending) == 2
+    assert tip.update(600005)
+    assert transactions[1].confirmations == 6
+    assert transactions[1].confirmation_level == cb.CBTransaction.CONFIRMATION_WELL
+    assert events == [(cb.CBContainer.CONTAINER_UPDATE, transactions[1].tx)]
+    assert transactions.pending == [transactions[2]]
+    assert not tip.update(600005)
+
+
+
+def test_refresh_queries_the_height_once():
+
+    tip = cb.ChainTip()
+    transactions = cb.TransactionContainer([make_transaction(0, block_height=600000)],
+                                           chain_tip=tip)
+    assert transactions[0].confirmations == 10
+    assert tip.refresh(FakeAPI(600001))
+    assert transactions[0].confirmations == 2
+    assert not tip.refresh(FakeAPI(None))
+
+
+
+def test_subscription_does_not_keep_containers_alive():
+
+    tip = cb.ChainTip(600000)
+    transactions = cb.TransactionContainer(chain_tip=tip)
+    transactions.append(make_transaction(0, block_height=600000))
+    del transactions
+    gc.collect()
+    assert tip.update(600001)
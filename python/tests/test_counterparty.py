@@ -0,0 +1,126 @@
+"""
+Tests of the addressbook index and CounterpartyResolver
+=======================================================
+"""
+
+
+import gc
+import io
+
+import chainbridge as cb
+from conftest import make_transaction, make_wallet, OWNER
+
+
+
+def build_addressbook():
+
+    return cb.WalletContainer([cb.Wallet('bitcoincash:qforeign1', 'One', is_valid=True),
+                               cb.Wallet('qforeign2', 'Two', is_valid=True)])
+
+
+
+def test_address_lookup_is_normalized():
+
+    addressbook = build_addressbook()
+    assert addressbook.contains_address('qforeign1')
+    assert addressbook.contains_address(' BITCOINCASH:QFOREIGN2 ')
+    assert addressbook.get_by_address('bitcoincash:qforeign2').displayed_name == 'Two'
+    assert not addressbook.contains_address('bitcoincash:qforeign3')
+    assert cb.WalletContainer.normalize_address('1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2') \
+        == '1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2'
+
+
+
+def test_from_dict_keeps_the_subclass():
+
+    class Contact(cb.Wallet):
+        pass
+
+    contact = Contact.from_dict_(build_addressbook()[0].to_dict_())
+    assert type(contact) is Contact
+    assert contact.displayed_name == 'One'
+
+
+
+def test_index_follows_address_assignment():
+
+    addressbook = build_addressbook()
+    late = cb.Wallet(displayed_name='Late')
+    addressbook.append(late)
+    assert not addressbook.contains_address('bitcoincash:qlate')
+    late.state_add(cb.Wallet.WALLET_EDITABLE)
+    late.address = 'bitcoincash:qlate'
+    late.state_delete(cb.Wallet.WALLET_EDITABLE)
+    assert addressbook.get_by_address('qlate') is late
+
+
+
+def test_resolution_is_cached_per_version():
+
+    addressbook = build_addressbook()
+    transactions = make_wallet(10).transactions
+    resolver = cb.CounterpartyResolver(addressbook)
+    result = resolver.resolve(transactions)
+    assert result['names'] == {'bitcoincash:qforeign1': 'One',
+                               'bitcoincash:qforeign2': 'Two'}
+    assert result['unmatched'] == ['bitcoincash:qforeign0', 'bitcoincash:qforeign3',
+                                   'bitcoincash:qforeign4']
+    assert resolver.resolve(transactions) is result
+    assert resolver.stats['hits'] == 1
+    friend = addressbook.get_by_address('qforeign1')
+    friend.state_add(cb.Wallet.WALLET_EDITABLE)
+    friend.displayed_name = 'Renamed'
+    friend.state_delete(cb.Wallet.WALLET_EDITABLE)
+    renamed = resolver.resolve(transactions)
+    assert renamed is not result
+    assert renamed['names']['bitcoincash:qforeign1'] == 'Renamed'
+    transactions.append(make_transaction(50, foreign_address='bitcoincash:qnew'))
+    assert 'bitcoincash:qnew' in resolver.resolve(transactions)['unmatched']
+
+
+
+def test_cache_is_bounded_and_drops_collected_containers():
+
+    resolver = cb.CounterpartyResolver(build_addressbook())
+    kept = []
+    for i in range(cb.CounterpartyResolver.CACHE_SIZE + 10):
+        transactions = make_wallet(2).transactions
+        resolver.resolve(transactions)
+        kept.append(transactions)
+    assert resolver.stats['cached'] == cb.CounterpartyResolver.CACHE_SIZE
+    del kept[:]
+    del transactions
+    gc.collect()
+    resolver.resolve(make_wallet(1).transactions)
+    assert resolver.stats['cached'] == 1
+
+
+
+def test_unmatched_addresses_are_looked_up_in_one_batch():
+
+    calls = []
+
+    def lookup(addresses):
+        calls.append(sorted(addresses))
+        return {'bitcoincash:qforeign0': 'Zero'}
+
+    transactions = make_wallet(10).transactions
+    resolver = cb.CounterpartyResolver(build_addressbook(), lookup)
+    result = resolver.lookup_unmatched(transactions)
+    assert calls == [['bitcoincash:qforeign0', 'bitcoincash:qforeign3',
+                      'bitcoincash:qforeign4']]
+    assert result['names']['bitcoincash:qforeign0'] == 'Zero'
+    assert result['unmatched'] == ['bitcoincash:qforeign3', 'bitcoincash:qforeign4']
+
+
+
+def test_statement_renders_counterparty_names():
+
+    wallet = make_wallet(5)
+    wallet.addressbook.append(cb.Wallet('bitcoincash:qforeign1', 'One', is_valid=True))
+    statement = cb.StatementOfAccount(OWNER, 1600000000, 1600001000, lambda query: True)
+    outstream = io.StringIO()
+    statement.render(wallet.transactions, outstream, resolver=wallet.counterparties)
+    lines = outstream.getvalue().splitlines()
+    assert lines[0].endswith('counterparty_name')
+    assert lines[2].endswith(',One')
@@ -0,0 +1,213 @@
+"""
+Tests of CBDocument states and DocumentRegistry
+===============================================
+"""
+
+
+import threading
+
+import pytest
+
+import chainbridge as cb
+from conftest import OWNER
+
+
+
+def allow(query_string):
+
+    return True
+
+
+
+def make_document(id, owner=OWNER, expires_at=None):
+
+    return cb.StatementOfAccount(owner, 1, 2, allow, id=id, expires_at=expires_at)
+
+
+
+def test_state_is_stored(monkeypatch):
+
+    documents = [make_document(i, expires_at=2000000000) for i in range(5)]
+    settled = make_document(5)
+    calls = []
+
+    def clock():
+        calls.append(1)
+        return 1900000000
+
+    monkeypatch.setattr(cb, 'now', clock)
+    assert settled.state == cb.CBDocument.DOCUMENT_CREATED + cb.CBDocument.DOCUMENT_HAS_ID
+    assert calls == []
+    states = cb.CBDocument.states(documents + [settled]).tolist()
+    assert len(calls) == 1
+    assert all(state & cb.CBDocument.DOCUMENT_EXPIRES for state in states[:5])
+    assert not any(state & cb.CBDocument.DOCUMENT_EXPIRED for state in states)
+
+
+
+def test_document_expires_outside_of_a_registry(monkeypatch):
+
+    tick = [1900000000]
+    monkeypatch.setattr(cb, 'now', lambda: tick[0])
+    document = cb.CBDocument(owner=OWNER, expires_at=tick[0] + 1)
+    events = []
+    documents = cb.DocumentContainer([document])
+    documents.add_listener(lambda container, event, item: events.append(event))
+    assert not cb.has_state(document.state, cb.CBDocument.DOCUMENT_EXPIRED)
+    tick[0] += 2
+    assert cb.has_state(document.state, cb.CBDocument.DOCUMENT_EXPIRED)
+    assert events == [cb.CBContainer.CONTAINER_UPDATE]
+    other = cb.CBDocument(owner=OWNER, expires_at=tick[0] + 1)
+    tick[0] += 2
+    assert cb.has_state(cb.CBDocument.states([other])[0], cb.CBDocument.DOCUMENT_EXPIRED)
+
+
+
+def test_setters_keep_state_current():
+
+    document = make_document(1)
+    assert document.state == (cb.CBDocument.DOCUMENT_CREATED + cb.CBDocument.DOCUMENT_HAS_ID)
+    document.expires = 1000
+    assert document.state & cb.CBDocument.DOCUMENT_EXPIRED
+    document.expires = None
+    assert not document.state & (cb.CBDocument.DOCUMENT_EXPIRES
+                                 + cb.CBDocument.DOCUMENT_EXPIRED)
+    document.certified = True
+    document.closed = 0
+    assert document.state & cb.CBDocument.DOCUMENT_IS_CERTIFIED
+    assert document.state & cb.CBDocument.DOCUMENT_CLOSED
+
+
+
+def test_states_of_many_documents():
+
+    documents = [make_document(i, expires_at=1000 if i % 2 else None) for i in range(10)]
+    assert cb.CBDocument.states(documents).tolist() == [document.state for document
+                                                         in documents]
+
+
+
+def test_refresh_expiry_uses_one_tick():
+
+    documents = [make_document(i, expires_at=2000000000 + i) for i in range(4)]
+    expired = cb.CBDocument.refresh_expiry(documents, 2000000002)
+    assert [document.id for document in expired] == [0, 1]
+    assert [bool(document.state & cb.CBDocument.DOCUMENT_EXPIRED)
+            for document in documents] == [True, True, False, False]
+
+
+
+def test_registry_finds_by_owner_and_state():
+
+    registry = cb.DocumentRegistry()
+    for i in range(6):
+        registry.add(make_document(i, owner='bitcoincash:q{}'.format(i % 2)))
+    registry.get(2).certified = True
+    registry.get(3).certified = True
+    found = registry.find('bitcoincash:q0', cb.CBDocument.DOCUMENT_IS_CERTIFIED)
+    assert [document.id for document in found] == [2]
+    assert len(registry.find(state=cb.CBDocument.DOCUMENT_IS_CERTIFIED)) == 2
+    assert len(registry.find('bitcoincash:q1', exclude=cb.CBDocument.DOCUMENT_IS_CERTIFIED)) == 2
+    registry.remove(2)
+    registry.get(3).closed = 0
+    assert 2 not in registry
+    assert [document.id for document in registry.find(state=cb.CBDocument.DOCUMENT_CLOSED)] == [3]
+
+
+
+def test_registry_rejects_duplicates():
+
+    registry = cb.DocumentRegistry()
+    registry.add(make_document(1))
+    with pytest.raises(ValueError):
+        registry.add(make_document(1))
+    with pytest.raises(ValueError):
+        registry.add(cb.CBDocument(owner=OWNER))
+
+
+
+def test_registry_notices_documents_expired_by_themselves(monkeypatch):
+
+    tick = [1900000000]
+    monkeypatch.setattr(cb, 'now', lambda: tick[0])
+    expired = []
+    registry = cb.DocumentRegistry(expired.append)
+    document = make_document(1, expires_at=tick[0] + 1)
+    registry.add(document)
+    tick[0] += 2
+    assert document.state & cb.CBDocument.DOCUMENT_EXPIRED
+    assert expired == [document]
+    assert registry.find(state=cb.CBDocument.DOCUMENT_EXPIRED) == [document]
+    assert registry.expire_due() == []
+    assert expired == [document]
+
+
+
+def test_expiry_scheduler_flips_due_documents():
+
+    expired = []
+    registry = cb.DocumentRegistry(expired.append)
+    for i in range(5):
+        registry.add(make_document(i, expires_at=2000000000 + i * 10))
+    registry.get(1).expires = 2000000100
+    assert registry.next_expiry() == 2000000000
+    due = registry.expire_due(2000000025)
+    assert sorted(document.id for document in due) == [0, 2]
+    assert expired == due
+    assert registry.get(0).state & cb.CBDocument.DOCUMENT_EXPIRED
+    assert not registry.get(1).state & cb.CBDocument.DOCUMENT_EXPIRED
+    assert registry.expire_due(2000000025) == []
+    assert registry.next_expiry() == 2000000030
+
+
+
+def test_run_expires_documents_in_the_background():
+
+    registry = cb.DocumentRegistry()
+    document = make_document(1, expires_at=cb.now())
+    registry.add(document)
+    cancel = threading.Event()
+    thread = threading.Thread(target=registry.run, args=(cancel,))
+    thread.start()
+    try:
+        for i in range(40):
+            if document.state & cb.CBDocument.DOCUMENT_EXPIRED:
+                break
+            cancel.wait(0.1)
+    finally:
+        cancel.set()
+        thread.join()
+    assert document.state & cb.CBDocument.DOCUMENT_EXPIRED
+    assert registry.find(state=cb.CBDocument.DOCUMENT_EXPIRED) == [document]
+
+
+
+def test_attached_container_adds_documents():
+
+    registry = cb.DocumentRegistry()
+    documents = cb.DocumentContainer([make_document(1)])
+    registry.attach(documents)
+    documents.append(make_document(2))
+    assert len(registry) == 2
+    registry.detach(documents)
+    documents.append(make_document(3))
+    assert len(registry) == 2
+
+
+
+def test_replaced_document_is_reindexed_and_rescheduled():
+
+    registry = cb.DocumentRegistry()
+    documents = cb.DocumentContainer([make_document(1, expires_at=2000000000)])
+    registry.attach(documents)
+    previous = documents[0]
+    replacement = make_document(1, expires_at=2000000100)
+    documents.replace_(0, replacement)
+    assert registry.get(1) is replacement
+    assert len(registry) == 1
+    assert registry.next_expiry() == 2000000100
+    assert registry.expire_due(2000000050) == []
+    assert registry.expire_due(2000000150) == [replacement]
+    previous.closed = 0
+    assert registry.find(state=cb.CBDocument.DOCUMENT_CLOSED) == []
+
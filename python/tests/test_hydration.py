@@ -0,0 +1,84 @@
+"""
+Tests of the parallel hydration of UserWallet.from_address
+==========================================================
+"""
+
+
+import threading
+from time import sleep
+
+import pytest
+
+import chainbridge as cb
+
+
+
+ADDRESS = 'bitcoincash:qhydrated'
+
+
+
+def raw_record(i):
+
+    return {'txid': '{:064x}'.format(i), 'blockheight': 600000 + i,
+            'time': 1600000000 + i,
+            'vin': [{'cashAddress': 'bitcoincash:qforeign', 'value': 0.5}],
+            'vout': [{'value': '0.49990000',
+                      'scriptPubKey': {'cashAddrs': [ADDRESS]}}],
+            'fees': 0.0001}
+
+
+
+class FakeAPI(object):
+
+    def __init__(self, pages=4, failing_page=None):
+
+        self.pages = pages
+        self.failing_page = failing_page
+
+    def get_address_details(self, address):
+
+        return {'txApperances': self.pages * 3}
+
+    def get_address_utxo(self, address):
+
+        return [{'txid': '{:064x}'.format(1), 'vout': 0, 'satoshis': 49990000,
+                 'height': 600001, 'confirmations': 5}]
+
+    def get_address_unconfirmed(self, address):
+
+        return []
+
+    def get_address_transactions_page(self, address, page=0):
+
+        if page == self.failing_page:
+            return None
+        sleep(0.01 * (self.pages - page))
+        return [raw_record(page * 3 + i) for i in range(3)], self.pages
+
+
+
+def test_pages_are_merged_in_their_original_order():
+
+    reports = []
+    wallet = cb.UserWallet.from_address(ADDRESS, api=FakeAPI(),
+                                        progress=lambda done, total: reports.append((done, total)))
+    assert [item.tx for item in wallet.transactions] == \
+           ['{:064x}'.format(i) for i in range(12)]
+    assert wallet.utxos.count == 1
+    assert reports[-1] == (7, 7)
+
+
+
+def test_failed_page_raises():
+
+    with pytest.raises(RuntimeError):
+        cb.UserWallet.from_address(ADDRESS, api=FakeAPI(failing_page=2))
+
+
+
+def test_cancel_aborts_the_creation():
+
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(RuntimeError):
+        cb.UserWallet.from_address(ADDRESS, api=FakeAPI(), cancel=cancel)
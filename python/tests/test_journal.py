@@ -0,0 +1,166 @@
+"""
+Tests of WalletJournal
+======================
+"""
+
+
+import os
+
+import chainbridge as cb
+from conftest import make_transaction, make_utxo, make_wallet, OWNER
+
+
+
+def allow(query_string):
+
+    return True
+
+
+
+def open_journal(tmp_path, wallet=None, **kwargs):
+
+    if wallet is None:
+        wallet = make_wallet(3)
+    return cb.WalletJournal(wallet, str(tmp_path / 'wallet.cbw'), **kwargs)
+
+
+
+def test_recovery_replays_container_changes(tmp_path):
+
+    journal = open_journal(tmp_path)
+    wallet = journal.wallet
+    for i in range(3, 6):
+        wallet.transactions.append(make_transaction(i))
+    wallet.utxos.append(make_utxo(1))
+    wallet.utxos.append(make_utxo(2))
+    wallet.utxos.remove_keys([make_utxo(1).key])
+    wallet.unconfirmed_utxos.append(make_utxo(3, block_height=0, confirmations=0))
+    journal.close()
+    assert journal.record_count == 7
+    recovered = cb.WalletJournal.recover(journal.snapshot_path)
+    assert [item.tx for item in recovered.transactions] == [item.tx for item in wallet.transactions]
+    assert recovered.utxos.keys() == wallet.utxos.keys()
+    assert recovered.unconfirmed_utxos.keys() == wallet.unconfirmed_utxos.keys()
+
+
+
+def test_recovery_replays_addressbook_edits(tmp_path):
+
+    journal = open_journal(tmp_path)
+    wallet = journal.wallet
+    friend = cb.Wallet('bitcoincash:qfriend', 'Friend', is_valid=True)
+    wallet.addressbook.append(friend)
+    friend.state_add(cb.Wallet.WALLET_EDITABLE)
+    friend.displayed_name = 'Best friend'
+    friend.set_detail('email', 'friend@example.com')
+    friend.state_delete(cb.Wallet.WALLET_EDITABLE)
+    journal.close()
+    recovered = cb.WalletJournal.recover(journal.snapshot_path)
+    assert len(recovered.addressbook) == 1
+    restored = recovered.addressbook.get_by_address('bitcoincash:qfriend')
+    assert restored.displayed_name == 'Best friend'
+    assert restored.get_detail('email') == 'friend@example.com'
+
+
+
+def test_recovery_keeps_certification_and_closing(tmp_path):
+
+    journal = open_journal(tmp_path)
+    wallet = journal.wallet
+    statement = cb.StatementOfAccount(OWNER, 1600000000, 1600001000, allow, id=1)
+    other = cb.StatementOfAccount(OWNER, 1600000000, 1600001000, allow, id=2)
+    wallet.documents.append(statement)
+    wallet.documents.append(other)
+    batch = cb.CertificationBatch()
+    batch.add(statement, 'rendered statement')
+    batch.certify()
+    other.closed = 0
+    journal.close()
+    recovered = cb.WalletJournal.recover(journal.snapshot_path)
+    assert [document.id for document in recovered.documents] == [1, 2]
+    certified = recovered.documents[0]
+    assert certified.certified
+    assert certified.certificate == statement.certificate
+    assert cb.CertificationBatch.verify(certified, 'rendered statement')
+    assert recovered.documents[1].closed == other.closed
+
+
+
+def test_replay_after_snapshot_is_idempotent(tmp_path):
+
+    journal = open_journal(tmp_path)
+    wallet = journal.wallet
+    wallet.transactions.append(make_transaction(10))
+    wallet.documents.append(cb.StatementOfAccount(OWNER, 1, 2, allow, id=5))
+    wallet.documents.append(cb.CBDocument(owner=OWNER))
+    journal.close()
+    cb.WalletJournal.write_snapshot_(wallet, journal.snapshot_path)
+    recovered = cb.WalletJournal.recover(journal.snapshot_path)
+    assert len(recovered.transactions) == 4
+    assert len(recovered.documents) == 2
+
+
+
+def test_change_of_document_without_id_compacts(tmp_path):
+
+    journal = open_journal(tmp_path)
+    document = cb.CBDocument(owner=OWNER)
+    journal.wallet.documents.append(document)
+    assert journal.record_count == 1
+    document.expires = 2000000000
+    assert journal.record_count == 0
+    journal.close()
+    recovered = cb.WalletJournal.recover(journal.snapshot_path)
+    assert recovered.documents[0].expires == 2000000000
+
+
+
+def test_torn_record_is_dropped(tmp_path):
+
+    journal = open_journal(tmp_path)
+    journal.wallet.transactions.append(make_transaction(3))
+    journal.wallet.transactions.append(make_transaction(4))
+    journal.close()
+    size = os.path.getsize(journal.journal_path)
+    with open(journal.journal_path, 'r+b') as stream:
+        stream.truncate(size - 3)
+    reopened = cb.WalletJournal.open(journal.snapshot_path)
+    assert len(reopened.wallet.transactions) == 4
+    reopened.wallet.transactions.append(make_transaction(5))
+    reopened.close()
+    assert len(cb.WalletJournal.recover(journal.snapshot_path).transactions) == 5
+
+
+
+def test_compaction_folds_journal_into_snapshot(tmp_path):
+
+    journal = open_journal(tmp_path, compact_size=1000)
+    for i in range(3, 30):
+        journal.wallet.transactions.append(make_transaction(i))
+    assert os.path.getsize(journal.journal_path) < 1000
+    journal.close()
+    recovered = cb.WalletJournal.recover(journal.snapshot_path)
+    assert len(recovered.transactions) == 30
+
+
+
+def test_recovery_replays_confirmation_changes(tmp_path):
+
+    tip = cb.ChainTip(600000)
+    wallet = make_wallet()
+    wallet.transactions.chain_tip = tip
+    wallet.transactions.append(make_transaction(0, block_height=600000))
+    wallet.transactions.append(make_transaction(1, block_height=0))
+    journal = open_journal(tmp_path, wallet)
+    assert wallet.transactions[0].confirmations == 1
+    tip.update(600005)
+    journal.close()
+    assert journal.record_count == 1
+    recovered = cb.WalletJournal.recover(journal.snapshot_path)
+    assert [item.confirmations for item in recovered.transactions] == [6, 0]
+    assert recovered.transactions.pending == [recovered.transactions[1]]
+    journal = cb.WalletJournal.open(journal.snapshot_path)
+    journal.compact()
+    journal.close()
+    assert cb.WalletJournal.recover(journal.snapshot_path).transactions[0].confirmations == 6
+
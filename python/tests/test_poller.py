@@ -0,0 +1,84 @@
+"""
+Tests of AdaptivePoller
+=======================
+"""
+
+
+from time import time
+
+import chainbridge as cb
+from conftest import make_wallet
+
+
+
+def record(i, height=0):
+
+    return {'txid': '{:064x}'.format(i), 'vout': 0, 'satoshis': 1000,
+            'height': height, 'confirmations': 1 if height > 0 else 0}
+
+
+
+class FakeAPI(object):
+
+    def __init__(self):
+
+        self.unconfirmed = []
+        self.confirmed = []
+        self.utxo_calls = 0
+
+    def get_address_unconfirmed(self, address):
+
+        return list(self.unconfirmed)
+
+    def get_address_utxo(self, address):
+
+        self.utxo_calls += 1
+        return list(self.confirmed)
+
+
+
+def test_dormant_wallet_backs_off_up_to_the_maximum():
+
+    api = FakeAPI()
+    poller = cb.AdaptivePoller(api=api, min_interval=10, max_interval=30, backoff=2)
+    poller.add(make_wallet(), due=0)
+    for interval in [20, 30, 30]:
+        assert poller.poll_due(now_=time() + 3600) == 1
+        assert abs(poller.next_due() - time() - interval) < 1
+    assert poller.stats['active'] == 0
+    assert api.utxo_calls == 0
+
+
+
+def test_activity_resets_the_interval_and_confirmation_is_detected():
+
+    api = FakeAPI()
+    reports = []
+    poller = cb.AdaptivePoller(api=api, min_interval=10, max_interval=1000, backoff=4,
+                               listener=lambda address, changes: reports.append(changes))
+    wallet = make_wallet()
+    poller.add(wallet, due=0)
+    poller.poll_due(now_=1)
+    api.unconfirmed = [record(1)]
+    poller.wake(wallet.address)
+    assert poller.poll_due() == 1
+    assert poller.stats['active'] == 1
+    assert [event for event, utxo in reports[-1]] == [cb.UserWallet.UTXO_ADDED]
+    api.unconfirmed = []
+    api.confirmed = [record(1, 600000)]
+    poller.wake(wallet.address)
+    poller.poll_due()
+    assert api.utxo_calls == 1
+    assert [event for event, utxo in reports[-1]] == [cb.UserWallet.UTXO_CONFIRMED]
+    assert wallet.balance['spendable'] == 1000
+
+
+
+def test_removed_wallet_is_not_polled():
+
+    poller = cb.AdaptivePoller(api=FakeAPI())
+    wallet = make_wallet()
+    poller.add(wallet, due=0)
+    poller.remove(wallet.address)
+    assert poller.next_due() is None
+    assert poller.poll_due() == 0
@@ -0,0 +1,61 @@
+"""
+Tests of the reconciliation of utxo containers
+==============================================
+"""
+
+
+import chainbridge as cb
+from conftest import make_wallet
+
+
+
+def record(i, vout=0, satoshis=10000, height=600000):
+
+    return {'txid': '{:064x}'.format(i), 'vout': vout, 'satoshis': satoshis,
+            'height': height, 'confirmations': 1 if height > 0 else 0}
+
+
+
+def test_mempool_utxo_is_promoted_once_confirmed():
+
+    wallet = make_wallet()
+    wallet.reconcile_utxos([record(1)], [record(2, height=0)])
+    pending = wallet.unconfirmed_utxos.get_by_key(('{:064x}'.format(2), 0))
+    changes = wallet.reconcile_utxos([record(1), record(2)], [])
+    assert [(event, utxo.key) for event, utxo in changes] == \
+           [(cb.UserWallet.UTXO_CONFIRMED, pending.key)]
+    assert wallet.utxos.count == 2
+    assert wallet.unconfirmed_utxos.count == 0
+    assert wallet.balance['spendable'] == 20000
+
+
+
+def test_unchanged_utxos_are_not_touched():
+
+    wallet = make_wallet()
+    wallet.reconcile_utxos([record(1), record(1, vout=1)], [])
+    stored = list(wallet.utxos)
+    assert wallet.reconcile_utxos([record(1), record(1, vout=1)], []) == []
+    assert all(a is b for a, b in zip(wallet.utxos, stored))
+
+
+
+def test_spent_utxos_are_removed_and_reported():
+
+    wallet = make_wallet()
+    wallet.reconcile_utxos([record(1), record(2)], [record(3, height=0)])
+    events = []
+    changes = wallet.reconcile_utxos([record(2)], [],
+                                     listener=lambda event, utxo: events.append(event))
+    assert sorted(utxo.tx[-1] for event, utxo in changes) == ['1', '3']
+    assert events == [cb.UserWallet.UTXO_REMOVED] * 2
+    assert wallet.balance['total'] == 10000
+
+
+
+def test_omitted_results_leave_containers_untouched():
+
+    wallet = make_wallet()
+    wallet.reconcile_utxos([record(1)], [record(2, height=0)])
+    assert wallet.reconcile_utxos(None, None) == []
+    assert wallet.balance['utxo_count'] == 2
@@ -0,0 +1,109 @@
+"""
+Tests of the ordering of StatementRenderer and ActivityRenderer
+===============================================================
+"""
+
+
+import random
+
+import pytest
+
+import chainbridge as cb
+from conftest import make_transaction, OWNER
+
+
+
+def allow(query_string):
+
+    return True
+
+
+
+def build_transactions(indexed):
+
+    generator = random.Random(7)
+    transactions = cb.TransactionContainer()
+    if indexed:
+        transactions.create_index(cb.TransactionContainer.INDEX_TIME)
+    for i in range(200):
+        time_ = 1600000000 + (i // 3) * 100
+        if i % 17 == 0:
+            time_ = 1600000000 + generator.randrange(70) * 100
+        transactions.append(make_transaction(i, time_=time_))
+    return transactions
+
+
+
+def expected_order(transactions, start, end):
+
+    return [item.tx for position, item in sorted(enumerate(transactions),
+                                                 key=lambda pair: (pair[1].transaction_time,
+                                                                   pair[0]))
+            if start <= item.transaction_time <= end]
+
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_statement_rows_are_ordered_by_time_then_position(indexed):
+
+    transactions = build_transactions(indexed)
+    statement = cb.StatementOfAccount(OWNER, 1600001000, 1600005000, allow)
+    rows = list(cb.StatementRenderer(statement, transactions).rows())
+    assert [row['tx'] for row in rows] == expected_order(transactions, 1600001000,
+                                                         1600005000)
+
+
+
+def test_descending_container_is_read_as_one_run(monkeypatch):
+
+    transactions = cb.TransactionContainer()
+    for i in range(60):
+        transactions.append(make_transaction(i, time_=1600006000 - (i // 2) * 100))
+    merged = []
+    merge = cb.heapq.merge
+
+    def counting_merge(*runs, **kwargs):
+        merged.append(len(runs))
+        return merge(*runs, **kwargs)
+
+    monkeypatch.setattr(cb.heapq, 'merge', counting_merge)
+    statement = cb.StatementOfAccount(OWNER, 1600001000, 1600005000, allow)
+    rows = list(cb.StatementRenderer(statement, transactions).rows())
+    assert [row['tx'] for row in rows] == expected_order(transactions, 1600001000,
+                                                         1600005000)
+    assert merged == [1]
+    merged.clear()
+    strict = [make_transaction(i, time_=1600006000 - i * 100) for i in range(30)]
+    assert list(cb.StatementRenderer.merge_runs_(strict, 0, 30, allow)) == strict[::-1]
+    assert merged == [1]
+
+
+
+def test_activity_rows_are_ordered_by_time():
+
+    transactions = build_transactions(False)
+    search = cb.SearchObject([(cb.SearchObject.FILTER_COUNTERPARTY,
+                               'bitcoincash:qforeign2')])
+    activity = cb.AccountActivity(OWNER, search, allow)
+    rows = list(cb.ActivityRenderer(activity, transactions).rows())
+    order = [tx for tx in expected_order(transactions, 0, 2000000000)
+             if int(tx, 16) % 5 == 2]
+    assert [row['tx'] for row in rows] == order
+
+
+
+def test_index_range_survives_inserts_while_iterating():
+
+    transactions = build_transactions(True)
+    kind = cb.TransactionContainer.INDEX_TIME
+    positions = transactions.index_range_(kind, 1600001000, 1600003000)
+    result = [next(positions) for i in range(5)]
+    transactions.append(make_transaction(500, time_=1600000000))
+    transactions.append(make_transaction(501, time_=1600002000))
+    result += list(positions)
+    stored = [position for position, item in sorted(enumerate(transactions[:200]),
+                                                    key=lambda pair: (pair[1].transaction_time,
+                                                                      pair[0]))
+              if 1600001000 <= item.transaction_time < 1600003000]
+    assert [position for position in result if position < 200] == stored
+    assert result.count(201) == 1
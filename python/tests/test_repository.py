@@ -0,0 +1,139 @@
+"""
+Tests of WalletRepository
+=========================
+"""
+
+
+import threading
+
+import chainbridge as cb
+from conftest import make_transaction, make_utxo, make_wallet, OWNER
+
+
+
+def allow(query_string):
+
+    return True
+
+
+
+def build_wallet(address=OWNER, count=5):
+
+    wallet = make_wallet(count, address=address)
+    wallet.utxos.append(make_utxo(1))
+    wallet.unconfirmed_utxos.append(make_utxo(2, block_height=0, confirmations=0))
+    wallet.addressbook.append(cb.Wallet('bitcoincash:qforeign1', 'One', is_valid=True))
+    wallet.documents.append(cb.StatementOfAccount(address, 1, 2, allow, id=address + '-1',
+                                                  expires_at=1700000000))
+    return wallet
+
+
+
+def test_save_and_lazy_load(tmp_path):
+
+    repository = cb.WalletRepository(str(tmp_path / 'wallets.db'))
+    try:
+        wallet = build_wallet()
+        repository.save(wallet)
+        loaded = repository.load(OWNER)
+        assert not loaded.is_loaded('transactions')
+        assert [item.tx for item in loaded.transactions] == [item.tx for item in wallet.transactions]
+        assert loaded.is_loaded('transactions')
+        assert loaded.utxos.keys() == wallet.utxos.keys()
+        assert loaded.unconfirmed_utxos.keys() == wallet.unconfirmed_utxos.keys()
+        assert loaded.addressbook.get_by_address('bitcoincash:qforeign1').displayed_name == 'One'
+        assert loaded.documents[0].to_dict_() == wallet.documents[0].to_dict_()
+        assert repository.load('bitcoincash:qunknown') is None
+    finally:
+        repository.close()
+
+
+
+def test_cross_user_queries(tmp_path):
+
+    repository = cb.WalletRepository(str(tmp_path / 'wallets.db'))
+    try:
+        for address in ['bitcoincash:qa', 'bitcoincash:qb']:
+            repository.save(build_wallet(address))
+        assert repository.addresses() == ['bitcoincash:qa', 'bitcoincash:qb']
+        found = repository.documents_by_id('bitcoincash:qb-1')
+        assert [owner for owner, document in found] == ['bitcoincash:qb']
+        expiring = repository.documents_expiring(1699999999, 1700000001)
+        assert sorted(owner for owner, document in expiring) == ['bitcoincash:qa',
+                                                                  'bitcoincash:qb']
+        assert repository.documents_expiring(1700000001, 1800000000) == []
+        rows = repository.transactions_by_counterparty('bitcoincash:qforeign1')
+        assert sorted(owner for owner, tx, time_ in rows) == ['bitcoincash:qa',
+                                                              'bitcoincash:qb']
+    finally:
+        repository.close()
+
+
+
+def test_attached_wallet_writes_edits(tmp_path):
+
+    repository = cb.WalletRepository(str(tmp_path / 'wallets.db'))
+    try:
+        wallet = build_wallet()
+        repository.save(wallet)
+        repository.attach(wallet)
+        wallet.transactions.append(make_transaction(20))
+        friend = wallet.addressbook.get_by_address('bitcoincash:qforeign1')
+        friend.state_add(cb.Wallet.WALLET_EDITABLE)
+        friend.displayed_name = 'Renamed'
+        friend.state_delete(cb.Wallet.WALLET_EDITABLE)
+        batch = cb.CertificationBatch()
+        batch.add(wallet.documents[0], 'content')
+        batch.certify()
+        repository.detach(OWNER)
+        loaded = repository.load(OWNER, lazy=False)
+        assert len(loaded.transactions) == 6
+        assert loaded.addressbook.get_by_address('bitcoincash:qforeign1').displayed_name == 'Renamed'
+        assert loaded.documents[0].certified
+        assert cb.CertificationBatch.verify(loaded.documents[0], 'content')
+    finally:
+        repository.close()
+
+
+
+def test_save_deletes_removed_items(tmp_path):
+
+    repository = cb.WalletRepository(str(tmp_path / 'wallets.db'))
+    try:
+        wallet = build_wallet()
+        wallet.documents.append(cb.StatementOfAccount(OWNER, 1, 2, allow, id=OWNER + '-2'))
+        repository.save(wallet)
+        del wallet.documents[0]
+        del wallet.addressbook[0]
+        repository.save(wallet)
+        loaded = repository.load(OWNER, lazy=False)
+        assert [document.id for document in loaded.documents] == [OWNER + '-2']
+        assert len(loaded.addressbook) == 0
+        assert repository.documents_by_id(OWNER + '-1') == []
+    finally:
+        repository.close()
+
+
+
+def test_attached_wallets_write_from_many_threads(tmp_path):
+
+    repository = cb.WalletRepository(str(tmp_path / 'wallets.db'))
+    try:
+        wallets = [build_wallet('bitcoincash:q{}'.format(i), count=0) for i in range(4)]
+        for wallet in wallets:
+            repository.save(wallet)
+            repository.attach(wallet)
+
+        def append(wallet):
+            for i in range(50):
+                wallet.transactions.append(make_transaction(i))
+
+        threads = [threading.Thread(target=append, args=(wallet,)) for wallet in wallets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert [len(repository.load(wallet.address).transactions)
+                for wallet in wallets] == [50, 50, 50, 50]
+    finally:
+        repository.close()
@@ -0,0 +1,220 @@
+"""
+Tests of SearchObject, SearchCache and SearchView
+=================================================
+"""
+
+
+import pytest
+
+import chainbridge as cb
+from conftest import make_transaction, make_wallet
+
+
+
+FILTER_SETS = [
+    [],
+    [(cb.SearchObject.FILTER_DATE, (1600000500, 1600002000))],
+    [(cb.SearchObject.FILTER_AMOUNT, (0.2, 0.6))],
+    [(cb.SearchObject.FILTER_DIRECTION, cb.SearchObject.DIRECTION_OUTGOING)],
+    [(cb.SearchObject.FILTER_COUNTERPARTY, 'bitcoincash:qforeign1')],
+    [(cb.SearchObject.FILTER_CONFIRMATION, [cb.CBTransaction.CONFIRMATION_CONFIRMED])],
+    [(cb.SearchObject.FILTER_ADDRESSBOOK, True)],
+    [(cb.SearchObject.FILTER_ADDRESSBOOK, False),
+     (cb.SearchObject.FILTER_DATE, (None, 1600003000)),
+     (cb.SearchObject.FILTER_AMOUNT, (0.3, None)),
+     (cb.SearchObject.FILTER_DIRECTION, cb.SearchObject.DIRECTION_INCOMING)],
+]
+
+
+
+def build_transactions(count=40, chain_tip=None):
+
+    transactions = cb.TransactionContainer(chain_tip=chain_tip)
+    for i in range(count):
+        amount = 0.1 * (i % 7 + 1) * (-1 if i % 3 == 0 else 1)
+        transactions.append(make_transaction(i, amount=round(amount, 8),
+                                             block_height=600000 + i if i % 4 else 0))
+    return transactions
+
+
+
+def build_addressbook():
+
+    return cb.WalletContainer([cb.Wallet('bitcoincash:qforeign2', 'Two', is_valid=True),
+                               cb.Wallet('bitcoincash:qforeign3', 'Three', is_valid=True)])
+
+
+
+def expected(transactions, filters, addressbook):
+
+    book = set(wallet.address for wallet in addressbook)
+    result = []
+    for item in transactions:
+        match = True
+        for filter_type, filter_value in filters:
+            if filter_type == cb.SearchObject.FILTER_DATE:
+                start, end = filter_value
+                match &= start is None or item.transaction_time >= start
+                match &= end is None or item.transaction_time < end
+            elif filter_type == cb.SearchObject.FILTER_AMOUNT:
+                start, end = filter_value
+                match &= start is None or abs(item.balance) >= start
+                match &= end is None or abs(item.balance) <= end
+            elif filter_type == cb.SearchObject.FILTER_DIRECTION:
+                match &= (item.is_incoming if filter_value == cb.SearchObject.DIRECTION_INCOMING
+                          else item.is_outgoing)
+            elif filter_type == cb.SearchObject.FILTER_COUNTERPARTY:
+                match &= item.foreign_address == filter_value
+            elif filter_type == cb.SearchObject.FILTER_CONFIRMATION:
+                match &= item.confirmation_level in filter_value
+            elif filter_type == cb.SearchObject.FILTER_ADDRESSBOOK:
+                match &= (item.foreign_address in book) == filter_value
+        if match:
+            result.append(item)
+    return result
+
+
+
+@pytest.mark.parametrize('filters', FILTER_SETS)
+def test_fused_predicate_matches_every_filter(filters):
+
+    transactions = build_transactions(chain_tip=cb.ChainTip(600050))
+    addressbook = build_addressbook()
+    result = cb.SearchObject(filters).apply_filter(transactions, addressbook)
+    assert result == expected(transactions, filters, addressbook)
+
+
+
+@pytest.mark.parametrize('filters', FILTER_SETS)
+def test_store_columns_match_objects(filters, tmp_path):
+
+    tip = cb.ChainTip(600050)
+    wallet = make_wallet()
+    for item in build_transactions():
+        wallet.transactions.append(item)
+    cb.TransactionStore.write(str(tmp_path / 'store'), wallet)
+    store = cb.TransactionStore(str(tmp_path / 'store'))
+    try:
+        stored = store.container(tip)
+        addressbook = build_addressbook()
+        search = cb.SearchObject(filters)
+        result = [item.tx for item in search.apply_filter(stored, addressbook)]
+        assert result == [item.tx for item in search.apply_filter(
+            build_transactions(chain_tip=tip), addressbook)]
+    finally:
+        store.close()
+
+
+
+def test_predicate_is_rebuilt_after_filter_change():
+
+    transactions = build_transactions()
+    search = cb.SearchObject([(cb.SearchObject.FILTER_DIRECTION,
+                               cb.SearchObject.DIRECTION_INCOMING)])
+    incoming = search.apply_filter(transactions)
+    search.change_filter(cb.SearchObject.FILTER_DIRECTION,
+                         cb.SearchObject.DIRECTION_OUTGOING)
+    outgoing = search.apply_filter(transactions)
+    assert all(item.is_incoming for item in incoming)
+    assert all(item.is_outgoing for item in outgoing)
+    assert len(incoming) + len(outgoing) == len(transactions)
+
+
+
+@pytest.mark.parametrize('filters', FILTER_SETS)
+def test_indexed_plans_match_scans(filters):
+
+    transactions = build_transactions(chain_tip=cb.ChainTip(600050))
+    for kind in [cb.TransactionContainer.INDEX_TIME,
+                 cb.TransactionContainer.INDEX_AMOUNT,
+                 cb.TransactionContainer.INDEX_COUNTERPARTY]:
+        transactions.create_index(kind)
+    addressbook = build_addressbook()
+    result = cb.SearchObject(filters).apply_filter(transactions, addressbook)
+    assert result == expected(transactions, filters, addressbook)
+
+
+
+def test_amount_index_bounds_are_inclusive_and_exact():
+
+    transactions = build_transactions()
+    transactions.create_index(cb.TransactionContainer.INDEX_AMOUNT)
+    filters = [(cb.SearchObject.FILTER_AMOUNT, (0.2, 0.4))]
+    plan = cb.SearchObject(filters).explain(transactions)
+    matching = expected(transactions, filters, [])
+    assert plan['access'] == 'index'
+    assert plan['steps'][0]['value'] == (20000000, 40000000)
+    assert plan['candidates'] == len(matching)
+    assert cb.SearchObject(filters).apply_filter(transactions) == matching
+
+
+
+def test_cache_hits_equivalent_filters_until_the_container_changes():
+
+    transactions = build_transactions()
+    cache = cb.SearchCache()
+    first = cb.SearchObject([(cb.SearchObject.FILTER_AMOUNT, (0.2, 0.6)),
+                             (cb.SearchObject.FILTER_COUNTERPARTY, 'bitcoincash:qforeign1')])
+    second = cb.SearchObject([(cb.SearchObject.FILTER_COUNTERPARTY, ['bitcoincash:qforeign1']),
+                              (cb.SearchObject.FILTER_AMOUNT, (0.2, 0.6))])
+    result = cache.apply(first, transactions)
+    assert cache.apply(second, transactions) == result
+    assert cache.stats == {'hits': 1, 'misses': 1, 'entries': 1}
+    transactions.append(make_transaction(41, amount=0.3, foreign_address='bitcoincash:qforeign1'))
+    assert cache.apply(second, transactions) == result + [transactions[-1]]
+    assert cache.stats['misses'] == 2
+
+
+
+def test_cached_result_is_a_copy():
+
+    transactions = build_transactions()
+    cache = cb.SearchCache()
+    search = cb.SearchObject([(cb.SearchObject.FILTER_DIRECTION,
+                               cb.SearchObject.DIRECTION_INCOMING)])
+    cache.apply(search, transactions).clear()
+    assert len(cache.apply(search, transactions)) > 0
+
+
+
+def test_cache_is_bounded():
+
+    transactions = build_transactions()
+    cache = cb.SearchCache(capacity=2)
+    for start in range(3):
+        cache.apply(cb.SearchObject([(cb.SearchObject.FILTER_DATE,
+                                      (1600000000 + start * 100, None))]), transactions)
+    assert len(cache) == 2
+
+
+
+def test_view_follows_appends_and_confirmation_changes():
+
+    tip = cb.ChainTip(600050)
+    transactions = build_transactions(chain_tip=tip)
+    events = []
+    search = cb.SearchObject([(cb.SearchObject.FILTER_CONFIRMATION,
+                               [cb.CBTransaction.CONFIRMATION_CONFIRMED])])
+    view = cb.SearchView(search, transactions,
+                         listener=lambda event, item: events.append((event, item.tx)))
+    assert view.result == expected(transactions, search.filter_list, [])
+    transactions.append(make_transaction(40, block_height=600050))
+    assert events[-1] == (cb.CBContainer.CONTAINER_APPEND, transactions[-1].tx)
+    tip.update(600060)
+    assert (cb.CBContainer.CONTAINER_REMOVE, transactions[-1].tx) in events
+    assert view.result == expected(transactions, search.filter_list, []) == []
+    view.close()
+    transactions.append(make_transaction(41, block_height=600060))
+    assert view.count == 0
+
+
+
+def test_view_is_reevaluated_after_filter_change():
+
+    transactions = build_transactions()
+    search = cb.SearchObject([(cb.SearchObject.FILTER_DIRECTION,
+                               cb.SearchObject.DIRECTION_INCOMING)])
+    view = cb.SearchView(search, transactions)
+    search.change_filter(cb.SearchObject.FILTER_DIRECTION,
+                         cb.SearchObject.DIRECTION_OUTGOING)
+    assert view.result == expected(transactions, search.filter_list, [])
@@ -0,0 +1,118 @@
+"""
+Tests of TransactionSnapshot and document binding
+=================================================
+"""
+
+
+import io
+import json
+
+import chainbridge as cb
+from conftest import make_transaction, make_wallet, OWNER
+
+
+
+def allow(query_string):
+
+    return True
+
+
+
+def render(document, transactions=None, format=None):
+
+    outstream = io.StringIO()
+    summary = document.render(transactions, outstream, format)
+    return outstream.getvalue(), summary
+
+
+
+def build_wallet(tip):
+
+    wallet = make_wallet()
+    wallet.transactions.chain_tip = tip
+    for i in range(10):
+        wallet.transactions.append(make_transaction(i, block_height=100 - i % 2 * 10))
+    return wallet
+
+
+
+def test_activity_keeps_confirmation_filter_at_frozen_tip():
+
+    tip = cb.ChainTip(100)
+    wallet = build_wallet(tip)
+    search = cb.SearchObject([(cb.SearchObject.FILTER_CONFIRMATION,
+                               [cb.CBTransaction.CONFIRMATION_CONFIRMED])])
+    activity = cb.AccountActivity(OWNER, search, allow)
+    activity.bind(wallet.transactions)
+    first, summary = render(activity)
+    assert summary['count'] == 5
+    tip.update(200)
+    assert all(item.confirmation_level == cb.CBTransaction.CONFIRMATION_WELL
+               for item in wallet.transactions)
+    second, summary = render(activity)
+    assert summary['count'] == 5
+    assert second == first
+
+
+
+def test_activity_keeps_frozen_tip_on_indexed_container():
+
+    tip = cb.ChainTip(100)
+    wallet = build_wallet(tip)
+    wallet.transactions.create_index(cb.TransactionContainer.INDEX_TIME)
+    search = cb.SearchObject([(cb.SearchObject.FILTER_CONFIRMATION,
+                               [cb.CBTransaction.CONFIRMATION_WELL]),
+                              (cb.SearchObject.FILTER_DATE, (1600000000, 1600000500))])
+    activity = cb.AccountActivity(OWNER, search, allow)
+    activity.bind(wallet.transactions)
+    first, summary = render(activity)
+    assert summary['count'] == 2
+    tip.update(200)
+    assert render(activity)[0] == first
+
+
+
+def test_statement_ignores_appended_transactions_and_tip_moves():
+
+    tip = cb.ChainTip(100)
+    wallet = build_wallet(tip)
+    statement = cb.StatementOfAccount(OWNER, 1600000000, 1600010000, allow)
+    statement.bind(wallet.transactions)
+    first, summary = render(statement)
+    assert summary['count'] == 10
+    for i in range(10, 15):
+        wallet.transactions.append(make_transaction(i))
+    tip.update(300)
+    assert render(statement)[0] == first
+
+
+
+def test_restored_document_renders_the_bound_rows():
+
+    tip = cb.ChainTip(100)
+    wallet = build_wallet(tip)
+    statement = cb.StatementOfAccount(OWNER, 1600000000, 1600010000, allow, id=7)
+    statement.bind(wallet.transactions)
+    first = render(statement, format=cb.StatementRenderer.FORMAT_JSONL)[0]
+    wallet.transactions.append(make_transaction(20))
+    tip.update(150)
+    restored = cb.CBDocument.from_dict_(json.loads(json.dumps(statement.to_dict_())))
+    assert restored.binding == statement.binding
+    assert render(restored, wallet.transactions,
+                  cb.StatementRenderer.FORMAT_JSONL)[0] == first
+
+
+
+def test_snapshot_view():
+
+    tip = cb.ChainTip(100)
+    wallet = build_wallet(tip)
+    snapshot = wallet.transactions.snapshot()
+    wallet.transactions.append(make_transaction(10))
+    assert len(snapshot) == 10
+    assert len(list(snapshot)) == 10
+    assert snapshot[-1].tx == wallet.transactions[9].tx
+    assert not snapshot.is_current
+    tip.update(120)
+    assert snapshot.tip_height == 100
+    assert snapshot.confirmations_of(wallet.transactions[0]) == 1
@@ -0,0 +1,112 @@
+"""
+Tests of the WalletFile storage format
+======================================
+"""
+
+
+import json
+import pickle
+import struct
+
+import pytest
+
+import chainbridge as cb
+from conftest import make_transaction, make_utxo, make_wallet
+
+
+
+def restore(wallet, include_raw=True):
+
+    return cb.UserWallet.from_dict_(cb.WalletFile.loads(
+                                        cb.WalletFile.dumps(wallet, include_raw)))
+
+
+
+def test_round_trip_keeps_transactions_utxos_and_raw_records():
+
+    wallet = make_wallet(30, raw=True)
+    wallet.transactions.append_(make_transaction(30, amount=-0.25, raw=True))
+    wallet.utxos.append(make_utxo(1, 1500))
+    wallet.unconfirmed_utxos.append(make_utxo(2, 700, 0, 0))
+    restored = restore(wallet)
+    assert [item.tx for item in restored.transactions] == \
+           [item.tx for item in wallet.transactions]
+    assert [item.foreign_address for item in restored.transactions] == \
+           [item.foreign_address for item in wallet.transactions]
+    assert [item.balance for item in restored.transactions] == \
+           [item.balance for item in wallet.transactions]
+    assert restored.transactions[3].raw == wallet.transactions[3].raw
+    assert restored.balance == wallet.balance
+    assert restore(wallet, include_raw=False).transactions[3].raw is None
+
+
+
+def test_txids_that_are_not_hex_are_kept_verbatim():
+
+    wallet = make_wallet()
+    wallet.transactions.append_(cb.CBTransaction('not-a-hex-txid', 600000, 1, 1, 1,
+                                                 10, [0.0], [0.5], [0.0],
+                                                 'bitcoincash:qforeign'))
+    wallet.utxos.append(cb.CBUtxo('A' * 64, 0.0001, 10000, 600000, 10))
+    restored = restore(wallet)
+    assert restored.transactions[0].tx == 'not-a-hex-txid'
+    assert restored.utxos[0].tx == 'A' * 64
+
+
+
+def test_version_1_files_are_readable():
+
+    wallet = make_wallet()
+    meta = json.dumps(cb.Wallet.to_dict_(wallet)).encode('utf-8')
+    strings = json.dumps([['{:064x}'.format(7)], ['bitcoincash:qforeign']]).encode('utf-8')
+    transactions = b''.join([struct.pack('<IQ', 1, len(strings)), strings,
+                             struct.pack('<6q', 600000, 1, 1, 1, 10, 6),
+                             struct.pack('<3I', 1, 1, 1),
+                             struct.pack('<3q', 0, 50000000, 0)])
+    sections = [(b'META', meta), (b'TXNS', transactions)]
+    data = struct.pack('<4sHH', b'CBWF', 1, len(sections)) + b''.join(
+               struct.pack('<4sQ', name, len(payload)) + payload
+               for name, payload in sections)
+    restored = cb.UserWallet.from_dict_(cb.WalletFile.loads(data))
+    assert restored.transactions[0].tx == '{:064x}'.format(7)
+    assert restored.transactions[0].received == 0.5
+    assert restored.transactions[0].foreign_address == 'bitcoincash:qforeign'
+
+
+
+def test_newer_format_version_is_rejected():
+
+    data = struct.pack('<4sHH', b'CBWF', cb.WalletFile.FORMAT_VERSION + 1, 0)
+    with pytest.raises(ValueError):
+        cb.WalletFile.loads(data)
+
+
+
+def test_from_dict_validates_wallets_without_stored_validity(monkeypatch):
+
+    queried = []
+    monkeypatch.setattr(cb.BitcoinAPI, 'is_valid_wallet',
+                        classmethod(lambda cls, address: queried.append(address)
+                                    or True))
+    data = cb.Wallet.to_dict_(make_wallet())
+    del data['is_valid']
+    assert cb.has_state(cb.Wallet.from_dict_(data).state, cb.Wallet.WALLET_VALID)
+    assert cb.has_state(cb.UserWallet.from_dict_(data).state, cb.Wallet.WALLET_VALID)
+    assert queried == [data['address']] * 2
+
+
+
+def test_legacy_pickle_file_is_converted_on_request(tmp_path):
+
+    wallet = make_wallet(3)
+    path = str(tmp_path / 'wallet.dat')
+    with open(path, 'wb') as stream:
+        pickle.dump(wallet.to_dict_(), stream)
+    with pytest.raises(ValueError, match='allow_pickle=True'):
+        cb.UserWallet.from_file(path)
+    restored = cb.UserWallet.from_file(path, allow_pickle=True)
+    assert [item.tx for item in restored.transactions] == \
+           [item.tx for item in wallet.transactions]
+    with open(path, 'rb') as stream:
+        assert stream.read(4) == cb.WalletFile.MAGIC
+    assert len(cb.UserWallet.from_file(path).transactions) == 3
@@ -0,0 +1,63 @@
+"""
+Tests of TransactionStore and StoredTransactionContainer
+========================================================
+"""
+
+
+import pytest
+
+import chainbridge as cb
+from conftest import make_transaction, make_utxo, make_wallet
+
+
+
+@pytest.fixture
+def store_path(tmp_path):
+
+    wallet = make_wallet(raw=True)
+    for i in reversed(range(20)):
+        wallet.transactions.append(make_transaction(i, amount=-0.1 if i % 4 == 0 else 0.3,
+                                                    raw=True))
+    wallet.utxos.append(make_utxo(1, 2500))
+    wallet.unconfirmed_utxos.append(make_utxo(2, 700, 0, 0))
+    path = str(tmp_path / 'wallet')
+    cb.TransactionStore.write(path, wallet)
+    return path
+
+
+
+def test_records_are_ordered_by_time_and_found_by_txid(store_path):
+
+    store = cb.TransactionStore(store_path)
+    try:
+        assert store.transaction_count == 20
+        times = [store.time_at(i) for i in range(20)]
+        assert times == sorted(times)
+        item = store.get_by_txid('{:064x}'.format(8))
+        assert item.transaction_time == 1600000800
+        assert item.balance == -0.1
+        assert item.raw['txid'] == '{:064x}'.format(8)
+        assert store.get_by_txid('{:064x}'.format(99)) is None
+        assert [item.tx for item in store.range_by_time(1600000500, 1600000800)] == \
+               ['{:064x}'.format(i) for i in range(5, 8)]
+    finally:
+        store.close()
+
+
+
+def test_loaded_wallet_reads_lazily_and_accepts_appends(store_path):
+
+    wallet = cb.TransactionStore.load_wallet(store_path, cb.ChainTip(600030))
+    transactions = wallet.transactions
+    try:
+        assert len(transactions) == 20
+        assert transactions[3] is transactions[3]
+        assert transactions[3].confirmations == 28
+        assert transactions.contains_tx('{:064x}'.format(19))
+        transactions.append(make_transaction(20))
+        assert len(transactions) == 21
+        assert transactions[-1].tx == '{:064x}'.format(20)
+        assert wallet.balance == {'spendable': 2500, 'pending': 700, 'total': 3200,
+                                  'utxo_count': 2, 'min_confirmations': 10}
+    finally:
+        transactions.store.close()
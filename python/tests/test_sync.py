@@ -0,0 +1,98 @@
+"""
+Tests of the rate limiter and the sync scheduler
+================================================
+"""
+
+
+import pytest
+
+import chainbridge as cb
+from conftest import make_wallet
+
+
+
+class FakeAPI(object):
+    """
+    Bulk API stand-in with canned answers
+    """
+
+    def __init__(self, utxos, fail=False):
+
+        self.rate_limiter = None
+        self.utxos = utxos
+        self.fail = fail
+        self.bulk_calls = 0
+        self.page_calls = 0
+
+    def get_addresses_details(self, addresses):
+
+        self.bulk_calls += 1
+        if self.fail:
+            return None
+        return {address: {'txApperances': 0, 'unconfirmedTxApperances': 0}
+                for address in addresses}
+
+    def get_addresses_utxo(self, addresses):
+
+        return {address: list(self.utxos.get(address, []))
+                for address in addresses}
+
+    def get_addresses_unconfirmed(self, addresses):
+
+        return {address: [] for address in addresses}
+
+    def get_address_transactions_page(self, address, page):
+
+        self.page_calls += 1
+        return [], 1
+
+
+
+def test_acquire_rejects_more_than_capacity():
+
+    bucket = cb.TokenBucket(10, capacity=2)
+    with pytest.raises(ValueError):
+        bucket.acquire(3)
+    bucket.acquire(2)
+    assert not bucket.try_acquire()
+
+
+
+def test_try_acquire_takes_tokens_without_waiting():
+
+    bucket = cb.TokenBucket(0.001, capacity=3)
+    assert bucket.try_acquire(2)
+    assert not bucket.try_acquire(2)
+    assert bucket.try_acquire(1)
+
+
+
+def test_run_once_reconciles_and_ranks_fresh_wallets_last():
+
+    first = make_wallet(address='bitcoincash:qfirst')
+    second = make_wallet(address='bitcoincash:qsecond')
+    record = {'txid': '{:064x}'.format(1), 'vout': 0, 'satoshis': 5000,
+              'height': 600000, 'confirmations': 3}
+    api = FakeAPI({first.address: [record]})
+    scheduler = cb.SyncScheduler(api=api, workers=1, batch_size=1)
+    scheduler.add(first)
+    scheduler.add(second)
+    report = scheduler.run_once(limit=1)
+    assert report['wallets'] == 1
+    assert report['changes'] == 1
+    assert len(first.utxos) == 1
+    assert scheduler.due() == [second.address, first.address]
+    assert scheduler.stats['oldest'] is None
+
+
+
+def test_failed_batch_counts_errors_per_wallet():
+
+    api = FakeAPI({}, fail=True)
+    scheduler = cb.SyncScheduler(api=api, workers=1)
+    scheduler.add(make_wallet(address='bitcoincash:qfirst'))
+    scheduler.add(make_wallet(address='bitcoincash:qsecond'))
+    report = scheduler.run_once()
+    assert report['wallets'] == 0
+    assert report['errors'] == 2
+    assert api.bulk_calls == 1
@@ -0,0 +1,45 @@
+"""
+Tests of DocumentTemplate and TemplateRegistry
+==============================================
+"""
+
+
+import pytest
+
+import chainbridge as cb
+
+
+
+def test_slots_are_formatted_with_their_specs():
+
+    template = cb.DocumentTemplate('{{time:>10}}|{{ tx :<6.6}}|{{count}}\n', 'row')
+    assert template.slots == ['time', 'tx', 'count']
+    assert template.render(time=1600000000, tx='abcdef0123', count=3) == \
+           '1600000000|abcdef|3\n'
+    assert template({'time': '', 'tx': 'ab', 'count': 0}) == '          |ab    |0\n'
+
+
+
+def test_literals_only_and_empty_layouts():
+
+    assert cb.DocumentTemplate('no slots {here}').render() == 'no slots {here}'
+    assert cb.DocumentTemplate('').render() == ''
+    assert cb.DocumentTemplate('{{a}}{{a:>3}}').slots == ['a']
+
+
+
+def test_missing_slot_raises_value_error():
+
+    template = cb.DocumentTemplate('{{owner}} {{balance:>18}}', 'header')
+    with pytest.raises(ValueError):
+        template.render(owner='x')
+
+
+
+def test_builtin_row_matches_format_specification():
+
+    row = cb.TemplateRegistry().get('CBDocument', 'row')
+    values = {'time': 1600000000, 'tx': 'f' * 64, 'counterparty': 'bitcoincash:qforeign',
+              'amount': '0.50000000', 'balance': '-1.25000000'}
+    assert row(values) == '{time:>10}  {tx:<16.16}  {counterparty:<36.36}  ' \
+                          '{amount:>18}  {balance:>18}\n'.format(**values)
@@ -0,0 +1,81 @@
+"""
+Tests of the running totals of UtxoContainer
+============================================
+"""
+
+
+import chainbridge as cb
+from conftest import make_utxo, make_wallet
+
+
+
+def test_totals_follow_append_and_removal():
+
+    container = cb.UtxoContainer([make_utxo(1, 1000, 600000, 5),
+                                  make_utxo(2, 2000, 600004, 1)])
+    assert container.sat_total == 3000
+    assert container.count == 2
+    assert container.min_confirmations == 1
+    container.remove_keys([make_utxo(2).key])
+    assert container.sat_total == 1000
+    assert container.min_confirmations == 5
+    container.remove_keys([make_utxo(1).key])
+    assert container.sat_total == 0
+    assert container.min_confirmations is None
+
+
+
+def test_replacing_a_key_does_not_double_count():
+
+    container = cb.UtxoContainer([make_utxo(1, 1000, 600000, 5)])
+    container.append_(make_utxo(1, 1500, 600000, 6))
+    assert container.sat_total == 1500
+    assert container.count == 1
+    assert len(container) == 1
+    assert container.min_confirmations == 6
+
+
+
+def test_removal_and_replacement_keep_the_container_consistent():
+
+    container = cb.UtxoContainer([make_utxo(i, 1000 + i) for i in range(10)])
+    replacement = make_utxo(4, 5000)
+    container.append_(replacement)
+    assert container[4] is replacement
+    removed = container.remove_keys([make_utxo(i).key for i in [0, 9, 4, 42]])
+    assert sorted(utxo.tx for utxo in removed) == sorted(make_utxo(i).tx for i in [0, 4, 9])
+    assert len(container) == container.count == 7
+    assert {utxo.key for utxo in container} == container.keys()
+    assert container.sat_total == sum(1000 + i for i in [1, 2, 3, 5, 6, 7, 8])
+    container.remove_keys([utxo.key for utxo in list(container)])
+    assert len(container) == 0
+    container.append(make_utxo(3))
+    assert container.get_by_key(make_utxo(3).key) is container[0]
+
+
+
+def test_min_confirmations_follows_the_chain_tip():
+
+    tip = cb.ChainTip(600009)
+    container = cb.UtxoContainer([make_utxo(1, 1000, 600000, 1),
+                                  make_utxo(2, 1000, 600005, 1)],
+                                 chain_tip=tip)
+    assert container.min_confirmations == 5
+    tip.update(600019)
+    assert container.min_confirmations == 15
+    container.append_(make_utxo(3, 1000, 0, 0))
+    assert container.min_confirmations == 0
+    container.chain_tip = None
+    assert container.min_confirmations == 0
+    container.remove_keys([make_utxo(3).key])
+    assert container.min_confirmations == 1
+
+
+
+def test_balance_summary_of_wallet():
+
+    wallet = make_wallet()
+    wallet.utxos.append(make_utxo(1, 4000))
+    wallet.unconfirmed_utxos.append(make_utxo(2, 500, 0, 0))
+    assert wallet.balance == {'spendable': 4000, 'pending': 500, 'total': 4500,
+                              'utxo_count': 2, 'min_confirmations': 10}